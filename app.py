@@ -3,26 +3,75 @@ Telegram Bot that handles text messages, images, and documents.
 Supports Python 3.8+
 """
 
+import asyncio
+import functools
 import logging
 import mimetypes
 import os
-from datetime import datetime, timezone
+import tempfile
+import time
+import weakref
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from dotenv import load_dotenv
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import (
+    Application,
+    CallbackQueryHandler,
+    CommandHandler,
+    MessageHandler,
+    filters,
+    ContextTypes,
+)
 
-from src.db import init_db_from_env
+from src.db import (
+    apply_transition,
+    enqueue_job,
+    init_db_from_env,
+    preview_transition,
+    record_receipt_file,
+    usage_report,
+)
+from src.graph.album import run_album
+from src.graph.checkpoint import ConversationMemory, thread_config, turn_input
 from src.graph.graph import graph
 from src.schemas.state import WorkflowState
-from src.tools.minio_storage import get_minio_client, upload_bytes
+from src.tools.bulk_approval import (
+    COMMANDS,
+    USAGE,
+    format_preview,
+    notification_messages,
+    parse_approval_args,
+)
+from src.tools.expense_export import (
+    MAX_DOCUMENT_BYTES,
+    RECEIPT_CONCURRENCY,
+    parse_export_args,
+    write_export,
+    write_receipts,
+)
+from src.tools.minio_storage import get_minio_client, record_file_reference
+from src.tools.outbound import OutboundLimiter
+from src.tools.media_group import AlbumItem, MediaGroupBatcher
+from src.tools.metrics import Gauge, Histogram, start_metrics_server
+from src.tools.notifier import send_batched
+from src.tools.profiler import (
+    ProfilerBusy,
+    install_profile_signal,
+    profile_dir,
+    profile_for,
+    profile_update,
+)
+from src.tools.progressive_reply import ProgressiveReply
+from src.tools.streaming_upload import stream_telegram_file_to_minio
+from src.tools.structured_logging import configure_logging
+from src.tools.usage_ledger import format_usage_report, get_usage_ledger
+from src.tools.webhook import run_webhook
 
 load_dotenv()
 
-# Enable logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Queued logging (LOG_LEVEL, LOG_FORMAT) so writes never block the event loop
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load bot token from environment variable
@@ -30,11 +79,225 @@ TELEGRAM_BOT_TOKEN = os.environ["TELEGRAM_BOT_TOKEN"]
 
 compiled_graph = graph.compile()
 
-def _extract_response_text(result: object) -> str | None:
-    """Extract response_text from a graph result payload."""
-    if isinstance(result, dict):
-        return result.get("response_text")
-    return getattr(result, "response_text", None)
+# Per-chat graph state kept between messages (CHECKPOINT_BACKEND)
+conversation_memory = ConversationMemory.from_env()
+
+# Runs of one chat share a checkpoint thread, so they must not overlap
+_chat_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+# Hand graph runs to worker processes (worker.py) instead of running them here
+JOB_QUEUE = os.getenv("JOB_QUEUE", "false").lower() == "true"
+
+# Telegram user ids allowed to run admin commands such as /usage
+ADMIN_TELEGRAM_IDS = {
+    int(user_id) for user_id in os.getenv("ADMIN_TELEGRAM_IDS", "").split(",") if user_id.strip()
+}
+
+# Telegram user ids allowed to approve or reject expenses in bulk (admins too)
+APPROVER_TELEGRAM_IDS = ADMIN_TELEGRAM_IDS | {
+    int(user_id)
+    for user_id in os.getenv("APPROVER_TELEGRAM_IDS", "").split(",")
+    if user_id.strip()
+}
+
+
+async def _enqueue(message, kind: str, payload: dict, progress_message_id: int | None = None) -> None:
+    """Queue a job for the worker pool; replies keep per-chat order."""
+    job_id = await asyncio.to_thread(
+        enqueue_job,
+        os.environ["DATABASE_URL"],
+        chat_id=message.chat_id,
+        kind=kind,
+        payload=payload,
+        reply_to_message_id=message.message_id,
+        progress_message_id=progress_message_id,
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+    )
+    logger.info("Queued %s job %s for chat %s", kind, job_id, message.chat_id)
+
+
+async def _flush_album(media_group_id: str, items: list[AlbumItem]) -> None:
+    """Process a complete album and send one consolidated reply."""
+    if JOB_QUEUE:
+        states = [item.state.model_dump(mode="json") for item in items]
+        await _enqueue(items[0].message, "album", {"states": states})
+        return
+
+    result = await asyncio.to_thread(run_album, [item.state for item in items])
+    response_text = result.response_text or f"✅ {len(items)} receipts received. Thanks!"
+    await items[0].message.reply_text(response_text)
+
+
+album_batcher = MediaGroupBatcher(
+    _flush_album,
+    window=float(os.getenv("ALBUM_WINDOW_SECONDS", "1.5")),
+)
+
+
+UPDATE_TTFB_SECONDS = Histogram(
+    "telegram_update_ttfb_seconds",
+    "Time from handling an update to the first message sent back.",
+    ["handler"],
+)
+HANDLER_SECONDS = Histogram(
+    "telegram_handler_seconds",
+    "End-to-end time spent handling an update.",
+    ["handler"],
+)
+UPDATES_IN_FLIGHT = Gauge(
+    "telegram_updates_in_flight",
+    "Updates currently being handled.",
+    ["handler"],
+)
+UPDATE_QUEUE_DEPTH = Gauge(
+    "telegram_update_queue_depth",
+    "Updates received but not yet picked up by a handler.",
+)
+PENDING_ALBUMS = Gauge(
+    "media_group_pending_albums",
+    "Albums still collecting photos or being processed.",
+)
+PENDING_ALBUMS.set_function(lambda: album_batcher.pending)
+
+
+def _timed(name: str, handler):
+    """Wrap a handler to export its latency and in-flight count, and sample cProfile captures."""
+    seconds = HANDLER_SECONDS.labels(name)
+    in_flight = UPDATES_IN_FLIGHT.labels(name)
+
+    @functools.wraps(handler)
+    async def run(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        started = time.monotonic()
+        in_flight.inc()
+        try:
+            with profile_update(name):
+                await handler(update, context)
+        finally:
+            in_flight.dec()
+            seconds.observe(time.monotonic() - started)
+
+    return run
+
+# Progress text shown while the node chosen by the planner runs
+NODE_STATUS = {
+    "extract_receipt": "🔍 Reading receipt…",
+    "upsert_expense": "💾 Saving…",
+    "query_status": "📊 Looking up your expenses…",
+    "render_and_post": "✍️ Writing reply…",
+}
+
+
+async def _start_progress(message, handler: str, started: float) -> ProgressiveReply:
+    """Post the placeholder reply and record time-to-first-byte."""
+    reply = ProgressiveReply(
+        message, min_interval=float(os.getenv("PROGRESS_EDIT_INTERVAL", "1.0"))
+    )
+    await reply.start("⏳ Working on it…")
+    UPDATE_TTFB_SECONDS.labels(handler).observe(time.monotonic() - started)
+    return reply
+
+
+async def _run_graph_with_progress(
+    reply: ProgressiveReply, state: WorkflowState, fallback_text: str
+) -> None:
+    """Stream the graph, editing the placeholder as nodes finish and tokens arrive.
+
+    With JOB_QUEUE on, the run is queued instead and a worker replaces the
+    placeholder with the final reply.
+    """
+    if JOB_QUEUE:
+        await _enqueue(
+            reply.source,
+            "graph",
+            {"state": state.model_dump(mode="json"), "fallback_text": fallback_text},
+            progress_message_id=reply.message_id,
+        )
+        return
+
+    chat_id = reply.source.chat_id
+    lock = _chat_locks.setdefault(chat_id, asyncio.Lock())
+    streamed: list[str] = []
+    response_text = None
+    async with lock:
+        async for mode, chunk in compiled_graph.astream(
+            turn_input(state),
+            config=thread_config(chat_id, stream_tokens=True),
+            stream_mode=["updates", "custom"],
+            durability="exit",
+        ):
+            if mode == "custom":
+                delta = chunk.get("response_text_delta") if isinstance(chunk, dict) else None
+                if delta:
+                    streamed.append(delta)
+                    await reply.update("".join(streamed))
+                continue
+
+            for node_update in chunk.values():
+                values = node_update if isinstance(node_update, dict) else {}
+                response_text = values.get("response_text") or response_text
+                status = NODE_STATUS.get(values.get("next_action"))
+                if status and not streamed:
+                    await reply.update(status)
+        await conversation_memory.after_turn(chat_id)
+
+    await reply.finish(response_text or "".join(streamed) or fallback_text)
+
+
+async def _store_telegram_file(
+    context: ContextTypes.DEFAULT_TYPE,
+    telegram_user_id: int,
+    file_id: str,
+    *,
+    default_suffix: str,
+    default_content_type: str,
+    file_name: str | None = None,
+    mime_type: str | None = None,
+) -> str | None:
+    """Stream a Telegram file into MinIO and record its reference.
+
+    Returns:
+        The file_id when stored, otherwise None.
+    """
+    try:
+        file = await context.bot.get_file(file_id)
+        file_path = getattr(file, "file_path", "") or ""
+        suffix = os.path.splitext(file_name or file_path)[1].lower() or default_suffix
+        content_type = mime_type or mimetypes.guess_type(file_path)[0] or default_content_type
+        uploaded_at = datetime.now(timezone.utc)
+
+        client, bucket = get_minio_client()
+        stored = await stream_telegram_file_to_minio(
+            file,
+            client,
+            bucket,
+            content_type,
+            metadata={"file_id": file_id},
+        )
+        logger.info(
+            "File stored in MinIO: %s/%s (new=%s)", bucket, stored.object_name, stored.uploaded
+        )
+        database_url = os.getenv("DATABASE_URL", "")
+        if database_url:
+            await asyncio.to_thread(
+                record_receipt_file,
+                database_url,
+                telegram_user_id=telegram_user_id,
+                file_id=file_id,
+                sha256=stored.sha256,
+                object_name=stored.object_name,
+                size_bytes=stored.size,
+                content_type=content_type,
+                suffix=suffix,
+                uploaded_at=uploaded_at,
+            )
+        else:
+            await asyncio.to_thread(
+                record_file_reference, client, bucket, file_id, stored, suffix
+            )
+        return file_id
+    except Exception as exc:
+        logger.error("Failed to upload file to MinIO: %s", exc)
+        return None
 
 
 # ==================== COMMAND HANDLERS ====================
@@ -55,6 +318,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     /start - Show this message
     /help - Get help
     /stats - View your activity stats
+    /export - Download your expenses as CSV or XLSX
     """
     await update.message.reply_text(welcome_message)
 
@@ -93,10 +357,188 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(stats_message)
 
 
+async def usage_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show LLM spend by node and top users (admins only): /usage [days]."""
+    if update.effective_user.id not in ADMIN_TELEGRAM_IDS:
+        return
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        await update.message.reply_text("Usage reporting needs DATABASE_URL.")
+        return
+    try:
+        days = max(1, int(context.args[0])) if context.args else 1
+    except ValueError:
+        await update.message.reply_text("Usage: /usage [days]")
+        return
+
+    # Include what this process has not flushed yet
+    await asyncio.to_thread(get_usage_ledger().flush)
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    report = await asyncio.to_thread(usage_report, database_url, since)
+    await update.message.reply_text(format_usage_report(report, days))
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sample the live process and send the stacks (admins only): /profile [seconds]."""
+    if update.effective_user.id not in ADMIN_TELEGRAM_IDS:
+        return
+    try:
+        seconds = max(1.0, float(context.args[0])) if context.args else 30.0
+    except ValueError:
+        await update.message.reply_text("Usage: /profile [seconds]")
+        return
+
+    await update.message.reply_text(f"⏱ Profiling for {seconds:.0f}s…")
+    try:
+        result = await profile_for(seconds)
+    except ProfilerBusy:
+        await update.message.reply_text("A profile is already running.")
+        return
+    path = await asyncio.to_thread(result.write, profile_dir())
+    with path.open("rb") as folded:
+        await update.message.reply_document(
+            folded, filename=path.name, caption=result.summary()[:1024]
+        )
+
+
+async def _send_export_file(message, path: Path, caption: str) -> None:
+    """Send an export as a document, or say it is too large for Telegram."""
+    size = path.stat().st_size
+    if size > MAX_DOCUMENT_BYTES:
+        await message.reply_text(
+            f"{path.name} is {size / 1e6:.0f} MB, over Telegram's limit. "
+            "Export a shorter range or use src/tools/expense_export.py."
+        )
+        return
+    with path.open("rb") as document:
+        await message.reply_document(document, filename=path.name, caption=caption)
+
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send expenses as a file: /export [YYYY-MM | FROM TO] [csv|xlsx] [receipts]."""
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        await update.message.reply_text("Exports need DATABASE_URL.")
+        return
+    try:
+        request = parse_export_args(context.args or [], datetime.now(timezone.utc).date())
+    except ValueError:
+        await update.message.reply_text(
+            "Usage: /export [YYYY-MM | YYYY-MM-DD YYYY-MM-DD] [csv|xlsx] [receipts]"
+        )
+        return
+
+    # Admins export every user's expenses, everyone else their own
+    user_id = update.effective_user.id
+    scope = None if user_id in ADMIN_TELEGRAM_IDS else user_id
+    await update.message.reply_text("📤 Preparing your export…")
+    with tempfile.TemporaryDirectory(prefix="export-") as directory:
+        path = await asyncio.to_thread(write_export, database_url, Path(directory), request, scope)
+        last_day = request.end - timedelta(days=1)
+        await _send_export_file(update.message, path, f"Expenses {request.start} to {last_day}")
+        if request.receipts:
+            minio_client, bucket_name = get_minio_client()
+            concurrency = int(os.getenv("EXPORT_RECEIPT_CONCURRENCY", str(RECEIPT_CONCURRENCY)))
+            path, count = await asyncio.to_thread(
+                write_receipts,
+                database_url,
+                minio_client,
+                bucket_name,
+                Path(directory),
+                request,
+                scope,
+                concurrency,
+            )
+            await _send_export_file(update.message, path, f"{count} receipts")
+
+
+async def _bulk_preview(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, new_status: str
+) -> None:
+    """Preview a bulk transition and ask the approver to confirm it."""
+    if update.effective_user.id not in APPROVER_TELEGRAM_IDS:
+        return
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        await update.message.reply_text("Bulk approvals need DATABASE_URL.")
+        return
+    now = datetime.now(timezone.utc)
+    try:
+        selection = parse_approval_args(context.args or [], now.date())
+    except ValueError as exc:
+        await update.message.reply_text(f"{exc}\n{USAGE.format(command=COMMANDS[new_status])}")
+        return
+
+    # Expenses that arrive after the preview are not part of what gets confirmed
+    selection = selection._replace(created_before=now)
+    preview = await asyncio.to_thread(
+        preview_transition, database_url, selection, update.effective_user.id
+    )
+    text = format_preview(selection, preview, new_status)
+    if not preview:
+        await update.message.reply_text(text)
+        return
+    token = f"{update.effective_message.message_id:x}"
+    context.user_data.setdefault("bulk_transitions", {})[token] = (selection, new_status)
+    confirm = f"✅ {COMMANDS[new_status].capitalize()}"
+    keyboard = InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton(confirm, callback_data=f"bulk:{token}:ok"),
+                InlineKeyboardButton("Cancel", callback_data=f"bulk:{token}:cancel"),
+            ]
+        ]
+    )
+    await update.message.reply_text(text, reply_markup=keyboard)
+
+
+async def approve_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Approve pending expenses in bulk (approvers only): /approve [filter]."""
+    await _bulk_preview(update, context, "approved")
+
+
+async def reject_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Reject pending expenses in bulk (approvers only): /reject [filter]."""
+    await _bulk_preview(update, context, "not_approved")
+
+
+async def bulk_transition_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Apply or drop a previewed bulk transition and notify the owners."""
+    query = update.callback_query
+    await query.answer()
+    if update.effective_user.id not in APPROVER_TELEGRAM_IDS:
+        return
+    _prefix, token, choice = query.data.split(":")
+    pending = context.user_data.get("bulk_transitions", {}).pop(token, None)
+    if pending is None:
+        await query.edit_message_text("This request has expired; send the command again.")
+        return
+    if choice != "ok":
+        await query.edit_message_text("Cancelled.")
+        return
+
+    selection, new_status = pending
+    await query.edit_message_text(f"{query.message.text}\n\n⏳ Working…")
+    _batch_id, changed = await asyncio.to_thread(
+        apply_transition,
+        os.environ["DATABASE_URL"],
+        selection,
+        new_status,
+        update.effective_user.id,
+    )
+    messages = notification_messages(changed, new_status)
+    status = new_status.replace("_", " ")
+    await query.edit_message_text(
+        f"Done: {len(changed)} expenses {status}; notifying {len(messages)} users."
+    )
+    await send_batched(context.bot, messages)
+
+
 # ==================== MESSAGE HANDLERS ====================
 
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle text messages."""
+    started = time.monotonic()
     user = update.effective_user
     user_id = user.id
     text = update.message.text
@@ -106,6 +548,7 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     
     # Log the message
     logger.info("Text from %s (%s): %s...", user.first_name or "User", user_id, text[:50])
+    reply = await _start_progress(update.message, "text", started)
 
     state = WorkflowState(
         user_input=text,
@@ -114,13 +557,12 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         first_name=user.first_name,
         last_name=user.last_name,
     )
-    result = compiled_graph.invoke(state.model_dump())
-    response_text = _extract_response_text(result) or "✅ Got it. Thanks!"
-    await update.message.reply_text(response_text)
+    await _run_graph_with_progress(reply, state, "✅ Got it. Thanks!")
 
 
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle photo/image messages."""
+    started = time.monotonic()
     user = update.effective_user
     
     # Update stats
@@ -135,37 +577,78 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     
     logger.info("Photo from %s: %sx%s, size: %s bytes", user.first_name or "User", width, height, file_size)
     
-    # Get caption if provided
-    caption = update.message.caption or "No caption"
+    # Get caption if provided (albums carry it on a single photo)
+    caption = update.message.caption or ("" if update.message.media_group_id else "No caption")
     
     # Store file_id for later retrieval if needed
     context.user_data['last_photo_id'] = file_id
 
-    try:
-        file = await context.bot.get_file(file_id)
-        file_bytes = await file.download_as_bytearray()
-        file_path = getattr(file, "file_path", "") or ""
-        suffix = os.path.splitext(file_path)[1] or ".jpg"
-        content_type = getattr(file, "mime_type", None)
-        if not content_type:
-            content_type = mimetypes.guess_type(file_path)[0] or "image/jpeg"
-        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
-        object_name = f"telegram/{update.effective_user.id}/{timestamp}_{file_id}{suffix}"
+    # Albums get one consolidated reply once the whole group is processed
+    media_group_id = update.message.media_group_id
+    if media_group_id:
+        # Keep the album open while this photo uploads, however long it takes
+        album_batcher.expect(media_group_id)
+        reply = None
+    else:
+        reply = await _start_progress(update.message, "photo", started)
+
+    uploaded_file_id = await _store_telegram_file(
+        context, user.id, file_id, default_suffix=".jpg", default_content_type="image/jpeg"
+    )
 
-        client, bucket = get_minio_client()
-        upload_bytes(
-            client,
-            bucket,
-            object_name,
-            bytes(file_bytes),
-            content_type,
-            metadata={"file_id": file_id},
-        )
-        logger.info("Image uploaded to MinIO: %s/%s", bucket, object_name)
-        uploaded_file_id = file_id
-    except Exception as exc:
-        logger.error("Failed to upload image to MinIO: %s", exc)
-        uploaded_file_id = None
+    state = WorkflowState(
+        user_input=caption,
+        telegram_user_id=str(user.id),
+        username=user.username,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        file_id=uploaded_file_id,
+    )
+    if reply is None:
+        if uploaded_file_id:
+            album_batcher.add(media_group_id, AlbumItem(update.message, state))
+        else:
+            album_batcher.discard(media_group_id)
+            await update.message.reply_text("❌ I couldn't store this photo. Please resend it.")
+        return
+
+    await _run_graph_with_progress(reply, state, "✅ Image received. Thanks!")
+
+
+async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle documents (PDF invoices and images sent as files)."""
+    started = time.monotonic()
+    user = update.effective_user
+    document = update.message.document
+
+    # Update stats
+    context.user_data['document_count'] = context.user_data.get('document_count', 0) + 1
+
+    logger.info(
+        "Document from %s: %s (%s, %s bytes)",
+        user.first_name or "User",
+        document.file_name,
+        document.mime_type,
+        document.file_size,
+    )
+
+    media_group_id = update.message.media_group_id
+    if media_group_id:
+        album_batcher.expect(media_group_id)
+        reply = None
+    else:
+        reply = await _start_progress(update.message, "document", started)
+
+    caption = update.message.caption or ("" if media_group_id else "No caption")
+    uploaded_file_id = await _store_telegram_file(
+        context,
+        user.id,
+        document.file_id,
+        default_suffix=".pdf",
+        default_content_type="application/pdf",
+        file_name=document.file_name,
+        mime_type=document.mime_type,
+    )
 
     state = WorkflowState(
         user_input=caption,
@@ -175,9 +658,32 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         last_name=user.last_name,
         file_id=uploaded_file_id,
     )
-    result = compiled_graph.invoke(state.model_dump())
-    response_text = _extract_response_text(result) or "✅ Image received. Thanks!"
-    await update.message.reply_text(response_text)
+    if reply is None:
+        if uploaded_file_id:
+            album_batcher.add(media_group_id, AlbumItem(update.message, state))
+        else:
+            album_batcher.discard(media_group_id)
+            await update.message.reply_text("❌ I couldn't store this file. Please resend it.")
+        return
+
+    await _run_graph_with_progress(reply, state, "✅ Document received. Thanks!")
+
+# ==================== LIFECYCLE ====================
+
+async def post_init(application: Application) -> None:
+    """Open conversation memory, compile the graph and install the profile signal."""
+    global compiled_graph
+    install_profile_signal(asyncio.get_running_loop())
+    saver = await conversation_memory.open()
+    if saver is not None:
+        compiled_graph = graph.compile(checkpointer=saver)
+
+
+async def post_shutdown(application: Application) -> None:
+    """Release conversation memory and flush recorded LLM usage."""
+    await conversation_memory.close()
+    await asyncio.to_thread(get_usage_ledger().close)
+
 
 # ==================== ERROR HANDLER ====================
 
@@ -203,23 +709,79 @@ def main() -> None:
         return
 
     init_db_from_env()
-    
+
+    # Polling (default) or webhook serving mode
+    bot_mode = os.getenv("BOT_MODE", "polling").lower()
+
     # Create the Application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    builder = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .rate_limiter(OutboundLimiter.from_env())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if bot_mode == "webhook":
+        builder = builder.updater(None).concurrent_updates(
+            int(os.getenv("CONCURRENT_UPDATES", "64"))
+        )
+    application = builder.build()
+    UPDATE_QUEUE_DEPTH.set_function(application.update_queue.qsize)
+
+    metrics_port = int(os.getenv("METRICS_PORT", "0"))
+    if metrics_port:
+        start_metrics_server(metrics_port, os.getenv("METRICS_HOST", "127.0.0.1"))
 
     # Register command handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("stats", stats))
+    application.add_handler(CommandHandler("usage", usage_command))
+    application.add_handler(CommandHandler("profile", profile_command, block=False))
+    application.add_handler(CommandHandler("export", export_command, block=False))
+    application.add_handler(CommandHandler("approve", approve_command))
+    application.add_handler(CommandHandler("reject", reject_command))
+    application.add_handler(
+        CallbackQueryHandler(bulk_transition_callback, pattern=r"^bulk:", block=False)
+    )
 
     # Register message handlers
     # Order matters: more specific filters should come first
-    application.add_handler(MessageHandler(filters.PHOTO, handle_photo))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+    application.add_handler(MessageHandler(filters.PHOTO, _timed("photo", handle_photo)))
+    application.add_handler(
+        MessageHandler(
+            filters.Document.PDF | filters.Document.IMAGE, _timed("document", handle_document)
+        )
+    )
+    application.add_handler(
+        MessageHandler(filters.TEXT & ~filters.COMMAND, _timed("text", handle_text))
+    )
 
     # Register error handler
     application.add_error_handler(error_handler)
 
+    if bot_mode == "webhook":
+        webhook_url = os.getenv("WEBHOOK_URL", "")
+        webhook_secret = os.getenv("WEBHOOK_SECRET", "")
+        if not webhook_url or not webhook_secret:
+            print("❌ ERROR: BOT_MODE=webhook requires WEBHOOK_URL and WEBHOOK_SECRET")
+            return
+
+        print("✅ Bot is running in webhook mode! Press Ctrl+C to stop.")
+        asyncio.run(
+            run_webhook(
+                application,
+                webhook_url=webhook_url,
+                secret_token=webhook_secret,
+                host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+                port=int(os.getenv("WEBHOOK_PORT", "8080")),
+                url_path=os.getenv("WEBHOOK_PATH", "telegram"),
+                drain_timeout=float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30")),
+                register_webhook=os.getenv("WEBHOOK_REGISTER", "true").lower() == "true",
+            )
+        )
+        return
+
     # Start the Bot
     print("✅ Bot is running! Press Ctrl+C to stop.")
     print(f"📱 Search for @BotFather on Telegram to create a bot and get your token")
@@ -0,0 +1,148 @@
+"""
+Album of N receipts: per-photo graph runs vs the batched album workflow.
+
+LLM calls, vision extraction, storage and Postgres are stubbed with fixed
+latencies so the comparison isolates orchestration: wall time and number
+of LLM calls per album.
+
+Usage:
+    uv run python benchmarks/album_batching.py --photos 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from langchain_core.runnables import RunnableLambda
+
+from src.graph.album import run_album
+from src.graph.graph import graph
+from src.nodes.agent_plan import AgentPlan
+from src.nodes.extract_receipt import ExtractReceipt
+from src.nodes.render_and_post import RenderAndPost
+from src.schemas.agent_plan import AgentPlanResponse
+from src.schemas.post_and_render import RenderAndPostResponse
+from src.schemas.state import WorkflowState
+
+RECEIPT = {
+    "is_receipt": True,
+    "merchant_name": "Uber",
+    "receipt_date": "2025-11-16",
+    "currency": "MXN",
+    "total": 197.97,
+}
+
+
+class _Counter:
+    def __init__(self) -> None:
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def hit(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+
+def _plan(state: dict) -> str:
+    """Mirror the planner prompt's routing rules."""
+    if state.get("file_id") and not state.get("receipt_json_present"):
+        return "extract_receipt"
+    if state.get("receipt_json_present") and not state.get("expense_id"):
+        return "upsert_expense"
+    return "render_and_post"
+
+
+class _StubLLM:
+    def __init__(self, counter: _Counter, latency: float) -> None:
+        self._counter = counter
+        self._latency = latency
+
+    def with_structured_output(self, schema: object, **_kwargs: object) -> RunnableLambda:
+        def respond(prompt_value: object) -> object:
+            self._counter.hit()
+            time.sleep(self._latency)
+            if schema is AgentPlanResponse:
+                content = prompt_value.to_messages()[-1].content
+                state = json.loads(content.split("State:\n", 1)[1])
+                return AgentPlanResponse(next_action=_plan(state))
+            return RenderAndPostResponse(response_text="Saved.")
+
+        return RunnableLambda(respond)
+
+
+def _stub_connection(db_latency: float) -> MagicMock:
+    cur = MagicMock()
+    cur.fetchone.return_value = ("00000000-0000-0000-0000-000000000000",)
+    cur.execute.side_effect = lambda *_args, **_kwargs: time.sleep(db_latency)
+
+    def executemany(_query, params_seq, returning=False):
+        time.sleep(db_latency)
+        cur.results.return_value = iter([cur] * len(params_seq))
+
+    cur.executemany.side_effect = executemany
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value = cur
+    conn_cm = MagicMock()
+    conn_cm.__enter__.return_value = conn
+    return conn_cm
+
+
+def _run(label: str, func, counter: _Counter, args: argparse.Namespace) -> None:
+    llm = _StubLLM(counter, args.llm_latency)
+
+    def extract(_path: str, model: str, detail: str = "high") -> dict:
+        counter.hit()
+        time.sleep(args.vision_latency)
+        return dict(RECEIPT)
+
+    with ExitStack() as stack:
+        stack.enter_context(patch.dict(os.environ, {"DATABASE_URL": "stub"}))
+        stack.enter_context(patch.object(AgentPlan, "_get_llm", return_value=llm))
+        stack.enter_context(patch.object(RenderAndPost, "_get_llm", return_value=llm))
+        stack.enter_context(
+            patch.object(ExtractReceipt, "_load_image_bytes", return_value=(b"jpg", ".jpg"))
+        )
+        stack.enter_context(patch("src.nodes.extract_receipt.extract_receipt_from_image", extract))
+        stack.enter_context(
+            patch(
+                "src.nodes.upsert_expense.psycopg.connect",
+                side_effect=lambda *_a, **_k: _stub_connection(args.db_latency),
+            )
+        )
+        states = [
+            WorkflowState(telegram_user_id="123", file_id=f"file-{index}", user_input="")
+            for index in range(args.photos)
+        ]
+        started = time.perf_counter()
+        func(states)
+        elapsed = time.perf_counter() - started
+
+    print(f"{label:<10} {elapsed:6.2f}s wall  {counter.calls:3d} LLM calls")
+
+
+def _per_photo(states: list[WorkflowState]) -> None:
+    compiled = graph.compile()
+    for state in states:
+        compiled.invoke(state.model_dump())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Album batching benchmark")
+    parser.add_argument("--photos", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="Planner/render latency (s)")
+    parser.add_argument("--vision-latency", type=float, default=3.0, help="Extraction latency (s)")
+    parser.add_argument("--db-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    _run("per-photo", _per_photo, _Counter(), args)
+    _run("album", run_album, _Counter(), args)
@@ -0,0 +1,352 @@
+"""
+End-to-end load test of the workflow graph without OpenAI, Postgres or MinIO.
+
+Synthetic Telegram updates (status questions, chit-chat and receipt photos
+from images/receipts) are replayed through the compiled graph at a fixed
+concurrency. Every LLM call goes through the real nodes and the LLM
+gateway to the fake OpenAI server (src/tools/fake_llm.py); Postgres and
+MinIO are in-process stand-ins with sampled latencies, or a real database
+with --database-url.
+
+Reports throughput, p50/p99 latency per update kind and a per-node
+breakdown taken from the runs' node_timings.
+
+Usage:
+    uv run python benchmarks/graph_load.py --updates 500 --concurrency 32
+    uv run python benchmarks/graph_load.py --llm-latency agent_plan=lognormal:0.8,0.4 \\
+        --llm-latency receipt=lognormal:2.5,0.3 --llm-error-rate 0.02 --stream-tokens
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+from loguru import logger
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+# The gateway's default budget would throttle the load itself
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "1000000")
+os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+
+from src.db import init_db
+from src.graph.graph import graph
+from src.nodes.extract_receipt import ExtractReceipt
+from src.schemas.state import WorkflowState
+from src.tools.fake_llm import FakeLLMServer, Latency, parse_latency_args
+from src.tools.llm_gateway import FALLBACKS
+
+IMAGES_DIR = REPO_ROOT / "images" / "receipts"
+
+# Columns of the fake LLM's status query
+STATUS_COLUMNS = ("id", "status", "total", "currency", "expense_date")
+
+TEXTS = (
+    "What's the status of my expenses?",
+    "show my expense history",
+    "¿cuál es el estado de mis gastos?",
+    "hola",
+    "thanks!",
+)
+
+DEFAULT_LLM_LATENCY = {
+    "agent_plan": "lognormal:0.6,0.35",
+    "query_status": "lognormal:0.8,0.35",
+    "receipt": "lognormal:2.5,0.3",
+    "render": "lognormal:0.9,0.35",
+}
+
+
+class _StandInCursor:
+    """Answers SELECTs with status rows and writes with a new id."""
+
+    def __init__(self, database: "_StandInDatabase") -> None:
+        self._database = database
+        self._rows: list[Any] = []
+        self.description: list[tuple[str]] | None = None
+
+    def __enter__(self) -> "_StandInCursor":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        pass
+
+    def execute(self, sql: str, _params: Any = None) -> "_StandInCursor":
+        self._database.wait()
+        if sql.lstrip().lower().startswith(("select", "with")):
+            self._rows = self._database.status_rows()
+            self.description = [(name,) for name in STATUS_COLUMNS]
+        else:
+            self._rows = [(str(uuid.uuid4()),)]
+            self.description = [("id",)]
+        return self
+
+    def executemany(self, sql: str, params_seq: Any) -> None:
+        self._database.wait()
+
+    def fetchone(self) -> Any:
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self) -> list[Any]:
+        return list(self._rows)
+
+
+class _StandInConnection:
+    def __init__(self, database: "_StandInDatabase") -> None:
+        self._database = database
+
+    def __enter__(self) -> "_StandInConnection":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        pass
+
+    def cursor(self) -> _StandInCursor:
+        return _StandInCursor(self._database)
+
+    def execute(self, sql: str, params: Any = None) -> _StandInCursor:
+        return self.cursor().execute(sql, params)
+
+
+class _StandInDatabase:
+    """In-process Postgres stand-in: every statement costs a sampled latency."""
+
+    def __init__(self, latency: Latency, seed: int) -> None:
+        self._latency = latency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def connect(self, *_args: Any, **_kwargs: Any) -> _StandInConnection:
+        return _StandInConnection(self)
+
+    def wait(self) -> None:
+        with self._lock:
+            delay = self._latency.sample(self._rng)
+        time.sleep(delay)
+
+    def status_rows(self) -> list[tuple[Any, ...]]:
+        with self._lock:
+            count = self._rng.randint(0, 8)
+        return [
+            (uuid.uuid4(), "pending", Decimal("120.50") + row, "MXN", date(2025, 11, 16))
+            for row in range(count)
+        ]
+
+
+class _StandInStorage:
+    """In-process MinIO stand-in serving the sample receipts by file_id."""
+
+    def __init__(self, latency: Latency, seed: int) -> None:
+        self._latency = latency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._images = [path.read_bytes() for path in sorted(IMAGES_DIR.glob("*.jpg"))]
+        self._objects: dict[str, bytes] = {}
+
+    def add(self, file_id: str) -> None:
+        self._objects[file_id] = self._rng.choice(self._images)
+
+    def reference(self, file_id: str) -> dict[str, Any]:
+        return {"object_name": f"sha256/{file_id}", "sha256": file_id, "suffix": ".jpg"}
+
+    def read_object(self, _client: Any, _bucket: str, object_name: str) -> bytes:
+        with self._lock:
+            delay = self._latency.sample(self._rng)
+        time.sleep(delay)
+        return self._objects[object_name.removeprefix("sha256/")]
+
+
+def _updates(args: argparse.Namespace, storage: _StandInStorage) -> list[tuple[str, WorkflowState]]:
+    """Build the synthetic updates: photos with a caption, or plain text."""
+    rng = random.Random(args.seed)
+    updates = []
+    for index in range(args.updates):
+        user = str(100_000 + rng.randrange(args.users))
+        if rng.random() < args.photo_ratio:
+            file_id = f"photo-{index}"
+            storage.add(file_id)
+            state = WorkflowState(
+                telegram_user_id=user, first_name="Load", file_id=file_id, user_input="receipt"
+            )
+            updates.append(("photo", state))
+        else:
+            state = WorkflowState(telegram_user_id=user, first_name="Load", user_input=rng.choice(TEXTS))
+            updates.append(("text", state))
+    return updates
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def _latency_summary(seconds: list[float]) -> dict[str, Any]:
+    return {
+        "count": len(seconds),
+        "p50_ms": round(_percentile(seconds, 50) * 1000, 1),
+        "p99_ms": round(_percentile(seconds, 99) * 1000, 1),
+        "mean_ms": round(sum(seconds) / len(seconds) * 1000, 1) if seconds else 0.0,
+    }
+
+
+def _node_summary(timings: list[dict[str, Any]]) -> dict[str, Any]:
+    by_node: dict[str, list[float]] = {}
+    for timing in timings:
+        by_node.setdefault(timing["node"], []).append(timing["ms"] / 1000)
+    total = sum(sum(values) for values in by_node.values()) or 1.0
+    return {
+        node: {
+            **_latency_summary(values),
+            "share_pct": round(100 * sum(values) / total, 1),
+        }
+        for node, values in sorted(by_node.items(), key=lambda item: -sum(item[1]))
+    }
+
+
+async def _replay(args: argparse.Namespace, updates: list[tuple[str, WorkflowState]]) -> dict[str, Any]:
+    compiled = graph.compile()
+    config = {"configurable": {"stream_tokens": args.stream_tokens}}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: dict[str, list[float]] = {"photo": [], "text": []}
+    timings: list[dict[str, Any]] = []
+    errors: list[str] = []
+
+    async def run(kind: str, state: WorkflowState) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await compiled.ainvoke(state, config=config)
+            except Exception as exc:
+                errors.append(f"{type(exc).__name__}: {exc}")
+                return
+            latencies[kind].append(time.perf_counter() - started)
+            timings.extend(result.get("node_timings", []))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(kind, state) for kind, state in updates))
+    wall = time.perf_counter() - started
+
+    completed = sum(len(values) for values in latencies.values())
+    return {
+        "wall_s": round(wall, 2),
+        "throughput_per_s": round(completed / wall, 2),
+        "latency": {
+            "all": _latency_summary(latencies["photo"] + latencies["text"]),
+            "photo": _latency_summary(latencies["photo"]),
+            "text": _latency_summary(latencies["text"]),
+        },
+        "nodes": _node_summary(timings),
+        "errors": len(errors),
+        "first_errors": errors[:3],
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Command-line options of the load test (reused by other benchmarks)."""
+    parser = argparse.ArgumentParser(description="Graph load test against local stand-ins")
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--photo-ratio", type=float, default=0.5)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument(
+        "--llm-latency",
+        action="append",
+        default=[],
+        help="KIND=SPEC for the fake LLM (kinds: agent_plan, query_status, receipt, render, *)",
+    )
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--db-latency", default="lognormal:0.004,0.5")
+    parser.add_argument("--storage-latency", default="lognormal:0.05,0.5")
+    parser.add_argument("--database-url", help="Use this Postgres instead of the stand-in")
+    parser.add_argument("--stream-tokens", action="store_true", help="Stream the rendered reply")
+    parser.add_argument("--threads", type=int, help="Executor threads for sync nodes")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser
+
+
+def run_load(args: argparse.Namespace) -> dict[str, Any]:
+    """Replay the synthetic updates against the stand-ins and return the report."""
+    latency = {kind: Latency.parse(spec) for kind, spec in DEFAULT_LLM_LATENCY.items()}
+    latency.update(parse_latency_args(args.llm_latency))
+
+    storage = _StandInStorage(Latency.parse(args.storage_latency), args.seed)
+    database = _StandInDatabase(Latency.parse(args.db_latency), args.seed)
+    updates = _updates(args, storage)
+
+    with ExitStack() as stack:
+        fake = stack.enter_context(
+            FakeLLMServer(latency=latency, error_rate=args.llm_error_rate, seed=args.seed)
+        )
+        env = {"OPENAI_BASE_URL": fake.base_url, "DATABASE_URL": args.database_url or "standin"}
+        stack.enter_context(patch.dict(os.environ, env))
+        if args.database_url:
+            init_db(args.database_url)
+        else:
+            for module in (
+                "src.nodes.upsert_expense",
+                "src.nodes.resolve_user",
+                "src.nodes.query_status",
+                "src.db.llm_usage",
+            ):
+                stack.enter_context(patch(f"{module}.psycopg.connect", database.connect))
+        stack.enter_context(
+            patch.object(ExtractReceipt, "_find_reference", lambda _self, file_id: storage.reference(file_id))
+        )
+        stack.enter_context(patch("src.nodes.extract_receipt.get_minio_client", lambda: (None, "receipts")))
+        stack.enter_context(patch("src.nodes.extract_receipt.ensure_bucket", lambda *_args: None))
+        stack.enter_context(patch("src.nodes.extract_receipt.read_object", storage.read_object))
+
+        # Sync nodes run on the loop's default executor, which is small by default
+        threads = args.threads or args.concurrency * 3
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=threads))
+        try:
+            report = loop.run_until_complete(_replay(args, updates))
+        finally:
+            loop.close()
+
+        llm_requests = dict(fake.requests)
+
+    fallbacks = {
+        route: FALLBACKS.labels(route).value
+        for route in ("agent_plan", "query_status", "render_and_post", "extract_receipt")
+    }
+    return {
+        "updates": args.updates,
+        "concurrency": args.concurrency,
+        "executor_threads": threads,
+        **report,
+        "llm_requests": llm_requests,
+        "llm_fallbacks": fallbacks,
+    }
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    logger.disable("src")
+    print(json.dumps(run_load(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Cost of the metrics instrumentation under load.
+
+Two measurements:
+
+1. Micro: nanoseconds per recording on a bound child (counter, gauge,
+   histogram, BoundTimer) and per ``labels()`` lookup.
+2. Load: the graph_load harness with zero LLM, database and storage
+   latency, so the process is CPU-bound. Rounds alternate between recording
+   enabled and disabled (the value classes' recording methods replaced by
+   no-ops) and compare CPU time per update. One extra round counts the
+   recordings per update, giving an estimate (recordings x ns / CPU per
+   update) that is not subject to run-to-run noise.
+
+CPU per update includes the in-process fake OpenAI server, which stands in
+for the HTTP work of real calls.
+
+Usage:
+    uv run python benchmarks/metrics_overhead.py --updates 300 --rounds 3
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from unittest.mock import patch
+
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import graph_load  # noqa: E402
+
+from src.tools import metrics  # noqa: E402
+
+ZERO_LATENCY = [f"{kind}=fixed:0" for kind in graph_load.DEFAULT_LLM_LATENCY]
+
+RECORDING_METHODS = (
+    (metrics._CounterValue, "inc"),
+    (metrics._GaugeValue, "inc"),
+    (metrics._GaugeValue, "dec"),
+    (metrics._GaugeValue, "set"),
+    (metrics._HistogramValue, "observe"),
+)
+
+
+def _per_call_ns(fn, iterations: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter_ns() - started) / iterations
+
+
+def micro(iterations: int) -> dict[str, float]:
+    """Nanoseconds per recording call."""
+    counter = metrics.Counter("bench_counter_total", "Benchmark counter.", ["kind"])
+    gauge = metrics.Gauge("bench_gauge", "Benchmark gauge.", ["kind"])
+    histogram = metrics.Histogram("bench_seconds", "Benchmark histogram.", ["kind"])
+    sizes = metrics.Histogram("bench_bytes", "Benchmark sizes.", ["kind"], buckets=metrics.BYTES_BUCKETS)
+    counter_child = counter.labels("a")
+    gauge_child = gauge.labels("a")
+    histogram_child = histogram.labels("a")
+    timer = metrics.BoundTimer(histogram, sizes, "a")
+    started = time.perf_counter()
+    try:
+        return {
+            "counter_inc_ns": round(_per_call_ns(counter_child.inc, iterations), 1),
+            "gauge_inc_ns": round(_per_call_ns(gauge_child.inc, iterations), 1),
+            "histogram_observe_ns": round(
+                _per_call_ns(lambda: histogram_child.observe(0.3), iterations), 1
+            ),
+            "bound_timer_observe_ns": round(
+                _per_call_ns(lambda: timer.observe(started, 50_000), iterations), 1
+            ),
+            "labels_lookup_ns": round(_per_call_ns(lambda: counter.labels("a"), iterations), 1),
+        }
+    finally:
+        for metric in (counter, gauge, histogram, sizes):
+            metrics.REGISTRY.remove(metric)
+
+
+def _disabled(stack: ExitStack) -> None:
+    for cls, name in RECORDING_METHODS:
+        stack.enter_context(patch.object(cls, name, lambda *_args, **_kwargs: None))
+
+
+def _counting(stack: ExitStack, calls: list[int]) -> None:
+    for cls, name in RECORDING_METHODS:
+        original = getattr(cls, name)
+
+        def counted(self, *args, _original=original, **kwargs):
+            calls[0] += 1
+            return _original(self, *args, **kwargs)
+
+        stack.enter_context(patch.object(cls, name, counted))
+
+
+def _round(load_args: argparse.Namespace, mode: str, calls: list[int]) -> float:
+    """Run one load round; return CPU seconds per update."""
+    with ExitStack() as stack:
+        if mode == "disabled":
+            _disabled(stack)
+        elif mode == "counting":
+            _counting(stack, calls)
+        started = time.process_time()
+        report = graph_load.run_load(load_args)
+        cpu = time.process_time() - started
+    if report["errors"]:
+        raise RuntimeError(f"{report['errors']} updates failed: {report['first_errors']}")
+    return cpu / load_args.updates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Metrics instrumentation overhead")
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    logger.disable("src")
+    load_args = graph_load.build_parser().parse_args(
+        [
+            "--updates", str(args.updates),
+            "--concurrency", str(args.concurrency),
+            "--db-latency", "fixed:0",
+            "--storage-latency", "fixed:0",
+            *(arg for spec in ZERO_LATENCY for arg in ("--llm-latency", spec)),
+        ]
+    )
+
+    micro_ns = micro(args.iterations)
+
+    calls = [0]
+    _round(load_args, "enabled", calls)  # warm-up
+    enabled: list[float] = []
+    disabled: list[float] = []
+    for _ in range(args.rounds):
+        enabled.append(_round(load_args, "enabled", calls))
+        disabled.append(_round(load_args, "disabled", calls))
+    _round(load_args, "counting", calls)
+
+    cpu_enabled = statistics.median(enabled)
+    cpu_disabled = statistics.median(disabled)
+    recordings = calls[0] / args.updates
+    # Histogram observations are the most expensive recording, so this is an upper bound
+    estimated_ns = recordings * micro_ns["histogram_observe_ns"]
+    print(
+        json.dumps(
+            {
+                "updates": args.updates,
+                "rounds": args.rounds,
+                "micro": micro_ns,
+                "recordings_per_update": round(recordings, 1),
+                "cpu_ms_per_update": {
+                    "enabled": round(cpu_enabled * 1000, 3),
+                    "disabled": round(cpu_disabled * 1000, 3),
+                },
+                "measured_overhead_pct": round(100 * (cpu_enabled - cpu_disabled) / cpu_disabled, 2),
+                "estimated_overhead_pct": round(100 * estimated_ns / (cpu_disabled * 1e9), 4),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark receipt-sized uploads against a local MinIO-compatible server.
+
+Compares the previous storage path (new client + bucket check per upload)
+with the shared client and memoized bucket check.
+
+Usage:
+    docker compose up -d minio
+    MINIO_ENDPOINT=http://localhost:9000 MINIO_ACCESS_KEY=minioadmin \\
+    MINIO_SECRET_KEY=minioadmin MINIO_BUCKET=reimburstmate-bench \\
+        uv run python benchmarks/minio_uploads.py --count 500 --concurrency 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.tools import minio_storage
+
+
+def _upload_fresh_client(index: int, payload: bytes) -> None:
+    """Upload the way the bot did before: new client and bucket check each time."""
+    client, bucket = minio_storage._create_minio_client()
+    if not client.bucket_exists(bucket):
+        client.make_bucket(bucket)
+    client.put_object(
+        bucket,
+        f"bench/fresh/{index}.jpg",
+        BytesIO(payload),
+        length=len(payload),
+        content_type="image/jpeg",
+    )
+
+
+def _upload_shared_client(index: int, payload: bytes) -> None:
+    """Upload through the process-wide client."""
+    client, bucket = minio_storage.get_minio_client()
+    minio_storage.upload_bytes(client, bucket, f"bench/shared/{index}.jpg", payload, "image/jpeg")
+
+
+def _run(label: str, func, count: int, concurrency: int, payload: bytes) -> None:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda index: func(index, payload), range(count)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<14} {count / elapsed:8.1f} uploads/sec  ({elapsed:.2f}s for {count})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MinIO upload throughput benchmark")
+    parser.add_argument("--count", type=int, default=300, help="Uploads per scenario")
+    parser.add_argument("--size-kb", type=int, default=256, help="Payload size in KiB")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent uploads")
+    args = parser.parse_args()
+
+    if not os.getenv("MINIO_ENDPOINT"):
+        parser.error("MINIO_ENDPOINT must point at a local MinIO-compatible server")
+
+    data = os.urandom(args.size_kb * 1024)
+    _run("fresh client", _upload_fresh_client, args.count, args.concurrency, data)
+    _run("shared client", _upload_shared_client, args.count, args.concurrency, data)
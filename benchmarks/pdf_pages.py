@@ -0,0 +1,85 @@
+"""
+Pages/sec for PDF receipt extraction at different page concurrency caps.
+
+Without --live, LLM calls are replaced by a fixed-latency stub so the
+numbers reflect rasterization and scheduling; pass --live to call OpenAI.
+Without --pdf, a synthetic scanned (text-less) PDF is generated.
+
+Usage:
+    uv run python benchmarks/pdf_pages.py --pages 12 --concurrency 1 4 8
+    uv run python benchmarks/pdf_pages.py --pdf folio.pdf --live
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import pypdfium2 as pdfium
+
+from src.schemas.receipt import Receipt
+from src.tools import pdf_extractor, pdf_raster
+
+
+def _synthetic_pdf(pages: int) -> str:
+    """Write a text-less letter-size PDF with the given page count."""
+    document = pdfium.PdfDocument.new()
+    for _ in range(pages):
+        document.new_page(612, 792)
+    handle = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    document.save(handle)
+    handle.close()
+    return handle.name
+
+
+class _StubVision:
+    def __init__(self, latency: float) -> None:
+        self._latency = latency
+
+    def invoke(self, _inputs: dict) -> Receipt:
+        time.sleep(self._latency)
+        return Receipt(is_receipt=True, total=1.0)
+
+
+def _run(pdf_path: str, concurrency: int) -> float:
+    started = time.perf_counter()
+    pdf_extractor.extract_receipt_from_pdf(pdf_path, max_concurrency=concurrency)
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF extraction pages/sec benchmark")
+    parser.add_argument("--pdf", help="PDF to extract (default: synthetic scanned PDF)")
+    parser.add_argument("--pages", type=int, default=12, help="Pages in the synthetic PDF")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--llm-latency", type=float, default=1.5, help="Stub LLM latency (s)")
+    parser.add_argument("--live", action="store_true", help="Call OpenAI instead of the stub")
+    args = parser.parse_args()
+
+    pdf_path = args.pdf or _synthetic_pdf(args.pages)
+    pages = pdf_raster.page_count(pdf_path)
+
+    pool = pdf_extractor._get_raster_pool()
+    list(pool.map(pdf_raster.page_count, [pdf_path] * (os.cpu_count() or 2)))
+
+    stub = _StubVision(args.llm_latency)
+    for concurrency in args.concurrency:
+        if args.live:
+            elapsed = _run(pdf_path, concurrency)
+        else:
+            with patch.object(pdf_extractor, "image_extraction_chain", stub):
+                with patch.object(
+                    pdf_extractor, "extract_receipt_from_text", lambda text, model: stub.invoke({})
+                ):
+                    elapsed = _run(pdf_path, concurrency)
+        print(f"concurrency={concurrency:<3} {pages / elapsed:6.2f} pages/sec  ({elapsed:.2f}s)")
+
+    if not args.pdf:
+        os.remove(pdf_path)
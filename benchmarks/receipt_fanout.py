@@ -0,0 +1,138 @@
+"""
+End-to-end latency of the receipt path with and without parallel fan-out.
+
+Every external service is stubbed with a fixed delay (planner and render
+LLM calls, storage fetch, vision extraction, Postgres statements). With
+fan-out the storage fetch and the user upsert run next to the first
+planner call instead of inside extraction and the expense write.
+
+Usage:
+    uv run python benchmarks/receipt_fanout.py --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.graph.graph import build_graph
+from src.nodes.agent_plan import AgentPlan
+from src.nodes.extract_receipt import ExtractReceipt
+from src.nodes.render_and_post import RenderAndPost
+from src.schemas.state import WorkflowState
+
+RECEIPT = {
+    "is_receipt": True,
+    "merchant_name": "Uber",
+    "receipt_date": "2025-11-16",
+    "currency": "MXN",
+    "total": 197.97,
+}
+
+
+def _stub_connection(db_latency: float) -> MagicMock:
+    cur = MagicMock()
+    cur.fetchone.return_value = ("00000000-0000-0000-0000-000000000000",)
+    cur.execute.side_effect = lambda *_args, **_kwargs: time.sleep(db_latency)
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value = cur
+    conn_cm = MagicMock()
+    conn_cm.__enter__.return_value = conn
+    return conn_cm
+
+
+def _run(fanout: bool, args: argparse.Namespace, cache_dir: str) -> list[float]:
+    def plan(_self, state: WorkflowState) -> WorkflowState:
+        time.sleep(args.llm_latency)
+        if state.file_id and state.receipt_json is None:
+            action = "extract_receipt"
+        elif state.receipt_json is not None and not state.expense_id:
+            action = "upsert_expense"
+        else:
+            action = "render_and_post"
+        return state.model_copy(update={"next_action": action})
+
+    def render(_self, state: WorkflowState) -> WorkflowState:
+        time.sleep(args.llm_latency)
+        return state.model_copy(update={"response_text": "✅ Saved"})
+
+    def fetch(_self, _file_id: str, _reference=None) -> tuple[bytes, str]:
+        time.sleep(args.fetch_latency)
+        return b"jpg", ".jpg"
+
+    def extract(_path: str, model: str, detail: str = "high") -> dict:
+        time.sleep(args.vision_latency)
+        return dict(RECEIPT)
+
+    env = {
+        "DATABASE_URL": "stub",
+        "RECEIPT_CACHE_DIR": cache_dir,
+        "GRAPH_FANOUT": "true" if fanout else "false",
+    }
+    compiled = build_graph().compile()
+    timings = []
+    with ExitStack() as stack:
+        stack.enter_context(patch.dict(os.environ, env))
+        stack.enter_context(patch.object(AgentPlan, "__call__", plan))
+        stack.enter_context(patch.object(RenderAndPost, "__call__", render))
+        stack.enter_context(patch.object(ExtractReceipt, "_load_from_minio", fetch))
+        stack.enter_context(patch.object(ExtractReceipt, "_find_reference", return_value=None))
+        stack.enter_context(patch("src.nodes.extract_receipt.extract_receipt_from_image", extract))
+        for module in ("src.nodes.upsert_expense", "src.nodes.resolve_user"):
+            stack.enter_context(
+                patch(
+                    f"{module}.psycopg.connect",
+                    side_effect=lambda *_a, **_k: _stub_connection(args.db_latency),
+                )
+            )
+        for index in range(args.runs):
+            state = WorkflowState(
+                telegram_user_id="1",
+                file_id=f"{'fanout' if fanout else 'serial'}-{index}",
+                user_input="receipt",
+            )
+            started = time.perf_counter()
+            compiled.invoke(state)
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Receipt path fan-out benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--fetch-latency", type=float, default=0.3)
+    parser.add_argument("--vision-latency", type=float, default=2.5)
+    parser.add_argument("--db-latency", type=float, default=0.03)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        serial = statistics.median(_run(False, args, cache_dir))
+        fanout = statistics.median(_run(True, args, cache_dir))
+
+    print(
+        json.dumps(
+            {
+                "runs": args.runs,
+                "serial_median_s": round(serial, 3),
+                "fanout_median_s": round(fanout, 3),
+                "saved_s": round(serial - fanout, 3),
+                "saved_pct": round(100 * (serial - fanout) / serial, 1),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+State-handling overhead of one graph run carrying a large status result.
+
+Runs the status path (plan, query_status, plan, render) with stubbed nodes,
+so the timings are pure state handling: LangGraph rebuilding the state
+model before every node and route, and the tracing wrapper merging each
+node's output. query_status returns --status-rows rows.
+
+Two contracts are compared:
+
+- ``copy``: nodes return ``state.model_copy(update=...)`` and status rows are
+  a ``list[dict]`` field, revalidated row by row whenever the state is
+  rebuilt; the wrapper diffs the whole state after each node.
+- ``update``: nodes return partial update dicts and status rows are a
+  ``StatusTable`` passed through by reference (the current contract).
+
+Route functions keep the current schema in both runs, so the ``copy``
+numbers are a lower bound.
+
+Usage:
+    uv run python benchmarks/state_overhead.py --runs 50 --status-rows 5000
+"""
+
+import argparse
+import importlib
+import json
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.graph.graph import build_graph
+from src.nodes.agent_plan import AgentPlan
+from src.nodes.query_status import QueryStatus
+from src.nodes.render_and_post import RenderAndPost
+from src.schemas.state import WorkflowState
+from src.schemas.status_table import StatusTable
+
+
+class ListState(WorkflowState):
+    """The previous schema: row lists validated on every rebuild."""
+
+    status_rows: list[dict[str, Any]] | None = None
+    batch_results: list[dict[str, Any]] | None = None
+
+
+def _rows(count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "id": f"expense-{row}",
+            "status": "pending",
+            "total": Decimal("123.45"),
+            "currency": "MXN",
+            "expense_date": date(2025, 11, 16),
+        }
+        for row in range(count)
+    ]
+
+
+def _action(state: WorkflowState) -> str:
+    return "query_status" if state.status_rows is None else "render_and_post"
+
+
+def _stub_copy(stack: ExitStack, rows: list[dict[str, Any]]) -> None:
+    stack.enter_context(
+        patch.object(
+            AgentPlan,
+            "__call__",
+            lambda _self, state: state.model_copy(update={"next_action": _action(state)}),
+        )
+    )
+    stack.enter_context(
+        patch.object(
+            QueryStatus,
+            "__call__",
+            lambda _self, state: state.model_copy(update={"status_rows": list(rows)}),
+        )
+    )
+    stack.enter_context(
+        patch.object(
+            RenderAndPost,
+            "__call__",
+            lambda _self, state: state.model_copy(update={"response_text": f"{len(state.status_rows)} rows"}),
+        )
+    )
+
+
+def _stub_update(stack: ExitStack, rows: list[dict[str, Any]]) -> None:
+    table = StatusTable.from_dicts(rows)
+    stack.enter_context(
+        patch.object(AgentPlan, "__call__", lambda _self, state: {"next_action": _action(state)})
+    )
+    stack.enter_context(
+        patch.object(QueryStatus, "__call__", lambda _self, state: {"status_rows": table})
+    )
+    stack.enter_context(
+        patch.object(
+            RenderAndPost,
+            "__call__",
+            lambda _self, state: {"response_text": f"{len(state.status_rows)} rows"},
+        )
+    )
+
+
+def _time_runs(contract: str, rows: list[dict[str, Any]], runs: int) -> list[float]:
+    with ExitStack() as stack:
+        if contract == "copy":
+            # Node input schemas come from the tracing wrapper's annotation; src.graph
+            # re-exports the compiled ``graph``, which shadows the module name
+            for module in ("src.graph.graph", "src.graph.tracing"):
+                stack.enter_context(
+                    patch.object(importlib.import_module(module), "WorkflowState", ListState)
+                )
+            _stub_copy(stack, rows)
+        else:
+            _stub_update(stack, rows)
+        compiled = build_graph().compile()
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            result = compiled.invoke({"telegram_user_id": "1", "user_input": "status"})
+            timings.append(time.perf_counter() - started)
+    if result["response_text"] != f"{len(rows)} rows":
+        raise RuntimeError(f"unexpected reply: {result['response_text']}")
+    return timings
+
+
+def _rebuild_us(schema: type[WorkflowState], values: dict[str, Any], iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        schema(**values)
+    return (time.perf_counter() - started) * 1e6 / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="State handling overhead per graph run")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--status-rows", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = _rows(args.status_rows)
+    values = {"telegram_user_id": "1", "user_input": "status", "next_action": "render_and_post"}
+    report: dict[str, Any] = {
+        "runs": args.runs,
+        "status_rows": args.status_rows,
+        "state_rebuild_us": {
+            "copy": round(_rebuild_us(ListState, {**values, "status_rows": rows}, args.iterations), 1),
+            "update": round(
+                _rebuild_us(
+                    WorkflowState, {**values, "status_rows": StatusTable.from_dicts(rows)}, args.iterations
+                ), 1
+            ),
+        },
+        "run_ms": {},
+    }
+    for contract in ("copy", "update"):
+        _time_runs(contract, rows, 3)  # warm-up
+        timings = _time_runs(contract, rows, args.runs)
+        report["run_ms"][contract] = {
+            "median": round(statistics.median(timings) * 1000, 3),
+            "p95": round(sorted(timings)[int(0.95 * (len(timings) - 1))] * 1000, 3),
+        }
+    copy_ms = report["run_ms"]["copy"]["median"]
+    update_ms = report["run_ms"]["update"]["median"]
+    report["speedup"] = round(copy_ms / update_ms, 2) if update_ms else None
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Memory and aggregation time of status results: row dicts vs StatusTable.
+
+Builds --rows synthetic expense rows (UUID, status, Decimal total,
+currency, concept, date, description) and compares:
+
+- memory: what stays allocated (tracemalloc) for the ``list[dict]``
+  psycopg's ``dict_row`` returns vs a ``StatusTable`` encoded from the
+  tuple rows of the default row factory, which are then dropped
+- aggregation: count and total per (status, currency) with a Python loop
+  over the dicts vs ``StatusTable.summarize``
+- encoding: ``StatusTable.from_rows`` itself
+
+Usage:
+    uv run python benchmarks/status_table.py --rows 100000
+"""
+
+import argparse
+import gc
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable
+from uuid import UUID
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.schemas.status_table import StatusTable
+
+COLUMNS = ("id", "status", "total", "currency", "concept", "expense_date", "description")
+
+
+def _tuples(count: int) -> list[tuple[Any, ...]]:
+    rng = random.Random(1)
+    concepts = ("alimentos", "avion", "hotel", "transporte", None)
+    return [
+        (
+            UUID(int=rng.getrandbits(128)),
+            rng.choice(("pending", "approved", "not_approved")),
+            Decimal(rng.randint(100, 500_000)).scaleb(-2),
+            rng.choice(("MXN", "USD", "EUR")),
+            rng.choice(concepts),
+            date(2025, rng.randint(1, 12), rng.randint(1, 28)),
+            rng.choice(("Uber (Amex)", "Hotel Centro", "Oxxo", None)),
+        )
+        for _ in range(count)
+    ]
+
+
+def _allocated(build: Callable[[], Any]) -> tuple[Any, int]:
+    """Build a value and return it with the bytes it still holds."""
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current
+
+
+def _best_ms(fn: Callable[[], Any], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def _aggregate_dicts(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    counts: dict[tuple[Any, Any], int] = defaultdict(int)
+    totals: dict[tuple[Any, Any], Decimal] = defaultdict(Decimal)
+    for row in rows:
+        key = (row["status"], row["currency"])
+        counts[key] += 1
+        totals[key] += row["total"]
+    return [
+        {"status": status, "currency": currency, "count": count, "total": totals[status, currency]}
+        for (status, currency), count in sorted(counts.items(), key=lambda item: -item[1])
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Status result representation benchmark")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    dicts, dict_bytes = _allocated(lambda: [dict(zip(COLUMNS, row)) for row in _tuples(args.rows)])
+    table, table_bytes = _allocated(lambda: StatusTable.from_rows(COLUMNS, _tuples(args.rows)))
+
+    expected = _aggregate_dicts(dicts)
+    if table.summarize() != expected:
+        raise RuntimeError("aggregates differ")
+
+    tuples = [tuple(row.values()) for row in dicts]
+    report = {
+        "rows": args.rows,
+        "memory_mb": {
+            "dict_rows": round(dict_bytes / 1e6, 1),
+            "status_table": round(table_bytes / 1e6, 1),
+        },
+        "bytes_per_row": {
+            "dict_rows": round(dict_bytes / args.rows),
+            "status_table": round(table_bytes / args.rows),
+        },
+        "aggregate_ms": {
+            "dict_rows": round(_best_ms(lambda: _aggregate_dicts(dicts), args.repeats), 2),
+            "status_table": round(_best_ms(table.summarize, args.repeats), 2),
+        },
+        "encode_ms": round(_best_ms(lambda: StatusTable.from_rows(COLUMNS, tuples), args.repeats), 2),
+        "median_row_decode_us": round(
+            statistics.median(
+                _best_ms(lambda: list(table.rows(20)), args.repeats) * 1000 / 20 for _ in range(3)
+            ),
+            2,
+        ),
+        "kinds": dict(zip(table.columns, table.kinds)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
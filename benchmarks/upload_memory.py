@@ -0,0 +1,113 @@
+"""
+Peak RSS of concurrent receipt uploads: buffered vs streaming.
+
+Each mode runs in its own subprocess (ru_maxrss is a high-water mark) and
+pushes N concurrent uploads of SIZE MiB. Sources are synthetic async chunk
+iterators, so only the upload path's own buffering shows up. When
+MINIO_* env vars are set the uploads go to that server; otherwise a sink
+client that consumes data the way the MinIO SDK does is used.
+
+Usage:
+    uv run python benchmarks/upload_memory.py --uploads 50 --size-mb 10
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import MagicMock
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from minio.error import S3Error
+from minio.helpers import read_part_data
+
+from src.tools.minio_storage import get_minio_client, upload_content_addressed
+from src.tools.streaming_upload import CHUNK_SIZE, stream_to_minio
+
+_BLOCK = os.urandom(CHUNK_SIZE)
+
+
+def _sink_client() -> MagicMock:
+    """Client that reads uploads in part-sized pieces and discards them."""
+
+    def put_object(_bucket, _name, data, length, part_size=5 * 1024 * 1024, **_kwargs):
+        while read_part_data(data, part_size if length < 0 else length):
+            pass
+
+    client = MagicMock()
+    client.bucket_exists.return_value = True
+    client.put_object.side_effect = put_object
+    client.stat_object.side_effect = S3Error(None, "NoSuchKey", "missing", None, None, None)
+    return client
+
+
+async def _source(size: int):
+    """Yield size bytes in download-sized chunks."""
+    remaining = size
+    while remaining > 0:
+        chunk = _BLOCK[: min(CHUNK_SIZE, remaining)]
+        remaining -= len(chunk)
+        await asyncio.sleep(0)
+        yield chunk
+
+
+async def _buffered(client, bucket: str, size: int) -> None:
+    """Previous path: bytearray download, bytes() copy, BytesIO upload."""
+    buffer = bytearray()
+    async for chunk in _source(size):
+        buffer.extend(chunk)
+    await asyncio.to_thread(upload_content_addressed, client, bucket, bytes(buffer), "image/jpeg")
+
+
+async def _streaming(client, bucket: str, size: int) -> None:
+    await stream_to_minio(_source(size), client, bucket, "image/jpeg")
+
+
+async def _run(mode: str, uploads: int, size: int) -> None:
+    if os.getenv("MINIO_ENDPOINT"):
+        client, bucket = get_minio_client()
+    else:
+        client, bucket = _sink_client(), "bench"
+    worker = _buffered if mode == "buffered" else _streaming
+    await asyncio.gather(*(worker(client, bucket, size) for _ in range(uploads)))
+
+
+def _child(mode: str, uploads: int, size_mb: int) -> None:
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    asyncio.run(_run(mode, uploads, size_mb * 1024 * 1024))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{mode:<10} peak RSS {peak / 1024:8.1f} MiB  (+{(peak - baseline) / 1024:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload path memory benchmark")
+    parser.add_argument("--uploads", type=int, default=50, help="Concurrent uploads")
+    parser.add_argument("--size-mb", type=int, default=10, help="Size of each upload in MiB")
+    parser.add_argument("--mode", choices=["buffered", "streaming"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        _child(args.mode, args.uploads, args.size_mb)
+        sys.exit(0)
+
+    for mode in ("buffered", "streaming"):
+        subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--mode",
+                mode,
+                "--uploads",
+                str(args.uploads),
+                "--size-mb",
+                str(args.size_mb),
+            ],
+            check=True,
+        )
@@ -0,0 +1,156 @@
+"""
+Load test for the webhook endpoint: post synthetic Update payloads and
+report updates/sec.
+
+Without --url the webhook server is started in-process on localhost with an
+offline bot and a handler that sleeps for --handler-latency seconds, so the
+numbers isolate HTTP ingestion plus concurrent update dispatch. The load
+generator shares the server's event loop in that mode, so point --url at a
+separate process to measure the server alone.
+
+Usage:
+    uv run python benchmarks/webhook_load.py --updates 2000 --concurrency 64
+    uv run python benchmarks/webhook_load.py --url http://localhost:8080/telegram --secret s3cret
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import httpx
+import uvicorn
+from telegram import User
+from telegram.ext import Application, ExtBot, MessageHandler, filters
+
+from src.tools.webhook import SECRET_HEADER, build_webhook_app, drain_updates
+
+
+class _OfflineBot(ExtBot):
+    """Bot that never contacts Telegram."""
+
+    async def get_me(self, *args, **kwargs) -> User:
+        self._bot_user = User(id=1, is_bot=True, first_name="bench", username="bench_bot")
+        return self._bot_user
+
+
+def _payload(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": 1000 + update_id % 50, "type": "private"},
+            "from": {"id": 1000 + update_id % 50, "is_bot": False, "first_name": "Load"},
+            "text": "status",
+        },
+    }
+
+
+async def _post_all(url: str, secret: str, updates: int, concurrency: int) -> tuple[float, int]:
+    """Post payloads with bounded concurrency; return (seconds, failures)."""
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for update_id in range(1, updates + 1):
+        queue.put_nowait(update_id)
+    failures = 0
+
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency)) as client:
+
+        async def worker() -> None:
+            nonlocal failures
+            while not queue.empty():
+                update_id = queue.get_nowait()
+                response = await client.post(
+                    url, json=_payload(update_id), headers={SECRET_HEADER: secret}
+                )
+                if response.status_code != 200:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - started, failures
+
+
+async def _run_local(args: argparse.Namespace) -> dict:
+    processed = 0
+
+    async def handler(_update, _context) -> None:
+        nonlocal processed
+        await asyncio.sleep(args.handler_latency)
+        processed += 1
+
+    application = (
+        Application.builder()
+        .bot(_OfflineBot("1:offline"))
+        .updater(None)
+        .concurrent_updates(args.concurrent_updates)
+        .build()
+    )
+    application.add_handler(MessageHandler(filters.TEXT, handler))
+
+    server = uvicorn.Server(
+        uvicorn.Config(
+            build_webhook_app(application, args.secret),
+            host="127.0.0.1",
+            port=args.port,
+            log_level="warning",
+        )
+    )
+    async with application:
+        await application.start()
+        serve = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        ingest_seconds, failures = await _post_all(
+            f"http://127.0.0.1:{args.port}/telegram", args.secret, args.updates, args.concurrency
+        )
+        await drain_updates(application, timeout=60)
+        total_seconds = time.perf_counter() - started
+
+        server.should_exit = True
+        await serve
+        await application.stop()
+
+    return {
+        "updates": args.updates,
+        "failures": failures,
+        "ingest_updates_per_sec": round(args.updates / ingest_seconds, 1),
+        "processed": processed,
+        "processed_updates_per_sec": round(processed / total_seconds, 1),
+    }
+
+
+async def _run_remote(args: argparse.Namespace) -> dict:
+    seconds, failures = await _post_all(args.url, args.secret, args.updates, args.concurrency)
+    return {
+        "updates": args.updates,
+        "failures": failures,
+        "ingest_updates_per_sec": round(args.updates / seconds, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Webhook load test")
+    parser.add_argument("--url", help="Webhook URL of a running bot (default: in-process)")
+    parser.add_argument("--secret", default="bench-secret", help="Webhook secret token")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent HTTP clients")
+    parser.add_argument("--concurrent-updates", type=int, default=64)
+    parser.add_argument("--handler-latency", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    result = asyncio.run(_run_remote(args) if args.url else _run_local(args))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
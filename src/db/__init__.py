@@ -1,3 +1,52 @@
+from src.db.expense_approval import (
+    ApprovalFilter,
+    ChangedExpense,
+    apply_transition,
+    preview_transition,
+)
+from src.db.expense_export import EXPORT_COLUMNS, copy_expenses_csv, iter_expenses
+from src.db.expense_search import SEARCH_COLUMNS, search_expenses
 from src.db.init_db import init_db, init_db_from_env
+from src.db.job_queue import (
+    Job,
+    backoff_seconds,
+    claim_job,
+    complete_job,
+    enqueue_job,
+    extend_lease,
+    fail_job,
+    purge_jobs,
+    save_job_result,
+)
+from src.db.llm_usage import UsageRow, usage_report, user_spend, write_usage
+from src.db.receipt_files import find_receipt_file, record_receipt_file, storage_savings
 
-__all__ = ["init_db", "init_db_from_env"]
+__all__ = [
+    "ApprovalFilter",
+    "ChangedExpense",
+    "apply_transition",
+    "preview_transition",
+    "EXPORT_COLUMNS",
+    "copy_expenses_csv",
+    "iter_expenses",
+    "SEARCH_COLUMNS",
+    "search_expenses",
+    "init_db",
+    "init_db_from_env",
+    "Job",
+    "backoff_seconds",
+    "claim_job",
+    "complete_job",
+    "enqueue_job",
+    "extend_lease",
+    "fail_job",
+    "purge_jobs",
+    "save_job_result",
+    "UsageRow",
+    "usage_report",
+    "user_spend",
+    "write_usage",
+    "find_receipt_file",
+    "record_receipt_file",
+    "storage_savings",
+]
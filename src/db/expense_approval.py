@@ -0,0 +1,168 @@
+"""Set-based status transitions of pending expenses, with an audit trail.
+
+A transition applies to every pending expense matching an ``ApprovalFilter``.
+Each batch is one ``UPDATE ... RETURNING`` statement that also writes the
+batch's ``expense_status_audit`` rows, committed on its own so row locks are
+held briefly; rows locked by another transition are skipped and picked up by
+a later batch or run. Approvers never act on their own expenses: those are
+excluded from every preview and transition.
+"""
+
+import logging
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, NamedTuple
+from uuid import UUID, uuid4
+
+import psycopg
+
+from src.db.metrics import QueryMetrics
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_QUERY = QueryMetrics("preview_status_transition")
+TRANSITION_QUERY = QueryMetrics("apply_status_transition")
+
+TRANSITION_BATCH_ROWS = 500
+
+# Statuses a pending expense can be moved to in bulk
+TARGET_STATUSES = ("approved", "not_approved")
+
+
+class ApprovalFilter(NamedTuple):
+    """Which pending expenses a transition applies to; None matches anything."""
+
+    concept: str | None = None
+    currency: str | None = None
+    max_total: Decimal | None = None
+    team: str | None = None
+    start: date | None = None
+    end: date | None = None
+    telegram_user_id: int | None = None
+    # Expenses created later (e.g. after a preview) are left alone
+    created_before: datetime | None = None
+
+
+class ChangedExpense(NamedTuple):
+    """One expense moved by a transition."""
+
+    expense_id: UUID
+    old_status: str
+    telegram_user_id: int
+    total: Decimal
+    currency: str
+
+
+FILTER_SQL = """
+e.status = 'pending'
+  AND u.telegram_user_id <> %(changed_by)s::bigint
+  AND (%(concept)s::text IS NULL OR e.concept::text = %(concept)s::text)
+  AND (%(currency)s::text IS NULL OR e.currency = %(currency)s::text)
+  AND (%(max_total)s::numeric IS NULL OR e.total < %(max_total)s::numeric)
+  AND (%(team)s::text IS NULL OR lower(u.team) = lower(%(team)s::text))
+  AND (%(start)s::date IS NULL OR e.expense_date >= %(start)s::date)
+  AND (%(end)s::date IS NULL OR e.expense_date < %(end)s::date)
+  AND (%(telegram_user_id)s::bigint IS NULL OR u.telegram_user_id = %(telegram_user_id)s::bigint)
+  AND (%(created_before)s::timestamptz IS NULL OR e.created_at < %(created_before)s::timestamptz)
+"""
+
+PREVIEW_SQL = f"""
+SELECT e.currency, COUNT(*) AS expenses, SUM(e.total) AS total
+FROM expenses e
+JOIN users u ON u.id = e.user_id
+WHERE {FILTER_SQL}
+GROUP BY e.currency
+ORDER BY expenses DESC
+"""
+
+TRANSITION_SQL = f"""
+WITH target AS (
+    SELECT e.id, e.status, u.telegram_user_id
+    FROM expenses e
+    JOIN users u ON u.id = e.user_id
+    WHERE {FILTER_SQL}
+    ORDER BY e.id
+    LIMIT %(batch_rows)s
+    FOR UPDATE OF e SKIP LOCKED
+),
+changed AS (
+    UPDATE expenses e
+    SET status = %(new_status)s, updated_at = now()
+    FROM target t
+    WHERE e.id = t.id
+    RETURNING e.id, t.status AS old_status, t.telegram_user_id, e.total, e.currency
+),
+audit AS (
+    INSERT INTO expense_status_audit (batch_id, expense_id, old_status, new_status, changed_by)
+    SELECT %(batch_id)s, id, old_status, %(new_status)s, %(changed_by)s
+    FROM changed
+)
+SELECT id, old_status, telegram_user_id, total, currency FROM changed
+"""
+
+
+def _params(selection: ApprovalFilter, changed_by: int) -> dict[str, Any]:
+    return {**selection._asdict(), "changed_by": changed_by}
+
+
+def preview_transition(
+    database_url: str, selection: ApprovalFilter, changed_by: int
+) -> list[tuple[str, int, Decimal]]:
+    """Return ``(currency, expenses, total)`` of the matching pending expenses.
+
+    ``changed_by`` is the approver; their own expenses are left out.
+    """
+    started = time.perf_counter()
+    with psycopg.connect(database_url) as conn:
+        rows = conn.execute(PREVIEW_SQL, _params(selection, changed_by)).fetchall()
+    PREVIEW_QUERY.observe(started, len(rows))
+    return rows
+
+
+def apply_transition(
+    database_url: str,
+    selection: ApprovalFilter,
+    new_status: str,
+    changed_by: int,
+    batch_rows: int = TRANSITION_BATCH_ROWS,
+) -> tuple[UUID, list[ChangedExpense]]:
+    """Move every matching pending expense to ``new_status``.
+
+    Args:
+        database_url: Postgres connection string.
+        selection: Which pending expenses to change.
+        new_status: One of ``TARGET_STATUSES``.
+        changed_by: Telegram user id recorded in the audit log; their own
+            expenses are never changed.
+        batch_rows: Expenses updated per statement and transaction.
+
+    Returns:
+        The audit batch id and the changed expenses.
+
+    Raises:
+        ValueError: If ``new_status`` is not a bulk target status.
+    """
+    if new_status not in TARGET_STATUSES:
+        raise ValueError(f"cannot move expenses to {new_status!r} in bulk")
+    batch_id = uuid4()
+    params = {
+        **_params(selection, changed_by),
+        "new_status": new_status,
+        "batch_id": batch_id,
+        "batch_rows": batch_rows,
+    }
+    changed: list[ChangedExpense] = []
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        while True:
+            started = time.perf_counter()
+            with conn.transaction():
+                rows = conn.execute(TRANSITION_SQL, params).fetchall()
+            TRANSITION_QUERY.observe(started, len(rows))
+            changed.extend(ChangedExpense(*row) for row in rows)
+            if len(rows) < batch_rows:
+                break
+    logger.info(
+        "Moved %d expenses to %s (batch %s, by %s)", len(changed), new_status, batch_id, changed_by
+    )
+    return batch_id, changed
@@ -0,0 +1,137 @@
+"""Streaming reads of expenses for CSV/XLSX exports.
+
+Exports can cover any date range, so rows are never fetched all at once:
+``iter_expenses`` reads through a server-side (named) cursor in batches of
+``itersize`` rows and ``copy_expenses_csv`` lets Postgres render CSV with
+``COPY ... TO STDOUT`` and forwards the blocks as they arrive.
+"""
+
+import logging
+import time
+from datetime import date
+from typing import Any, BinaryIO, Iterator
+
+import psycopg
+
+from src.db.metrics import QueryMetrics
+
+logger = logging.getLogger(__name__)
+
+EXPORT_QUERY = QueryMetrics("export_expenses")
+COPY_QUERY = QueryMetrics("copy_expenses_csv")
+
+EXPORT_BATCH_ROWS = 2000
+
+# Header of every export, in column order
+EXPORT_COLUMNS = (
+    "expense_id",
+    "expense_date",
+    "status",
+    "total",
+    "currency",
+    "concept",
+    "description",
+    "telegram_user_id",
+    "username",
+    "file_id",
+    "receipt_object",
+)
+
+# Latest stored object for the expense's receipt, if it was uploaded through the bot
+EXPORT_SQL = """
+SELECT e.id AS expense_id,
+       e.expense_date,
+       e.status,
+       e.total,
+       e.currency,
+       e.concept::text AS concept,
+       e.description,
+       u.telegram_user_id,
+       u.username,
+       e.file_id,
+       r.object_name AS receipt_object
+FROM expenses e
+JOIN users u ON u.id = e.user_id
+LEFT JOIN LATERAL (
+    SELECT rf.object_name
+    FROM receipt_files rf
+    WHERE rf.file_id = e.file_id AND rf.telegram_user_id = u.telegram_user_id
+    ORDER BY rf.uploaded_at DESC
+    LIMIT 1
+) r ON true
+WHERE e.expense_date >= %(start)s
+  AND e.expense_date < %(end)s
+  AND (%(telegram_user_id)s::bigint IS NULL OR u.telegram_user_id = %(telegram_user_id)s::bigint)
+ORDER BY e.expense_date, e.created_at, e.id
+"""
+
+
+def _params(start: date, end: date, telegram_user_id: int | None) -> dict[str, Any]:
+    return {"start": start, "end": end, "telegram_user_id": telegram_user_id}
+
+
+def iter_expenses(
+    database_url: str,
+    start: date,
+    end: date,
+    telegram_user_id: int | None = None,
+    batch_rows: int = EXPORT_BATCH_ROWS,
+) -> Iterator[tuple[Any, ...]]:
+    """Yield export rows (``EXPORT_COLUMNS`` order) for ``start <= expense_date < end``.
+
+    Rows come from a server-side cursor, ``batch_rows`` per round trip, so
+    memory does not grow with the range. The connection stays open until
+    the generator is exhausted or closed.
+
+    Args:
+        database_url: Postgres connection string.
+        start: First day included.
+        end: First day excluded.
+        telegram_user_id: Only this user's expenses; all users when None.
+        batch_rows: Rows fetched per round trip.
+    """
+    started = time.perf_counter()
+    count = 0
+    try:
+        with psycopg.connect(database_url) as conn:
+            # Named cursors live in a transaction; nothing is written
+            with conn.cursor(name="expense_export") as cur:
+                cur.itersize = batch_rows
+                cur.execute(EXPORT_SQL, _params(start, end, telegram_user_id))
+                for row in cur:
+                    count += 1
+                    yield row
+    finally:
+        EXPORT_QUERY.observe(started, count)
+        logger.info("Exported %d expenses from %s to %s", count, start, end)
+
+
+def copy_expenses_csv(
+    database_url: str,
+    out: BinaryIO,
+    start: date,
+    end: date,
+    telegram_user_id: int | None = None,
+) -> int:
+    """Write a CSV export (with header) rendered by Postgres to ``out``.
+
+    Args:
+        database_url: Postgres connection string.
+        out: Binary file-like object receiving UTF-8 CSV.
+        start: First day included.
+        end: First day excluded.
+        telegram_user_id: Only this user's expenses; all users when None.
+
+    Returns:
+        Bytes written.
+    """
+    started = time.perf_counter()
+    written = 0
+    with psycopg.connect(database_url) as conn:
+        with conn.cursor() as cur:
+            statement = f"COPY ({EXPORT_SQL}) TO STDOUT WITH (FORMAT csv, HEADER)"
+            with cur.copy(statement, _params(start, end, telegram_user_id)) as copy:
+                for block in copy:
+                    written += out.write(block)
+    COPY_QUERY.observe(started)
+    return written
@@ -0,0 +1,80 @@
+"""Ranked, user-scoped search over expense descriptions (merchant and payment).
+
+The description is ``"<merchant> (<payment>)"``, so it is what users mean by
+"at Uber" or "the Marriott receipt". Two GIN indexes serve it (see
+``init_db``): trigrams on ``description`` for fuzzy and partial matches
+(``mariot``, and any ``ILIKE '%uber%'``), and the generated
+``description_tsv`` column for whole words. Matches are ranked by the better
+of trigram word similarity and full-text rank.
+"""
+
+import time
+from typing import Any
+
+import psycopg
+
+from src.db.metrics import QueryMetrics
+
+SEARCH_QUERY = QueryMetrics("search_expenses")
+
+SEARCH_PAGE_ROWS = 10
+
+SEARCH_COLUMNS = (
+    "id",
+    "status",
+    "total",
+    "currency",
+    "concept",
+    "description",
+    "expense_date",
+)
+
+# ``<%`` is word_similarity above pg_trgm.word_similarity_threshold (0.6),
+# answered from the trigram index; ``%%`` escapes it for psycopg
+SEARCH_SQL = """
+WITH q AS (
+    SELECT %(text)s::text AS text, websearch_to_tsquery('simple', %(text)s) AS tsq
+)
+SELECT e.id, e.status, e.total, e.currency, e.concept, e.description, e.expense_date
+FROM expenses e
+JOIN users u ON u.id = e.user_id
+CROSS JOIN q
+WHERE u.telegram_user_id = %(telegram_user_id)s
+  AND (q.text <%% e.description OR e.description_tsv @@ q.tsq)
+ORDER BY greatest(word_similarity(q.text, e.description), ts_rank(e.description_tsv, q.tsq)) DESC,
+    e.expense_date DESC,
+    e.id
+LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+
+def search_expenses(
+    database_url: str,
+    telegram_user_id: int,
+    text: str,
+    page: int = 0,
+    page_rows: int = SEARCH_PAGE_ROWS,
+) -> list[tuple[Any, ...]]:
+    """Return one page of the user's expenses matching ``text``, best first.
+
+    Args:
+        database_url: Postgres connection string.
+        telegram_user_id: Owner of the expenses.
+        text: Merchant or description words, typos allowed.
+        page: Zero-based page number.
+        page_rows: Rows per page.
+
+    Returns:
+        Rows in ``SEARCH_COLUMNS`` order.
+    """
+    params = {
+        "text": text.strip(),
+        "telegram_user_id": telegram_user_id,
+        "limit": page_rows,
+        "offset": max(page, 0) * page_rows,
+    }
+    started = time.perf_counter()
+    with psycopg.connect(database_url) as conn:
+        rows = conn.execute(SEARCH_SQL, params).fetchall()
+    SEARCH_QUERY.observe(started, len(rows))
+    return rows
@@ -11,6 +11,7 @@ logger = logging.getLogger(__name__)
 def _statements() -> Iterable[str]:
     return [
         "CREATE EXTENSION IF NOT EXISTS pgcrypto;",
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
         """
 DO $$
 BEGIN
@@ -39,6 +40,7 @@ CREATE TABLE IF NOT EXISTS users (
     created_at TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 """.strip(),
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS team TEXT;",
         """
 CREATE TABLE IF NOT EXISTS expenses (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -57,6 +59,110 @@ CREATE TABLE IF NOT EXISTS expenses (
         "CREATE INDEX IF NOT EXISTS expenses_user_id_idx ON expenses(user_id);",
         "CREATE INDEX IF NOT EXISTS expenses_status_idx ON expenses(status);",
         "CREATE INDEX IF NOT EXISTS expenses_expense_date_idx ON expenses(expense_date);",
+        """
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS description_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', coalesce(description, ''))) STORED;
+""".strip(),
+        """
+CREATE INDEX IF NOT EXISTS expenses_description_trgm_idx
+    ON expenses USING gin (description gin_trgm_ops);
+""".strip(),
+        """
+CREATE INDEX IF NOT EXISTS expenses_description_tsv_idx
+    ON expenses USING gin (description_tsv);
+""".strip(),
+        """
+CREATE TABLE IF NOT EXISTS expense_status_audit (
+    id BIGSERIAL PRIMARY KEY,
+    batch_id UUID NOT NULL,
+    expense_id UUID NOT NULL REFERENCES expenses(id),
+    old_status TEXT NOT NULL,
+    new_status TEXT NOT NULL,
+    changed_by BIGINT NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+""".strip(),
+        "CREATE INDEX IF NOT EXISTS expense_status_audit_expense_idx ON expense_status_audit(expense_id);",
+        "CREATE INDEX IF NOT EXISTS expense_status_audit_batch_idx ON expense_status_audit(batch_id);",
+        """
+CREATE TABLE IF NOT EXISTS receipt_files (
+    id BIGSERIAL PRIMARY KEY,
+    telegram_user_id BIGINT NOT NULL,
+    file_id TEXT NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    object_name TEXT NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    content_type TEXT,
+    suffix TEXT,
+    uploaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE (telegram_user_id, file_id, uploaded_at)
+);
+""".strip(),
+        "CREATE INDEX IF NOT EXISTS receipt_files_file_id_idx ON receipt_files(file_id);",
+        "CREATE INDEX IF NOT EXISTS receipt_files_sha256_idx ON receipt_files(sha256);",
+        """
+CREATE TABLE IF NOT EXISTS graph_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    chat_id BIGINT NOT NULL,
+    kind TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    reply_to_message_id BIGINT,
+    progress_message_id BIGINT,
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+    locked_by TEXT,
+    locked_until TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+""".strip(),
+        "ALTER TABLE graph_jobs ADD COLUMN IF NOT EXISTS result_text TEXT;",
+        """
+CREATE INDEX IF NOT EXISTS graph_jobs_pending_idx
+    ON graph_jobs(id) WHERE status IN ('queued', 'running');
+""".strip(),
+        """
+CREATE INDEX IF NOT EXISTS graph_jobs_chat_pending_idx
+    ON graph_jobs(chat_id, id) WHERE status IN ('queued', 'running');
+""".strip(),
+        """
+CREATE INDEX IF NOT EXISTS graph_jobs_finished_idx
+    ON graph_jobs(updated_at) WHERE status IN ('done', 'failed');
+""".strip(),
+        """
+CREATE TABLE IF NOT EXISTS llm_usage (
+    id BIGSERIAL PRIMARY KEY,
+    recorded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    day DATE NOT NULL,
+    telegram_user_id BIGINT NOT NULL,
+    node TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    input_tokens BIGINT NOT NULL,
+    output_tokens BIGINT NOT NULL,
+    cost_usd NUMERIC(14, 6) NOT NULL
+);
+""".strip(),
+        """
+CREATE INDEX IF NOT EXISTS llm_usage_day_idx ON llm_usage(day);
+""".strip(),
+        """
+CREATE TABLE IF NOT EXISTS llm_usage_daily (
+    day DATE NOT NULL,
+    telegram_user_id BIGINT NOT NULL,
+    node TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls BIGINT NOT NULL DEFAULT 0,
+    input_tokens BIGINT NOT NULL DEFAULT 0,
+    output_tokens BIGINT NOT NULL DEFAULT 0,
+    cost_usd NUMERIC(14, 6) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, telegram_user_id, node, model)
+);
+""".strip(),
     ]
 
 
@@ -0,0 +1,305 @@
+"""Durable Postgres queue for graph runs.
+
+Jobs are claimed with ``FOR UPDATE SKIP LOCKED`` so any number of worker
+processes can pull from the same table. Only the oldest unfinished job of a
+chat is claimable, which keeps replies in message order. A claimed job is
+leased until ``locked_until``; if its worker dies, the job becomes
+claimable again once the lease expires (delivery is at-least-once). A job's
+reply is saved with ``save_job_result`` before it is sent, so a retry after a
+failed delivery only sends it again instead of re-running the graph.
+"""
+
+import logging
+import random
+import time
+from typing import Any, NamedTuple
+
+import psycopg
+from psycopg.types.json import Jsonb
+
+from src.db.metrics import QueryMetrics
+
+logger = logging.getLogger(__name__)
+
+ENQUEUE_QUERY = QueryMetrics("enqueue_job")
+CLAIM_QUERY = QueryMetrics("claim_job")
+COMPLETE_QUERY = QueryMetrics("complete_job")
+FAIL_QUERY = QueryMetrics("fail_job")
+PURGE_QUERY = QueryMetrics("purge_jobs")
+RESULT_QUERY = QueryMetrics("save_job_result")
+
+JOB_CHANNEL = "graph_jobs"
+
+CLAIM_JOB_SQL = """
+WITH candidate AS (
+    SELECT j.id
+    FROM graph_jobs j
+    WHERE (
+        (j.status = 'queued' AND j.run_after <= now())
+        OR (j.status = 'running' AND j.locked_until < now() AND j.attempts < j.max_attempts)
+    )
+    AND NOT EXISTS (
+        SELECT 1
+        FROM graph_jobs earlier
+        WHERE earlier.chat_id = j.chat_id
+          AND earlier.id < j.id
+          AND earlier.status IN ('queued', 'running')
+    )
+    ORDER BY j.id
+    LIMIT 1
+    FOR UPDATE OF j SKIP LOCKED
+)
+UPDATE graph_jobs
+SET status = 'running',
+    attempts = graph_jobs.attempts + 1,
+    locked_by = %(worker_id)s,
+    locked_until = now() + make_interval(secs => %(visibility_timeout)s),
+    updated_at = now()
+FROM candidate
+WHERE graph_jobs.id = candidate.id
+RETURNING
+    graph_jobs.id,
+    graph_jobs.chat_id,
+    graph_jobs.kind,
+    graph_jobs.payload,
+    graph_jobs.reply_to_message_id,
+    graph_jobs.progress_message_id,
+    graph_jobs.attempts,
+    graph_jobs.max_attempts,
+    graph_jobs.result_text
+"""
+
+FAIL_EXPIRED_SQL = """
+UPDATE graph_jobs
+SET status = 'failed', last_error = 'lease expired', locked_by = NULL, updated_at = now()
+WHERE status = 'running' AND locked_until < now() AND attempts >= max_attempts
+"""
+
+
+class Job(NamedTuple):
+    """A claimed graph job."""
+
+    id: int
+    chat_id: int
+    kind: str
+    payload: dict[str, Any]
+    reply_to_message_id: int | None
+    progress_message_id: int | None
+    attempts: int
+    max_attempts: int
+    # Reply saved by an earlier attempt that failed to deliver it
+    result_text: str | None = None
+
+
+def enqueue_job(
+    database_url: str,
+    *,
+    chat_id: int,
+    kind: str,
+    payload: dict[str, Any],
+    reply_to_message_id: int | None = None,
+    progress_message_id: int | None = None,
+    max_attempts: int = 5,
+) -> int:
+    """Insert a job and wake listening workers.
+
+    Args:
+        database_url: Postgres connection string.
+        chat_id: Chat the reply goes to; jobs of one chat run in order.
+        kind: Job type understood by the worker (e.g. "graph", "album").
+        payload: JSON-serializable job input.
+        reply_to_message_id: Message the reply should answer.
+        progress_message_id: Placeholder message to edit with the result.
+        max_attempts: Attempts before the job is marked failed.
+
+    Returns:
+        The new job id.
+    """
+    started = time.perf_counter()
+    with psycopg.connect(database_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO graph_jobs (
+                    chat_id,
+                    kind,
+                    payload,
+                    reply_to_message_id,
+                    progress_message_id,
+                    max_attempts
+                )
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING id
+                """,
+                (
+                    chat_id,
+                    kind,
+                    Jsonb(payload),
+                    reply_to_message_id,
+                    progress_message_id,
+                    max_attempts,
+                ),
+            )
+            job_id = cur.fetchone()[0]
+            # Delivered on commit, so workers never see a job before it exists
+            cur.execute("SELECT pg_notify(%s, %s)", (JOB_CHANNEL, str(job_id)))
+    ENQUEUE_QUERY.observe(started, 1)
+    return job_id
+
+
+def claim_job(
+    conn: psycopg.Connection, worker_id: str, visibility_timeout: float
+) -> Job | None:
+    """Lease the next runnable job, if any.
+
+    Args:
+        conn: Connection owned by the calling worker slot.
+        worker_id: Identifier stored in ``locked_by``.
+        visibility_timeout: Lease length in seconds.
+
+    Returns:
+        The claimed job, or None when nothing is runnable.
+    """
+    started = time.perf_counter()
+    with conn.transaction():
+        with conn.cursor() as cur:
+            cur.execute(FAIL_EXPIRED_SQL)
+            cur.execute(
+                CLAIM_JOB_SQL,
+                {"worker_id": worker_id, "visibility_timeout": visibility_timeout},
+            )
+            row = cur.fetchone()
+    CLAIM_QUERY.observe(started, 1 if row else 0)
+    return Job(*row) if row else None
+
+
+def extend_lease(
+    conn: psycopg.Connection, job_id: int, worker_id: str, visibility_timeout: float
+) -> bool:
+    """Push the lease of a running job forward.
+
+    Returns:
+        False if the job is no longer held by this worker.
+    """
+    with conn.transaction():
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE graph_jobs
+                SET locked_until = now() + make_interval(secs => %s), updated_at = now()
+                WHERE id = %s AND status = 'running' AND locked_by = %s
+                """,
+                (visibility_timeout, job_id, worker_id),
+            )
+            return cur.rowcount == 1
+
+
+def save_job_result(database_url: str, job_id: int, text: str) -> None:
+    """Store a running job's reply so retries deliver it without re-running.
+
+    Args:
+        database_url: Postgres connection string.
+        job_id: The running job.
+        text: Reply to deliver.
+    """
+    started = time.perf_counter()
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE graph_jobs
+                SET result_text = %s, updated_at = now()
+                WHERE id = %s AND status = 'running'
+                """,
+                (text, job_id),
+            )
+            updated = cur.rowcount
+    RESULT_QUERY.observe(started, max(updated, 0))
+
+
+def complete_job(conn: psycopg.Connection, job_id: int, worker_id: str) -> None:
+    """Mark a job done if this worker still holds it."""
+    started = time.perf_counter()
+    with conn.transaction():
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE graph_jobs
+                SET status = 'done', locked_by = NULL, locked_until = NULL, updated_at = now()
+                WHERE id = %s AND status = 'running' AND locked_by = %s
+                """,
+                (job_id, worker_id),
+            )
+            updated = cur.rowcount
+    COMPLETE_QUERY.observe(started, max(updated, 0))
+    if updated != 1:
+        logger.warning("Job %s completed after its lease was lost", job_id)
+
+
+def fail_job(
+    conn: psycopg.Connection, job: Job, worker_id: str, error: str, retry_in: float
+) -> str:
+    """Record a failed attempt: requeue with a delay, or fail for good.
+
+    Args:
+        conn: Connection owned by the calling worker slot.
+        job: The job that failed.
+        worker_id: Worker holding the lease.
+        error: Error description stored in ``last_error``.
+        retry_in: Seconds before the job may be claimed again.
+
+    Returns:
+        The job's new status ("queued" or "failed").
+    """
+    status = "failed" if job.attempts >= job.max_attempts else "queued"
+    started = time.perf_counter()
+    with conn.transaction():
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE graph_jobs
+                SET status = %s,
+                    last_error = %s,
+                    run_after = now() + make_interval(secs => %s),
+                    locked_by = NULL,
+                    locked_until = NULL,
+                    updated_at = now()
+                WHERE id = %s AND status = 'running' AND locked_by = %s
+                """,
+                (status, error[:2000], retry_in, job.id, worker_id),
+            )
+            updated = cur.rowcount
+    FAIL_QUERY.observe(started, max(updated, 0))
+    return status
+
+
+def purge_jobs(database_url: str, older_than_days: float) -> int:
+    """Delete done and failed jobs last updated more than ``older_than_days`` ago.
+
+    Args:
+        database_url: Postgres connection string.
+        older_than_days: Retention period in days.
+
+    Returns:
+        Number of jobs deleted.
+    """
+    started = time.perf_counter()
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM graph_jobs
+                WHERE status IN ('done', 'failed')
+                  AND updated_at < now() - make_interval(secs => %s)
+                """,
+                (older_than_days * 86400,),
+            )
+            deleted = cur.rowcount
+    PURGE_QUERY.observe(started, max(deleted, 0))
+    return deleted
+
+
+def backoff_seconds(attempts: int, base: float = 2.0, cap: float = 300.0) -> float:
+    """Exponential backoff with jitter for the given attempt number."""
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
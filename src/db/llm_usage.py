@@ -0,0 +1,133 @@
+"""LLM token usage and cost: raw batches plus a daily per-user rollup."""
+
+import logging
+import time
+from datetime import date
+from decimal import Decimal
+from typing import Any, Iterable, NamedTuple
+
+import psycopg
+from psycopg.rows import dict_row
+
+from src.db.metrics import QueryMetrics
+
+logger = logging.getLogger(__name__)
+
+WRITE_QUERY = QueryMetrics("write_llm_usage")
+SPEND_QUERY = QueryMetrics("user_llm_spend")
+
+INSERT_USAGE_SQL = """
+INSERT INTO llm_usage (
+    day, telegram_user_id, node, model, calls, input_tokens, output_tokens, cost_usd
+)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+UPSERT_DAILY_SQL = """
+INSERT INTO llm_usage_daily (
+    day, telegram_user_id, node, model, calls, input_tokens, output_tokens, cost_usd
+)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON CONFLICT (day, telegram_user_id, node, model) DO UPDATE
+SET calls = llm_usage_daily.calls + EXCLUDED.calls,
+    input_tokens = llm_usage_daily.input_tokens + EXCLUDED.input_tokens,
+    output_tokens = llm_usage_daily.output_tokens + EXCLUDED.output_tokens,
+    cost_usd = llm_usage_daily.cost_usd + EXCLUDED.cost_usd
+"""
+
+USER_SPEND_SQL = """
+SELECT COALESCE(SUM(cost_usd), 0) AS cost_usd
+FROM llm_usage_daily
+WHERE day = %s AND telegram_user_id = %s
+"""
+
+
+class UsageRow(NamedTuple):
+    """Aggregated usage for one (day, user, node, model) over a flush window."""
+
+    day: date
+    telegram_user_id: int
+    node: str
+    model: str
+    calls: int
+    input_tokens: int
+    output_tokens: int
+    cost_usd: Decimal
+
+
+def write_usage(database_url: str, rows: Iterable[UsageRow]) -> int:
+    """Store a batch of aggregated usage and add it to the daily rollup.
+
+    Both tables are written in one transaction, so the rollup never counts
+    a batch the raw table does not have.
+
+    Returns:
+        Number of rows written.
+    """
+    params = [tuple(row) for row in rows]
+    if not params:
+        return 0
+    started = time.perf_counter()
+    with psycopg.connect(database_url) as conn:
+        with conn.cursor() as cur:
+            cur.executemany(INSERT_USAGE_SQL, params)
+            cur.executemany(UPSERT_DAILY_SQL, params)
+    WRITE_QUERY.observe(started, len(params))
+    return len(params)
+
+
+def user_spend(database_url: str, telegram_user_id: int, day: date) -> Decimal:
+    """Return a user's stored spend for one day, in USD."""
+    started = time.perf_counter()
+    with psycopg.connect(database_url) as conn:
+        row = conn.execute(USER_SPEND_SQL, (day, telegram_user_id)).fetchone()
+    SPEND_QUERY.observe(started, 1 if row else 0)
+    return Decimal(row[0] if row else 0)
+
+
+def usage_report(database_url: str, since: date, top_users: int = 5) -> dict[str, Any]:
+    """Summarize spend since a day from the daily rollup.
+
+    Returns:
+        Dict with ``totals``, ``by_node`` (with cost per call) and
+        ``top_users`` by cost.
+    """
+    with psycopg.connect(database_url, row_factory=dict_row) as conn:
+        totals = conn.execute(
+            """
+            SELECT COALESCE(SUM(calls), 0) AS calls,
+                   COALESCE(SUM(input_tokens), 0) AS input_tokens,
+                   COALESCE(SUM(output_tokens), 0) AS output_tokens,
+                   COALESCE(SUM(cost_usd), 0) AS cost_usd,
+                   COUNT(DISTINCT telegram_user_id) AS users
+            FROM llm_usage_daily
+            WHERE day >= %s
+            """,
+            (since,),
+        ).fetchone()
+        by_node = conn.execute(
+            """
+            SELECT node,
+                   SUM(calls) AS calls,
+                   SUM(input_tokens + output_tokens) AS tokens,
+                   SUM(cost_usd) AS cost_usd,
+                   SUM(cost_usd) / NULLIF(SUM(calls), 0) AS cost_per_call
+            FROM llm_usage_daily
+            WHERE day >= %s
+            GROUP BY node
+            ORDER BY cost_usd DESC
+            """,
+            (since,),
+        ).fetchall()
+        users = conn.execute(
+            """
+            SELECT telegram_user_id, SUM(calls) AS calls, SUM(cost_usd) AS cost_usd
+            FROM llm_usage_daily
+            WHERE day >= %s
+            GROUP BY telegram_user_id
+            ORDER BY cost_usd DESC
+            LIMIT %s
+            """,
+            (since, top_users),
+        ).fetchall()
+    return {"totals": totals, "by_node": by_node, "top_users": users}
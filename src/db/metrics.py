@@ -0,0 +1,24 @@
+"""Latency and row counts of database operations."""
+
+from src.tools.metrics import COUNT_BUCKETS, BoundTimer, Histogram
+
+DB_SECONDS = Histogram(
+    "db_query_seconds",
+    "Database operations by name, including connecting.",
+    ["query"],
+)
+DB_ROWS = Histogram(
+    "db_query_rows",
+    "Rows returned or written per database operation.",
+    ["query"],
+    buckets=COUNT_BUCKETS,
+)
+
+
+class QueryMetrics(BoundTimer):
+    """Latency and row-count children for a named database operation."""
+
+    __slots__ = ()
+
+    def __init__(self, query: str) -> None:
+        super().__init__(DB_SECONDS, DB_ROWS, query)
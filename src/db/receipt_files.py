@@ -0,0 +1,130 @@
+"""Reference table linking Telegram uploads to content-addressed objects."""
+
+import logging
+import time
+from datetime import datetime
+from typing import Any
+
+import psycopg
+from psycopg.rows import dict_row
+
+from src.db.metrics import QueryMetrics
+
+logger = logging.getLogger(__name__)
+
+RECORD_QUERY = QueryMetrics("record_receipt_file")
+FIND_QUERY = QueryMetrics("find_receipt_file")
+
+
+def record_receipt_file(
+    database_url: str,
+    *,
+    telegram_user_id: int | str,
+    file_id: str,
+    sha256: str,
+    object_name: str,
+    size_bytes: int,
+    content_type: str | None = None,
+    suffix: str | None = None,
+    uploaded_at: datetime | None = None,
+) -> None:
+    """Store one upload event pointing at a content-addressed object.
+
+    Args:
+        database_url: Postgres connection string.
+        telegram_user_id: Uploading Telegram user.
+        file_id: Telegram file_id of the upload.
+        sha256: Hex digest of the stored bytes.
+        object_name: Object key in MinIO.
+        size_bytes: Size of the stored bytes.
+        content_type: MIME type of the upload.
+        suffix: File suffix (e.g. ".jpg").
+        uploaded_at: Upload time; defaults to now.
+    """
+    started = time.perf_counter()
+    with psycopg.connect(database_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO receipt_files (
+                    telegram_user_id,
+                    file_id,
+                    sha256,
+                    object_name,
+                    size_bytes,
+                    content_type,
+                    suffix,
+                    uploaded_at
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, COALESCE(%s, now()))
+                ON CONFLICT (telegram_user_id, file_id, uploaded_at) DO NOTHING
+                """,
+                (
+                    int(telegram_user_id),
+                    file_id,
+                    sha256,
+                    object_name,
+                    size_bytes,
+                    content_type,
+                    suffix,
+                    uploaded_at,
+                ),
+            )
+            written = cur.rowcount
+    RECORD_QUERY.observe(started, max(written, 0))
+
+
+def find_receipt_file(database_url: str, file_id: str) -> dict[str, Any] | None:
+    """Return the most recent reference for a Telegram file_id, if any."""
+    started = time.perf_counter()
+    with psycopg.connect(database_url, row_factory=dict_row) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT sha256, object_name, size_bytes, content_type, suffix
+                FROM receipt_files
+                WHERE file_id = %s
+                ORDER BY uploaded_at DESC
+                LIMIT 1
+                """,
+                (file_id,),
+            )
+            row = cur.fetchone()
+    FIND_QUERY.observe(started, 1 if row else 0)
+    return row
+
+
+def storage_savings(database_url: str) -> dict[str, Any]:
+    """Summarize how many bytes deduplication saves.
+
+    Returns:
+        Dict with upload count, unique object count, referenced bytes,
+        stored bytes and saved bytes.
+    """
+    with psycopg.connect(database_url, row_factory=dict_row) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                WITH objects AS (
+                    SELECT sha256, MAX(size_bytes) AS size_bytes
+                    FROM receipt_files
+                    GROUP BY sha256
+                )
+                SELECT
+                    (SELECT COUNT(*) FROM receipt_files) AS uploads,
+                    (SELECT COUNT(*) FROM objects) AS unique_objects,
+                    (SELECT COALESCE(SUM(size_bytes), 0) FROM receipt_files) AS referenced_bytes,
+                    (SELECT COALESCE(SUM(size_bytes), 0) FROM objects) AS stored_bytes
+                """
+            )
+            row = cur.fetchone() or {}
+
+    referenced = int(row.get("referenced_bytes") or 0)
+    stored = int(row.get("stored_bytes") or 0)
+    return {
+        "uploads": int(row.get("uploads") or 0),
+        "unique_objects": int(row.get("unique_objects") or 0),
+        "referenced_bytes": referenced,
+        "stored_bytes": stored,
+        "saved_bytes": referenced - stored,
+    }
@@ -0,0 +1,80 @@
+"""Batch workflow for albums of receipts sent together."""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from src.nodes.extract_receipt import ExtractReceipt
+from src.nodes.render_and_post import RenderAndPost
+from src.nodes.upsert_expense import UpsertExpense
+from src.schemas.state import WorkflowState
+from src.tools.usage_ledger import usage_scope
+
+logger = logging.getLogger(__name__)
+
+
+def _extract(extractor: ExtractReceipt, state: WorkflowState) -> WorkflowState:
+    """Extract one receipt, keeping the album going if a single photo fails."""
+    try:
+        with usage_scope(state.telegram_user_id, "extract_receipt"):
+            return state.model_copy(update=extractor(state))
+    except Exception:
+        logger.exception("Album extraction failed for file_id=%s", state.file_id)
+        return state
+
+
+def _summarize(state: WorkflowState) -> dict[str, Any]:
+    """Describe the outcome for one album item."""
+    receipt = state.receipt_json or {}
+    return {
+        "file_id": state.file_id,
+        "is_receipt": receipt.get("is_receipt"),
+        "merchant_name": receipt.get("merchant_name"),
+        "receipt_date": receipt.get("receipt_date"),
+        "total": receipt.get("total"),
+        "currency": receipt.get("currency"),
+        "expense_id": state.expense_id,
+    }
+
+
+def run_album(states: list[WorkflowState], max_concurrency: int | None = None) -> WorkflowState:
+    """Process an album: concurrent extraction, one batched write, one reply.
+
+    This skips the planner entirely: the route for a batch of receipts is
+    fixed (extract -> upsert -> render).
+
+    Args:
+        states: One state per photo in the album, in message order.
+        max_concurrency: Extractions in flight (default ALBUM_EXTRACT_CONCURRENCY).
+
+    Returns:
+        Rendered state whose response_text covers every receipt.
+    """
+    if not states:
+        raise ValueError("run_album requires at least one state")
+
+    limit = max_concurrency or int(os.environ.get("ALBUM_EXTRACT_CONCURRENCY", "4"))
+    extractor = ExtractReceipt()
+    with ThreadPoolExecutor(max_workers=min(limit, len(states))) as pool:
+        extracted = list(pool.map(lambda state: _extract(extractor, state), states))
+
+    written = UpsertExpense().upsert_many(extracted)
+    logger.info(
+        "Album processed: %s photos, %s expenses written",
+        len(written),
+        sum(1 for state in written if state.expense_id),
+    )
+
+    first = states[0]
+    captions = [state.user_input for state in states if state.user_input]
+    summary_state = WorkflowState(
+        user_input="\n".join(captions) or None,
+        telegram_user_id=first.telegram_user_id,
+        username=first.username,
+        first_name=first.first_name,
+        last_name=first.last_name,
+        batch_results=tuple(_summarize(state) for state in written),
+    )
+    with usage_scope(first.telegram_user_id, "render_and_post"):
+        return summary_state.model_copy(update=RenderAndPost()(summary_state))
@@ -0,0 +1,189 @@
+"""Conversation memory: one persisted LangGraph thread per chat.
+
+Each message is merged into the chat's stored WorkflowState instead of
+starting from an empty one. The receipt being worked on is reset every
+turn, but the last saved one stays in ``previous_receipt``, so a follow-up
+such as "actually it was a hotel expense" can correct that expense without
+running vision extraction again.
+
+Checkpoints are written once per run (``durability="exit"``) rather than
+after every hop, each thread keeps only its latest checkpoint, and threads
+idle for longer than the retention window are deleted.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import os
+from contextlib import suppress
+from datetime import timedelta
+from typing import Any
+
+import psycopg
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.types import Overwrite
+
+from src.schemas.state import WorkflowState
+
+logger = logging.getLogger(__name__)
+
+# Fields every message brings with it
+TURN_FIELDS = {"user_input", "telegram_user_id", "username", "first_name", "last_name"}
+
+# Fields that only describe the previous run and must not leak into the next
+RESET_EACH_TURN = {
+    "next_action": None,
+    "file_id": None,
+    "receipt_json": None,
+    "expense_id": None,
+    "receipt_updates": None,
+    "status_rows": None,
+    "batch_results": None,
+    "hops": 0,
+    "action_history": [],
+    # Appended through a reducer, so the reset has to bypass it
+    "node_timings": Overwrite([]),
+    "response_text": None,
+    # Resolved again from the message's sender; in a group chat the previous
+    # turn may have been someone else's
+    "user_id": None,
+}
+
+# State values of our own types, restorable when LANGGRAPH_STRICT_MSGPACK is on
+CHECKPOINT_TYPES = [("src.schemas.status_table", "StatusTable")]
+
+IDLE_THREADS_SQL = """
+SELECT thread_id
+FROM checkpoints
+GROUP BY thread_id
+HAVING MAX((checkpoint->>'ts')::timestamptz) < now() - make_interval(secs => %s)
+"""
+
+
+def thread_config(chat_id: int | str, **configurable: Any) -> dict[str, Any]:
+    """Build the run config that binds a graph run to a chat's thread."""
+    return {"configurable": {"thread_id": str(chat_id), **configurable}}
+
+
+def turn_input(state: WorkflowState) -> dict[str, Any]:
+    """Return the graph input that merges one message into the stored state.
+
+    Only ``previous_receipt`` is kept from earlier turns, and a new upload
+    drops it too.
+
+    Args:
+        state: State built from the incoming message.
+
+    Returns:
+        Partial state for ``invoke``/``astream``.
+    """
+    update = state.model_dump(include=TURN_FIELDS)
+    update.update(copy.deepcopy(RESET_EACH_TURN))
+    if state.file_id:
+        update.update(file_id=state.file_id, previous_receipt=None)
+    return update
+
+
+class ConversationMemory:
+    """Owns the checkpointer that keeps each chat's state between messages.
+
+    Backends:
+        ``postgres``: LangGraph's Postgres saver on DATABASE_URL.
+        ``memory``: In-process saver (single process, lost on restart).
+        ``none``: Every message starts from an empty state.
+    """
+
+    def __init__(
+        self,
+        backend: str = "none",
+        database_url: str = "",
+        retention: timedelta = timedelta(hours=24),
+        sweep_interval: float = 3600.0,
+    ) -> None:
+        self.backend = backend
+        self._database_url = database_url
+        self._retention = retention
+        self._sweep_interval = sweep_interval
+        self._saver_cm = None
+        self._sweeper: asyncio.Task | None = None
+        self.saver: BaseCheckpointSaver | None = None
+
+    @classmethod
+    def from_env(cls) -> ConversationMemory:
+        """Configure from CHECKPOINT_BACKEND and CHECKPOINT_RETENTION_HOURS."""
+        return cls(
+            backend=os.getenv("CHECKPOINT_BACKEND", "none").lower(),
+            database_url=os.getenv("DATABASE_URL", ""),
+            retention=timedelta(hours=float(os.getenv("CHECKPOINT_RETENTION_HOURS", "24"))),
+        )
+
+    async def open(self) -> BaseCheckpointSaver | None:
+        """Create the saver (and its tables) and start the retention sweep."""
+        if self.backend == "memory":
+            self.saver = InMemorySaver().with_allowlist(CHECKPOINT_TYPES)
+        elif self.backend == "postgres":
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+            self._saver_cm = AsyncPostgresSaver.from_conn_string(self._database_url)
+            saver = await self._saver_cm.__aenter__()
+            await saver.setup()
+            self.saver = saver.with_allowlist(CHECKPOINT_TYPES)
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+        elif self.backend != "none":
+            raise ValueError(f"Unknown CHECKPOINT_BACKEND: {self.backend}")
+
+        logger.info("Conversation memory backend=%s", self.backend)
+        return self.saver
+
+    async def close(self) -> None:
+        """Stop the sweep and release the saver's connection."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._sweeper
+            self._sweeper = None
+        if self._saver_cm is not None:
+            await self._saver_cm.__aexit__(None, None, None)
+            self._saver_cm = None
+        self.saver = None
+
+    async def after_turn(self, chat_id: int | str) -> None:
+        """Drop all but the latest checkpoint of a chat's thread."""
+        if self.saver is None or self.backend == "memory":
+            return
+        try:
+            await self.saver.aprune([str(chat_id)], strategy="keep_latest")
+        except Exception:
+            logger.warning("Failed to prune checkpoints for chat %s", chat_id, exc_info=True)
+
+    async def expire_idle_threads(self) -> int:
+        """Delete threads whose last checkpoint is older than the retention window.
+
+        Returns:
+            Number of threads deleted.
+        """
+        if self.saver is None or self.backend != "postgres":
+            return 0
+        thread_ids = await asyncio.to_thread(self._idle_thread_ids)
+        if thread_ids:
+            await self.saver.aprune(thread_ids, strategy="delete")
+            logger.info("Expired %s idle conversation threads", len(thread_ids))
+        return len(thread_ids)
+
+    def _idle_thread_ids(self) -> list[str]:
+        """Return thread ids idle for longer than the retention window."""
+        with psycopg.connect(self._database_url) as conn:
+            rows = conn.execute(IDLE_THREADS_SQL, (self._retention.total_seconds(),)).fetchall()
+        return [row[0] for row in rows]
+
+    async def _sweep_forever(self) -> None:
+        """Expire idle threads on startup and then every sweep interval."""
+        while True:
+            try:
+                await self.expire_idle_threads()
+            except Exception:
+                logger.warning("Conversation retention sweep failed", exc_info=True)
+            await asyncio.sleep(self._sweep_interval)
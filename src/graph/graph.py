@@ -1,29 +1,60 @@
-from langgraph.graph import END, StateGraph
+import os
+
+from langgraph.graph import END, START, StateGraph
 
 from src.nodes.agent_plan import AgentPlan
 from src.nodes.extract_receipt import ExtractReceipt
+from src.nodes.prefetch_receipt import PrefetchReceipt
 from src.nodes.query_status import QueryStatus
 from src.nodes.render_and_post import RenderAndPost
+from src.nodes.resolve_user import ResolveUser
 from src.nodes.upsert_expense import UpsertExpense
+from src.graph.tracing import record_route, traced
 from src.schemas.state import WorkflowState
+from src.tools.receipt_cache import get_receipt_cache
+
+
+def route_from_start(state: WorkflowState) -> list[str]:
+    """Start the planner, plus side branches that don't depend on it.
+
+    For a new upload the storage fetch (into the local receipt cache) and
+    the user upsert run while the planner's LLM call is in flight, so the
+    extraction and expense write that follow find their inputs ready.
+    """
+    branches = ["agent_plan"]
+    new_upload = state.file_id and state.receipt_json is None
+    if not new_upload or os.getenv("GRAPH_FANOUT", "true").lower() != "true":
+        return branches
+    if get_receipt_cache() is not None:
+        branches.append("prefetch_receipt")
+    if state.telegram_user_id and os.getenv("DATABASE_URL"):
+        branches.append("resolve_user")
+    return branches
 
 
 def route_from_agent_plan(state: WorkflowState) -> str:
-    """Return the next node name chosen by the agent plan."""
-    return state.next_action or "render_and_post"
+    """Return the next node: the planner's choice unless a guard overrides it."""
+    return record_route(state)
 
 
 def build_graph() -> StateGraph:
     """Build the LangGraph workflow."""
     graph = StateGraph(WorkflowState)
 
-    graph.add_node("agent_plan", AgentPlan())
-    graph.add_node("extract_receipt", ExtractReceipt())
-    graph.add_node("upsert_expense", UpsertExpense())
-    graph.add_node("query_status", QueryStatus())
-    graph.add_node("render_and_post", RenderAndPost())
+    graph.add_node("agent_plan", traced("agent_plan", AgentPlan()))
+    graph.add_node("extract_receipt", traced("extract_receipt", ExtractReceipt()))
+    graph.add_node("upsert_expense", traced("upsert_expense", UpsertExpense()))
+    graph.add_node("query_status", traced("query_status", QueryStatus()))
+    graph.add_node("render_and_post", traced("render_and_post", RenderAndPost()))
 
-    graph.set_entry_point("agent_plan")
+    graph.add_node("prefetch_receipt", traced("prefetch_receipt", PrefetchReceipt()))
+    graph.add_node("resolve_user", traced("resolve_user", ResolveUser()))
+
+    graph.add_conditional_edges(
+        START,
+        route_from_start,
+        ["agent_plan", "prefetch_receipt", "resolve_user"],
+    )
 
     graph.add_conditional_edges(
         "agent_plan",
@@ -40,6 +71,8 @@ def build_graph() -> StateGraph:
     graph.add_edge("upsert_expense", "agent_plan")
     graph.add_edge("query_status", "agent_plan")
     graph.add_edge("render_and_post", END)
+    graph.add_edge("prefetch_receipt", END)
+    graph.add_edge("resolve_user", END)
 
     return graph
 
@@ -0,0 +1,144 @@
+"""Hop budget, loop detection and per-node timing for graph runs."""
+
+import logging
+import os
+import time
+from typing import Any, Callable
+
+from src.schemas.state import StateUpdate, WorkflowState
+from src.tools.metrics import Counter, Histogram
+from src.tools.usage_ledger import usage_scope
+
+logger = logging.getLogger(__name__)
+
+PLANNER = "agent_plan"
+FINAL_ACTION = "render_and_post"
+ACTIONS = ("extract_receipt", "upsert_expense", "query_status", FINAL_ACTION)
+
+# Fields maintained by the tracing wrapper rather than by the nodes
+BOOKKEEPING_FIELDS = {"hops", "action_history", "node_timings"}
+
+# Fields ignored when deciding whether an action node did anything
+TRACE_FIELDS = BOOKKEEPING_FIELDS | {"next_action"}
+
+NODE_SECONDS = Histogram(
+    "graph_node_seconds",
+    "Time spent in each graph node.",
+    ["node"],
+)
+ROUTES = Counter(
+    "graph_route_total",
+    "Routing decisions after the planner, by chosen action and why it was chosen.",
+    ["action", "reason"],
+)
+WASTED_HOPS = Counter(
+    "graph_wasted_hops_total",
+    "Hops that ran without changing the state, or were cut by the guards.",
+    ["node", "reason"],
+)
+
+
+def max_hops() -> int:
+    """Action nodes allowed per turn before the reply is forced (GRAPH_MAX_HOPS)."""
+    return int(os.getenv("GRAPH_MAX_HOPS", "4"))
+
+
+def max_action_repeats() -> int:
+    """Times one action may run per turn (GRAPH_MAX_ACTION_REPEATS)."""
+    return int(os.getenv("GRAPH_MAX_ACTION_REPEATS", "1"))
+
+
+def guard_action(state: WorkflowState) -> tuple[str, str]:
+    """Apply the hop budget and loop detection to the planner's choice.
+
+    Args:
+        state: State after the planner ran.
+
+    Returns:
+        (action, reason) where reason is "planner" when the planner's choice
+        stands, "default" when it made none, otherwise the guard that
+        forced render_and_post.
+    """
+    action = state.next_action
+    if action not in ACTIONS:
+        return FINAL_ACTION, "default"
+    if action == FINAL_ACTION:
+        return action, "planner"
+    if state.hops >= max_hops():
+        return FINAL_ACTION, "hop_budget"
+    if state.action_history.count(action) >= max_action_repeats():
+        return FINAL_ACTION, "repeated_action"
+    return action, "planner"
+
+
+def record_route(state: WorkflowState) -> str:
+    """Route after the planner and export the decision as metrics."""
+    action, reason = guard_action(state)
+    ROUTES.labels(action, reason).inc()
+    if reason in ("hop_budget", "repeated_action"):
+        WASTED_HOPS.labels(state.next_action, reason).inc()
+        logger.warning(
+            "Forcing %s: planner chose %s (%s) after %s",
+            FINAL_ACTION,
+            state.next_action,
+            reason,
+            state.action_history,
+        )
+    return action
+
+
+def traced(
+    name: str, node: Callable[[WorkflowState], StateUpdate | WorkflowState]
+) -> Callable[[WorkflowState], dict[str, Any]]:
+    """Wrap a node to time it and record the hop in the state.
+
+    Nodes return a partial update with only the fields they changed, so
+    nodes running in parallel branches never write the same field
+    (``node_timings`` is merged by its reducer) and large fields are not
+    compared or copied; a node returning a whole state is diffed instead.
+    Action nodes count towards ``hops`` and are appended to
+    ``action_history``; side branches only add timings. The trace of the
+    whole run is logged when the final node finishes. LLM usage inside the
+    node is attributed to the node and the state's user.
+    """
+    seconds = NODE_SECONDS.labels(name)
+    no_op = WASTED_HOPS.labels(name, "no_op")
+
+    def run(state: WorkflowState) -> dict[str, Any]:
+        started = time.perf_counter()
+        with usage_scope(state.telegram_user_id, name):
+            result = node(state)
+        elapsed = time.perf_counter() - started
+        seconds.observe(elapsed)
+
+        if isinstance(result, dict):
+            update = {field: value for field, value in result.items() if field not in BOOKKEEPING_FIELDS}
+        else:
+            update = _changed_fields(state, result)
+        timing = {"node": name, "ms": round(elapsed * 1000, 1)}
+        update["node_timings"] = [timing]
+        if name in ACTIONS:
+            update["hops"] = state.hops + 1
+            update["action_history"] = [*state.action_history, name]
+            if name != FINAL_ACTION and set(update) <= TRACE_FIELDS:
+                no_op.inc()
+
+        if name == FINAL_ACTION:
+            logger.info(
+                "Graph run hops=%s path=%s timings=%s",
+                update["hops"],
+                update["action_history"],
+                [*state.node_timings, timing],
+            )
+        return update
+
+    return run
+
+
+def _changed_fields(before: WorkflowState, after: WorkflowState) -> dict[str, Any]:
+    """Return the non-bookkeeping fields a node changed."""
+    return {
+        field: getattr(after, field)
+        for field in WorkflowState.model_fields
+        if field not in BOOKKEEPING_FIELDS and getattr(after, field) != getattr(before, field)
+    }
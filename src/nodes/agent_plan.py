@@ -1,34 +1,87 @@
+import contextvars
 import json
 import logging
 import os
+import re
+import threading
+import unicodedata
 from pathlib import Path
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 
 from src.schemas.agent_plan import AgentPlanResponse
-from src.schemas.state import WorkflowState
+from src.schemas.state import StateUpdate, WorkflowState
+from src.tools.llm_gateway import FALLBACKS, LLM_ERRORS, get_chat_model
+from src.tools.planner_cache import PlannerCache, get_planner_cache
+from src.tools.structured_logging import log_state
 
 PROMPT_PATH = Path(__file__).resolve().parents[1] / "prompts" / "agent_plan.md"
 PROMPT = PROMPT_PATH.read_text(encoding="utf-8").strip()
 
+# Words that make the rule-based fallback plan treat a message as a status request
+STATUS_WORDS = ("status", "history", "pending", "approved", "estado", "historial", "pendiente")
+
+# Whole messages the planner cache treats as one input class; other text is planned uncached
+SMALL_TALK = {"hi", "hello", "hey", "hola", "buenas", "ok", "okay", "thanks", "thank you", "gracias"}
+RECEIPT_CAPTIONS = {"receipt", "recibo", "ticket", "factura", "invoice"}
+
 
 class AgentPlan:
     """Plans the next action based on the user input and current state."""
 
-    def __call__(self, state: WorkflowState) -> WorkflowState:
+    def __call__(self, state: WorkflowState) -> StateUpdate:
         """Run the node.
 
         Args:
             state: Current workflow state.
 
         Returns:
-            Updated workflow state.
+            The fields this node changed.
         """
-        logging.info("AgentPlan input state=%s", state)
+        log_state("AgentPlan input", state)
         return self._plan(state)
 
-    def _plan(self, state: WorkflowState) -> WorkflowState:
+    def _plan(self, state: WorkflowState) -> StateUpdate:
+        """Plan the next action from the planner cache or the LLM."""
+        cache = get_planner_cache()
+        key = self._cache_key(state) if cache is not None else None
+        cached = cache.get(key) if cache is not None else None
+
+        if cached is not None and cache.serves_hits:
+            logging.info("AgentPlan cache hit next_action=%s", cached)
+            if cache.sample_shadow():
+                self._shadow_check(cache, key, cached, state)
+            result = AgentPlanResponse(next_action=cached)
+        else:
+            try:
+                result = self._ask_llm(state)
+            except LLM_ERRORS:
+                logging.warning("AgentPlan LLM unavailable; planning from rules", exc_info=True)
+                FALLBACKS.labels("agent_plan").inc()
+                result = self._fallback_plan(state)
+            else:
+                # Decisions carrying corrections depend on the exact text
+                if key is not None and not self._has_updates(result):
+                    if cached is not None:
+                        cache.compare(key, cached, result.next_action)
+                    else:
+                        cache.put(key, result.next_action)
+
+        logging.info("AgentPlan selected next_action=%s", result.next_action)
+        update = {"next_action": result.next_action}
+        corrections = self._receipt_corrections(state, result)
+        if corrections:
+            logging.info("AgentPlan applying receipt corrections to fields=%s", sorted(corrections))
+            if state.receipt_json is None:
+                # Correcting the receipt saved in an earlier turn
+                update["expense_id"] = state.previous_receipt["expense_id"]
+                update["file_id"] = state.previous_receipt["file_id"]
+            update["receipt_json"] = {**self._correctable_receipt(state), **corrections}
+            update["receipt_updates"] = corrections
+        return update
+
+    def _ask_llm(self, state: WorkflowState) -> AgentPlanResponse:
         """Plan the next action using an LLM with structured output."""
         formatted_state = self._format_state_for_prompt(state)
         llm = self._get_llm()
@@ -41,16 +94,102 @@ class AgentPlan:
             ]
         )
         chain = prompt | llm_with_structure
-        result = chain.invoke({"state_json": formatted_state})
+        return chain.invoke({"state_json": formatted_state})
 
-        logging.info("AgentPlan selected next_action=%s", result.next_action)
-        return state.model_copy(update={"next_action": result.next_action})
+    def _shadow_check(
+        self, cache: PlannerCache, key: str, cached: str, state: WorkflowState
+    ) -> None:
+        """Re-plan a cache hit with the LLM in the background and compare."""
+        context = contextvars.copy_context()
+
+        def check() -> None:
+            try:
+                cache.compare(key, cached, self._ask_llm(state).next_action)
+            except Exception:
+                logging.warning("AgentPlan shadow check failed", exc_info=True)
+            finally:
+                cache.release_shadow()
+
+        threading.Thread(target=context.run, args=(check,), name="planner-shadow", daemon=True).start()
+
+    def _cache_key(self, state: WorkflowState) -> str | None:
+        """Return the id-free planning state, or None when it cannot be cached.
+
+        The key keeps what the planning payload tells the LLM (presence
+        flags) and replaces the message with its input class.
+        """
+        input_class = self._input_class(state.user_input)
+        correction_possible = state.receipt_updates is None and (
+            (state.receipt_json is not None and state.expense_id is not None)
+            or state.previous_receipt is not None
+        )
+        if input_class is None or (input_class == "status" and correction_possible):
+            return None
+        payload = {
+            "user_input": input_class,
+            "file_id": state.file_id is not None,
+            "receipt_json_present": state.receipt_json is not None,
+            "expense_id": state.expense_id is not None,
+            "previous_expense_id": state.previous_receipt is not None,
+            "receipt_updates_applied": state.receipt_updates is not None,
+            "status_rows": bool(state.status_rows),
+        }
+        return json.dumps(payload, sort_keys=True, separators=(",", ":"))
+
+    def _input_class(self, user_input: str | None) -> str | None:
+        """Classify a message for the planner cache; None for free text."""
+        text = unicodedata.normalize("NFKD", user_input or "").lower()
+        text = "".join(char for char in text if not unicodedata.combining(char))
+        text = " ".join(re.sub(r"[^\w\s]", " ", text).split())
+        if not text:
+            return "empty"
+        if any(word in text for word in STATUS_WORDS):
+            return "status"
+        if text in SMALL_TALK:
+            return "small_talk"
+        if text in RECEIPT_CAPTIONS:
+            return "receipt_caption"
+        return None
+
+    def _has_updates(self, result: AgentPlanResponse) -> bool:
+        return bool(result.receipt_updates and result.receipt_updates.model_dump(exclude_none=True))
+
+    def _receipt_corrections(
+        self, state: WorkflowState, result: AgentPlanResponse
+    ) -> dict[str, object]:
+        """Return the non-empty corrections for a saved receipt."""
+        if not result.receipt_updates or not self._correctable_receipt(state) or state.receipt_updates:
+            return {}
+        return result.receipt_updates.model_dump(exclude_none=True)
+
+    def _correctable_receipt(self, state: WorkflowState) -> dict[str, object]:
+        """The saved receipt a correction applies to: this turn's, else the last one."""
+        if state.receipt_json is not None:
+            return state.receipt_json
+        if state.previous_receipt:
+            return state.previous_receipt.get("receipt_json") or {}
+        return {}
+
+    def _fallback_plan(self, state: WorkflowState) -> AgentPlanResponse:
+        """Apply the planner prompt's routing rules without the LLM.
+
+        Corrections to a stored receipt need the LLM to read them, so they
+        are not attempted here.
+        """
+        if state.file_id and state.receipt_json is None:
+            return AgentPlanResponse(next_action="extract_receipt")
+        if state.receipt_json is not None and not state.expense_id:
+            return AgentPlanResponse(next_action="upsert_expense")
+        text = (state.user_input or "").lower()
+        if state.status_rows is None and any(word in text for word in STATUS_WORDS):
+            return AgentPlanResponse(next_action="query_status")
+        return AgentPlanResponse(next_action="render_and_post")
 
     def _get_llm(self) -> ChatOpenAI:
         """Create the chat model for planning."""
         model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
-        api_key = os.environ.get("OPENAI_API_KEY")
-        return ChatOpenAI(model=model, api_key=api_key)
+        hedge = os.environ.get("LLM_HEDGE_PLANNER", "false").lower() == "true"
+        return get_chat_model(model, "agent_plan", hedge=hedge)
 
     def _format_state_for_prompt(self, state: WorkflowState) -> str:
         """Format the workflow state for prompt consumption."""
@@ -60,6 +199,8 @@ class AgentPlan:
             "file_id": state.file_id,
             "receipt_json_present": state.receipt_json is not None,
             "expense_id": state.expense_id,
+            "previous_expense_id": (state.previous_receipt or {}).get("expense_id"),
+            "receipt_updates_applied": state.receipt_updates is not None,
             "status_rows_count": len(state.status_rows or []),
         }
         return json.dumps(payload, indent=2, ensure_ascii=False)
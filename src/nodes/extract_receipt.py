@@ -1,41 +1,68 @@
+import itertools
 import logging
 import os
 import tempfile
-from typing import Any, Tuple
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Tuple
 
+from src.db.receipt_files import find_receipt_file
 from src.tools.image_extractor import extract_receipt_from_image
-from src.tools.minio_storage import ensure_bucket, get_minio_client
-
-from src.schemas.state import WorkflowState
+from src.tools.llm_gateway import FALLBACKS, LLM_ERRORS
+from src.tools.pdf_extractor import extract_receipt_from_pdf
+from src.tools.minio_storage import (
+    CONTENT_PREFIX,
+    ensure_bucket,
+    find_file_reference,
+    get_minio_client,
+    read_object,
+)
+from src.tools.receipt_cache import ReceiptCache, get_receipt_cache
+from src.tools.structured_logging import log_state
+from src.tools.usage_ledger import over_budget
+
+from src.schemas.state import StateUpdate, WorkflowState
 
 
 class ExtractReceipt:
     """Extracts structured data from receipt images."""
 
-    def __call__(self, state: WorkflowState) -> WorkflowState:
+    def __call__(self, state: WorkflowState) -> StateUpdate:
         """Run the node.
 
         Args:
             state: Current workflow state.
 
         Returns:
-            Updated workflow state.
+            The fields this node changed.
         """
-        logging.info("ExtractReceipt input state=%s", state)
+        log_state("ExtractReceipt input", state)
         return self._extract(state)
 
-    def _extract(self, state: WorkflowState) -> WorkflowState:
+    def _extract(self, state: WorkflowState) -> StateUpdate:
         """Extract receipt data from the stored image bytes."""
         if not state.file_id:
             logging.info("ExtractReceipt skipping: missing file_id")
-            return state
+            return {}
         if state.receipt_json is not None:
             logging.info("ExtractReceipt skipping: receipt_json already present")
-            return state
+            return {}
 
-        image_bytes, suffix = self._load_image_bytes(state)
-        receipt_data = self._run_extractor(image_bytes, suffix)
-        return state.model_copy(update={"receipt_json": receipt_data})
+        cache = get_receipt_cache()
+        # Users over their daily LLM budget get low-detail (cheaper) vision
+        detail = "low" if over_budget(state.telegram_user_id, "extract_receipt") else "high"
+        try:
+            if cache is not None:
+                with self._cached_path(cache, state) as image_path:
+                    receipt_data = self._extract_from_path(image_path, detail)
+            else:
+                image_bytes, suffix = self._load_image_bytes(state)
+                receipt_data = self._run_extractor(image_bytes, suffix, detail)
+        except LLM_ERRORS:
+            # Leave receipt_json empty so the reply asks the user to resend
+            logging.warning("ExtractReceipt LLM unavailable for file_id=%s", state.file_id, exc_info=True)
+            FALLBACKS.labels("extract_receipt").inc()
+            return {}
+        return {"receipt_json": receipt_data}
 
     def _load_image_bytes(self, state: WorkflowState) -> Tuple[bytes, str]:
         """Load image bytes for the provided file_id.
@@ -54,44 +81,95 @@ class ExtractReceipt:
 
         return self._load_from_minio(file_id)
 
-    def _load_from_minio(self, file_id: str) -> Tuple[bytes, str]:
-        """Load image bytes from MinIO by file_id metadata."""
+    @contextmanager
+    def _cached_path(self, cache: ReceiptCache, state: WorkflowState) -> Iterator[str]:
+        """Yield a local path for the receipt, reading through the disk cache.
+
+        Args:
+            cache: Local receipt cache.
+            state: Current workflow state.
+
+        Yields:
+            Path to the cached (or already local) file, pinned until the
+            block exits.
+        """
+        file_id = state.file_id or ""
+        if os.path.exists(file_id):
+            yield file_id
+            return
+
+        reference = self._find_reference(file_id)
+        key = reference["sha256"] if reference else f"file_id:{file_id}"
+        with cache.pinned(key, lambda: self._load_from_minio(file_id, reference)) as path:
+            yield str(path)
+
+    def _find_reference(self, file_id: str) -> Optional[dict[str, Any]]:
+        """Look up the content-addressed object for a file_id, if recorded."""
+        database_url = os.environ.get("DATABASE_URL", "")
+        if database_url:
+            return find_receipt_file(database_url, file_id)
         client, bucket = get_minio_client()
         ensure_bucket(client, bucket)
-        prefix = os.environ.get("MINIO_PREFIX", "telegram/")
-        for obj in client.list_objects(bucket, prefix=prefix, recursive=True):
+        return find_file_reference(client, bucket, file_id)
+
+    def _load_from_minio(
+        self, file_id: str, reference: Optional[dict[str, Any]] = None
+    ) -> Tuple[bytes, str]:
+        """Load image bytes from MinIO, resolving file_id via the reference table."""
+        client, bucket = get_minio_client()
+        ensure_bucket(client, bucket)
+
+        reference = reference or self._find_reference(file_id)
+        if reference:
+            data = read_object(client, bucket, reference["object_name"])
+            return data, reference.get("suffix") or ".jpg"
+
+        return self._scan_minio_metadata(client, bucket, file_id)
+
+    def _scan_minio_metadata(self, client: Any, bucket: str, file_id: str) -> Tuple[bytes, str]:
+        """Find objects stored without a reference by scanning their file_id metadata.
+
+        Covers legacy per-upload objects and content-addressed ones uploaded
+        before references were written without a database.
+        """
+        legacy = client.list_objects(
+            bucket, prefix=os.environ.get("MINIO_PREFIX", "telegram/"), recursive=True
+        )
+        content = client.list_objects(bucket, prefix=CONTENT_PREFIX, recursive=True)
+        for obj in itertools.chain(legacy, content):
             stat = client.stat_object(bucket, obj.object_name)
             metadata = {key.lower(): value for key, value in (stat.metadata or {}).items()}
             stored_id = metadata.get("x-amz-meta-file_id") or metadata.get("file_id")
             if stored_id != file_id:
                 continue
 
-            response = client.get_object(bucket, obj.object_name)
-            try:
-                data = response.read()
-            finally:
-                response.close()
-                response.release_conn()
-
+            data = read_object(client, bucket, obj.object_name)
             suffix = os.path.splitext(obj.object_name)[1] or ".jpg"
             return data, suffix
 
         raise FileNotFoundError(f"Unable to locate file_id={file_id} in MinIO")
 
-    def _run_extractor(self, image_bytes: bytes, suffix: str) -> dict[str, Any]:
+    def _run_extractor(self, image_bytes: bytes, suffix: str, detail: str = "high") -> dict[str, Any]:
         """Run the receipt extraction tool on the image bytes."""
-        model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
         tmp_path = None
         try:
             with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as handle:
                 handle.write(image_bytes)
                 tmp_path = handle.name
 
-            result = extract_receipt_from_image(tmp_path, model=model)
+            return self._extract_from_path(tmp_path, detail)
         finally:
             if tmp_path and os.path.exists(tmp_path):
                 os.remove(tmp_path)
 
+    def _extract_from_path(self, image_path: str, detail: str = "high") -> dict[str, Any]:
+        """Run the receipt extraction tool on a local image or PDF file."""
+        model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+        if image_path.lower().endswith(".pdf"):
+            result = extract_receipt_from_pdf(image_path, model=model, detail=detail)
+        else:
+            result = extract_receipt_from_image(image_path, model=model, detail=detail)
+
         if hasattr(result, "model_dump"):
             return result.model_dump()
         if isinstance(result, dict):
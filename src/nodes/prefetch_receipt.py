@@ -0,0 +1,35 @@
+import logging
+
+from src.nodes.extract_receipt import ExtractReceipt
+from src.schemas.state import StateUpdate, WorkflowState
+from src.tools.receipt_cache import get_receipt_cache
+
+
+class PrefetchReceipt(ExtractReceipt):
+    """Pulls a new upload into the local receipt cache while the planner runs."""
+
+    def __call__(self, state: WorkflowState) -> StateUpdate:
+        """Run the node.
+
+        Args:
+            state: Current workflow state.
+
+        Returns:
+            No changes; the effect is a warm cache entry.
+        """
+        logging.info("PrefetchReceipt file_id=%s", state.file_id)
+        return self._prefetch(state)
+
+    def _prefetch(self, state: WorkflowState) -> StateUpdate:
+        """Fetch the receipt bytes so extraction reads them from local disk."""
+        cache = get_receipt_cache()
+        if cache is None or not state.file_id or state.receipt_json is not None:
+            return {}
+
+        # Best effort: extraction fetches again if this fails
+        try:
+            with self._cached_path(cache, state):
+                pass
+        except Exception:
+            logging.warning("PrefetchReceipt failed for file_id=%s", state.file_id, exc_info=True)
+        return {}
@@ -1,37 +1,55 @@
 import json
 import logging
 import os
+import time
 from pathlib import Path
 from typing import Any, Iterable, List
 
 import psycopg
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
-from psycopg.rows import dict_row
 
+from src.db.expense_search import SEARCH_COLUMNS, search_expenses
+from src.db.metrics import QueryMetrics
 from src.schemas.query_status import QueryStatusResponse
-from src.schemas.state import WorkflowState
+from src.schemas.state import StateUpdate, WorkflowState
+from src.schemas.status_table import StatusTable
+from src.tools.llm_gateway import FALLBACKS, LLM_ERRORS, get_chat_model
+from src.tools.structured_logging import log_state
 
 PROMPT_PATH = Path(__file__).resolve().parents[1] / "prompts" / "query_status.md"
 PROMPT = PROMPT_PATH.read_text(encoding="utf-8").strip()
 
+STATUS_QUERY = QueryMetrics("status_query")
+RECENT_QUERY = QueryMetrics("recent_expenses")
+
+# Answered instead of the generated queries when the LLM is unavailable
+RECENT_EXPENSES_SQL = """
+SELECT e.id, e.status, e.total, e.currency, e.concept, e.description, e.expense_date
+FROM expenses e
+JOIN users u ON u.id = e.user_id
+WHERE u.telegram_user_id = %s
+ORDER BY e.expense_date DESC, e.created_at DESC
+LIMIT 10
+"""
+
 
 class QueryStatus:
     """Queries expense status and history."""
 
-    def __call__(self, state: WorkflowState) -> WorkflowState:
+    def __call__(self, state: WorkflowState) -> StateUpdate:
         """Run the node.
 
         Args:
             state: Current workflow state.
 
         Returns:
-            Updated workflow state.
+            The fields this node changed.
         """
-        logging.info("QueryStatus input state=%s", state)
+        log_state("QueryStatus input", state)
         return self._query(state)
 
-    def _query(self, state: WorkflowState) -> WorkflowState:
+    def _query(self, state: WorkflowState) -> StateUpdate:
         """Query status data using an LLM-generated query plan."""
         formatted_state = self._format_state_for_prompt(state)
         llm = self._get_llm()
@@ -44,26 +62,37 @@ class QueryStatus:
             ]
         )
         chain = prompt | llm_with_structure
-        result = chain.invoke(
-            {
-                "user_input": state.user_input or "",
-                "state_json": formatted_state,
-            }
-        )
+        try:
+            result = chain.invoke(
+                {
+                    "user_input": state.user_input or "",
+                    "state_json": formatted_state,
+                }
+            )
+        except LLM_ERRORS:
+            logging.warning("QueryStatus LLM unavailable; listing recent expenses", exc_info=True)
+            FALLBACKS.labels("query_status").inc()
+            return {"status_rows": self._fetch_recent_rows(state.telegram_user_id)}
+
+        if result.search:
+            status_rows = self._search_rows(
+                state.telegram_user_id, result.search, result.search_page
+            )
+            logging.info("QueryStatus search matched %s rows.", len(status_rows))
+            return {"status_rows": status_rows}
 
         if not result.queries:
             logging.info("QueryStatus did not produce queries.")
-            return state
+            return {}
 
         status_rows = self._fetch_status_rows(result.queries)
         logging.info("QueryStatus retrieved %s rows.", len(status_rows))
-        return state.model_copy(update={"status_rows": status_rows})
+        return {"status_rows": status_rows}
 
     def _get_llm(self) -> ChatOpenAI:
         """Create the chat model for query generation."""
         model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
-        api_key = os.environ.get("OPENAI_API_KEY")
-        return ChatOpenAI(model=model, api_key=api_key)
+        return get_chat_model(model, "query_status")
 
     def _format_state_for_prompt(self, state: WorkflowState) -> str:
         """Format the workflow state for prompt consumption."""
@@ -78,15 +107,16 @@ class QueryStatus:
         }
         return json.dumps(payload, indent=2, ensure_ascii=False)
 
-    def _fetch_status_rows(self, queries: Iterable[str]) -> List[dict[str, Any]]:
+    def _fetch_status_rows(self, queries: Iterable[str]) -> StatusTable:
         """Execute query list and collect rows for response building."""
         database_url = os.environ.get("DATABASE_URL", "")
         if not database_url:
             logging.warning("DATABASE_URL not set; skipping status query.")
-            return []
+            return StatusTable.from_rows([], [])
 
-        rows: List[dict[str, Any]] = []
-        with psycopg.connect(database_url, row_factory=dict_row) as conn:
+        results: List[tuple[List[str], List[tuple[Any, ...]]]] = []
+        started = time.perf_counter()
+        with psycopg.connect(database_url) as conn:
             with conn.cursor() as cur:
                 for query in queries:
                     if not query:
@@ -97,8 +127,39 @@ class QueryStatus:
                         continue
                     cur.execute(normalized_query)
                     if cur.description:
-                        rows.extend(cur.fetchall())
-        return rows
+                        results.append(([column[0] for column in cur.description], cur.fetchall()))
+        table = self._to_table(results)
+        STATUS_QUERY.observe(started, len(table))
+        return table
+
+    def _fetch_recent_rows(self, telegram_user_id: str | None) -> StatusTable:
+        """Fetch the user's latest expenses with a fixed, parameterized query."""
+        database_url = os.environ.get("DATABASE_URL", "")
+        if not database_url or not telegram_user_id:
+            return StatusTable.from_rows([], [])
+        started = time.perf_counter()
+        with psycopg.connect(database_url) as conn:
+            cur = conn.execute(RECENT_EXPENSES_SQL, (int(telegram_user_id),))
+            table = StatusTable.from_rows([column[0] for column in cur.description], cur.fetchall())
+        RECENT_QUERY.observe(started, len(table))
+        return table
+
+    def _search_rows(self, telegram_user_id: str | None, text: str, page: int) -> StatusTable:
+        """Run the ranked, user-scoped search template instead of generated SQL."""
+        database_url = os.environ.get("DATABASE_URL", "")
+        if not database_url or not telegram_user_id:
+            return StatusTable.from_rows(SEARCH_COLUMNS, [])
+        rows = search_expenses(database_url, int(telegram_user_id), text, page)
+        return StatusTable.from_rows(SEARCH_COLUMNS, rows)
+
+    def _to_table(self, results: List[tuple[List[str], List[tuple[Any, ...]]]]) -> StatusTable:
+        """Combine the queries' results; differently shaped results are merged by column name."""
+        if len({tuple(columns) for columns, _rows in results}) <= 1:
+            columns = results[0][0] if results else []
+            return StatusTable.from_rows(columns, [row for _columns, rows in results for row in rows])
+        return StatusTable.from_dicts(
+            dict(zip(columns, row)) for columns, rows in results for row in rows
+        )
 
     def _normalize_query(self, query: str) -> str:
         """Strip optional language prefixes so only SQL is executed."""
@@ -4,38 +4,50 @@ import os
 from datetime import date, datetime
 from decimal import Decimal
 from pathlib import Path
+from typing import Any
 from uuid import UUID
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
+from langgraph.config import get_config, get_stream_writer
+from langgraph.types import StreamWriter
 
 from src.schemas.post_and_render import RenderAndPostResponse
-from src.schemas.state import WorkflowState
+from src.schemas.state import StateUpdate, WorkflowState
+from src.schemas.status_table import StatusTable
+from src.tools.llm_gateway import FALLBACKS, LLM_ERRORS, get_chat_model
+from src.tools.structured_logging import log_state
+from src.tools.usage_ledger import over_budget
 
 PROMPT_PATH = Path(__file__).resolve().parents[1] / "prompts" / "post_and_render.md"
 PROMPT = PROMPT_PATH.read_text(encoding="utf-8").strip()
 
+# Status rows listed in replies; larger results are described by their totals
+STATUS_ROWS_LISTED = 20
+
 
 class RenderAndPost:
     """Renders a response and posts it back to the user."""
 
-    def __call__(self, state: WorkflowState) -> WorkflowState:
+    def __call__(self, state: WorkflowState) -> StateUpdate:
         """Run the node.
 
         Args:
             state: Current workflow state.
 
         Returns:
-            Updated workflow state.
+            The fields this node changed.
         """
-        logging.info("RenderAndPost input state=%s", state)
+        log_state("RenderAndPost input", state)
         return self._render(state)
 
-    def _render(self, state: WorkflowState) -> WorkflowState:
+    def _render(self, state: WorkflowState) -> StateUpdate:
         """Render the response using an LLM with structured output."""
+        if over_budget(state.telegram_user_id, "render_and_post"):
+            return {"response_text": self._template_reply(state)}
+
         formatted_state = self._format_state_for_prompt(state)
         llm = self._get_llm()
-        llm_with_structure = llm.with_structured_output(RenderAndPostResponse)
 
         prompt = ChatPromptTemplate.from_messages(
             [
@@ -43,21 +55,106 @@ class RenderAndPost:
                 ("human", "State:\n{state_json}"),
             ]
         )
-        chain = prompt | llm_with_structure
-        result = chain.invoke({"state_json": formatted_state})
+        writer = self._token_writer()
+        try:
+            if writer is not None:
+                result = self._render_streaming(prompt | llm, formatted_state, writer)
+            else:
+                chain = prompt | llm.with_structured_output(RenderAndPostResponse)
+                result = chain.invoke({"state_json": formatted_state})
+        except LLM_ERRORS:
+            logging.warning("RenderAndPost LLM unavailable; using template reply", exc_info=True)
+            FALLBACKS.labels("render_and_post").inc()
+            result = RenderAndPostResponse(response_text=self._template_reply(state))
 
         logging.info("RenderAndPost response_text length=%s", len(result.response_text))
-        return state.model_copy(update={"response_text": result.response_text})
+        return {"response_text": result.response_text}
+
+    def _render_streaming(
+        self, chain: object, formatted_state: str, writer: StreamWriter
+    ) -> RenderAndPostResponse:
+        """Stream the reply as plain text, emitting each token as a custom event."""
+        parts: list[str] = []
+        for chunk in chain.stream({"state_json": formatted_state}):
+            delta = chunk.content if isinstance(chunk.content, str) else ""
+            if delta:
+                parts.append(delta)
+                writer({"response_text_delta": delta})
+        return RenderAndPostResponse(response_text="".join(parts).strip())
+
+    def _token_writer(self) -> StreamWriter | None:
+        """Return the graph stream writer when the run asked for token streaming."""
+        try:
+            config = get_config()
+        except RuntimeError:
+            return None
+        if not config.get("configurable", {}).get("stream_tokens"):
+            return None
+        return get_stream_writer()
 
     def _get_llm(self) -> ChatOpenAI:
         """Create the chat model for rendering."""
         model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
-        api_key = os.environ.get("OPENAI_API_KEY")
-        return ChatOpenAI(model=model, api_key=api_key)
+        return get_chat_model(model, "render_and_post")
+
+    def _template_reply(self, state: WorkflowState) -> str:
+        """Build a plain reply from the state without the LLM."""
+        if state.batch_results is not None:
+            saved = sum(1 for row in state.batch_results if row.get("expense_id"))
+            lines = [f"✅ {saved} of {len(state.batch_results)} receipts saved:"]
+            for row in state.batch_results:
+                if row.get("expense_id"):
+                    lines.append(
+                        f"• {row.get('merchant_name') or 'Receipt'}: "
+                        f"{row.get('total')} {row.get('currency') or ''} (id {row['expense_id']})".rstrip()
+                    )
+                else:
+                    lines.append(f"• {row.get('file_id')}: could not be saved")
+            return "\n".join(lines)
+        if state.status_rows is not None:
+            table = state.status_rows
+            if not table:
+                return "No expenses found."
+            lines = ["Your recent expenses:"]
+            for row in table.rows(STATUS_ROWS_LISTED):
+                lines.append(
+                    f"• {self._json_default(row.get('expense_date'))} "
+                    f"{self._json_default(row.get('total'))} {row.get('currency') or ''} "
+                    f"{row.get('status') or ''}".rstrip()
+                )
+            if len(table) > STATUS_ROWS_LISTED:
+                lines.append(f"…and {len(table) - STATUS_ROWS_LISTED} more. Totals:")
+                for group in table.summarize():
+                    label = " ".join(str(group[key]) for key in ("status", "currency") if group.get(key))
+                    amount = f", {group['total']}" if "total" in group else ""
+                    lines.append(f"• {label or 'all'}: {group['count']}{amount}")
+            return "\n".join(lines)
+        if state.expense_id:
+            receipt = state.receipt_json or {}
+            return (
+                f"✅ Expense saved: {receipt.get('merchant_name') or 'receipt'} "
+                f"{receipt.get('total')} {receipt.get('currency') or ''}".rstrip()
+                + f" (id {state.expense_id})"
+            )
+        if state.file_id and state.receipt_json is None:
+            return "⚠️ I couldn't read your receipt right now. Please send it again in a few minutes."
+        return "⚠️ I'm having trouble answering right now. Please try again in a few minutes."
 
     def _format_state_for_prompt(self, state: WorkflowState) -> str:
         """Format the workflow state for prompt consumption."""
-        payload = state.model_dump()
+        # Run bookkeeping is not something the reply should talk about
+        payload = state.model_dump(
+            exclude={
+                "user_id",
+                "previous_receipt",
+                "hops",
+                "action_history",
+                "node_timings",
+                "status_rows",
+            }
+        )
+        if state.status_rows is not None:
+            payload["status_rows"] = self._status_summary(state.status_rows)
         return json.dumps(
             payload,
             indent=2,
@@ -65,6 +162,20 @@ class RenderAndPost:
             default=self._json_default,
         )
 
+    def _status_summary(self, table: StatusTable) -> dict[str, Any]:
+        """Row count, totals per status and currency, and the first rows of a status result."""
+        summary: dict[str, Any] = {
+            "count": len(table),
+            "totals": table.summarize(),
+            "rows": list(table.rows(STATUS_ROWS_LISTED)),
+        }
+        dates = table.date_range()
+        if dates is not None:
+            summary["date_range"] = list(dates)
+        if len(table) > STATUS_ROWS_LISTED:
+            summary["rows_omitted"] = len(table) - STATUS_ROWS_LISTED
+        return summary
+
     def _json_default(self, value: object) -> str | list[object]:
         """Coerce non-JSON types into prompt-safe representations."""
         if isinstance(value, (datetime, date)):
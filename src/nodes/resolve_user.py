@@ -0,0 +1,51 @@
+import logging
+import os
+import time
+
+import psycopg
+
+from src.db.metrics import QueryMetrics
+from src.nodes.upsert_expense import UPSERT_USER_SQL, user_params
+from src.schemas.state import StateUpdate, WorkflowState
+
+RESOLVE_QUERY = QueryMetrics("resolve_user")
+
+
+class ResolveUser:
+    """Upserts the requesting user and records users.id ahead of the expense write."""
+
+    def __call__(self, state: WorkflowState) -> StateUpdate:
+        """Run the node.
+
+        Args:
+            state: Current workflow state.
+
+        Returns:
+            The fields this node changed.
+        """
+        logging.info("ResolveUser telegram_user_id=%s", state.telegram_user_id)
+        return self._resolve(state)
+
+    def _resolve(self, state: WorkflowState) -> StateUpdate:
+        """Upsert the user row and return its id."""
+        database_url = os.environ.get("DATABASE_URL", "")
+        if not database_url or not state.telegram_user_id:
+            return {}
+
+        # Best effort: upsert_expense resolves the user itself when this fails
+        try:
+            started = time.perf_counter()
+            with psycopg.connect(database_url) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(UPSERT_USER_SQL, user_params(state))
+                    row = cur.fetchone()
+            RESOLVE_QUERY.observe(started, 1 if row else 0)
+        except Exception:
+            logging.warning(
+                "ResolveUser failed for telegram_user_id=%s", state.telegram_user_id, exc_info=True
+            )
+            return {}
+
+        if not row:
+            return {}
+        return {"user_id": str(row[0])}
@@ -1,39 +1,164 @@
 import logging
 import os
+import time
 from decimal import Decimal, InvalidOperation
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import psycopg
 
-from src.schemas.state import WorkflowState
+from src.db.metrics import QueryMetrics
+from src.schemas.state import StateUpdate, WorkflowState
+from src.tools.structured_logging import log_state
+
+UPSERT_QUERY = QueryMetrics("upsert_expense")
+UPSERT_MANY_QUERY = QueryMetrics("upsert_expenses_batch")
+
+INSERT_EXPENSE_SQL = """
+INSERT INTO expenses (
+    user_id,
+    status,
+    total,
+    currency,
+    description,
+    concept,
+    expense_date,
+    file_id
+)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+RETURNING id
+"""
+
+
+UPSERT_USER_SQL = """
+INSERT INTO users (telegram_user_id, username, first_name, last_name)
+VALUES (%s, %s, %s, %s)
+ON CONFLICT (telegram_user_id) DO UPDATE
+SET username = EXCLUDED.username,
+    first_name = EXCLUDED.first_name,
+    last_name = EXCLUDED.last_name
+RETURNING id
+"""
+
+
+def user_params(state: WorkflowState) -> Tuple[Any, ...]:
+    """Order user values to match UPSERT_USER_SQL."""
+    return (
+        int(state.telegram_user_id),
+        state.username,
+        state.first_name,
+        state.last_name,
+    )
 
 
 class UpsertExpense:
     """Creates or updates an expense record in the system of record."""
 
-    def __call__(self, state: WorkflowState) -> WorkflowState:
+    def __call__(self, state: WorkflowState) -> StateUpdate:
         """Run the node.
 
         Args:
             state: Current workflow state.
 
         Returns:
-            Updated workflow state.
+            The fields this node changed.
+        """
+        log_state("UpsertExpense input", state)
+        update = self._upsert(state)
+        if update.get("expense_id"):
+            update["previous_receipt"] = {
+                "receipt_json": state.receipt_json,
+                "expense_id": update["expense_id"],
+                "file_id": state.file_id,
+            }
+        return update
+
+    def _upsert(self, state: WorkflowState) -> StateUpdate:
+        """Upsert receipt data into the database and return the new expense_id."""
+        values = self._prepare_expense(state)
+        if values is None:
+            return {}
+
+        database_url = os.environ.get("DATABASE_URL", "")
+        if not database_url:
+            logging.warning("DATABASE_URL not set; skipping expense upsert.")
+            return {}
+
+        started = time.perf_counter()
+        with psycopg.connect(database_url) as conn:
+            with conn.cursor() as cur:
+                # resolve_user may already have run in parallel with extraction
+                user_id = state.user_id or self._upsert_user(cur, state)
+                expense_id = self._upsert_expense(
+                    cur,
+                    user_id=user_id,
+                    expense_id=state.expense_id,
+                    **values,
+                )
+        UPSERT_QUERY.observe(started, 1)
+
+        return {"expense_id": expense_id}
+
+    def upsert_many(self, states: List[WorkflowState]) -> List[WorkflowState]:
+        """Write several receipts in a single transaction.
+
+        Users are upserted once each and new expenses are inserted with one
+        pipelined ``executemany``. States that fail validation are returned
+        unchanged.
+
+        Args:
+            states: Workflow states carrying extracted receipts.
+
+        Returns:
+            States in the same order, with expense_id set where written.
         """
-        logging.info("UpsertExpense input state=%s", state)
-        return self._upsert(state)
+        prepared = [(index, self._prepare_expense(state)) for index, state in enumerate(states)]
+        pending = [(index, values) for index, values in prepared if values is not None]
+        if not pending:
+            return list(states)
+
+        database_url = os.environ.get("DATABASE_URL", "")
+        if not database_url:
+            logging.warning("DATABASE_URL not set; skipping batched expense upsert.")
+            return list(states)
+
+        results = list(states)
+        started = time.perf_counter()
+        with psycopg.connect(database_url) as conn:
+            with conn.cursor() as cur:
+                user_ids: Dict[str, str] = {}
+                inserts: List[Tuple[int, Tuple[Any, ...]]] = []
+                for index, values in pending:
+                    state = states[index]
+                    if state.telegram_user_id not in user_ids:
+                        user_ids[state.telegram_user_id] = self._upsert_user(cur, state)
+                    user_id = user_ids[state.telegram_user_id]
+                    if state.expense_id:
+                        expense_id = self._upsert_expense(
+                            cur, user_id=user_id, expense_id=state.expense_id, **values
+                        )
+                        results[index] = state.model_copy(update={"expense_id": expense_id})
+                    else:
+                        inserts.append((index, self._insert_params(user_id, values)))
+
+                expense_ids = self._insert_expenses(cur, [params for _, params in inserts])
+                for (index, _params), expense_id in zip(inserts, expense_ids):
+                    results[index] = states[index].model_copy(update={"expense_id": expense_id})
 
-    def _upsert(self, state: WorkflowState) -> WorkflowState:
-        """Upsert receipt data into the database and return updated state."""
+        UPSERT_MANY_QUERY.observe(started, len(pending))
+        logging.info("UpsertExpense wrote %s expenses in one transaction", len(pending))
+        return results
+
+    def _prepare_expense(self, state: WorkflowState) -> Optional[Dict[str, Any]]:
+        """Validate receipt data and build expense column values, or None to skip."""
         if not state.receipt_json:
             logging.info("UpsertExpense skipping: missing receipt_json")
-            return state
+            return None
         if state.receipt_json.get("is_receipt") is False:
             logging.info("UpsertExpense skipping: receipt marked as invalid")
-            return state
+            return None
         if not state.telegram_user_id:
             logging.warning("UpsertExpense missing telegram_user_id; skipping DB write")
-            return state
+            return None
 
         total = self._coerce_decimal(state.receipt_json.get("total"))
         currency = self._normalize_currency(state.receipt_json.get("currency"))
@@ -46,54 +171,21 @@ class UpsertExpense:
                 currency,
                 expense_date,
             )
-            return state
-
-        database_url = os.environ.get("DATABASE_URL", "")
-        if not database_url:
-            logging.warning("DATABASE_URL not set; skipping expense upsert.")
-            return state
-
-        description = self._build_description(state.receipt_json)
-        concept = self._normalize_concept(state.receipt_json.get("category"))
-        status = state.receipt_json.get("status") or "pending"
-
-        with psycopg.connect(database_url) as conn:
-            with conn.cursor() as cur:
-                user_id = self._upsert_user(cur, state)
-                expense_id = self._upsert_expense(
-                    cur,
-                    user_id=user_id,
-                    expense_id=state.expense_id,
-                    status=status,
-                    total=total,
-                    currency=currency,
-                    description=description,
-                    concept=concept,
-                    expense_date=expense_date,
-                    file_id=state.file_id,
-                )
+            return None
 
-        return state.model_copy(update={"expense_id": expense_id})
+        return {
+            "status": state.receipt_json.get("status") or "pending",
+            "total": total,
+            "currency": currency,
+            "description": self._build_description(state.receipt_json),
+            "concept": self._normalize_concept(state.receipt_json.get("category")),
+            "expense_date": expense_date,
+            "file_id": state.file_id,
+        }
 
     def _upsert_user(self, cur: psycopg.Cursor[Any], state: WorkflowState) -> str:
         """Upsert the user row and return the user id."""
-        cur.execute(
-            """
-            INSERT INTO users (telegram_user_id, username, first_name, last_name)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (telegram_user_id) DO UPDATE
-            SET username = EXCLUDED.username,
-                first_name = EXCLUDED.first_name,
-                last_name = EXCLUDED.last_name
-            RETURNING id
-            """,
-            (
-                int(state.telegram_user_id),
-                state.username,
-                state.first_name,
-                state.last_name,
-            ),
-        )
+        cur.execute(UPSERT_USER_SQL, user_params(state))
         row = cur.fetchone()
         if not row:
             raise RuntimeError("Failed to upsert user record")
@@ -146,29 +238,18 @@ class UpsertExpense:
                 return str(row[0])
 
         cur.execute(
-            """
-            INSERT INTO expenses (
+            INSERT_EXPENSE_SQL,
+            self._insert_params(
                 user_id,
-                status,
-                total,
-                currency,
-                description,
-                concept,
-                expense_date,
-                file_id
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-            """,
-            (
-                user_id,
-                status,
-                total,
-                currency,
-                description,
-                concept,
-                expense_date,
-                file_id,
+                {
+                    "status": status,
+                    "total": total,
+                    "currency": currency,
+                    "description": description,
+                    "concept": concept,
+                    "expense_date": expense_date,
+                    "file_id": file_id,
+                },
             ),
         )
         row = cur.fetchone()
@@ -176,6 +257,34 @@ class UpsertExpense:
             raise RuntimeError("Failed to insert expense record")
         return str(row[0])
 
+    def _insert_expenses(
+        self, cur: psycopg.Cursor[Any], params_seq: List[Tuple[Any, ...]]
+    ) -> List[str]:
+        """Insert several expenses with one pipelined executemany."""
+        if not params_seq:
+            return []
+        cur.executemany(INSERT_EXPENSE_SQL, params_seq, returning=True)
+        expense_ids: List[str] = []
+        for _result in cur.results():
+            row = cur.fetchone()
+            if not row:
+                raise RuntimeError("Failed to insert expense record")
+            expense_ids.append(str(row[0]))
+        return expense_ids
+
+    def _insert_params(self, user_id: str, values: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Order expense values to match INSERT_EXPENSE_SQL."""
+        return (
+            user_id,
+            values["status"],
+            values["total"],
+            values["currency"],
+            values["description"],
+            values["concept"],
+            values["expense_date"],
+            values["file_id"],
+        )
+
     def _coerce_decimal(self, value: Any) -> Optional[Decimal]:
         """Convert receipt numeric fields to Decimal safely."""
         if value is None:
@@ -3,6 +3,27 @@ from typing import Literal
 from pydantic import BaseModel, Field
 
 
+class ReceiptUpdates(BaseModel):
+    """Corrections the user asked for on the receipt already in the conversation."""
+
+    merchant_name: str | None = Field(default=None, description="Corrected merchant name")
+    receipt_date: str | None = Field(default=None, description="Corrected date in YYYY-MM-DD format")
+    total: float | None = Field(default=None, description="Corrected total amount")
+    currency: str | None = Field(default=None, description="Corrected ISO 4217 code")
+    payment_method: str | None = Field(default=None, description="Corrected payment method")
+    category: Literal[
+        "alimentos",
+        "avion",
+        "estacionamiento",
+        "gasto de oficina",
+        "hotel",
+        "otros",
+        "profesional development",
+        "transporte",
+        "eventos",
+    ] | None = Field(default=None, description="Corrected expense concept")
+
+
 class AgentPlanResponse(BaseModel):
     """Structured response for agent planning."""
 
@@ -12,3 +33,7 @@ class AgentPlanResponse(BaseModel):
         "query_status",
         "render_and_post",
     ] = Field(description="Next workflow action to take")
+    receipt_updates: ReceiptUpdates | None = Field(
+        default=None,
+        description="Only the receipt fields the user_input corrects; null when nothing changes",
+    )
@@ -4,4 +4,9 @@ class QueryStatusResponse(BaseModel):
     """Structured response for query status."""
     queries: list[str] | None = Field(
         default=None, description="queries needed in order to retrieve the information need by the user."
-    )
\ No newline at end of file
+    )
+    search: str | None = Field(
+        default=None,
+        description="merchant or description words to find the user's expenses by, instead of queries",
+    )
+    search_page: int = Field(default=0, description="zero-based page of search results.")
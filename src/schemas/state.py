@@ -1,5 +1,47 @@
-from typing import Any
-from pydantic import BaseModel, Field
+import operator
+from typing import Annotated, Any
+
+from pydantic import BaseModel, Field, PlainSerializer, PlainValidator
+
+from src.schemas.status_table import StatusTable
+
+# What a node returns: only the fields it changed, merged into the graph state
+StateUpdate = dict[str, Any]
+
+
+def _shared_rows(value: Any) -> tuple[dict[str, Any], ...]:
+    """Keep a tuple of rows as is; convert other sequences (e.g. a checkpoint's lists) once."""
+    if type(value) is tuple:
+        return value
+    if not isinstance(value, (list, tuple)) or not all(isinstance(row, dict) for row in value):
+        raise ValueError("expected a sequence of row dicts")
+    return tuple(value)
+
+
+# LangGraph rebuilds the state model before every node and route, which
+# would copy and revalidate a list[dict] field row by row on each hop; an
+# immutable tuple of rows is passed through by reference instead.
+Rows = Annotated[
+    tuple[dict[str, Any], ...],
+    PlainValidator(_shared_rows, json_schema_input_type=list[dict[str, Any]]),
+    PlainSerializer(list, return_type=list[dict[str, Any]]),
+]
+
+
+def _status_table(value: Any) -> StatusTable:
+    """Keep a StatusTable as is; encode dict rows (e.g. an older checkpoint's) once."""
+    if isinstance(value, StatusTable):
+        return value
+    return StatusTable.from_dicts(_shared_rows(value))
+
+
+# Status results are columnar; they still dump as a list of row dicts
+StatusRows = Annotated[
+    StatusTable,
+    PlainValidator(_status_table, json_schema_input_type=list[dict[str, Any]]),
+    PlainSerializer(lambda table: list(table.rows()), return_type=list[dict[str, Any]]),
+]
+
 
 class WorkflowState(BaseModel):
     """Shared workflow state passed between nodes."""
@@ -36,13 +78,45 @@ class WorkflowState(BaseModel):
         default=None,
         description="Telegram file_id associated with an uploaded receipt or document.",
     )
+    user_id: str | None = Field(
+        default=None,
+        description="Internal users.id of the requesting user, resolved alongside extraction.",
+    )
     expense_id: str | None = Field(
         default=None,
         description="Identifier for the created or matched expense record.",
     )
-    status_rows: list[dict[str, Any]] | None = Field(
+    previous_receipt: dict[str, Any] | None = Field(
+        default=None,
+        description=(
+            "Last receipt saved in this chat (receipt_json, expense_id and file_id), "
+            "kept across turns so a follow-up message can correct it."
+        ),
+    )
+    receipt_updates: dict[str, Any] | None = Field(
+        default=None,
+        description="Corrections applied to receipt_json during the current turn.",
+    )
+    status_rows: StatusRows | None = Field(
         default=None,
-        description="Status rows from SQL DB used to build a response. Includes json non-serialisable types.",
+        description="Columnar status query result from the SQL DB used to build a response.",
+    )
+    batch_results: Rows | None = Field(
+        default=None,
+        description="Per-receipt outcomes when several receipts (an album) are processed together.",
+    )
+    hops: int = Field(
+        default=0,
+        description="Action nodes (everything but the planner) run in the current turn.",
+    )
+    action_history: list[str] = Field(
+        default_factory=list,
+        description="Actions run in the current turn, in order.",
+    )
+    # Parallel branches append concurrently, so entries are merged with a reducer
+    node_timings: Annotated[list[dict[str, Any]], operator.add] = Field(
+        default_factory=list,
+        description="Per-node trace of the current turn: node name and elapsed milliseconds.",
     )
     response_text: str | None = Field(
         default=None,
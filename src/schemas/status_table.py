@@ -0,0 +1,267 @@
+"""
+Columnar status query results.
+
+``QueryStatus`` results used to be one dict per row (UUID, Decimal and date
+objects, several hundred bytes a row) and every summary was a Python loop
+over them. A ``StatusTable`` keeps one column per result column instead:
+
+- money (``Decimal`` with at most 2 places): int64 cents
+- dates: int32 day ordinals
+- UUIDs: 16 packed bytes each
+- ``status``/``currency``/``concept``: uint16 codes into a category tuple
+- anything else: a tuple of the values
+
+Typed columns are immutable ``bytes`` read through ``memoryview.cast``, so
+the table is compact, shared by reference between graph nodes and
+serializable by the checkpointer. Grouped counts and sums run over the code
+and cents columns with ``map``/``compress``/``Counter`` (C loops, no Python
+bytecode per row) instead of touching row dicts.
+"""
+
+from __future__ import annotations
+
+import operator
+import sys
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from itertools import compress, repeat
+from math import prod
+from typing import Any, Callable, Iterable, Iterator, Sequence
+from uuid import UUID
+
+# Low-cardinality text columns stored as codes into a category tuple
+DICTIONARY_COLUMNS = frozenset({"status", "currency", "concept"})
+
+CENTS = "cents"
+DATE = "date"
+UUID_BYTES = "uuid"
+CODES = "codes"
+OBJECT = "object"
+
+_TYPECODES = {CENTS: "q", DATE: "i", CODES: "H"}
+_ITEMSIZES = {kind: array(typecode).itemsize for kind, typecode in _TYPECODES.items()}
+_HUNDRED = Decimal(100)
+# Offset of the low byte of each uint16 code in a column's bytes
+_LOW_BYTE = 0 if sys.byteorder == "little" else 1
+
+
+@dataclass(frozen=True, slots=True, repr=False)
+class StatusTable:
+    """Immutable columnar result set; build with ``from_rows`` or ``from_dicts``."""
+
+    columns: tuple[str, ...]
+    kinds: tuple[str, ...]
+    data: tuple[Any, ...]
+    categories: tuple[tuple[Any, ...] | None, ...]
+    length: int
+
+    def __post_init__(self) -> None:
+        # Checkpoints store tuples as lists; restore them so tables compare equal
+        object.__setattr__(self, "columns", tuple(self.columns))
+        object.__setattr__(self, "kinds", tuple(self.kinds))
+        object.__setattr__(
+            self, "data", tuple(column if isinstance(column, bytes) else tuple(column) for column in self.data)
+        )
+        object.__setattr__(
+            self, "categories", tuple(None if values is None else tuple(values) for values in self.categories)
+        )
+
+    @classmethod
+    def from_rows(cls, columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> StatusTable:
+        """Encode tuple rows (``cursor.fetchall()``) with the given column names."""
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        kinds, data, categories = [], [], []
+        for name, column in zip(columns, values):
+            kind, encoded, category = _encode(name, column)
+            kinds.append(kind)
+            data.append(encoded)
+            categories.append(category)
+        return cls(tuple(columns), tuple(kinds), tuple(data), tuple(categories), len(rows))
+
+    @classmethod
+    def from_dicts(cls, rows: Iterable[dict[str, Any]]) -> StatusTable:
+        """Encode dict rows; columns are the union of their keys, missing values None."""
+        rows = list(rows)
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        return cls.from_rows(columns, [tuple(map(row.get, columns)) for row in rows])
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __repr__(self) -> str:
+        return f"StatusTable(rows={self.length}, columns={self.columns})"
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        return self.rows()
+
+    def column(self, name: str) -> Sequence[Any]:
+        """Decoded values of one column."""
+        index = self.columns.index(name)
+        kind, data = self.kinds[index], self.data[index]
+        if kind == OBJECT:
+            return data
+        if kind == CENTS:
+            return [Decimal(cents).scaleb(-2) for cents in memoryview(data).cast("q")]
+        if kind == DATE:
+            return list(map(date.fromordinal, memoryview(data).cast("i")))
+        if kind == UUID_BYTES:
+            return [UUID(bytes=data[offset : offset + 16]) for offset in range(0, len(data), 16)]
+        return list(map(self.categories[index].__getitem__, memoryview(data).cast("H")))
+
+    def rows(self, limit: int | None = None) -> Iterator[dict[str, Any]]:
+        """Iterate rows as dicts (first ``limit`` only, when given)."""
+        if limit is not None and limit < self.length:
+            return self.head(limit).rows()
+        columns = [self.column(name) for name in self.columns]
+        return (dict(zip(self.columns, values)) for values in zip(*columns))
+
+    def head(self, count: int) -> StatusTable:
+        """The first ``count`` rows as a new table."""
+        count = min(count, self.length)
+        data = []
+        for kind, column in zip(self.kinds, self.data):
+            if kind == OBJECT:
+                data.append(column[:count])
+            elif kind == UUID_BYTES:
+                data.append(column[: 16 * count])
+            else:
+                data.append(column[: count * _ITEMSIZES[kind]])
+        return StatusTable(self.columns, self.kinds, tuple(data), self.categories, count)
+
+    def count_by(self, *group: str) -> dict[tuple[Any, ...], int]:
+        """Rows per distinct combination of the ``group`` columns."""
+        _keys, counts, decode = self._group_keys(group)
+        return {decode(key): count for key, count in counts.items()}
+
+    def sum_by(self, value: str, *group: str) -> dict[tuple[Any, ...], Decimal]:
+        """Sum of a money column per distinct combination of the ``group`` columns."""
+        keys, counts, decode = self._group_keys(group)
+        totals = self._sums(value, keys, counts)
+        return {decode(key): total for key, total in totals.items()}
+
+    def summarize(
+        self, group: Sequence[str] = ("status", "currency"), value: str = "total"
+    ) -> list[dict[str, Any]]:
+        """Count and money total per group, for the columns the table has, largest first."""
+        group = tuple(name for name in group if name in self.columns)
+        keys, counts, decode = self._group_keys(group)
+        has_totals = value in self.columns and self.kinds[self.columns.index(value)] == CENTS
+        totals = self._sums(value, keys, counts) if has_totals else {}
+        summary = []
+        for key, count in sorted(counts.items(), key=lambda item: -item[1]):
+            entry = dict(zip(group, decode(key)))
+            entry["count"] = count
+            if has_totals:
+                entry[value] = totals[key]
+            summary.append(entry)
+        return summary
+
+    def date_range(self, name: str = "expense_date") -> tuple[date, date] | None:
+        """Earliest and latest value of a date column."""
+        if name not in self.columns or not self.length:
+            return None
+        index = self.columns.index(name)
+        if self.kinds[index] != DATE:
+            return None
+        ordinals = memoryview(self.data[index]).cast("i")
+        return date.fromordinal(min(ordinals)), date.fromordinal(max(ordinals))
+
+    def _sums(self, value: str, keys: Sequence[Any], counts: dict[Any, int]) -> dict[Any, Decimal]:
+        """Money totals per group key.
+
+        With byte keys each group is one C pass: ``translate`` turns the keys
+        into a 0/1 selector and ``compress`` feeds the group's cents to ``sum``.
+        """
+        index = self.columns.index(value)
+        if self.kinds[index] != CENTS:
+            raise TypeError(f"column {value!r} is not a money column")
+        cents = memoryview(self.data[index]).cast("q").tolist()
+        if isinstance(keys, bytes):
+            totals = {key: sum(compress(cents, keys.translate(_selector(key)))) for key in counts}
+        else:
+            totals = dict.fromkeys(counts, 0)
+            for key, amount in zip(keys, cents):
+                totals[key] += amount
+        return {key: Decimal(total).scaleb(-2) for key, total in totals.items()}
+
+    def _group_keys(
+        self, group: Sequence[str]
+    ) -> tuple[Sequence[Any], dict[Any, int], Callable[[Any], tuple[Any, ...]]]:
+        """Per-row group keys, rows per key, and a decoder from key to column values.
+
+        When every group column is dictionary-encoded the key is one integer
+        combining the codes. Up to 256 combinations it is a byte: the codes'
+        low bytes are combined with ``translate`` and ``map`` over ``bytes``
+        and counting is ``bytes.count``. Otherwise ``map`` runs over the code
+        arrays and a ``Counter`` counts.
+        """
+        indexes = [self.columns.index(name) for name in group]
+        if any(self.kinds[index] != CODES for index in indexes):
+            keys = list(zip(*(self.column(name) for name in group)))
+            return keys, dict(Counter(keys)), lambda key: key
+
+        radixes = [len(self.categories[index]) for index in indexes]
+        combinations = prod(radixes)
+        if combinations <= 256:
+            keys = bytes(self.length)
+            for index, radix in zip(indexes, radixes):
+                codes = self.data[index][_LOW_BYTE::2]
+                keys = bytes(map(operator.add, keys.translate(_multiplier(radix)), codes))
+            counts = {key: count for key in range(combinations) if (count := keys.count(key))}
+        else:
+            combined: Iterable[int] = repeat(0, self.length)
+            for index, radix in zip(indexes, radixes):
+                codes = memoryview(self.data[index]).cast("H")
+                combined = map(operator.add, map(operator.mul, combined, repeat(radix)), codes)
+            keys = list(combined)
+            counts = dict(Counter(keys))
+        categories = [self.categories[index] for index in indexes]
+
+        def decode(key: int) -> tuple[Any, ...]:
+            codes = []
+            for radix in reversed(radixes):
+                key, code = divmod(key, radix)
+                codes.append(code)
+            return tuple(values[code] for values, code in zip(categories, reversed(codes)))
+
+        return keys, counts, decode
+
+
+def _multiplier(radix: int) -> bytes:
+    """Translation table multiplying each byte by ``radix`` (mod 256)."""
+    return bytes(code * radix & 0xFF for code in range(256))
+
+
+def _selector(key: int) -> bytes:
+    """Translation table mapping byte ``key`` to 1 and every other byte to 0."""
+    return bytes(key) + b"\x01" + bytes(255 - key)
+
+
+def _encode(name: str, values: Sequence[Any]) -> tuple[str, Any, tuple[Any, ...] | None]:
+    """Pick the most compact encoding the values allow."""
+    types = set(map(type, values))
+    if name in DICTIONARY_COLUMNS:
+        try:
+            categories = tuple(dict.fromkeys(values))
+        except TypeError:
+            categories = None
+        if categories is not None and len(categories) <= 0xFFFF:
+            index = {value: code for code, value in enumerate(categories)}
+            return CODES, array("H", map(index.__getitem__, values)).tobytes(), categories
+    if types == {Decimal}:
+        scaled = list(map(operator.mul, values, repeat(_HUNDRED)))
+        try:
+            cents = list(map(int, scaled))
+        except (ValueError, OverflowError):
+            cents = None  # NaN or infinity
+        # Only exact cents: AVG() and friends keep their precision as objects
+        if cents is not None and all(map(operator.eq, scaled, cents)):
+            return CENTS, array("q", cents).tobytes(), None
+    elif types == {date}:
+        return DATE, array("i", map(date.toordinal, values)).tobytes(), None
+    elif types == {UUID}:
+        return UUID_BYTES, b"".join(map(operator.attrgetter("bytes"), values)), None
+    return OBJECT, tuple(values), None
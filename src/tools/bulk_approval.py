@@ -0,0 +1,157 @@
+"""
+Bulk approvals: filters in plain words, previews and owner notices.
+
+Approvers send ``/approve`` or ``/reject`` with a filter such as
+``transporte under 500 MXN team ventas 2025-11``. The bot previews what
+matches and, once confirmed, moves those pending expenses in set-based
+batches (``src.db.expense_approval``). Each owner then gets one notice
+covering all of their changed expenses.
+"""
+
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, Sequence
+
+from src.db.expense_approval import ApprovalFilter, ChangedExpense
+from src.tools.expense_export import parse_period
+
+# Values of the expense_concept enum
+CONCEPTS = (
+    "alimentos",
+    "avion",
+    "estacionamiento",
+    "gasto de oficina",
+    "hotel",
+    "otros",
+    "profesional development",
+    "transporte",
+    "eventos",
+)
+
+# Command word per target status
+COMMANDS = {"approved": "approve", "not_approved": "reject"}
+
+USAGE = (
+    "Usage: /{command} [concept] [under AMOUNT] [CUR] [team NAME] [user ID] "
+    "[YYYY-MM | FROM TO]\nExample: /{command} transporte under 500 MXN team ventas 2025-11"
+)
+
+_CURRENCY = re.compile(r"^[a-z]{3}$")
+_FILLER = {"all", "pending", "expenses", "for"}
+
+
+def _amount(text: str) -> Decimal:
+    try:
+        return Decimal(text.replace(",", ""))
+    except InvalidOperation:
+        raise ValueError(f"not an amount: {text}") from None
+
+
+def parse_approval_args(args: Sequence[str], today: date) -> ApprovalFilter:
+    """Parse a bulk filter; every part is optional.
+
+    ``[concept] [under AMOUNT | <AMOUNT] [CUR] [team NAME] [user ID]
+    [YYYY-MM | FROM [TO] | FROM..TO]``. Without a period all dates match.
+
+    Raises:
+        ValueError: On a missing value, a bad amount or date, or extra words.
+    """
+    text = " ".join(args)
+    concept = None
+    for name in sorted(CONCEPTS, key=len, reverse=True):
+        match = re.search(rf"\b{re.escape(name)}\b", text, re.IGNORECASE)
+        if match:
+            concept = name
+            text = text[: match.start()] + text[match.end() :]
+            break
+
+    values: dict[str, object] = {"concept": concept}
+    period: list[str] = []
+    words = text.split()
+    try:
+        while words:
+            word = words.pop(0)
+            lowered = word.lower()
+            if lowered in _FILLER:
+                continue
+            if lowered in ("under", "below", "<"):
+                values["max_total"] = _amount(words.pop(0))
+            elif lowered.startswith("<"):
+                values["max_total"] = _amount(lowered[1:])
+            elif lowered == "team":
+                values["team"] = words.pop(0)
+            elif lowered == "user":
+                values["telegram_user_id"] = int(words.pop(0))
+            elif _CURRENCY.match(lowered):
+                values["currency"] = lowered.upper()
+            else:
+                period.append(lowered)
+    except IndexError:
+        raise ValueError(f"{word!r} needs a value") from None
+    if period:
+        values["start"], values["end"] = parse_period(period, today)
+    return ApprovalFilter(**values)
+
+
+def describe(selection: ApprovalFilter) -> str:
+    """One-line description of a filter, e.g. ``pending transporte expenses under 500 MXN``."""
+    parts = ["pending"]
+    if selection.concept:
+        parts.append(selection.concept)
+    parts.append("expenses")
+    if selection.max_total is not None:
+        parts.append(f"under {selection.max_total}")
+    if selection.currency:
+        in_currency = selection.max_total is None
+        parts.append(f"in {selection.currency}" if in_currency else selection.currency)
+    if selection.team:
+        parts.append(f"of team {selection.team}")
+    if selection.telegram_user_id is not None:
+        parts.append(f"of user {selection.telegram_user_id}")
+    if selection.start and selection.end:
+        parts.append(f"dated {selection.start} to {selection.end - timedelta(days=1)}")
+    return " ".join(parts)
+
+
+def _totals(amounts: Iterable[tuple[str, Decimal]]) -> str:
+    return ", ".join(f"{currency} {total:,.2f}" for currency, total in amounts)
+
+
+def format_preview(
+    selection: ApprovalFilter, preview: Sequence[tuple[str, int, Decimal]], new_status: str
+) -> str:
+    """Text shown above the confirm/cancel keyboard."""
+    count = sum(expenses for _currency, expenses, _total in preview)
+    if not count:
+        return f"No {describe(selection)}."
+    action = COMMANDS[new_status].capitalize()
+    totals = _totals((currency, total) for currency, _expenses, total in preview)
+    return f"{action} {count} {describe(selection)}?\nTotal: {totals}"
+
+
+def notification_messages(
+    changed: Iterable[ChangedExpense], new_status: str
+) -> list[tuple[int, str]]:
+    """One ``(chat_id, text)`` notice per owner of changed expenses."""
+    counts: dict[int, int] = defaultdict(int)
+    totals: dict[int, dict[str, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+    for expense in changed:
+        counts[expense.telegram_user_id] += 1
+        totals[expense.telegram_user_id][expense.currency] += expense.total
+    if new_status == "approved":
+        template = "✅ {count} of your pending expenses {verb} approved ({totals})."
+    else:
+        template = "❌ {count} of your pending expenses {verb} not approved ({totals})."
+    return [
+        (
+            user,
+            template.format(
+                count=count,
+                verb="was" if count == 1 else "were",
+                totals=_totals(totals[user].items()),
+            ),
+        )
+        for user, count in counts.items()
+    ]
@@ -0,0 +1,371 @@
+"""
+Expense exports as CSV or XLSX, plus an optional zip of the receipts.
+
+Rows stream from Postgres (``src.db.expense_export``) straight into the
+file, so memory stays flat for any date range:
+
+- CSV is rendered by Postgres with ``COPY ... TO STDOUT``
+- XLSX is written cell by cell into the worksheet entry of the zip with
+  the standard library (inline strings, no shared-string table)
+- receipts are downloaded from MinIO a few at a time and stored in a zip
+
+Used by the bot's ``/export`` command and as a CLI.
+
+Usage:
+    uv run python src/tools/expense_export.py 2025-11 --format xlsx --out november.xlsx
+    uv run python src/tools/expense_export.py 2025-10-01 2025-12-31 --receipts receipts.zip
+"""
+
+import argparse
+import calendar
+import logging
+import os
+import re
+import sys
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, BinaryIO, Iterable, Iterator, NamedTuple, Sequence
+from xml.sax.saxutils import escape
+
+from minio import Minio
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.db.expense_export import EXPORT_COLUMNS, copy_expenses_csv, iter_expenses
+from src.tools.minio_storage import get_minio_client, read_object
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "xlsx")
+
+# Telegram's upload limit for bots
+MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+
+RECEIPT_CONCURRENCY = 4
+
+_MONTH = re.compile(r"^\d{4}-\d{2}$")
+_EXCEL_EPOCH = date(1899, 12, 30).toordinal()
+# Characters XML 1.0 does not allow, even escaped
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_RECEIPT_COLUMN = EXPORT_COLUMNS.index("receipt_object")
+
+
+class ExportRequest(NamedTuple):
+    """What to export: ``start <= expense_date < end`` in ``fmt``."""
+
+    start: date
+    end: date
+    fmt: str = "csv"
+    receipts: bool = False
+
+    @property
+    def stem(self) -> str:
+        last = self.end - timedelta(days=1)
+        whole_month = self.start.day == 1 and self.end.day == 1
+        if whole_month and (last.year, last.month) == (self.start.year, self.start.month):
+            return f"expenses_{self.start:%Y-%m}"
+        return f"expenses_{self.start.isoformat()}_{last.isoformat()}"
+
+
+def _month(text: str) -> tuple[date, date]:
+    year, month = map(int, text.split("-"))
+    start = date(year, month, 1)
+    return start, start + timedelta(days=calendar.monthrange(year, month)[1])
+
+
+def parse_period(words: Sequence[str], today: date) -> tuple[date, date]:
+    """Parse ``YYYY-MM``, ``FROM [TO]`` or ``FROM..TO`` into ``(start, end)``.
+
+    ``TO`` is inclusive and ``end`` is the first day after it; without
+    words the current month is returned.
+
+    Raises:
+        ValueError: On a bad date, extra words or an empty range.
+    """
+    period = [part for word in words for part in word.split("..") if part]
+    if not period:
+        start, end = _month(f"{today:%Y-%m}")
+    elif len(period) == 1 and _MONTH.match(period[0]):
+        start, end = _month(period[0])
+    elif len(period) <= 2:
+        start = date.fromisoformat(period[0])
+        end = date.fromisoformat(period[-1]) + timedelta(days=1)
+    else:
+        raise ValueError(f"unexpected arguments: {' '.join(words)}")
+    if end <= start:
+        raise ValueError("the range ends before it starts")
+    return start, end
+
+
+def parse_export_args(args: Sequence[str], today: date) -> ExportRequest:
+    """Parse ``[YYYY-MM | FROM [TO] | FROM..TO] [csv|xlsx] [receipts]``.
+
+    Without a period the current month is exported; ``TO`` is inclusive.
+
+    Raises:
+        ValueError: On an unknown word, a bad date or an empty range.
+    """
+    fmt, receipts, period = "csv", False, []
+    for arg in args:
+        word = arg.lower()
+        if word in FORMATS:
+            fmt = word
+        elif word == "receipts":
+            receipts = True
+        else:
+            period.append(word)
+    start, end = parse_period(period, today)
+    return ExportRequest(start, end, fmt, receipts)
+
+
+# ==================== XLSX ====================
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+
+_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Expenses" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# Cell styles: 0 default, 1 date (built-in format 14), 2 money (built-in format 4)
+_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+</cellXfs>
+</styleSheet>"""
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    "</sheetView></sheetViews><sheetData>"
+)
+_SHEET_END = "</sheetData></worksheet>"
+
+# Worksheet XML is buffered to about this many characters per write
+_XLSX_FLUSH_CHARS = 256 * 1024
+
+
+def _text_cell(value: str, style: int = 0) -> str:
+    text = escape(_XML_ILLEGAL.sub("", value))
+    style_attr = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, Decimal):
+        return f'<c s="2"><v>{value}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, date):
+        return f'<c s="1"><v>{value.toordinal() - _EXCEL_EPOCH}</v></c>'
+    return _text_cell(str(value))
+
+
+def write_xlsx(out: BinaryIO, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    """Write a one-sheet workbook with a bold header row, streaming ``rows``.
+
+    Returns:
+        Data rows written.
+    """
+    count = 0
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _WORKBOOK)
+        archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        archive.writestr("xl/styles.xml", _STYLES)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            header = "".join(_text_cell(name, style=3) for name in columns)
+            chunk = [_SHEET_START, f"<row>{header}</row>"]
+            size = 0
+            for row in rows:
+                xml = "<row>" + "".join(map(_cell, row)) + "</row>"
+                chunk.append(xml)
+                size += len(xml)
+                count += 1
+                if size >= _XLSX_FLUSH_CHARS:
+                    sheet.write("".join(chunk).encode())
+                    chunk, size = [], 0
+            chunk.append(_SHEET_END)
+            sheet.write("".join(chunk).encode())
+    return count
+
+
+# ==================== RECEIPTS ====================
+
+def write_receipts_zip(
+    client: Minio,
+    bucket: str,
+    object_names: Iterable[str],
+    out: BinaryIO,
+    concurrency: int = RECEIPT_CONCURRENCY,
+) -> int:
+    """Download receipt objects into a zip, ``concurrency`` at a time.
+
+    At most ``concurrency`` objects are held in memory; entries keep the
+    object names and are stored uncompressed (images and PDFs already are).
+
+    Returns:
+        Receipts written.
+    """
+    count = 0
+    with (
+        zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as archive,
+        ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="export-receipts") as pool,
+    ):
+        pending: deque[tuple[str, Future[bytes]]] = deque()
+
+        def drain(limit: int) -> None:
+            nonlocal count
+            while len(pending) > limit:
+                name, future = pending.popleft()
+                archive.writestr(name, future.result())
+                count += 1
+
+        for object_name in object_names:
+            pending.append((object_name, pool.submit(read_object, client, bucket, object_name)))
+            drain(concurrency - 1)
+        drain(0)
+    return count
+
+
+def receipt_objects(rows: Iterable[Sequence[Any]]) -> Iterator[str]:
+    """Distinct receipt object names of export rows, in row order."""
+    seen: set[str] = set()
+    for row in rows:
+        object_name = row[_RECEIPT_COLUMN]
+        if object_name and object_name not in seen:
+            seen.add(object_name)
+            yield object_name
+
+
+# ==================== EXPORTS ====================
+
+def write_export(
+    database_url: str,
+    directory: Path,
+    request: ExportRequest,
+    telegram_user_id: int | None = None,
+) -> Path:
+    """Write the export file for ``request`` into ``directory``.
+
+    Args:
+        database_url: Postgres connection string.
+        directory: Where the file is created.
+        request: Period and format.
+        telegram_user_id: Only this user's expenses; all users when None.
+
+    Returns:
+        Path of the written file.
+    """
+    path = directory / f"{request.stem}.{request.fmt}"
+    with path.open("wb") as out:
+        if request.fmt == "xlsx":
+            rows = iter_expenses(database_url, request.start, request.end, telegram_user_id)
+            write_xlsx(out, EXPORT_COLUMNS, rows)
+        else:
+            copy_expenses_csv(database_url, out, request.start, request.end, telegram_user_id)
+    return path
+
+
+def write_receipts(
+    database_url: str,
+    client: Minio,
+    bucket: str,
+    directory: Path,
+    request: ExportRequest,
+    telegram_user_id: int | None = None,
+    concurrency: int = RECEIPT_CONCURRENCY,
+) -> tuple[Path, int]:
+    """Write a zip of the receipts referenced by the export rows.
+
+    Returns:
+        Path of the zip and the number of receipts in it.
+    """
+    path = directory / f"{request.stem}_receipts.zip"
+    rows = iter_expenses(database_url, request.start, request.end, telegram_user_id)
+    with path.open("wb") as out:
+        count = write_receipts_zip(client, bucket, receipt_objects(rows), out, concurrency)
+    return path, count
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Export expenses as CSV or XLSX")
+    parser.add_argument(
+        "period", nargs="*", help="YYYY-MM, FROM [TO] or FROM..TO (default: this month)"
+    )
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--user", type=int, help="Only this Telegram user's expenses")
+    parser.add_argument(
+        "--out", type=Path, help="Output directory or file (default: current directory)"
+    )
+    parser.add_argument("--receipts", type=Path, help="Also write a zip of the receipts here")
+    parser.add_argument("--concurrency", type=int, default=RECEIPT_CONCURRENCY)
+    args = parser.parse_args()
+
+    database_url = os.environ.get("DATABASE_URL", "")
+    if not database_url:
+        parser.error("DATABASE_URL is required")
+    try:
+        export = parse_export_args([*args.period, args.format], date.today())
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    out = args.out or Path.cwd()
+    directory = out if out.is_dir() else out.parent
+    written = write_export(database_url, directory, export, args.user)
+    if not out.is_dir():
+        written = written.replace(out)
+    print(f"{written} {written.stat().st_size} bytes")
+
+    if args.receipts:
+        minio_client, bucket_name = get_minio_client()
+        zip_path, receipts = write_receipts(
+            database_url,
+            minio_client,
+            bucket_name,
+            args.receipts.parent,
+            export,
+            args.user,
+            args.concurrency,
+        )
+        zip_path = zip_path.replace(args.receipts)
+        print(f"{zip_path} {receipts} receipts")
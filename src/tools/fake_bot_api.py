@@ -0,0 +1,228 @@
+"""
+Telegram Bot API stand-in that enforces flood limits, for rate-limiter tests.
+
+Serves ``POST /bot<token>/<method>`` for ``getMe``, ``sendMessage``,
+``editMessageText`` and ``answerCallbackQuery`` (form or JSON bodies, as
+python-telegram-bot sends them). Requests over ``global_per_second`` or a
+chat's ``chat_per_second`` in any one-second window are answered like
+Telegram does: 429 with ``parameters.retry_after``. Every accepted request
+is recorded in ``delivered`` with its arrival time.
+
+Usage:
+    uv run python src/tools/fake_bot_api.py --port 8091 --global-per-second 30
+    # ExtBot(token, base_url="http://127.0.0.1:8091/bot")
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, NamedTuple
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+
+class Delivered(NamedTuple):
+    """One accepted Bot API request."""
+
+    at: float
+    method: str
+    chat_id: int | str | None
+    text: str | None
+
+
+def _chat_id(value: Any) -> int | str | None:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class FakeBotAPIServer:
+    """Threaded Bot API server with sliding-window flood limits."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        global_per_second: int = 30,
+        chat_per_second: int = 1,
+        retry_after: int = 1,
+    ) -> None:
+        """Bind the server (``port=0`` picks a free port).
+
+        Args:
+            host: Interface to bind.
+            port: Port to bind.
+            global_per_second: Requests accepted in any one-second window.
+            chat_per_second: Requests accepted per chat in any one-second window.
+            retry_after: Seconds asked for in 429 answers.
+        """
+        self.global_per_second = global_per_second
+        self.chat_per_second = chat_per_second
+        self.retry_after = retry_after
+        self.delivered: list[Delivered] = []
+        self.rejected = 0
+        self._throttled: dict[Any, int] = defaultdict(int)
+        self._window: deque[float] = deque()
+        self._chat_windows: dict[Any, deque[float]] = defaultdict(deque)
+        self._message_ids: dict[Any, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._httpd.block_on_close = False
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to pass as ``ExtBot(base_url=...)``."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def start(self) -> FakeBotAPIServer:
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread until interrupted."""
+        self._httpd.serve_forever()
+
+    def close(self) -> None:
+        """Stop serving and release the port."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> FakeBotAPIServer:
+        return self.start()
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def throttle(self, chat_id: int | str, times: int = 1) -> None:
+        """Answer the chat's next ``times`` requests with 429."""
+        with self._lock:
+            self._throttled[chat_id] += times
+
+    def sent_to(self, chat_id: int | str, method: str = "sendMessage") -> list[Delivered]:
+        """Accepted ``method`` requests for one chat, in arrival order."""
+        with self._lock:
+            return [
+                item for item in self.delivered if item.chat_id == chat_id and item.method == method
+            ]
+
+    def respond(self, method: str, params: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+        """Decide the status and payload of one request."""
+        chat_id = _chat_id(params.get("chat_id"))
+        now = time.monotonic()
+        with self._lock:
+            if chat_id is not None and self._over_limit(chat_id, now):
+                self.rejected += 1
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+            text = params.get("text")
+            self.delivered.append(Delivered(now, method, chat_id, text))
+            if method == "getMe":
+                return 200, {"ok": True, "result": BOT_USER}
+            if method == "answerCallbackQuery":
+                return 200, {"ok": True, "result": True}
+            if method == "sendMessage":
+                self._message_ids[chat_id] += 1
+                message_id = self._message_ids[chat_id]
+            elif method == "editMessageText":
+                message_id = int(params.get("message_id") or 0)
+            else:
+                return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+        private = isinstance(chat_id, int) and chat_id > 0
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if private else "group"},
+            "from": BOT_USER,
+            "text": text,
+        }
+        return 200, {"ok": True, "result": message}
+
+    def _over_limit(self, chat_id: Any, now: float) -> bool:
+        if self._throttled.get(chat_id):
+            self._throttled[chat_id] -= 1
+            return True
+        chat_window = self._chat_windows[chat_id]
+        for window in (self._window, chat_window):
+            while window and window[0] <= now - 1.0:
+                window.popleft()
+        if len(self._window) >= self.global_per_second or len(chat_window) >= self.chat_per_second:
+            return True
+        self._window.append(now)
+        chat_window.append(now)
+        return False
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    params = json.loads(raw or b"{}")
+                else:
+                    params = dict(parse_qsl(raw.decode()))
+                method = self.path.rstrip("/").rsplit("/", 1)[-1]
+                status, payload = server.respond(method, params)
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except OSError:
+                    pass
+
+            def log_message(self, *_args: object) -> None:
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server with flood limits")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--global-per-second", type=int, default=30)
+    parser.add_argument("--chat-per-second", type=int, default=1)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fake = FakeBotAPIServer(
+        args.host,
+        args.port,
+        global_per_second=args.global_per_second,
+        chat_per_second=args.chat_per_second,
+        retry_after=args.retry_after,
+    )
+    logger.info("Fake Bot API serving on %s", fake.base_url)
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake._httpd.server_close()
@@ -0,0 +1,389 @@
+"""
+OpenAI-compatible stand-in for load tests and offline runs.
+
+Serves ``POST /v1/chat/completions`` with schema-valid answers for the
+bot's structured outputs (``AgentPlanResponse``, ``QueryStatusResponse``,
+``Receipt`` and ``RenderAndPostResponse``), whether the client asks for
+``json_schema`` output, function calling or a plain/streamed text reply.
+The planner answer follows the routing rules of the planner prompt, so a
+graph run takes the same path it would with the real model.
+
+Latency is sampled per answer kind (``agent_plan``, ``query_status``,
+``receipt``, ``render``) from ``fixed:S``, ``uniform:LOW,HIGH``,
+``lognormal:MEDIAN,SIGMA`` or ``normal:MEAN,SD``. A fraction of requests
+can be answered with 429/500 to exercise the LLM gateway.
+
+Usage:
+    uv run python src/tools/fake_llm.py --port 8089 --latency agent_plan=lognormal:0.8,0.4 \\
+        --latency receipt=lognormal:2.5,0.3
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 uv run python app.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Structured output schema name -> latency/answer kind
+SCHEMA_KINDS = {
+    "AgentPlanResponse": "agent_plan",
+    "QueryStatusResponse": "query_status",
+    "Receipt": "receipt",
+    "RenderAndPostResponse": "render",
+}
+
+STATUS_WORDS = ("status", "history", "pending", "approved", "estado", "historial", "pendiente")
+
+MERCHANTS = (
+    ("Uber", "MXN"),
+    ("Starbucks", "MXN"),
+    ("Hotel Camino Real", "MXN"),
+    ("Aeromexico", "USD"),
+    ("OfficeMax", "MXN"),
+)
+
+_STATE_JSON = re.compile(r"State:\s*(\{.*\})\s*$", re.DOTALL)
+
+
+class Latency(NamedTuple):
+    """Latency distribution in seconds."""
+
+    kind: str
+    params: tuple[float, ...]
+
+    @classmethod
+    def parse(cls, spec: str) -> Latency:
+        """Parse ``fixed:S``, ``uniform:LOW,HIGH``, ``lognormal:MEDIAN,SIGMA`` or ``normal:MEAN,SD``."""
+        kind, _, raw = spec.partition(":")
+        params = tuple(float(value) for value in raw.split(",") if value)
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2, "normal": 2}
+        if expected.get(kind) != len(params):
+            raise ValueError(f"Invalid latency spec: {spec}")
+        return cls(kind, params)
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw one latency."""
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return max(0.0, rng.gauss(*self.params))
+
+
+NO_LATENCY = Latency("fixed", (0.0,))
+
+
+def answer_kind(body: dict[str, Any]) -> tuple[str, str | None]:
+    """Return (kind, schema name) for a chat completion request."""
+    response_format = body.get("response_format") or {}
+    schema = (response_format.get("json_schema") or {}).get("name")
+    if schema is None and body.get("tools"):
+        schema = body["tools"][0]["function"]["name"]
+    return SCHEMA_KINDS.get(schema, "render"), schema
+
+
+def prompt_state(body: dict[str, Any]) -> dict[str, Any]:
+    """Return the JSON state the nodes append to their last message, if any."""
+    content = (body.get("messages") or [{}])[-1].get("content")
+    if not isinstance(content, str):
+        return {}
+    match = _STATE_JSON.search(content)
+    if not match:
+        return {}
+    try:
+        return json.loads(match.group(1))
+    except ValueError:
+        return {}
+
+
+def plan(state: dict[str, Any]) -> dict[str, Any]:
+    """Apply the planner prompt's routing rules to its state payload."""
+    if state.get("file_id") and not state.get("receipt_json_present"):
+        action = "extract_receipt"
+    elif state.get("receipt_json_present") and not state.get("expense_id"):
+        action = "upsert_expense"
+    elif state.get("status_rows_count") == 0 and any(
+        word in (state.get("user_input") or "").lower() for word in STATUS_WORDS
+    ):
+        action = "query_status"
+    else:
+        action = "render_and_post"
+    return {"next_action": action, "receipt_updates": None}
+
+
+def query(state: dict[str, Any]) -> dict[str, Any]:
+    """Search for ``find ...`` messages, else return the user's latest expenses."""
+    words = (state.get("user_input") or "").split(maxsplit=1)
+    if len(words) == 2 and words[0].lower() in ("find", "buscar"):
+        return {"queries": None, "search": words[1], "search_page": 0}
+    user_id = int(state.get("telegram_user_id") or 0)
+    return {
+        "queries": [
+            "SELECT e.id, e.status, e.total, e.currency, e.expense_date "
+            "FROM expenses e JOIN users u ON u.id = e.user_id "
+            f"WHERE u.telegram_user_id = {user_id} "
+            "ORDER BY e.expense_date DESC LIMIT 10"
+        ]
+    }
+
+
+def receipt(rng: random.Random) -> dict[str, Any]:
+    """Return a plausible, valid receipt."""
+    merchant, currency = rng.choice(MERCHANTS)
+    total = round(rng.uniform(50, 2500), 2)
+    return {
+        "is_receipt": True,
+        "merchant_name": merchant,
+        "merchant_address": None,
+        "receipt_date": f"2025-11-{rng.randint(1, 28):02d}",
+        "receipt_time": f"{rng.randint(7, 22):02d}:{rng.randint(0, 59):02d}",
+        "currency": currency,
+        "subtotal": round(total / 1.16, 2),
+        "tax": round(total - total / 1.16, 2),
+        "tip": None,
+        "total": total,
+        "payment_method": rng.choice(("Cash", "Visa", "Amex")),
+        "items": [{"description": merchant, "quantity": 1.0, "unit_price": total, "line_total": total}],
+    }
+
+
+def render(state: dict[str, Any]) -> dict[str, Any]:
+    """Return a short reply describing the state."""
+    if state.get("expense_id"):
+        text = f"✅ Expense saved (id {state['expense_id']})."
+    elif state.get("status_rows") is not None:
+        text = f"You have {state['status_rows']['count']} recent expenses."
+    else:
+        text = "👋 Send me a receipt photo or ask for your expense status."
+    return {"response_text": text}
+
+
+class FakeLLMServer:
+    """Threaded OpenAI-compatible server with sampled latencies and injected errors."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: dict[str, Latency] | None = None,
+        error_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        """Bind the server (``port=0`` picks a free port).
+
+        Args:
+            host: Interface to bind.
+            port: Port to bind.
+            latency: Distribution per answer kind; ``*`` is the default.
+            error_rate: Fraction of requests answered with 429 or 500.
+            seed: Seed for latencies, errors and generated receipts.
+        """
+        self.latency = latency or {}
+        self.error_rate = error_rate
+        self.requests: dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._httpd.block_on_close = False
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to use as ``OPENAI_BASE_URL``."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> FakeLLMServer:
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread until interrupted."""
+        self._httpd.serve_forever()
+
+    def close(self) -> None:
+        """Stop serving and release the port."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> FakeLLMServer:
+        return self.start()
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def respond(self, body: dict[str, Any]) -> tuple[int, dict[str, Any] | None, float, str]:
+        """Decide the status, content, delay and kind of one answer."""
+        kind, schema = answer_kind(body)
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            delay = self.latency.get(kind, self.latency.get("*", NO_LATENCY)).sample(self._rng)
+            if self._rng.random() < self.error_rate:
+                return self._rng.choice((429, 500)), None, delay, kind
+            state = prompt_state(body)
+            if kind == "agent_plan":
+                content = plan(state)
+            elif kind == "query_status":
+                content = query(state)
+            elif kind == "receipt":
+                content = receipt(self._rng)
+            else:
+                content = render(state)
+        return 200, content if schema else {"text": content["response_text"]}, delay, kind
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                status, content, delay, _kind = server.respond(body)
+                time.sleep(delay)
+                try:
+                    if status != 200:
+                        self._send_json(status, {"error": {"message": "injected", "type": "fake"}})
+                    elif body.get("stream"):
+                        self._send_stream(body, content)
+                    else:
+                        self._send_json(200, _completion(body, content))
+                except OSError:
+                    pass
+
+            def _send_json(self, status: int, payload: dict[str, Any]) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("retry-after-ms", "50")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, body: dict[str, Any], content: dict[str, Any]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                text = content.get("text") or json.dumps(content)
+                for chunk in _stream_chunks(body, text):
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def log_message(self, *_args: object) -> None:
+                pass
+
+        return Handler
+
+
+def _usage(body: dict[str, Any], text: str) -> dict[str, int]:
+    prompt_tokens = max(1, len(json.dumps(body.get("messages", []))) // 4)
+    completion_tokens = max(1, len(text) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _completion(body: dict[str, Any], content: dict[str, Any]) -> dict[str, Any]:
+    """Build a chat completion for JSON, tool-call or text answers."""
+    message: dict[str, Any] = {"role": "assistant", "content": None, "refusal": None}
+    finish_reason = "stop"
+    if "text" in content:
+        message["content"] = text = content["text"]
+    elif body.get("tools"):
+        text = json.dumps(content)
+        message["tool_calls"] = [
+            {
+                "id": "call_fake",
+                "type": "function",
+                "function": {"name": body["tools"][0]["function"]["name"], "arguments": text},
+            }
+        ]
+        finish_reason = "tool_calls"
+    else:
+        message["content"] = text = json.dumps(content)
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+        "usage": _usage(body, text),
+    }
+
+
+def _stream_chunks(body: dict[str, Any], text: str) -> list[dict[str, Any]]:
+    """Split a text answer into streaming chunks, a few words each."""
+    base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time())}
+    base["model"] = body.get("model", "fake")
+    words = re.findall(r"\S+\s*", text)
+    chunks = [
+        {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+    ]
+    for start in range(0, len(words), 3):
+        delta = {"content": "".join(words[start : start + 3])}
+        chunks.append({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+    chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+    if (body.get("stream_options") or {}).get("include_usage"):
+        chunks.append({**base, "choices": [], "usage": _usage(body, text)})
+    return chunks
+
+
+def parse_latency_args(values: list[str]) -> dict[str, Latency]:
+    """Parse ``KIND=SPEC`` arguments into a latency map."""
+    latency = {}
+    for value in values:
+        kind, _, spec = value.partition("=")
+        latency[kind] = Latency.parse(spec)
+    return latency
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible fake LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        help="KIND=SPEC, e.g. receipt=lognormal:2.5,0.3 (kinds: agent_plan, query_status, receipt, render, *)",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fake = FakeLLMServer(
+        args.host,
+        args.port,
+        latency=parse_latency_args(args.latency),
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    logger.info("Fake LLM serving on %s", fake.base_url)
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake._httpd.server_close()
@@ -29,6 +29,8 @@ if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
 from src import schemas
+from src.tools.llm_gateway import get_chat_model
+from src.tools.receipt_cache import read_mapped
 
 load_dotenv(find_dotenv())
 
@@ -59,8 +61,8 @@ def load_image(inputs: dict[str, Any]) -> dict[str, Any]:
     }
     mime_type = mime_types.get(ext, "image/jpeg")
 
-    with open(image_path, "rb") as f:
-        image_data = base64.b64encode(f.read()).decode("utf-8")
+    with read_mapped(image_path) as view:
+        image_data = base64.b64encode(view).decode("utf-8")
 
     # Return original inputs plus the new image field
     return {**inputs, "image": f"data:{mime_type};base64,{image_data}"}
@@ -73,10 +75,15 @@ load_image_chain = RunnableLambda(load_image)
 # ─────────────────────────────────────────────────────────────────────────────
 # LLM Setup with Structured Output
 # ─────────────────────────────────────────────────────────────────────────────
-def get_llm(model: str = "gpt-4o-mini") -> ChatOpenAI:
-    """Create a ChatOpenAI instance."""
-    return ChatOpenAI(
-        model=model,
+def get_llm(model: str = "gpt-4o-mini", route: str = "image_extractor") -> ChatOpenAI:
+    """Create a ChatOpenAI instance that calls through the LLM gateway.
+
+    Vision calls get their own deadline (LLM_VISION_DEADLINE_SECONDS).
+    """
+    return get_chat_model(
+        model,
+        route,
+        deadline=float(os.environ.get("LLM_VISION_DEADLINE_SECONDS", "60")),
         api_key=OPENAI_API_KEY,
         max_tokens=4096,
     )
@@ -94,6 +101,7 @@ def image_extraction_chain(inputs: dict[str, Any]) -> schemas.receipt.Receipt:
     """
     image = inputs["image"]
     model = inputs.get("model", "gpt-4o-mini")
+    detail = inputs.get("detail", "high")
 
     llm = get_llm(model)
     llm_with_structure = llm.with_structured_output(schemas.receipt.Receipt)
@@ -107,7 +115,7 @@ def image_extraction_chain(inputs: dict[str, Any]) -> schemas.receipt.Receipt:
             },
             {
                 "type": "image_url",
-                "image_url": {"url": image, "detail": "high"},
+                "image_url": {"url": image, "detail": detail},
             },
         ],
     }
@@ -122,13 +130,15 @@ def image_extraction_chain(inputs: dict[str, Any]) -> schemas.receipt.Receipt:
 # ─────────────────────────────────────────────────────────────────────────────
 def extract_receipt_from_image(
     image_path: str,
-    model: str = "gpt-4o-mini"
+    model: str = "gpt-4o-mini",
+    detail: str = "high",
 ) -> schemas.receipt.Receipt | dict:
     """Full pipeline to extract receipt data from an image file.
 
     Args:
         image_path: Path to the receipt image file
         model: OpenAI model to use (gpt-4o-mini or gpt-4o)
+        detail: Vision detail level ("high", or "low" for fewer image tokens)
         use_parser: If True, use JsonOutputParser approach; else use with_structured_output
 
     Returns:
@@ -145,6 +155,7 @@ def extract_receipt_from_image(
     result = image_extraction_chain.invoke({
         "image": image_data["image"],
         "model": model,
+        "detail": detail,
     })
 
     return result
@@ -0,0 +1,229 @@
+"""Async worker that drains the Postgres graph job queue."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable
+
+import psycopg
+
+from src.db.job_queue import (
+    JOB_CHANNEL,
+    Job,
+    backoff_seconds,
+    claim_job,
+    complete_job,
+    extend_lease,
+    fail_job,
+)
+from src.tools.metrics import Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+JOB_SECONDS = Histogram(
+    "job_seconds",
+    "Time spent running a claimed job, by kind and outcome.",
+    ["kind", "outcome"],
+)
+JOBS_IN_FLIGHT = Gauge(
+    "jobs_in_flight",
+    "Jobs currently running in this worker.",
+)
+
+JobHandler = Callable[[Job], Awaitable[None]]
+
+
+class JobWorker:
+    """Claim and run queued jobs with a fixed number of concurrent slots.
+
+    Each slot owns one database connection, reopened with backoff after a
+    database error. Idle slots sleep until a ``NOTIFY`` on the job channel
+    arrives or ``poll_interval`` passes (the poll also picks up retries
+    whose backoff elapsed and expired leases).
+    Leases are renewed every third of ``visibility_timeout`` while a job
+    runs, so only a dead worker lets its jobs be reclaimed. ``on_failed``
+    runs once a job has used up its attempts, to tell the user.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        handler: JobHandler,
+        *,
+        worker_id: str | None = None,
+        concurrency: int = 4,
+        visibility_timeout: float = 300.0,
+        poll_interval: float = 5.0,
+        retry_base: float = 2.0,
+        reconnect_base: float = 1.0,
+        listen: bool = True,
+        on_failed: JobHandler | None = None,
+    ) -> None:
+        self._database_url = database_url
+        self._handler = handler
+        self._on_failed = on_failed
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._concurrency = concurrency
+        self._visibility_timeout = visibility_timeout
+        self._poll_interval = poll_interval
+        self._retry_base = retry_base
+        self._reconnect_base = reconnect_base
+        self._listen = listen
+        self._wakers: list[asyncio.Event] = []
+        self.processed = 0
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Process jobs until ``stop`` is set; running jobs finish first."""
+        loop = asyncio.get_running_loop()
+        listener_stop = threading.Event()
+        listener = None
+        if self._listen:
+            listener = threading.Thread(
+                target=self._listen_for_jobs, args=(loop, listener_stop), daemon=True
+            )
+            listener.start()
+
+        logger.info("Worker %s started with %s slots", self.worker_id, self._concurrency)
+        try:
+            await asyncio.gather(*(self._slot(stop) for _ in range(self._concurrency)))
+        finally:
+            listener_stop.set()
+            if listener is not None:
+                await asyncio.to_thread(listener.join)
+        logger.info("Worker %s stopped after %s jobs", self.worker_id, self.processed)
+
+    async def _slot(self, stop: asyncio.Event) -> None:
+        """Claim-run loop for one unit of concurrency."""
+        wake = asyncio.Event()
+        self._wakers.append(wake)
+        conn: psycopg.Connection | None = None
+        failures = 0
+        try:
+            while not stop.is_set():
+                try:
+                    if conn is None:
+                        conn = await asyncio.to_thread(
+                            psycopg.connect, self._database_url, autocommit=True
+                        )
+                    # Cleared before claiming so a NOTIFY racing the claim is not lost
+                    wake.clear()
+                    job = await asyncio.to_thread(
+                        claim_job, conn, self.worker_id, self._visibility_timeout
+                    )
+                    failures = 0
+                    if job is None:
+                        await self._idle(wake, stop)
+                        continue
+                    await self._run_job(conn, job)
+                except psycopg.Error:
+                    # Expired leases hand any job caught mid-way to another claim
+                    failures += 1
+                    delay = backoff_seconds(failures, base=self._reconnect_base, cap=30.0)
+                    logger.exception(
+                        "Worker %s database error; reconnecting in %.1fs", self.worker_id, delay
+                    )
+                    if conn is not None:
+                        await asyncio.to_thread(conn.close)
+                        conn = None
+                    await self._sleep(delay, stop)
+        finally:
+            self._wakers.remove(wake)
+            if conn is not None:
+                await asyncio.to_thread(conn.close)
+
+    async def _sleep(self, delay: float, stop: asyncio.Event) -> None:
+        """Wait for ``delay`` seconds or shutdown, whichever comes first."""
+        try:
+            await asyncio.wait_for(stop.wait(), delay)
+        except TimeoutError:
+            pass
+
+    async def _idle(self, wake: asyncio.Event, stop: asyncio.Event) -> None:
+        """Wait for a notification, the poll interval or shutdown."""
+        waiters = [asyncio.ensure_future(wake.wait()), asyncio.ensure_future(stop.wait())]
+        await asyncio.wait(waiters, timeout=self._poll_interval, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+
+    async def _run_job(self, conn: psycopg.Connection, job: Job) -> None:
+        """Run one claimed job and record the outcome."""
+        heartbeat = asyncio.ensure_future(self._renew_lease(job))
+        started = time.monotonic()
+        JOBS_IN_FLIGHT.inc()
+        try:
+            await self._handler(job)
+        except Exception as exc:
+            heartbeat.cancel()
+            JOB_SECONDS.labels(job.kind, "error").observe(time.monotonic() - started)
+            retry_in = backoff_seconds(job.attempts, base=self._retry_base)
+            status = await asyncio.to_thread(
+                fail_job, conn, job, self.worker_id, f"{type(exc).__name__}: {exc}", retry_in
+            )
+            logger.exception(
+                "Job %s (%s) attempt %s/%s failed; now %s",
+                job.id,
+                job.kind,
+                job.attempts,
+                job.max_attempts,
+                status,
+            )
+            if status == "failed" and self._on_failed is not None:
+                await self._report_failure(job)
+            return
+        finally:
+            JOBS_IN_FLIGHT.dec()
+        heartbeat.cancel()
+        JOB_SECONDS.labels(job.kind, "ok").observe(time.monotonic() - started)
+        await asyncio.to_thread(complete_job, conn, job.id, self.worker_id)
+        self.processed += 1
+
+    async def _report_failure(self, job: Job) -> None:
+        """Run the ``on_failed`` callback for a job that will not be retried."""
+        try:
+            await self._on_failed(job)
+        except Exception:
+            logger.exception("Could not report failure of job %s", job.id)
+
+    async def _renew_lease(self, job: Job) -> None:
+        """Keep the lease alive while the handler runs."""
+        while True:
+            await asyncio.sleep(self._visibility_timeout / 3)
+            try:
+                renewed = await asyncio.to_thread(self._extend_lease, job.id)
+            except psycopg.Error:
+                # The next renewal may get through before the lease runs out
+                logger.warning("Could not renew lease on job %s", job.id, exc_info=True)
+                continue
+            if not renewed:
+                logger.warning("Lost lease on job %s", job.id)
+                return
+
+    def _extend_lease(self, job_id: int) -> bool:
+        """Renew a lease on a short-lived connection.
+
+        The slot's own connection may be in use by the time a renewal that
+        raced with job completion runs, so renewals never share it.
+        """
+        with psycopg.connect(self._database_url, autocommit=True) as conn:
+            return extend_lease(conn, job_id, self.worker_id, self._visibility_timeout)
+
+    def _listen_for_jobs(
+        self, loop: asyncio.AbstractEventLoop, stop: threading.Event
+    ) -> None:
+        """Forward NOTIFY events on the job channel to the idle slots."""
+        with psycopg.connect(self._database_url, autocommit=True) as conn:
+            conn.execute(f"LISTEN {JOB_CHANNEL}")
+            while not stop.is_set():
+                for _notify in conn.notifies(timeout=1.0, stop_after=1):
+                    loop.call_soon_threadsafe(self._wake_all)
+
+    def _wake_all(self) -> None:
+        """Wake every idle slot."""
+        for wake in self._wakers:
+            wake.set()
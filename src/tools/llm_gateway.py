@@ -0,0 +1,639 @@
+"""
+Shared gateway for every OpenAI call made by the bot.
+
+All chat models are built with ``get_chat_model`` and share one httpx client
+whose transport applies, per model:
+
+- Token-bucket rate limiting for requests and tokens per minute, seeded from
+  ``LLM_REQUESTS_PER_MINUTE``/``LLM_TOKENS_PER_MINUTE`` and then kept in
+  sync with the provider's ``x-ratelimit-*`` response headers.
+- Retries with full jitter for timeouts, connection errors, 429 and 5xx,
+  honouring ``retry-after``.
+- A deadline per call covering queueing, every attempt and the backoff in
+  between (``LLM_DEADLINE_SECONDS``, overridable per model).
+- A circuit breaker that fails calls fast after ``LLM_BREAKER_FAILURES``
+  consecutive failed calls, probing again after ``LLM_BREAKER_COOLDOWN``.
+  Nodes catch ``LLM_ERRORS`` and fall back to template responses.
+- Optional hedging: a second identical request is sent when the first has
+  not answered within the route's p95 latency, and the first good answer wins.
+
+Policies are passed from the model to the transport through private request
+headers, which are stripped before the request leaves the process. The
+OpenAI SDK's own retries are disabled so attempts are not multiplied.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, NamedTuple
+
+import httpx
+import openai
+from langchain_openai import ChatOpenAI
+
+from src.tools.metrics import Counter, Gauge, Histogram
+from src.tools.usage_ledger import UsageRecorder
+
+logger = logging.getLogger(__name__)
+
+ROUTE_HEADER = "x-gateway-route"
+DEADLINE_HEADER = "x-gateway-deadline"
+HEDGE_HEADER = "x-gateway-hedge"
+
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+# Errors that mean the provider is unavailable rather than the request being
+# wrong; the gateway turns a final 408 into DeadlineExceeded (APITimeoutError)
+LLM_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.ConflictError,
+)
+
+# Rough prompt cost of one image part; exact accounting is the provider's job
+IMAGE_TOKENS = 1000
+HEDGE_MIN_SAMPLES = 20
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+_GATEWAY_LOCK = threading.Lock()
+_GATEWAY: LLMGateway | None = None
+
+REQUESTS = Counter(
+    "llm_requests_total",
+    "LLM HTTP attempts by route and outcome.",
+    ["route", "outcome"],
+)
+CALL_SECONDS = Histogram(
+    "llm_call_seconds",
+    "Wall time of LLM calls by route (the calling node) and model, including queueing and retries.",
+    ["route", "model"],
+)
+IN_FLIGHT = Gauge(
+    "llm_in_flight",
+    "LLM calls currently waiting for a rate-limit slot or an answer.",
+    ["route"],
+)
+HEDGES = Counter(
+    "llm_hedged_requests_total",
+    "Backup requests sent for slow calls, by which request answered first.",
+    ["route", "winner"],
+)
+FALLBACKS = Counter(
+    "llm_fallbacks_total",
+    "Nodes that answered from a template because the LLM was unavailable.",
+    ["route"],
+)
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised without calling the provider while a model's circuit is open."""
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """Raised when a call runs out of time before getting an answer."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out reservations instead of blocking."""
+
+    def __init__(
+        self, per_minute: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Take ``amount`` tokens and return how long to wait before using them."""
+        with self._lock:
+            now = self._refill()
+            self._tokens -= amount
+            wait_s = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait_s, self._paused_until - now)
+
+    def refund(self, amount: float = 1.0) -> None:
+        """Return tokens from a reservation that was not used."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def has_headroom(self, amount: float = 1.0) -> bool:
+        """Return whether ``amount`` tokens are available right now."""
+        with self._lock:
+            now = self._refill()
+            return self._tokens >= amount and now >= self._paused_until
+
+    def sync(self, limit: float, remaining: float, reset_seconds: float) -> None:
+        """Adopt the provider's view of the limit after a response.
+
+        Args:
+            limit: Per-minute limit reported by the provider.
+            remaining: Tokens left in the provider's bucket.
+            reset_seconds: Time until the provider's bucket is full again.
+        """
+        with self._lock:
+            now = self._refill()
+            if limit > 0:
+                self.capacity = limit
+                self.rate = limit / 60.0
+            self._tokens = min(self._tokens, remaining)
+            if remaining < 1:
+                self._paused_until = max(self._paused_until, now + reset_seconds)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every reservation for ``seconds`` (after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def _refill(self) -> float:
+        now = self._clock()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        return now
+
+
+class RateLimiter:
+    """Request and token buckets for one model."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float) -> None:
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request and ``tokens`` tokens; returns the wait in seconds."""
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def refund(self, tokens: int) -> None:
+        """Give back a reservation that was not used."""
+        self.requests.refund(1)
+        self.tokens.refund(tokens)
+
+    def has_headroom(self, tokens: int) -> bool:
+        """Return whether a request could be sent right now without waiting."""
+        return self.requests.has_headroom(1) and self.tokens.has_headroom(tokens)
+
+    def observe(self, headers: httpx.Headers) -> None:
+        """Sync both buckets with the ``x-ratelimit-*`` headers of a response."""
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                bucket.sync(
+                    float(headers.get(f"x-ratelimit-limit-{kind}", "0")),
+                    float(remaining),
+                    parse_duration(headers.get(f"x-ratelimit-reset-{kind}", "0s")),
+                )
+            except ValueError:
+                logger.debug("Ignoring malformed rate limit headers for %s", kind)
+
+    def pause(self, seconds: float) -> None:
+        """Stop sending to this model for ``seconds``."""
+        self.requests.pause(seconds)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        cooldown: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        """``closed``, ``open`` or ``half_open``."""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at < self._cooldown:
+                return "open"
+            return "half_open"
+
+    def allow(self) -> bool:
+        """Return whether a call may go to the provider now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._clock() - self._opened_at < self._cooldown or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the circuit at the threshold."""
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self._failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("LLM circuit opened after %s failures", self._failures)
+                self._opened_at = self._clock()
+            self._probing = False
+
+
+class _Call(NamedTuple):
+    """Policy for one call, read from the private request headers."""
+
+    route: str
+    model: str
+    deadline: float
+    hedge: bool
+    stream: bool
+    tokens: int
+
+
+class LLMGateway(httpx.BaseTransport):
+    """httpx transport that applies the gateway policies to OpenAI requests."""
+
+    def __init__(
+        self,
+        inner: httpx.BaseTransport | None = None,
+        *,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 200_000,
+        max_retries: int = 3,
+        retry_base: float = 0.5,
+        retry_cap: float = 8.0,
+        deadline: float = 30.0,
+        breaker_failures: int = 5,
+        breaker_cooldown: float = 30.0,
+        hedge_delay: float = 2.0,
+        max_connections: int = 64,
+    ) -> None:
+        self._inner = inner or httpx.HTTPTransport(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            )
+        )
+        self._requests_per_minute = requests_per_minute
+        self._tokens_per_minute = tokens_per_minute
+        self._max_retries = max_retries
+        self._retry_base = retry_base
+        self._retry_cap = retry_cap
+        self._deadline = deadline
+        self._breaker_failures = breaker_failures
+        self._breaker_cooldown = breaker_cooldown
+        self._hedge_delay = hedge_delay
+        self._lock = threading.Lock()
+        self._limiters: dict[str, RateLimiter] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._latencies: dict[str, deque[float]] = {}
+        self.client = httpx.Client(transport=self, timeout=None)
+
+    @classmethod
+    def from_env(cls) -> LLMGateway:
+        """Configure from the ``LLM_*`` environment variables."""
+        return cls(
+            requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")),
+            tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            deadline=float(os.getenv("LLM_DEADLINE_SECONDS", "30")),
+            breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            breaker_cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+            hedge_delay=float(os.getenv("LLM_HEDGE_DELAY", "2")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "64")),
+        )
+
+    def limiter(self, model: str) -> RateLimiter:
+        """Return the rate limiter for a model."""
+        with self._lock:
+            limiter = self._limiters.get(model)
+            if limiter is None:
+                limiter = RateLimiter(self._requests_per_minute, self._tokens_per_minute)
+                self._limiters[model] = limiter
+            return limiter
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        """Return the circuit breaker for a model."""
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = CircuitBreaker(self._breaker_failures, self._breaker_cooldown)
+                self._breakers[model] = breaker
+            return breaker
+
+    def hedge_delay(self, route: str) -> float:
+        """Time to wait before hedging: the route's p95 latency once known."""
+        with self._lock:
+            samples = sorted(self._latencies.get(route, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return self._hedge_delay
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        """Send one SDK request through the rate limiter, retries and breaker."""
+        call = self._read_policy(request)
+        breaker = self.breaker(call.model)
+        if not breaker.allow():
+            REQUESTS.labels(call.route, "circuit_open").inc()
+            raise CircuitOpenError(f"circuit open for {call.model}", request=request)
+
+        started = time.monotonic()
+        deadline = started + call.deadline
+        in_flight = IN_FLIGHT.labels(call.route)
+        in_flight.inc()
+        try:
+            if call.hedge:
+                response = self._send_hedged(request, call, deadline)
+            else:
+                response = self._send_with_retries(request, call, deadline)
+        except httpx.HTTPError:
+            breaker.record_failure()
+            raise
+        finally:
+            in_flight.dec()
+            CALL_SECONDS.labels(call.route, call.model).observe(time.monotonic() - started)
+
+        if response.status_code in RETRY_STATUSES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if response.status_code == 408:
+            # The SDK has no error class for 408; report it as the timeout it is
+            response.close()
+            raise DeadlineExceeded("provider timed out (408)", request=request)
+        return response
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self._inner.close()
+
+    def _read_policy(self, request: httpx.Request) -> _Call:
+        """Pop the gateway headers and describe the call."""
+        route = request.headers.pop(ROUTE_HEADER, "unknown")
+        deadline = float(request.headers.pop(DEADLINE_HEADER, self._deadline))
+        hedge = request.headers.pop(HEDGE_HEADER, "") == "true"
+        try:
+            body = json.loads(request.content or b"{}")
+        except ValueError:
+            body = {}
+        return _Call(
+            route=route,
+            model=str(body.get("model", "unknown")),
+            deadline=deadline,
+            hedge=hedge and not body.get("stream"),
+            stream=bool(body.get("stream")),
+            tokens=estimate_tokens(body),
+        )
+
+    def _send_with_retries(
+        self, request: httpx.Request, call: _Call, deadline: float
+    ) -> httpx.Response:
+        """Send with rate limiting and jittered retries until the deadline."""
+        limiter = self.limiter(call.model)
+        attempt = 0
+        while True:
+            wait_s = limiter.reserve(call.tokens)
+            if time.monotonic() + wait_s >= deadline:
+                limiter.refund(call.tokens)
+                REQUESTS.labels(call.route, "deadline").inc()
+                raise DeadlineExceeded("rate limited past the call deadline", request=request)
+            if wait_s > 0:
+                REQUESTS.labels(call.route, "throttled").inc()
+                time.sleep(wait_s)
+
+            try:
+                response = self._attempt(request, call, deadline)
+            except httpx.TransportError as exc:
+                error: httpx.TransportError | None = exc
+                response = None
+                delay = self._backoff(attempt)
+            else:
+                error = None
+                limiter.observe(response.headers)
+                if response.status_code not in RETRY_STATUSES:
+                    REQUESTS.labels(call.route, "ok").inc()
+                    return response
+                delay = max(self._backoff(attempt), retry_after(response.headers))
+                if response.status_code == 429:
+                    limiter.pause(delay)
+
+            outcome = "rate_limited" if response is not None and response.status_code == 429 else "error"
+            REQUESTS.labels(call.route, outcome).inc()
+            attempt += 1
+            if attempt > self._max_retries or time.monotonic() + delay >= deadline:
+                if error is not None:
+                    raise error
+                return response
+
+            logger.info(
+                "Retrying %s call to %s in %.2fs (attempt %s, %s)",
+                call.route,
+                call.model,
+                delay,
+                attempt,
+                error or response.status_code,
+            )
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+    def _attempt(self, request: httpx.Request, call: _Call, deadline: float) -> httpx.Response:
+        """Send one attempt with timeouts bounded by the remaining deadline."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("call deadline exceeded", request=request)
+        attempt = httpx.Request(
+            request.method,
+            request.url,
+            headers=request.headers,
+            content=request.content,
+            extensions={
+                **request.extensions,
+                "timeout": {
+                    "connect": remaining,
+                    "read": remaining,
+                    "write": remaining,
+                    "pool": remaining,
+                },
+            },
+        )
+        started = time.monotonic()
+        response = self._inner.handle_request(attempt)
+        if not call.stream:
+            try:
+                response.read()
+            except BaseException:
+                response.close()
+                raise
+        if response.status_code < 400:
+            self._record_latency(call.route, time.monotonic() - started)
+        return response
+
+    def _send_hedged(self, request: httpx.Request, call: _Call, deadline: float) -> httpx.Response:
+        """Race a backup request against a slow primary; the first good answer wins."""
+        primary = _spawn(self._send_with_retries, request, call, deadline)
+        done, _ = wait([primary], timeout=self.hedge_delay(call.route))
+        if done or not self.limiter(call.model).has_headroom(call.tokens):
+            return primary.result()
+
+        backup = _spawn(self._send_with_retries, request, call, deadline)
+        pending = {primary, backup}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result().status_code < 400:
+                    HEDGES.labels(call.route, "primary" if future is primary else "backup").inc()
+                    for other in pending:
+                        other.add_done_callback(_close_response)
+                    return future.result()
+        HEDGES.labels(call.route, "neither").inc()
+        backup.add_done_callback(_close_response)
+        return primary.result()
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self._retry_cap, self._retry_base * 2**attempt))
+
+    def _record_latency(self, route: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._latencies.get(route)
+            if samples is None:
+                samples = self._latencies[route] = deque(maxlen=200)
+            samples.append(seconds)
+
+
+def _spawn(fn: Callable[..., httpx.Response], *args: Any) -> Future:
+    """Run ``fn`` on a daemon thread and return its future.
+
+    A dedicated thread per attempt keeps a hedge from queueing behind other
+    calls in a shared pool.
+    """
+    future: Future = Future()
+
+    def run() -> None:
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def _close_response(future: Future) -> None:
+    """Release the connection held by a losing hedge."""
+    if future.exception() is None:
+        future.result().close()
+
+
+def parse_duration(value: str) -> float:
+    """Parse OpenAI reset durations such as ``1s``, ``6m0s`` or ``20ms``."""
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return float(value)
+    return sum(float(number) * _DURATION_SECONDS[unit] for number, unit in parts)
+
+
+def retry_after(headers: httpx.Headers) -> float:
+    """Return the server's requested backoff in seconds, or 0."""
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value) * scale
+        except ValueError:
+            continue
+    return 0.0
+
+
+def estimate_tokens(body: dict[str, Any]) -> int:
+    """Estimate the tokens a request counts against the per-minute limit."""
+    chars = 0
+    images = 0
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "image_url":
+                images += 1
+            else:
+                chars += len(str(part.get("text", "")))
+    completion = body.get("max_completion_tokens") or body.get("max_tokens") or 0
+    return chars // 4 + images * IMAGE_TOKENS + int(completion)
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Return the process-wide gateway, creating it on first use."""
+    global _GATEWAY
+    with _GATEWAY_LOCK:
+        if _GATEWAY is None:
+            _GATEWAY = LLMGateway.from_env()
+        return _GATEWAY
+
+
+def get_chat_model(
+    model: str,
+    route: str,
+    *,
+    deadline: float | None = None,
+    hedge: bool = False,
+    gateway: LLMGateway | None = None,
+    **kwargs: Any,
+) -> ChatOpenAI:
+    """Create a chat model whose requests go through the gateway.
+
+    Args:
+        model: OpenAI model name.
+        route: Caller name used for metrics and hedge latencies.
+        deadline: Seconds per call (default LLM_DEADLINE_SECONDS).
+        hedge: Send a backup request when the call is slower than usual.
+        gateway: Gateway to use (default: the process-wide one).
+        **kwargs: Passed to ``ChatOpenAI``.
+
+    Returns:
+        Configured ``ChatOpenAI``. Only sync calls use the gateway. Token
+        usage of every call is recorded in the usage ledger.
+    """
+    headers = {ROUTE_HEADER: route}
+    if deadline is not None:
+        headers[DEADLINE_HEADER] = str(deadline)
+    if hedge:
+        headers[HEDGE_HEADER] = "true"
+    kwargs.setdefault("api_key", os.environ.get("OPENAI_API_KEY"))
+    kwargs.setdefault("stream_usage", True)
+    return ChatOpenAI(
+        model=model,
+        http_client=(gateway or get_llm_gateway()).client,
+        max_retries=0,
+        default_headers=headers,
+        callbacks=[UsageRecorder(route)],
+        **kwargs,
+    )
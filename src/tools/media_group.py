@@ -0,0 +1,121 @@
+"""Collect Telegram media-group (album) updates into one batch."""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, NamedTuple
+
+from telegram import Message
+
+from src.schemas.state import WorkflowState
+
+logger = logging.getLogger(__name__)
+
+# Same reply the bot's error handler sends for a failed single upload
+FAILED_TEXT = "❌ An error occurred. Please try again later."
+
+
+class AlbumItem(NamedTuple):
+    """One photo of an album, ready for the batch workflow."""
+
+    message: Message
+    state: WorkflowState
+
+
+class _PendingGroup:
+    __slots__ = ("items", "uploads", "first_seen", "timer")
+
+    def __init__(self) -> None:
+        self.items: list[AlbumItem] = []
+        # Items announced with ``expect`` whose upload has not resolved yet
+        self.uploads = 0
+        self.first_seen = time.monotonic()
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class MediaGroupBatcher:
+    """Buffer updates sharing a media_group_id and flush them together.
+
+    Handlers call ``expect`` before a slow step such as the upload, then
+    ``add`` (or ``discard`` if it failed). A group is never flushed while an
+    expected item is outstanding; otherwise it is flushed once no new item
+    arrived for ``window`` seconds, or ``max_wait`` seconds after its first
+    item, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[str, list[AlbumItem]], Awaitable[None]],
+        window: float = 1.5,
+        max_wait: float = 10.0,
+    ) -> None:
+        self._flush = flush
+        self._window = window
+        self._max_wait = max_wait
+        self._groups: dict[str, _PendingGroup] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        """Albums still collecting items or being processed."""
+        return len(self._groups) + len(self._tasks)
+
+    def expect(self, media_group_id: str) -> None:
+        """Hold the group open until an item being prepared is added or discarded."""
+        group = self._groups.setdefault(media_group_id, _PendingGroup())
+        group.uploads += 1
+        if group.timer is not None:
+            group.timer.cancel()
+            group.timer = None
+
+    def add(self, media_group_id: str, item: AlbumItem) -> None:
+        """Add an item and (re)arm the group's flush timer."""
+        group = self._groups.setdefault(media_group_id, _PendingGroup())
+        group.items.append(item)
+        self._resolve(media_group_id, group)
+
+    def discard(self, media_group_id: str) -> None:
+        """Give up on an expected item, e.g. because its upload failed."""
+        group = self._groups.get(media_group_id)
+        if group is None:
+            return
+        if not group.items and group.uploads <= 1:
+            del self._groups[media_group_id]
+            return
+        self._resolve(media_group_id, group)
+
+    def _resolve(self, media_group_id: str, group: _PendingGroup) -> None:
+        """Count one expected item as settled; arm the timer once none is left."""
+        group.uploads = max(0, group.uploads - 1)
+        if group.timer is not None:
+            group.timer.cancel()
+            group.timer = None
+        if group.uploads:
+            return
+
+        remaining = self._max_wait - (time.monotonic() - group.first_seen)
+        delay = max(0.0, min(self._window, remaining))
+        loop = asyncio.get_running_loop()
+        group.timer = loop.call_later(delay, self._fire, media_group_id)
+
+    def _fire(self, media_group_id: str) -> None:
+        """Hand a completed group to the flush callback."""
+        group = self._groups.pop(media_group_id, None)
+        if group is None:
+            return
+        logger.info("Flushing media group %s with %s items", media_group_id, len(group.items))
+        task = asyncio.ensure_future(self._run_flush(media_group_id, group.items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_flush(self, media_group_id: str, items: list[AlbumItem]) -> None:
+        """Run the flush callback; on failure log it and tell the user."""
+        try:
+            await self._flush(media_group_id, items)
+        except Exception:
+            logger.exception("Failed to process media group %s", media_group_id)
+            # Album photos get no progress message, so this is the only reply
+            try:
+                await items[0].message.reply_text(FAILED_TEXT)
+            except Exception:
+                logger.exception("Could not report failed media group %s", media_group_id)
@@ -0,0 +1,181 @@
+"""
+Migrate legacy receipt objects to the content-addressed layout.
+
+Legacy uploads live under ``telegram/{user}/{timestamp}_{file_id}{suffix}``.
+Each object is hashed, copied server-side to ``sha256/ab/cd/<digest>`` (once
+per unique content) and recorded in ``receipt_files``.
+
+Usage:
+    uv run python src/tools/migrate_storage.py --dry-run
+    uv run python src/tools/migrate_storage.py --delete-source
+    uv run python src/tools/migrate_storage.py --report
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any
+
+from minio import Minio
+from minio.commonconfig import CopySource
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.db.receipt_files import record_receipt_file, storage_savings
+from src.tools.minio_storage import (
+    content_object_name,
+    ensure_bucket,
+    get_minio_client,
+    object_exists,
+)
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_object(client: Minio, bucket: str, object_name: str) -> str:
+    """Compute the SHA-256 of an object without holding it in memory."""
+    digest = hashlib.sha256()
+    response = client.get_object(bucket, object_name)
+    try:
+        for chunk in response.stream(_CHUNK_SIZE):
+            digest.update(chunk)
+    finally:
+        response.close()
+        response.release_conn()
+    return digest.hexdigest()
+
+
+def _parse_legacy_name(object_name: str, prefix: str) -> tuple[str | None, str]:
+    """Return (telegram_user_id, suffix) parsed from a legacy object key."""
+    relative = object_name[len(prefix) :] if object_name.startswith(prefix) else object_name
+    parts = relative.split("/", 1)
+    user_id = parts[0] if len(parts) == 2 and parts[0].isdigit() else None
+    suffix = os.path.splitext(object_name)[1]
+    return user_id, suffix
+
+
+def migrate(
+    client: Minio,
+    bucket: str,
+    database_url: str,
+    *,
+    prefix: str = "telegram/",
+    dry_run: bool = False,
+    delete_source: bool = False,
+) -> dict[str, Any]:
+    """Migrate legacy objects under prefix to content-addressed keys.
+
+    Args:
+        client: MinIO client.
+        bucket: Bucket name.
+        database_url: Postgres connection string for receipt_files.
+        prefix: Legacy object prefix.
+        dry_run: Only hash and report; do not copy, record or delete.
+        delete_source: Remove legacy objects once their reference is recorded;
+            objects without a user or file_id are kept and counted as
+            ``unreferenced``.
+
+    Returns:
+        Summary with scanned/unique/unreferenced counts and byte totals.
+    """
+    ensure_bucket(client, bucket)
+    seen: dict[str, int] = {}
+    summary = {
+        "scanned": 0,
+        "copied": 0,
+        "skipped": 0,
+        "unreferenced": 0,
+        "scanned_bytes": 0,
+    }
+
+    for obj in client.list_objects(bucket, prefix=prefix, recursive=True):
+        stat = client.stat_object(bucket, obj.object_name)
+        metadata = {key.lower(): value for key, value in (stat.metadata or {}).items()}
+        file_id = metadata.get("x-amz-meta-file_id") or metadata.get("file_id")
+        user_id, suffix = _parse_legacy_name(obj.object_name, prefix)
+
+        digest = _hash_object(client, bucket, obj.object_name)
+        target = content_object_name(digest)
+        summary["scanned"] += 1
+        summary["scanned_bytes"] += stat.size
+        seen.setdefault(digest, stat.size)
+
+        if dry_run:
+            continue
+
+        if object_exists(client, bucket, target):
+            summary["skipped"] += 1
+        else:
+            client.copy_object(bucket, target, CopySource(bucket, obj.object_name))
+            summary["copied"] += 1
+
+        if not (database_url and file_id and user_id):
+            # Keep the source: without a reference nothing else points at it
+            logger.warning("No reference recorded for %s (missing user or file_id)", obj.object_name)
+            summary["unreferenced"] += 1
+            continue
+
+        record_receipt_file(
+            database_url,
+            telegram_user_id=user_id,
+            file_id=file_id,
+            sha256=digest,
+            object_name=target,
+            size_bytes=stat.size,
+            content_type=stat.content_type,
+            suffix=suffix,
+            uploaded_at=stat.last_modified,
+        )
+        if delete_source:
+            client.remove_object(bucket, obj.object_name)
+
+    summary["unique_objects"] = len(seen)
+    summary["unique_bytes"] = sum(seen.values())
+    summary["saved_bytes"] = summary["scanned_bytes"] - summary["unique_bytes"]
+    return summary
+
+
+def _format_report(report: dict[str, Any]) -> str:
+    """Render a summary dict as aligned text lines."""
+    return "\n".join(f"{key:<17} {value}" for key, value in report.items())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(
+        description="Move legacy receipt objects to content-addressed storage"
+    )
+    parser.add_argument("--prefix", default=os.environ.get("MINIO_PREFIX", "telegram/"))
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    parser.add_argument(
+        "--delete-source", action="store_true", help="Delete legacy objects after copying"
+    )
+    parser.add_argument(
+        "--report", action="store_true", help="Print storage savings from receipt_files and exit"
+    )
+    args = parser.parse_args()
+
+    database_url = os.environ.get("DATABASE_URL", "")
+    if args.report:
+        if not database_url:
+            parser.error("DATABASE_URL is required for --report")
+        print(_format_report(storage_savings(database_url)))
+        sys.exit(0)
+
+    minio_client, bucket_name = get_minio_client()
+    result = migrate(
+        minio_client,
+        bucket_name,
+        database_url,
+        prefix=args.prefix,
+        dry_run=args.dry_run,
+        delete_source=args.delete_source and not args.dry_run,
+    )
+    print(_format_report(result))
@@ -2,15 +2,56 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
 import os
-from typing import Tuple
+import threading
+import time
+from typing import NamedTuple, Tuple
 from urllib.parse import urlparse
 
+import certifi
+import urllib3
 from minio import Minio
+from minio.error import S3Error
+
+from src.tools.metrics import BYTES_BUCKETS, BoundTimer, Histogram
 
 logger = logging.getLogger(__name__)
 
+_CLIENT_LOCK = threading.Lock()
+_CLIENT: tuple[Minio, str] | None = None
+_READY_BUCKETS: set[str] = set()
+
+CONTENT_PREFIX = "sha256/"
+# file_id -> content object pointers, for deployments without Postgres
+FILE_ID_PREFIX = "file_id/"
+
+OP_SECONDS = Histogram(
+    "minio_op_seconds",
+    "MinIO operations by type.",
+    ["op"],
+)
+OP_BYTES = Histogram(
+    "minio_op_bytes",
+    "Bytes moved per MinIO operation.",
+    ["op"],
+    buckets=BYTES_BUCKETS,
+)
+GET_OP = BoundTimer(OP_SECONDS, OP_BYTES, "get")
+PUT_OP = BoundTimer(OP_SECONDS, OP_BYTES, "put")
+STAT_OP = BoundTimer(OP_SECONDS, OP_BYTES, "stat")
+
+
+class StoredObject(NamedTuple):
+    """Result of a content-addressed upload."""
+
+    object_name: str
+    sha256: str
+    size: int
+    uploaded: bool
+
 
 def _parse_minio_endpoint(endpoint: str) -> Tuple[str, bool]:
     """Parse a MinIO endpoint into host and TLS flag.
@@ -33,7 +74,62 @@ def _parse_minio_endpoint(endpoint: str) -> Tuple[str, bool]:
     return endpoint, False
 
 
+def _build_http_client() -> urllib3.PoolManager:
+    """Create the shared urllib3 pool used by the MinIO client.
+
+    Pool size, timeouts and retries are tuned through ``MINIO_POOL_SIZE``,
+    ``MINIO_CONNECT_TIMEOUT``, ``MINIO_READ_TIMEOUT`` and ``MINIO_RETRIES``.
+
+    Returns:
+        Configured urllib3 pool manager.
+    """
+    pool_size = int(os.getenv("MINIO_POOL_SIZE", "32"))
+    connect_timeout = float(os.getenv("MINIO_CONNECT_TIMEOUT", "5"))
+    read_timeout = float(os.getenv("MINIO_READ_TIMEOUT", "60"))
+    retries = int(os.getenv("MINIO_RETRIES", "3"))
+    return urllib3.PoolManager(
+        num_pools=4,
+        maxsize=pool_size,
+        block=True,
+        timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(
+            total=retries,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+    )
+
+
 def get_minio_client() -> tuple[Minio, str]:
+    """Return the process-wide MinIO client configured from environment variables.
+
+    The client is created on first use and reused afterwards so every upload
+    and download shares one connection pool.
+
+    Returns:
+        Tuple of (Minio client, bucket name).
+    """
+    global _CLIENT
+    if _CLIENT is not None:
+        return _CLIENT
+
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = _create_minio_client()
+        return _CLIENT
+
+
+def reset_minio_client() -> None:
+    """Drop the cached client and bucket checks (e.g. after config changes)."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        _CLIENT = None
+        _READY_BUCKETS.clear()
+
+
+def _create_minio_client() -> tuple[Minio, str]:
     """Create a MinIO client from environment variables.
 
     Returns:
@@ -54,6 +150,7 @@ def get_minio_client() -> tuple[Minio, str]:
         access_key=access_key,
         secret_key=secret_key,
         secure=secure,
+        http_client=_build_http_client(),
     )
     return client, bucket
 
@@ -61,13 +158,24 @@ def get_minio_client() -> tuple[Minio, str]:
 def ensure_bucket(client: Minio, bucket: str) -> None:
     """Ensure the bucket exists in MinIO.
 
+    The check runs once per bucket and process; later calls return without
+    a round trip.
+
     Args:
         client: MinIO client.
         bucket: Bucket name.
     """
+    if bucket in _READY_BUCKETS:
+        return
+
     if not client.bucket_exists(bucket):
-        client.make_bucket(bucket)
-        logger.info("Created MinIO bucket: %s", bucket)
+        try:
+            client.make_bucket(bucket)
+            logger.info("Created MinIO bucket: %s", bucket)
+        except S3Error as exc:
+            if exc.code not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+                raise
+    _READY_BUCKETS.add(bucket)
 
 
 def upload_bytes(
@@ -91,6 +199,7 @@ def upload_bytes(
 
     ensure_bucket(client, bucket)
     stream = BytesIO(data)
+    started = time.perf_counter()
     client.put_object(
         bucket,
         object_name,
@@ -99,3 +208,138 @@ def upload_bytes(
         content_type=content_type,
         metadata=metadata,
     )
+    PUT_OP.observe(started, len(data))
+
+
+def content_object_name(digest: str) -> str:
+    """Return the content-addressed object key for a SHA-256 hex digest.
+
+    Args:
+        digest: SHA-256 hex digest of the object bytes.
+
+    Returns:
+        Object key such as ``sha256/ab/cd/abcd...``.
+    """
+    return f"{CONTENT_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def object_exists(client: Minio, bucket: str, object_name: str) -> bool:
+    """Check whether an object exists using a HEAD request.
+
+    Args:
+        client: MinIO client.
+        bucket: Bucket name.
+        object_name: Object key in MinIO.
+
+    Returns:
+        True if the object exists.
+    """
+    started = time.perf_counter()
+    try:
+        client.stat_object(bucket, object_name)
+    except S3Error as exc:
+        if exc.code in ("NoSuchKey", "NoSuchObject", "ResourceNotFound"):
+            STAT_OP.observe(started)
+            return False
+        raise
+    STAT_OP.observe(started)
+    return True
+
+
+def upload_content_addressed(
+    client: Minio,
+    bucket: str,
+    data: bytes,
+    content_type: str,
+    metadata: dict[str, str] | None = None,
+) -> StoredObject:
+    """Upload bytes under their SHA-256 key, skipping the PUT for known content.
+
+    Args:
+        client: MinIO client.
+        bucket: Bucket name.
+        data: Bytes to upload.
+        content_type: MIME type.
+        metadata: Optional object metadata (only written on first upload).
+
+    Returns:
+        StoredObject describing the object key and digest.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    object_name = content_object_name(digest)
+
+    ensure_bucket(client, bucket)
+    if object_exists(client, bucket, object_name):
+        logger.info("MinIO object already stored: %s", object_name)
+        return StoredObject(object_name, digest, len(data), False)
+
+    upload_bytes(client, bucket, object_name, data, content_type, metadata=metadata)
+    return StoredObject(object_name, digest, len(data), True)
+
+
+def record_file_reference(
+    client: Minio, bucket: str, file_id: str, stored: StoredObject, suffix: str
+) -> None:
+    """Point a Telegram file_id at its content-addressed object.
+
+    Stands in for the ``receipt_files`` table when there is no database:
+    content is deduplicated, so only the first upload's object carries the
+    ``file_id`` metadata.
+
+    Args:
+        client: MinIO client.
+        bucket: Bucket name.
+        file_id: Telegram file_id.
+        stored: The content-addressed object.
+        suffix: File suffix such as ``.jpg``.
+    """
+    reference = {"sha256": stored.sha256, "object_name": stored.object_name, "suffix": suffix}
+    upload_bytes(
+        client,
+        bucket,
+        f"{FILE_ID_PREFIX}{file_id}",
+        json.dumps(reference).encode(),
+        "application/json",
+    )
+
+
+def find_file_reference(client: Minio, bucket: str, file_id: str) -> dict[str, str] | None:
+    """Return the reference written by ``record_file_reference``, if any.
+
+    Args:
+        client: MinIO client.
+        bucket: Bucket name.
+        file_id: Telegram file_id.
+
+    Returns:
+        ``sha256``, ``object_name`` and ``suffix``, or None.
+    """
+    try:
+        data = read_object(client, bucket, f"{FILE_ID_PREFIX}{file_id}")
+    except S3Error as exc:
+        if exc.code in ("NoSuchKey", "NoSuchObject", "ResourceNotFound"):
+            return None
+        raise
+    return json.loads(data)
+
+
+def read_object(client: Minio, bucket: str, object_name: str) -> bytes:
+    """Download an object fully into memory.
+
+    Args:
+        client: MinIO client.
+        bucket: Bucket name.
+        object_name: Object key in MinIO.
+
+    Returns:
+        Object bytes.
+    """
+    started = time.perf_counter()
+    response = client.get_object(bucket, object_name)
+    try:
+        data = response.read()
+    finally:
+        response.close()
+        response.release_conn()
+    GET_OP.observe(started, len(data))
+    return data
@@ -0,0 +1,72 @@
+"""Delivery of many Telegram messages (bulk-action notices) in the bulk lane."""
+
+import asyncio
+import logging
+from typing import Iterable
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+from telegram.ext import ExtBot
+
+from src.tools.metrics import Counter
+from src.tools.outbound import BULK
+
+logger = logging.getLogger(__name__)
+
+# Notices handed to the bot at once; the rate limiter paces them
+NOTIFY_IN_FLIGHT = 32
+
+NOTIFICATIONS = Counter(
+    "notifications_total",
+    "Bulk notices by outcome.",
+    ["outcome"],
+)
+_SENT = NOTIFICATIONS.labels("sent")
+_UNDELIVERABLE = NOTIFICATIONS.labels("undeliverable")
+_THROTTLED = NOTIFICATIONS.labels("throttled")
+_FAILED = NOTIFICATIONS.labels("failed")
+
+
+async def send_batched(
+    bot: ExtBot,
+    messages: Iterable[tuple[int, str]],
+    in_flight: int = NOTIFY_IN_FLIGHT,
+) -> int:
+    """Send ``(chat_id, text)`` messages in the rate limiter's bulk lane.
+
+    Pacing, per-chat limits and flood-control retries are the bot's
+    ``OutboundLimiter``'s (``src.tools.outbound``); replies to users go
+    ahead of these notices. Chats that blocked the bot or never started it
+    are skipped, as are notices still throttled after the limiter's retries
+    or lost to network errors; one failed notice never fails the batch.
+
+    Returns:
+        Messages delivered.
+    """
+    slots = asyncio.Semaphore(in_flight)
+
+    async def send(chat_id: int, text: str) -> bool:
+        try:
+            await bot.send_message(chat_id, text, rate_limit_args={"lane": BULK})
+        except RetryAfter:
+            logger.warning("Notice to chat %s dropped after flood waits", chat_id)
+            _THROTTLED.inc()
+            return False
+        except (Forbidden, BadRequest) as exc:
+            logger.info("Notice to chat %s not delivered: %s", chat_id, exc)
+            _UNDELIVERABLE.inc()
+            return False
+        except TelegramError as exc:
+            # NetworkError, TimedOut, ...: the transition is already committed
+            logger.warning("Notice to chat %s failed: %s", chat_id, exc)
+            _FAILED.inc()
+            return False
+        finally:
+            slots.release()
+        _SENT.inc()
+        return True
+
+    tasks = []
+    for chat_id, text in messages:
+        await slots.acquire()
+        tasks.append(asyncio.create_task(send(chat_id, text)))
+    return sum(await asyncio.gather(*tasks))
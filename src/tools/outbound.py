@@ -0,0 +1,456 @@
+"""
+Rate limiting of every Telegram Bot API call the bot makes.
+
+``OutboundLimiter`` is python-telegram-bot's rate-limiter extension point
+(``Application.builder().rate_limiter(...)`` or ``ExtBot(rate_limiter=...)``),
+so replies, edits, documents and notices all pass through it without call
+sites changing:
+
+- token buckets: one global (Telegram allows about 30 messages/second per
+  bot), one per chat (about 1/second in private chats, 20/minute in groups)
+  and a cap on bulk notices, so they never take the whole global budget
+- lanes: interactive replies first, then edits (progress), then bulk
+  notices (``rate_limit_args={"lane": "bulk"}``). A request only waits for
+  its own chat's bucket, never behind another chat's backlog, and a chat
+  has one request on the wire at a time so its messages keep their order
+- ``RetryAfter`` pauses the chat for the time Telegram asks and the
+  request is retried up to ``max_retries`` times
+- an edit of a message that already has an edit waiting replaces it; every
+  caller gets the result of the newest edit, which is still sent if its own
+  caller is cancelled
+
+Calls without a chat (getUpdates, getMe, answerCallbackQuery, ...) are not
+queued.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Coroutine, Hashable
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from src.tools.metrics import Counter, Histogram
+from src.tools.progressive_reply import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+PROGRESS = "progress"
+BULK = "bulk"
+LANES = (INTERACTIVE, PROGRESS, BULK)
+
+# Edits that can be coalesced: only the newest text of a message matters
+COALESCED_ENDPOINTS = frozenset({"editMessageText", "editMessageCaption", "editMessageReplyMarkup"})
+
+# Idle chat buckets are dropped once there are more than this many
+MAX_CHAT_BUCKETS = 10_000
+
+OUTBOUND = Counter(
+    "telegram_outbound_total",
+    "Rate-limited Bot API requests by lane and outcome.",
+    ["lane", "outcome"],
+)
+OUTBOUND_WAIT = Histogram(
+    "telegram_outbound_wait_seconds",
+    "Time requests waited for the rate limiter, by lane.",
+    ["lane"],
+)
+
+
+class _Bucket:
+    """Token bucket on the monotonic clock; ``burst`` tokens at most."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+        self.paused_until = 0.0
+
+    def ready_at(self, now: float) -> float:
+        """When a token is available (``now`` if it already is)."""
+        self._refill(now)
+        ready = now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+        return max(ready, self.paused_until)
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, until: float) -> None:
+        self.paused_until = max(self.paused_until, until)
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst and self.paused_until <= now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+@dataclass(eq=False, slots=True)
+class _Ticket:
+    """A request waiting for its turn."""
+
+    chat: Hashable
+    lane: str
+    key: tuple[Any, ...] | None
+    enqueued: float
+    # None when the request may go; a future with the result of the edit
+    # that replaced it otherwise
+    turn: asyncio.Future[asyncio.Future[Any] | None]
+    # Callers of replaced edits, waiting for this request's result
+    followers: list[asyncio.Future[Any]] = field(default_factory=list)
+
+
+class OutboundLimiter(BaseRateLimiter[dict[str, Any]]):
+    """Global, per-chat and bulk token buckets with lanes and edit coalescing."""
+
+    def __init__(
+        self,
+        global_per_second: float = 25.0,
+        global_burst: float = 5.0,
+        chat_per_second: float = 1.0,
+        chat_burst: float = 2.0,
+        group_per_minute: float = 20.0,
+        group_burst: float = 2.0,
+        bulk_per_second: float = 20.0,
+        max_retries: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create a limiter.
+
+        Args:
+            global_per_second: Sustained requests per second over all chats.
+            global_burst: Requests allowed at once above the sustained rate.
+            chat_per_second: Sustained rate per private chat.
+            chat_burst: Burst per private chat.
+            group_per_minute: Sustained rate per group or channel.
+            group_burst: Burst per group or channel.
+            bulk_per_second: Cap on the bulk lane, below the global rate.
+            max_retries: Retries of a request answered with ``RetryAfter``.
+            clock: Monotonic clock, for tests.
+        """
+        self._clock = clock
+        self._chat_limits = (chat_per_second, chat_burst)
+        self._group_limits = (group_per_minute / 60.0, group_burst)
+        self.max_retries = max_retries
+        now = clock()
+        self._global = _Bucket(global_per_second, global_burst, now)
+        self._bulk = _Bucket(bulk_per_second, 1.0, now)
+        self._chats: dict[Hashable, _Bucket] = {}
+        self._lanes: dict[str, deque[_Ticket]] = {lane: deque() for lane in LANES}
+        self._edits: dict[tuple[Any, ...], _Ticket] = {}
+        # Chats with a request on the wire; the next one waits, keeping order
+        self._busy: set[Hashable] = set()
+        # Requests finished on behalf of cancelled callers (see _hand_over)
+        self._orphans: set[asyncio.Task] = set()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def from_env(cls) -> OutboundLimiter:
+        """Build a limiter from ``OUTBOUND_*`` and ``NOTIFY_PER_SECOND``."""
+        return cls(
+            global_per_second=float(os.getenv("OUTBOUND_GLOBAL_PER_SECOND", "25")),
+            chat_per_second=float(os.getenv("OUTBOUND_CHAT_PER_SECOND", "1")),
+            group_per_minute=float(os.getenv("OUTBOUND_GROUP_PER_MINUTE", "20")),
+            bulk_per_second=float(os.getenv("NOTIFY_PER_SECOND", "20")),
+            max_retries=int(os.getenv("OUTBOUND_MAX_RETRIES", "3")),
+        )
+
+    async def initialize(self) -> None:
+        """Nothing to set up; the scheduler starts with the first request."""
+
+    async def shutdown(self) -> None:
+        """Stop the scheduler; requests still waiting are cancelled."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for lane in self._lanes.values():
+            while lane:
+                lane.popleft().turn.cancel()
+        self._edits.clear()
+
+    @property
+    def queued(self) -> int:
+        """Requests waiting for their turn."""
+        return sum(map(len, self._lanes.values()))
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, bool | dict[str, Any] | list[dict[str, Any]]]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: dict[str, Any] | None,
+    ) -> bool | dict[str, Any] | list[dict[str, Any]]:
+        """Wait for the request's turn, send it and retry on ``RetryAfter``."""
+        chat = data.get("chat_id") or data.get("inline_message_id")
+        if chat is None:
+            return await self._send_unqueued(callback, args, kwargs)
+
+        lane = (rate_limit_args or {}).get("lane") or (
+            PROGRESS if endpoint.startswith("edit") else INTERACTIVE
+        )
+        key = None
+        if endpoint in COALESCED_ENDPOINTS:
+            key = (endpoint, chat, data.get("message_id"))
+        ticket = self._enqueue(chat, lane, key)
+        return await self._drive(ticket, callback, args, kwargs)
+
+    async def _drive(
+        self,
+        ticket: _Ticket,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: dict[str, Any],
+    ) -> Any:
+        """Wait for the ticket's turn, send it and retry on ``RetryAfter``."""
+        chat, lane, key = ticket.chat, ticket.lane, ticket.key
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Shielded: a cancelled turn means the limiter shut down
+                replaced = await asyncio.shield(ticket.turn)
+            except asyncio.CancelledError:
+                if not self._hand_over(ticket, callback, args, kwargs):
+                    self._discard(ticket)
+                raise
+            if replaced is not None:
+                OUTBOUND.labels(lane, "coalesced").inc()
+                return await replaced
+            OUTBOUND_WAIT.labels(lane).observe(self._clock() - ticket.enqueued)
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                delay = retry_after_seconds(exc)
+                self._chat_bucket(chat).pause(self._clock() + delay)
+                if attempt == self.max_retries:
+                    OUTBOUND.labels(lane, "failed").inc()
+                    self._finish(ticket, exc=exc)
+                    raise
+                logger.info("Flood control on chat %s, retrying in %.1fs", chat, delay)
+                OUTBOUND.labels(lane, "retried").inc()
+                newer = self._edits.get(key) if key is not None else None
+                if newer is not None:
+                    # A newer edit of the message is waiting; its result is ours
+                    return await self._follow(newer, ticket.followers)
+                # Retries go to the front of the lane, keeping the chat's order
+                ticket = self._enqueue(chat, lane, key, front=True, followers=ticket.followers)
+                continue
+            except BaseException as exc:
+                OUTBOUND.labels(lane, "failed").inc()
+                self._finish(ticket, exc=exc)
+                raise
+            finally:
+                self._release(chat)
+            OUTBOUND.labels(lane, "sent").inc()
+            self._finish(ticket, result=result)
+            return result
+        raise AssertionError("unreachable")
+
+    def _hand_over(
+        self,
+        ticket: _Ticket,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: dict[str, Any],
+    ) -> bool:
+        """Keep a cancelled caller's edit going for the callers it replaced.
+
+        Returns:
+            True if a background task now owns the ticket.
+        """
+        if ticket.turn.cancelled():
+            return False
+        if ticket.turn.done() and ticket.turn.result() is not None:
+            # Coalesced into a newer edit, which already owns the followers
+            return False
+        if not any(not follower.done() for follower in ticket.followers):
+            return False
+        task = asyncio.get_running_loop().create_task(self._drive(ticket, callback, args, kwargs))
+        self._orphans.add(task)
+        task.add_done_callback(self._orphan_done)
+        return True
+
+    def _orphan_done(self, task: asyncio.Task) -> None:
+        self._orphans.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # Already delivered to the followers
+            logger.debug("Handed-over request failed: %r", task.exception())
+
+    async def _send_unqueued(
+        self, callback: Callable[..., Coroutine[Any, Any, Any]], args: Any, kwargs: dict[str, Any]
+    ) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(retry_after_seconds(exc))
+        raise AssertionError("unreachable")
+
+    def _chat_bucket(self, chat: Hashable) -> _Bucket:
+        bucket = self._chats.get(chat)
+        if bucket is None:
+            now = self._clock()
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._chats = {key: kept for key, kept in self._chats.items() if not kept.idle(now)}
+            group = isinstance(chat, str) or (isinstance(chat, int) and chat < 0)
+            rate, burst = self._group_limits if group else self._chat_limits
+            bucket = self._chats[chat] = _Bucket(rate, burst, now)
+        return bucket
+
+    def _enqueue(
+        self,
+        chat: Hashable,
+        lane: str,
+        key: tuple[Any, ...] | None,
+        front: bool = False,
+        followers: list[asyncio.Future[Any]] | None = None,
+    ) -> _Ticket:
+        loop = asyncio.get_running_loop()
+        ticket = _Ticket(chat, lane, key, self._clock(), loop.create_future(), followers or [])
+        if key is not None:
+            waiting = self._edits.get(key)
+            if waiting is not None:
+                # The waiting edit is dropped; its caller gets this one's result
+                self._lanes[waiting.lane].remove(waiting)
+                waiting.turn.set_result(self._follow(ticket, waiting.followers))
+            self._edits[key] = ticket
+        if front:
+            self._lanes[lane].appendleft(ticket)
+        else:
+            self._lanes[lane].append(ticket)
+        self._chat_bucket(chat)
+        self._start()
+        return ticket
+
+    def _follow(
+        self, ticket: _Ticket, followers: list[asyncio.Future[Any]]
+    ) -> asyncio.Future[Any]:
+        """A future for ``ticket``'s result, handing over ``followers`` too."""
+        follower = asyncio.get_running_loop().create_future()
+        ticket.followers.extend(followers)
+        ticket.followers.append(follower)
+        return follower
+
+    def _discard(self, ticket: _Ticket) -> None:
+        """Forget a ticket whose caller was cancelled while waiting.
+
+        Other callers waiting on the ticket are handed it instead (see
+        ``_hand_over``) unless the limiter shut down; a granted turn frees
+        the chat again.
+        """
+        queue = self._lanes[ticket.lane]
+        if ticket in queue:
+            queue.remove(ticket)
+        if ticket.key is not None and self._edits.get(ticket.key) is ticket:
+            del self._edits[ticket.key]
+        if ticket.turn.cancelled():
+            # The limiter shut down; nobody will send this request
+            for follower in ticket.followers:
+                follower.cancel()
+        elif ticket.turn.done() and ticket.turn.result() is None:
+            # Cancelled after its turn was granted
+            self._release(ticket.chat)
+
+    def _finish(
+        self, ticket: _Ticket, result: Any = None, exc: BaseException | None = None
+    ) -> None:
+        for follower in ticket.followers:
+            if follower.done():
+                continue
+            if exc is not None:
+                follower.set_exception(exc)
+            else:
+                follower.set_result(result)
+
+    def _release(self, chat: Hashable) -> None:
+        self._busy.discard(chat)
+        if self.queued:
+            self._start()
+
+    def _start(self) -> None:
+        if self._wakeup is None or self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="outbound-limiter")
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        """Grant turns as buckets allow; sleep until the next one can go."""
+        while True:
+            self._wakeup.clear()
+            delay = self._grant_ready()
+            if delay is None:
+                await self._wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except TimeoutError:
+                pass
+
+    def _grant_ready(self) -> float | None:
+        """Grant every ticket that may go now, lanes in priority order.
+
+        Returns:
+            Seconds until another ticket could go, or None to wait for a
+            new request or a chat's request to finish.
+        """
+        next_ready: float | None = None
+        granted = True
+        while granted:
+            granted = False
+            now = self._clock()
+            blocked: set[Hashable] = set()
+            for lane in LANES:
+                queue = self._lanes[lane]
+                for ticket in queue:
+                    if ticket.chat in blocked or ticket.chat in self._busy:
+                        continue
+                    chat_bucket = self._chat_bucket(ticket.chat)
+                    ready = max(self._global.ready_at(now), chat_bucket.ready_at(now))
+                    if lane == BULK:
+                        ready = max(ready, self._bulk.ready_at(now))
+                    if ready > now:
+                        # Later tickets of the chat keep their order behind this one
+                        blocked.add(ticket.chat)
+                        next_ready = ready if next_ready is None else min(next_ready, ready)
+                        continue
+                    self._grant(queue, ticket, chat_bucket, now)
+                    granted = True
+                    break
+                if granted:
+                    next_ready = None
+                    break
+        if next_ready is None:
+            # Nothing waits, or only chats with a request on the wire
+            return None
+        return max(0.0, next_ready - self._clock())
+
+    def _grant(
+        self, queue: deque[_Ticket], ticket: _Ticket, chat_bucket: _Bucket, now: float
+    ) -> None:
+        queue.remove(ticket)
+        if ticket.key is not None and self._edits.get(ticket.key) is ticket:
+            del self._edits[ticket.key]
+        if ticket.turn.done():
+            return
+        self._global.take(now)
+        chat_bucket.take(now)
+        if ticket.lane == BULK:
+            self._bulk.take(now)
+        self._busy.add(ticket.chat)
+        ticket.turn.set_result(None)
@@ -0,0 +1,181 @@
+"""
+Extract a single receipt from a (possibly multi-page) PDF.
+
+Pages with embedded text are parsed from that text, skipping vision
+entirely. Scanned pages are rasterized in a process pool and sent to the
+vision chain. Pages run concurrently under a per-document cap, and the
+per-page results are merged into one Receipt.
+
+Usage:
+    uv run python src/tools/pdf_extractor.py --pdf-path invoice.pdf
+"""
+
+import argparse
+import base64
+import contextvars
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.schemas.receipt import Receipt, ReceiptItem
+from src.tools import pdf_raster
+from src.tools.image_extractor import get_llm, image_extraction_chain
+
+logger = logging.getLogger(__name__)
+
+PROMPT_PATH = Path(__file__).resolve().parents[1] / "prompts" / "text_extractor.md"
+PROMPT = PROMPT_PATH.read_text(encoding="utf-8").strip()
+
+_RASTER_POOL_LOCK = threading.Lock()
+_RASTER_POOL: ProcessPoolExecutor | None = None
+
+
+def _get_raster_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool used to rasterize pages."""
+    global _RASTER_POOL
+    with _RASTER_POOL_LOCK:
+        if _RASTER_POOL is None:
+            workers = int(os.environ.get("PDF_RASTER_WORKERS", str(os.cpu_count() or 2)))
+            _RASTER_POOL = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _RASTER_POOL
+
+
+def extract_receipt_from_text(text: str, model: str = "gpt-4o-mini") -> Receipt:
+    """Extract receipt fields from embedded page text without vision.
+
+    Args:
+        text: Text content of one page.
+        model: OpenAI model to use.
+
+    Returns:
+        Receipt parsed from the text.
+    """
+    llm_with_structure = get_llm(model, route="pdf_extractor").with_structured_output(Receipt)
+    return llm_with_structure.invoke(
+        [
+            {"role": "system", "content": PROMPT},
+            {"role": "user", "content": text},
+        ]
+    )
+
+
+def _extract_page(
+    pdf_path: str, page_index: int, text: str, model: str, detail: str = "high"
+) -> Receipt:
+    """Extract one page, preferring embedded text over rasterized vision."""
+    min_chars = int(os.environ.get("PDF_MIN_TEXT_CHARS", "40"))
+    if len(text) >= min_chars:
+        logger.info("PDF page %s: using embedded text (%s chars)", page_index, len(text))
+        return extract_receipt_from_text(text, model=model)
+
+    logger.info("PDF page %s: rasterizing for vision", page_index)
+    png = _get_raster_pool().submit(pdf_raster.render_page_png, pdf_path, page_index).result()
+    image = f"data:image/png;base64,{base64.b64encode(png).decode('utf-8')}"
+    return image_extraction_chain.invoke({"image": image, "model": model, "detail": detail})
+
+
+def merge_receipts(receipts: list[Receipt]) -> Receipt:
+    """Merge per-page results into a single receipt.
+
+    Header fields come from the first page that has them; amounts come from
+    the last page that has them (totals usually close the document); line
+    items are concatenated in page order.
+
+    Args:
+        receipts: Per-page receipts in page order.
+
+    Returns:
+        Merged receipt.
+    """
+    header_fields = (
+        "merchant_name",
+        "merchant_address",
+        "receipt_date",
+        "receipt_time",
+        "currency",
+        "payment_method",
+    )
+    amount_fields = ("subtotal", "tax", "tip", "total")
+
+    merged: dict[str, object] = {
+        "is_receipt": any(receipt.is_receipt for receipt in receipts),
+    }
+    for field in header_fields:
+        merged[field] = next(
+            (getattr(r, field) for r in receipts if getattr(r, field) is not None), None
+        )
+    for field in amount_fields:
+        merged[field] = next(
+            (getattr(r, field) for r in reversed(receipts) if getattr(r, field) is not None),
+            None,
+        )
+
+    items: list[ReceiptItem] = []
+    for receipt in receipts:
+        items.extend(receipt.items or [])
+    merged["items"] = items
+    return Receipt(**merged)
+
+
+def extract_receipt_from_pdf(
+    pdf_path: str,
+    model: str = "gpt-4o-mini",
+    max_concurrency: int | None = None,
+    detail: str = "high",
+) -> Receipt:
+    """Extract one receipt from all pages of a PDF.
+
+    Args:
+        pdf_path: Path to the PDF file.
+        model: OpenAI model to use.
+        max_concurrency: Pages extracted at once (default PDF_PAGE_CONCURRENCY).
+        detail: Vision detail level for rasterized pages.
+
+    Returns:
+        Receipt merged from every page.
+    """
+    texts = pdf_raster.extract_page_texts(pdf_path)
+    if not texts:
+        return Receipt(is_receipt=False)
+
+    limit = max_concurrency or int(os.environ.get("PDF_PAGE_CONCURRENCY", "4"))
+    logger.info("Extracting %s PDF pages with concurrency=%s", len(texts), limit)
+    # Page threads inherit the caller's context so usage stays attributed
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=min(limit, len(texts))) as pool:
+        futures = [
+            pool.submit(
+                context.copy().run, _extract_page, pdf_path, index, texts[index], model, detail
+            )
+            for index in range(len(texts))
+        ]
+        receipts = [future.result() for future in futures]
+    return merge_receipts(receipts)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Extract a receipt from a PDF")
+    parser.add_argument("--pdf-path", required=True, help="Path to the PDF file")
+    parser.add_argument(
+        "--model",
+        default="gpt-4o-mini",
+        choices=["gpt-4o-mini", "gpt-4o"],
+        help="OpenAI model to use (default: gpt-4o-mini)",
+    )
+    args = parser.parse_args()
+
+    result = extract_receipt_from_pdf(args.pdf_path, model=args.model)
+    print(json.dumps(result.model_dump(), indent=2, ensure_ascii=False))
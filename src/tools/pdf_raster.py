@@ -0,0 +1,52 @@
+"""Page rasterization for PDF receipts, kept import-light for worker processes."""
+
+from io import BytesIO
+
+import pypdfium2 as pdfium
+
+
+def page_count(pdf_path: str) -> int:
+    """Return the number of pages in a PDF."""
+    document = pdfium.PdfDocument(pdf_path)
+    try:
+        return len(document)
+    finally:
+        document.close()
+
+
+def extract_page_texts(pdf_path: str) -> list[str]:
+    """Return the embedded text of every page (empty for scanned pages)."""
+    document = pdfium.PdfDocument(pdf_path)
+    try:
+        texts = []
+        for page in document:
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_bounded().strip())
+            textpage.close()
+            page.close()
+        return texts
+    finally:
+        document.close()
+
+
+def render_page_png(pdf_path: str, page_index: int, scale: float = 2.0) -> bytes:
+    """Render one PDF page to PNG bytes.
+
+    Args:
+        pdf_path: Path to the PDF file.
+        page_index: Zero-based page index.
+        scale: Render scale (1.0 = 72 dpi).
+
+    Returns:
+        PNG-encoded page image.
+    """
+    document = pdfium.PdfDocument(pdf_path)
+    try:
+        page = document[page_index]
+        bitmap = page.render(scale=scale)
+        buffer = BytesIO()
+        bitmap.to_pil().save(buffer, format="PNG", optimize=False)
+        page.close()
+        return buffer.getvalue()
+    finally:
+        document.close()
@@ -0,0 +1,226 @@
+"""
+Memoized planner decisions keyed on the canonical planning state.
+
+The planner only sees a handful of presence flags and the user's message,
+so the same shapes recur all day. ``AgentPlan`` builds an id-free key from
+those flags and a normalized class of the message; this cache maps keys to
+the chosen ``next_action`` with LRU and TTL eviction, optionally persisted
+in SQLite (``PLANNER_CACHE_PATH``) so restarts start warm.
+
+``PLANNER_CACHE`` selects the mode:
+
+- ``off`` (default): no caching.
+- ``shadow``: the LLM still plans every message; cached decisions are only
+  compared with its answers to measure agreement.
+- ``on``: hits skip the LLM. A ``PLANNER_CACHE_SHADOW_RATE`` sample of hits
+  is re-planned in the background; a disagreeing entry is replaced.
+
+Agreement is exported as ``planner_cache_shadow_total{outcome}``.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from src.tools.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "shadow", "on")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    key TEXT PRIMARY KEY,
+    next_action TEXT NOT NULL,
+    stored_at REAL NOT NULL
+)
+"""
+
+_CACHE_LOCK = threading.Lock()
+_CACHE: PlannerCache | None = None
+
+LOOKUPS = Counter(
+    "planner_cache_lookups_total",
+    "Planner cache lookups by result (hit, miss, uncacheable).",
+    ["result"],
+)
+SHADOW = Counter(
+    "planner_cache_shadow_total",
+    "Cached planner decisions checked against the LLM, by outcome.",
+    ["outcome"],
+)
+
+
+class PlannerCache:
+    """LRU/TTL map from canonical planning state to ``next_action``."""
+
+    def __init__(
+        self,
+        mode: str = "on",
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        path: str | Path | None = None,
+        shadow_rate: float = 0.05,
+    ) -> None:
+        """Create a cache.
+
+        Args:
+            mode: ``shadow`` or ``on`` (see the module docstring).
+            max_entries: Entries kept before the least recently used is dropped.
+            ttl: Seconds a decision stays valid.
+            path: SQLite file persisting decisions across restarts (optional).
+            shadow_rate: Share of hits re-planned by the LLM in ``on`` mode.
+        """
+        if mode not in MODES[1:]:
+            raise ValueError(f"Unknown planner cache mode: {mode}")
+        self.mode = mode
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shadow_rate = shadow_rate
+        self.path = Path(path) if path else None
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hit": 0, "miss": 0, "agree": 0, "disagree": 0}
+        self._rng = random.Random()
+        # At most two background re-plans at a time; extra samples are skipped
+        self._shadow_slots = threading.BoundedSemaphore(2)
+        self._db: sqlite3.Connection | None = None
+        if self.path is not None:
+            self._open()
+
+    @classmethod
+    def from_env(cls) -> PlannerCache | None:
+        """Configure from ``PLANNER_CACHE*`` variables; None when off."""
+        mode = os.getenv("PLANNER_CACHE", "off").lower()
+        if mode == "off":
+            return None
+        return cls(
+            mode=mode,
+            max_entries=int(os.getenv("PLANNER_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("PLANNER_CACHE_TTL_SECONDS", "3600")),
+            path=os.getenv("PLANNER_CACHE_PATH") or None,
+            shadow_rate=float(os.getenv("PLANNER_CACHE_SHADOW_RATE", "0.05")),
+        )
+
+    @property
+    def serves_hits(self) -> bool:
+        """Whether hits replace the LLM call."""
+        return self.mode == "on"
+
+    def get(self, key: str | None) -> str | None:
+        """Return the cached decision for key, or None when absent or expired.
+
+        A None key (a state the planner does not cache) is only counted.
+        """
+        if key is None:
+            LOOKUPS.labels("uncacheable").inc()
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] >= self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self._stats["miss"] += 1
+            else:
+                self._entries.move_to_end(key)
+                self._stats["hit"] += 1
+        LOOKUPS.labels("miss" if entry is None else "hit").inc()
+        return entry[0] if entry is not None else None
+
+    def put(self, key: str, next_action: str) -> None:
+        """Store a decision, evicting the least recently used past the bound."""
+        stored_at = time.time()
+        with self._lock:
+            self._entries[key] = (next_action, stored_at)
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO decisions (key, next_action, stored_at) VALUES (?, ?, ?)",
+                    (key, next_action, stored_at),
+                )
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def compare(self, key: str, cached: str, live: str) -> bool:
+        """Record whether a cached decision matches the LLM; keep the LLM's."""
+        agree = cached == live
+        outcome = "agree" if agree else "disagree"
+        with self._lock:
+            self._stats[outcome] += 1
+        SHADOW.labels(outcome).inc()
+        if not agree:
+            logger.info("Planner cache disagreement for %s: cached=%s live=%s", key, cached, live)
+            self.put(key, live)
+        return agree
+
+    def sample_shadow(self) -> bool:
+        """Return whether this hit should be re-planned, reserving a slot if so.
+
+        Callers that get True must call ``release_shadow`` when done.
+        """
+        with self._lock:
+            sampled = self._rng.random() < self.shadow_rate
+        return sampled and self._shadow_slots.acquire(blocking=False)
+
+    def release_shadow(self) -> None:
+        """Free the slot taken by ``sample_shadow``."""
+        self._shadow_slots.release()
+
+    def stats(self) -> dict[str, float]:
+        """Return hit rate and shadow agreement so far."""
+        with self._lock:
+            stats: dict[str, float] = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hit"] + stats["miss"]
+        checked = stats["agree"] + stats["disagree"]
+        stats["hit_rate"] = stats["hit"] / lookups if lookups else 0.0
+        stats["agreement"] = stats["agree"] / checked if checked else 0.0
+        return stats
+
+    def close(self) -> None:
+        """Close the persistence file."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _open(self) -> None:
+        """Open the SQLite file and load its unexpired, most recent entries."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(_SCHEMA)
+        self._db.execute("DELETE FROM decisions WHERE stored_at < ?", (time.time() - self.ttl,))
+        rows = self._db.execute(
+            "SELECT key, next_action, stored_at FROM decisions ORDER BY stored_at DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for key, next_action, stored_at in reversed(rows):
+            self._entries[key] = (next_action, stored_at)
+        logger.info("Loaded %s planner decisions from %s", len(rows), self.path)
+
+    def _drop(self, key: str) -> None:
+        """Remove an entry (caller holds the lock)."""
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM decisions WHERE key = ?", (key,))
+
+
+def get_planner_cache() -> PlannerCache | None:
+    """Return the process-wide cache, or None when PLANNER_CACHE is off."""
+    global _CACHE
+    if os.getenv("PLANNER_CACHE", "off").lower() == "off":
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = PlannerCache.from_env()
+        return _CACHE
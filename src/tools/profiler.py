@@ -0,0 +1,285 @@
+"""
+On-demand sampling profiler for the live bot and worker processes.
+
+A background thread samples every thread's stack (``sys._current_frames``)
+every ``PROFILE_INTERVAL_MS`` and counts them as collapsed stacks, the
+input format of flamegraph.pl and speedscope. Samples of the event loop
+thread are rooted at the asyncio task that was running, and a heartbeat
+scheduled on the loop marks samples taken while it has not run for
+``PROFILE_BLOCK_MS`` as ``loop-blocked``, so time spent blocking the loop
+(JSON dumps, ``model_copy``, base64) stands out from time in worker
+threads.
+
+Triggered by the admin ``/profile <seconds>`` command, by ``SIGUSR1``
+(``PROFILE_SIGNAL_SECONDS``, written to ``PROFILE_DIR``), and per update:
+``PROFILE_UPDATE_RATE`` of handled updates are captured with cProfile into
+``PROFILE_DIR/*.prof``. cProfile sees every thread, so concurrent updates
+show up in each other's captures.
+
+Usage (render a capture):
+    flamegraph.pl profiles/profile-*.folded > flame.svg
+    uv run python -m pstats profiles/update-text-*.prof
+"""
+
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import logging
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+MAX_PROFILE_SECONDS = 300
+STACK_DEPTH = 64
+
+# One sampling session and one cProfile capture at a time per process
+_SESSION_LOCK = threading.Lock()
+_CPROFILE_LOCK = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a sampling session is already running."""
+
+
+def profile_dir() -> Path:
+    """Directory for captures (PROFILE_DIR)."""
+    return Path(os.getenv("PROFILE_DIR", "profiles"))
+
+
+class ProfileResult(NamedTuple):
+    """Collapsed stacks of one sampling session."""
+
+    stacks: Counter[str]
+    samples: int
+    seconds: float
+    loop_blocked_samples: int
+    loop_samples: int
+    max_loop_lag: float
+
+    def collapsed(self) -> str:
+        """Render as ``frame;frame;frame count`` lines."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def write(self, directory: Path) -> Path:
+        """Write the collapsed stacks to a ``.folded`` file and return its path."""
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"profile-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.folded"
+        path.write_text(self.collapsed(), encoding="utf-8")
+        return path
+
+    def summary(self, top: int = 8) -> str:
+        """Short text: loop health and the frames with most self samples."""
+        lines = [
+            f"{self.samples} samples over {self.seconds:.1f}s",
+            f"event loop blocked in {self.loop_blocked_samples}/{self.loop_samples} samples, "
+            f"max lag {self.max_loop_lag * 1000:.0f} ms",
+        ]
+        leaves: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        for frame, count in leaves.most_common(top):
+            lines.append(f"{100 * count / total:5.1f}% {frame}")
+        return "\n".join(lines)
+
+
+class SamplingProfiler:
+    """Sample all thread stacks from a background thread."""
+
+    def __init__(
+        self,
+        interval: float = 0.005,
+        loop: asyncio.AbstractEventLoop | None = None,
+        block_threshold: float = 0.1,
+    ) -> None:
+        """Create a profiler.
+
+        Args:
+            interval: Seconds between samples.
+            loop: Event loop to watch; must be running in the thread that
+                calls ``start``.
+            block_threshold: Heartbeat lag after which the loop counts as blocked.
+        """
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self._loop = loop
+        self._loop_thread = threading.get_ident() if loop is not None else None
+        self._stacks: Counter[str] = Counter()
+        self._labels: dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._samples = 0
+        self._loop_samples = 0
+        self._blocked_samples = 0
+        self._beat_sent: float | None = None
+        self._max_lag = 0.0
+        self._started = 0.0
+
+    def start(self) -> None:
+        """Start sampling."""
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> ProfileResult:
+        """Stop sampling and return the collected stacks."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return ProfileResult(
+            stacks=self._stacks,
+            samples=self._samples,
+            seconds=time.perf_counter() - self._started,
+            loop_blocked_samples=self._blocked_samples,
+            loop_samples=self._loop_samples,
+            max_loop_lag=self._max_lag,
+        )
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            blocked = self._loop_blocked()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                root = names.get(thread_id, str(thread_id))
+                if thread_id == self._loop_thread:
+                    root = self._loop_root(blocked)
+                self._stacks[f"{root};{self._collapse(frame)}"] += 1
+            self._samples += 1
+
+    def _loop_blocked(self) -> bool:
+        """Send a heartbeat to the loop; True while the last one is overdue."""
+        if self._loop is None:
+            return False
+        now = time.perf_counter()
+        sent = self._beat_sent
+        if sent is None:
+            self._beat_sent = now
+            try:
+                self._loop.call_soon_threadsafe(self._beat, now)
+            except RuntimeError:
+                self._loop = None  # loop closed
+            return False
+        lag = now - sent
+        self._max_lag = max(self._max_lag, lag)
+        return lag >= self.block_threshold
+
+    def _beat(self, sent: float) -> None:
+        self._max_lag = max(self._max_lag, time.perf_counter() - sent)
+        self._beat_sent = None
+
+    def _loop_root(self, blocked: bool) -> str:
+        """Root frame for the loop thread: blocked state and the running task."""
+        self._loop_samples += 1
+        task = asyncio.tasks._current_tasks.get(self._loop)
+        name = f"task {task.get_name()}" if task is not None else "idle"
+        if blocked:
+            self._blocked_samples += 1
+            return f"loop-blocked;{name}"
+        return f"loop;{name}"
+
+    def _collapse(self, frame) -> str:
+        """Render a frame chain root-first, labelling each code object once."""
+        parts = []
+        while frame is not None and len(parts) < STACK_DEPTH:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                path = Path(code.co_filename)
+                label = f"{code.co_qualname} ({path.parent.name}/{path.name}:{code.co_firstlineno})"
+                label = label.replace(";", ":")
+                self._labels[code] = label
+            parts.append(label)
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+
+async def profile_for(seconds: float) -> ProfileResult:
+    """Sample the process (watching the running loop) for ``seconds``.
+
+    Raises:
+        ProfilerBusy: Another session is running.
+    """
+    if not _SESSION_LOCK.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        profiler = SamplingProfiler(
+            interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+            loop=asyncio.get_running_loop(),
+            block_threshold=float(os.getenv("PROFILE_BLOCK_MS", "100")) / 1000,
+        )
+        profiler.start()
+        try:
+            await asyncio.sleep(min(seconds, MAX_PROFILE_SECONDS))
+        finally:
+            result = profiler.stop()
+    finally:
+        _SESSION_LOCK.release()
+    return result
+
+
+async def profile_to_disk(seconds: float) -> Path | None:
+    """Run a session and write it to PROFILE_DIR; None if one is running."""
+    try:
+        result = await profile_for(seconds)
+    except ProfilerBusy:
+        logger.warning("Profile requested while another one is running")
+        return None
+    path = await asyncio.to_thread(result.write, profile_dir())
+    logger.info("Wrote profile %s\n%s", path, result.summary())
+    return path
+
+
+def install_profile_signal(loop: asyncio.AbstractEventLoop) -> None:
+    """Profile for PROFILE_SIGNAL_SECONDS on SIGUSR1 (where supported)."""
+    if not hasattr(signal, "SIGUSR1"):
+        return
+    seconds = float(os.getenv("PROFILE_SIGNAL_SECONDS", "30"))
+    tasks: set[asyncio.Task] = set()
+
+    def start() -> None:
+        task = loop.create_task(profile_to_disk(seconds))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    loop.add_signal_handler(signal.SIGUSR1, start)
+
+
+@contextmanager
+def profile_update(label: str) -> Iterator[None]:
+    """Capture the block with cProfile for PROFILE_UPDATE_RATE of calls."""
+    rate = float(os.getenv("PROFILE_UPDATE_RATE", "0"))
+    if rate <= 0 or random.random() >= rate or not _CPROFILE_LOCK.acquire(blocking=False):
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool owns the interpreter's monitoring hooks
+        _CPROFILE_LOCK.release()
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _CPROFILE_LOCK.release()
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"update-{label}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.prof"
+        profiler.dump_stats(path)
+        logger.info("Wrote update profile %s", path)
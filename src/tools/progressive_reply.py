@@ -0,0 +1,97 @@
+"""Placeholder reply that is edited in place while the graph runs."""
+
+import asyncio
+import logging
+import time
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+
+def retry_after_seconds(exc: RetryAfter) -> float:
+    """Return a RetryAfter delay in seconds (int or timedelta depending on PTB)."""
+    value = exc.retry_after
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+class ProgressiveReply:
+    """Post a placeholder message and edit it with throttled progress updates.
+
+    Intermediate edits are coalesced so at most one edit is sent every
+    ``min_interval`` seconds; the latest text always wins. ``finish`` sends
+    the final text immediately.
+    """
+
+    def __init__(self, source: Message, min_interval: float = 1.0) -> None:
+        self._source = source
+        self._min_interval = min_interval
+        self._message: Message | None = None
+        self._shown_text: str | None = None
+        self._pending_text: str | None = None
+        self._last_edit = 0.0
+        self._deferred: asyncio.Task | None = None
+
+    @property
+    def source(self) -> Message:
+        """Message this reply answers."""
+        return self._source
+
+    @property
+    def message_id(self) -> int | None:
+        """Id of the placeholder message once it has been sent."""
+        return self._message.message_id if self._message is not None else None
+
+    async def start(self, text: str) -> None:
+        """Send the placeholder message."""
+        self._message = await self._source.reply_text(text)
+        self._shown_text = text
+        self._last_edit = time.monotonic()
+
+    async def update(self, text: str) -> None:
+        """Show new progress text, throttled to respect Telegram limits."""
+        self._pending_text = text
+        wait = self._min_interval - (time.monotonic() - self._last_edit)
+        if wait <= 0:
+            await self._flush()
+        elif self._deferred is None:
+            self._deferred = asyncio.create_task(self._flush_later(wait))
+
+    async def finish(self, text: str) -> None:
+        """Replace the placeholder with the final text."""
+        if self._deferred is not None:
+            self._deferred.cancel()
+            self._deferred = None
+        if self._message is None:
+            await self._source.reply_text(text)
+            return
+        self._pending_text = text
+        await self._flush(final=True)
+
+    async def _flush_later(self, delay: float) -> None:
+        """Send the coalesced edit once the throttle window has passed."""
+        await asyncio.sleep(delay)
+        self._deferred = None
+        await self._flush()
+
+    async def _flush(self, final: bool = False) -> None:
+        """Edit the message with the most recent pending text."""
+        text = self._pending_text
+        if self._message is None or not text or text == self._shown_text:
+            return
+        try:
+            await self._message.edit_text(text)
+        except RetryAfter as exc:
+            if not final:
+                logger.info(
+                    "Skipping progress edit, flood control for %ss", retry_after_seconds(exc)
+                )
+                return
+            await asyncio.sleep(retry_after_seconds(exc))
+            await self._message.edit_text(text)
+        except BadRequest as exc:
+            if "not modified" not in str(exc).lower():
+                raise
+        self._shown_text = text
+        self._last_edit = time.monotonic()
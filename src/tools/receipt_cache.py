@@ -0,0 +1,351 @@
+"""
+Read-through local disk cache for receipt files stored in MinIO.
+
+Entries live under ``RECEIPT_CACHE_DIR`` with a SQLite index tracking size
+and last access for LRU eviction. Writes are atomic (temp file + rename),
+reads are memory-mapped, and concurrent misses for the same key, whether
+from threads or other processes, are coalesced into a single download.
+Callers read entries through ``pinned``, which holds a shared lock on the
+key's stripe that eviction (in any process) will not break, so a path handed
+out is never deleted while it is in use. Keys map onto ``LOCK_STRIPES`` lock
+files, so the lock directory does not grow with the number of keys. Objects
+larger than the cache are never stored; ``pinned`` serves them from a
+temporary file instead.
+
+Usage (print hit rate and bytes saved):
+    uv run python src/tools/receipt_cache.py --dir .cache/receipts
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+_INDEX_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        filename TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        last_access REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS entries_last_access_idx ON entries(last_access)",
+    "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+)
+
+# Keys share a fixed pool of lock files, so locks/ stays bounded like the cache
+LOCK_STRIPES = 256
+
+_CACHE_LOCK = threading.Lock()
+_CACHE: ReceiptCache | None = None
+
+
+class ReceiptCache:
+    """Size-bounded LRU cache of receipt files on local disk."""
+
+    def __init__(self, directory: str | Path, max_bytes: int) -> None:
+        """Create or open a cache directory.
+
+        Args:
+            directory: Cache root directory.
+            max_bytes: Total size bound before LRU eviction kicks in.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._objects_dir = self.directory / "objects"
+        self._locks_dir = self.directory / "locks"
+        self._index_path = self.directory / "index.sqlite3"
+        self._stripe_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+        self._objects_dir.mkdir(parents=True, exist_ok=True)
+        self._locks_dir.mkdir(parents=True, exist_ok=True)
+        with self._index() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _INDEX_SCHEMA:
+                conn.execute(statement)
+
+    def get(self, key: str) -> Path | None:
+        """Return the cached file path for key and mark it as recently used.
+
+        The path is not pinned; use ``pinned`` to read it safely.
+        """
+        with self._transaction() as conn:
+            return self._lookup(conn, key, count_hit=False)
+
+    def put(self, key: str, data: bytes, suffix: str = "") -> Path | None:
+        """Atomically store data under key and evict old entries if needed.
+
+        Returns:
+            The cached path, or None when data is larger than the cache.
+        """
+        if len(data) > self.max_bytes:
+            logger.info("Not caching key=%s: %s bytes exceeds the cache size", key, len(data))
+            return None
+
+        filename = f"{self._safe_name(key)}{suffix}"
+        path = self._objects_dir / filename
+        fd, tmp_path = tempfile.mkstemp(dir=self._objects_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._index() as conn:
+            conn.execute(
+                """
+                INSERT INTO entries (key, filename, size, last_access) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE
+                SET filename = excluded.filename,
+                    size = excluded.size,
+                    last_access = excluded.last_access
+                """,
+                (key, filename, len(data), time.time()),
+            )
+        self._evict(keep=key)
+        return path
+
+    @contextmanager
+    def pinned(self, key: str, fetch: Callable[[], tuple[bytes, str]]) -> Iterator[Path]:
+        """Yield a local path for key, downloading it once on a miss.
+
+        The entry is pinned until the block exits: eviction skips it, so the
+        path stays readable even if other writers fill the cache meanwhile.
+
+        Args:
+            key: Cache key (content hash or file id).
+            fetch: Callable returning (bytes, suffix) on a miss.
+
+        Yields:
+            Path to the cached file, or to a temporary copy when the object
+            is too large to cache.
+        """
+        with self._pin(key):
+            path = self._hit(key)
+            if path is None:
+                with self._coalesce(key):
+                    path = self._hit(key)
+                    if path is None:
+                        data, suffix = fetch()
+                        with self._index() as conn:
+                            self._count(conn, misses=1, bytes_fetched=len(data))
+                        path = self.put(key, data, suffix)
+            if path is not None:
+                yield path
+                return
+            with self._uncached(data, suffix) as tmp_path:
+                yield tmp_path
+
+    def stats(self) -> dict[str, float]:
+        """Return hit/miss counters, hit rate and bytes saved."""
+        with self._index() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            usage = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "bytes_saved": counters.get("bytes_saved", 0),
+            "bytes_fetched": counters.get("bytes_fetched", 0),
+            "entries": usage[0],
+            "size_bytes": usage[1],
+        }
+
+    def _hit(self, key: str) -> Path | None:
+        """Return the cached path for key, counting the hit."""
+        with self._transaction() as conn:
+            return self._lookup(conn, key, count_hit=True)
+
+    def _lookup(self, conn: sqlite3.Connection, key: str, count_hit: bool) -> Path | None:
+        """Find key's file, touch its last access and optionally count a hit."""
+        row = conn.execute("SELECT filename, size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        path = self._objects_dir / row[0]
+        if not path.exists():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        if count_hit:
+            self._count(conn, hits=1, bytes_saved=row[1])
+        return path
+
+    @contextmanager
+    def _uncached(self, data: bytes, suffix: str) -> Iterator[Path]:
+        """Hold data in a temporary file outside the index."""
+        fd, tmp_path = tempfile.mkstemp(dir=self._objects_dir, prefix=".tmp-", suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            yield Path(tmp_path)
+        finally:
+            os.remove(tmp_path)
+
+    def _count(self, conn: sqlite3.Connection, **amounts: int) -> None:
+        """Increment persistent stats counters on the caller's connection."""
+        conn.executemany(
+            """
+            INSERT INTO stats (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+            """,
+            amounts.items(),
+        )
+
+    def _evict(self, keep: str) -> None:
+        """Remove least recently used entries until the size bound holds.
+
+        Args:
+            keep: Key just written; never evicted by its own write.
+        """
+        with self._index() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = conn.execute(
+                "SELECT key, filename, size FROM entries WHERE key <> ? ORDER BY last_access ASC",
+                (keep,),
+            ).fetchall()
+            for key, filename, size in rows:
+                if total <= self.max_bytes:
+                    break
+                with open(self._lock_path(key, ".pin"), "a") as handle:
+                    try:
+                        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # Pinned by a reader (of it or a key on its stripe)
+                        continue
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    (self._objects_dir / filename).unlink(missing_ok=True)
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+                total -= size
+                logger.debug("Evicted cached receipt key=%s size=%s", key, size)
+
+    @contextmanager
+    def _coalesce(self, key: str) -> Iterator[None]:
+        """Hold the key's lock stripe across threads and processes."""
+        with self._stripe_locks[self._stripe(key)]:
+            with open(self._lock_path(key, ".lock"), "a") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _pin(self, key: str) -> Iterator[None]:
+        """Hold a shared lock on key that keeps eviction away from it."""
+        with open(self._lock_path(key, ".pin"), "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _lock_path(self, key: str, suffix: str) -> Path:
+        """Lock file of key's stripe under the locks directory."""
+        return self._locks_dir / f"{self._stripe(key):02x}{suffix}"
+
+    def _stripe(self, key: str) -> int:
+        """Lock stripe of key; keys sharing one only wait on each other."""
+        return int(self._safe_name(key)[:8], 16) % LOCK_STRIPES
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the block's statements as one write transaction."""
+        with self._index() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def _index(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived autocommit connection to the index."""
+        conn = sqlite3.connect(self._index_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _safe_name(self, key: str) -> str:
+        """Map an arbitrary key to a filesystem-safe name."""
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def read_mapped(path: str | Path) -> Iterator[memoryview]:
+    """Memory-map a file read-only and yield a zero-copy view of it.
+
+    Args:
+        path: File to map.
+
+    Yields:
+        memoryview over the file contents.
+    """
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size == 0:
+            yield memoryview(b"")
+            return
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+            mapped.close()
+
+
+def get_receipt_cache() -> ReceiptCache | None:
+    """Return the process-wide cache, or None when RECEIPT_CACHE_DIR is unset."""
+    global _CACHE
+    directory = os.environ.get("RECEIPT_CACHE_DIR", "")
+    if not directory:
+        return None
+
+    with _CACHE_LOCK:
+        if _CACHE is None or _CACHE.directory != Path(directory):
+            max_bytes = int(os.environ.get("RECEIPT_CACHE_MAX_MB", "512")) * 1024 * 1024
+            _CACHE = ReceiptCache(directory, max_bytes)
+        return _CACHE
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the local receipt cache")
+    parser.add_argument(
+        "--dir",
+        default=os.environ.get("RECEIPT_CACHE_DIR", ""),
+        help="Cache directory (default: RECEIPT_CACHE_DIR)",
+    )
+    args = parser.parse_args()
+
+    if not args.dir:
+        parser.error("--dir or RECEIPT_CACHE_DIR is required")
+
+    cache = ReceiptCache(args.dir, int(os.environ.get("RECEIPT_CACHE_MAX_MB", "512")) * 1024 * 1024)
+    for name, value in cache.stats().items():
+        print(f"{name:<14} {value:.2%}" if name == "hit_rate" else f"{name:<14} {value}")
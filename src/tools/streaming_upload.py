@@ -0,0 +1,231 @@
+"""Stream Telegram files into MinIO without buffering whole files in memory."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from typing import AsyncIterator, Awaitable
+
+import httpx
+from minio import Minio
+from minio.commonconfig import CopySource
+from telegram import File
+
+from src.tools.metrics import BoundTimer
+from src.tools.minio_storage import (
+    OP_BYTES,
+    OP_SECONDS,
+    StoredObject,
+    content_object_name,
+    ensure_bucket,
+    object_exists,
+)
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+PART_SIZE = 5 * 1024 * 1024
+STAGING_PREFIX = "incoming/"
+
+_HTTP_CLIENT: httpx.AsyncClient | None = None
+
+STREAM_PUT_OP = BoundTimer(OP_SECONDS, OP_BYTES, "stream_put")
+
+
+class _HashingQueueReader:
+    """Blocking file-like reader fed from the event loop through a bounded queue.
+
+    MinIO's uploader calls ``read`` from a worker thread; each call pulls
+    chunks produced by the download coroutine and updates the SHA-256 digest
+    in the same pass.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_chunks: int) -> None:
+        self._loop = loop
+        self._queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=max_chunks)
+        self._pending = memoryview(b"")
+        self._finished = False
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    async def feed(self, chunk: bytes) -> None:
+        """Queue a downloaded chunk, waiting while the buffer is full."""
+        await self._queue.put(chunk)
+
+    async def close(self) -> None:
+        """Signal end of stream to the reader."""
+        await self._queue.put(None)
+
+    def abort(self) -> None:
+        """Drop buffered chunks and unblock the reader with EOF."""
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    def read(self, size: int = -1) -> bytes:
+        """Return up to size bytes, blocking until data or EOF is available."""
+        if not self._pending and not self._finished:
+            chunk = asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop).result()
+            if chunk is None:
+                self._finished = True
+            else:
+                self._digest.update(chunk)
+                self.size += len(chunk)
+                self._pending = memoryview(chunk)
+
+        if not self._pending:
+            return b""
+        if size < 0 or size >= len(self._pending):
+            data, self._pending = self._pending, memoryview(b"")
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        return data.tobytes()
+
+    def hexdigest(self) -> str:
+        """Return the SHA-256 hex digest of everything read so far."""
+        return self._digest.hexdigest()
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return a shared HTTP client for Telegram file downloads."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        _HTTP_CLIENT = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+    return _HTTP_CLIENT
+
+
+async def iter_telegram_file(file: File, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield a Telegram file's content in chunks.
+
+    Args:
+        file: Telegram File returned by ``bot.get_file``.
+        chunk_size: Download chunk size in bytes.
+
+    Yields:
+        Byte chunks of the file.
+    """
+    file_path = file.file_path or ""
+    if os.path.exists(file_path):
+        with open(file_path, "rb") as handle:
+            while chunk := await asyncio.to_thread(handle.read, chunk_size):
+                yield chunk
+        return
+
+    async with _get_http_client().stream("GET", file_path) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes(chunk_size):
+            yield chunk
+
+
+async def stream_to_minio(
+    chunks: AsyncIterator[bytes],
+    client: Minio,
+    bucket: str,
+    content_type: str,
+    metadata: dict[str, str] | None = None,
+    max_buffered_chunks: int = 4,
+) -> StoredObject:
+    """Pipe chunks into a multipart upload and store them content-addressed.
+
+    Bytes are uploaded to a staging key while their hash is computed, then
+    copied server-side to ``sha256/...`` (or dropped if that content already
+    exists). Memory per upload is bounded by one multipart part plus
+    ``max_buffered_chunks`` download chunks.
+
+    Args:
+        chunks: Async iterator of file content.
+        client: MinIO client.
+        bucket: Bucket name.
+        content_type: MIME type.
+        metadata: Optional object metadata.
+        max_buffered_chunks: Download chunks buffered ahead of the uploader.
+
+    Returns:
+        StoredObject describing the content-addressed object.
+    """
+    ensure_bucket(client, bucket)
+    loop = asyncio.get_running_loop()
+    reader = _HashingQueueReader(loop, max_buffered_chunks)
+    staging_name = f"{STAGING_PREFIX}{uuid.uuid4().hex}"
+
+    started = time.perf_counter()
+    upload = asyncio.ensure_future(
+        asyncio.to_thread(
+            client.put_object,
+            bucket,
+            staging_name,
+            reader,
+            length=-1,
+            part_size=PART_SIZE,
+            content_type=content_type,
+            metadata=metadata,
+        )
+    )
+    try:
+        async for chunk in chunks:
+            if not await _until_upload_fails(reader.feed(chunk), upload):
+                break
+        await _until_upload_fails(reader.close(), upload)
+        await upload
+    except BaseException:
+        reader.abort()
+        await asyncio.gather(upload, return_exceptions=True)
+        await asyncio.to_thread(_remove_quietly, client, bucket, staging_name)
+        raise
+    STREAM_PUT_OP.observe(started, reader.size)
+
+    digest = reader.hexdigest()
+    object_name = content_object_name(digest)
+    exists = await asyncio.to_thread(object_exists, client, bucket, object_name)
+    if not exists:
+        await asyncio.to_thread(
+            client.copy_object, bucket, object_name, CopySource(bucket, staging_name)
+        )
+    await asyncio.to_thread(client.remove_object, bucket, staging_name)
+
+    logger.info("Streamed %s bytes to MinIO: %s (new=%s)", reader.size, object_name, not exists)
+    return StoredObject(object_name, digest, reader.size, not exists)
+
+
+async def _until_upload_fails(step: Awaitable[None], upload: asyncio.Future) -> bool:
+    """Await a queue operation unless the upload finishes (fails) first."""
+    task = asyncio.ensure_future(step)
+    await asyncio.wait({task, upload}, return_when=asyncio.FIRST_COMPLETED)
+    if task.done():
+        return True
+    task.cancel()
+    return False
+
+
+def _remove_quietly(client: Minio, bucket: str, object_name: str) -> None:
+    """Best-effort removal of a staging object."""
+    try:
+        client.remove_object(bucket, object_name)
+    except Exception:
+        logger.warning("Failed to remove MinIO staging object: %s", object_name)
+
+
+async def stream_telegram_file_to_minio(
+    file: File,
+    client: Minio,
+    bucket: str,
+    content_type: str,
+    metadata: dict[str, str] | None = None,
+) -> StoredObject:
+    """Download a Telegram file and upload it to MinIO in one streaming pass.
+
+    Args:
+        file: Telegram File returned by ``bot.get_file``.
+        client: MinIO client.
+        bucket: Bucket name.
+        content_type: MIME type.
+        metadata: Optional object metadata.
+
+    Returns:
+        StoredObject describing the content-addressed object.
+    """
+    return await stream_to_minio(iter_telegram_file(file), client, bucket, content_type, metadata)
@@ -0,0 +1,140 @@
+"""
+Compact, sampled logging of workflow state and a queued log pipeline.
+
+Nodes log ``log_state(event, state)`` instead of the full state: ids,
+flags, counts and sizes, never message text, names or receipt contents.
+The full state is only rendered at DEBUG. ``LOG_STATE_SAMPLE_RATE`` keeps
+the summaries of that share of users (chosen by a hash of the user id, so a
+sampled user's turns are complete) and ``LOG_STATE_USERS`` always logs the
+listed Telegram ids.
+
+``configure_logging`` routes every record through a queue to a background
+listener thread, so writing to stderr never blocks the event loop or a
+node. ``LOG_FORMAT=json`` writes one JSON object per line, with the state
+summary under ``state``.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+from src.schemas.state import WorkflowState
+
+logger = logging.getLogger(__name__)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: QueueListener | None = None
+
+
+def summarize_state(state: WorkflowState) -> dict[str, Any]:
+    """Ids, flags, counts and sizes of a state; no user-provided content."""
+    receipt = state.receipt_json or {}
+    return {
+        "telegram_user_id": state.telegram_user_id,
+        "user_id": state.user_id,
+        "file_id": state.file_id,
+        "expense_id": state.expense_id,
+        "next_action": state.next_action,
+        "hops": state.hops,
+        "input_chars": len(state.user_input or ""),
+        "receipt": state.receipt_json is not None,
+        "receipt_items": len(receipt.get("items") or ()),
+        "receipt_updates": sorted(state.receipt_updates or ()),
+        "status_rows": None if state.status_rows is None else len(state.status_rows),
+        "batch_results": None if state.batch_results is None else len(state.batch_results),
+        "response_chars": len(state.response_text or ""),
+    }
+
+
+class _FullState:
+    """Renders the whole state only if a DEBUG record is actually emitted."""
+
+    __slots__ = ("_state",)
+
+    def __init__(self, state: WorkflowState) -> None:
+        self._state = state
+
+    def __str__(self) -> str:
+        return repr(self._state)
+
+
+def _sampled(telegram_user_id: str | None) -> bool:
+    """Per-user sampling: the same users are always in or out."""
+    if telegram_user_id and telegram_user_id in _always_logged():
+        return True
+    rate = float(os.getenv("LOG_STATE_SAMPLE_RATE", "1"))
+    if rate >= 1:
+        return True
+    bucket = zlib.crc32((telegram_user_id or "").encode()) % 10_000
+    return bucket < rate * 10_000
+
+
+def _always_logged() -> set[str]:
+    return {user.strip() for user in os.getenv("LOG_STATE_USERS", "").split(",") if user.strip()}
+
+
+def log_state(event: str, state: WorkflowState, level: int = logging.INFO) -> None:
+    """Log a state summary for ``event``; the full state is added at DEBUG."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s full state=%s", event, _FullState(state))
+    if not logger.isEnabledFor(level) or not _sampled(state.telegram_user_id):
+        return
+    summary = summarize_state(state)
+    text = " ".join(f"{key}={value}" for key, value in summary.items() if value not in (None, 0, False, []))
+    logger.log(level, "%s %s", event, text, extra={"state": summary})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        state = getattr(record, "state", None)
+        if state is not None:
+            payload["state"] = state
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging() -> QueueListener:
+    """Send root logging through a queue to a stderr handler (LOG_LEVEL, LOG_FORMAT).
+
+    Returns:
+        The running listener; it is stopped (and flushed) at exit.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(records)]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    return _listener
@@ -0,0 +1,340 @@
+"""
+Per-user, per-node LLM token and cost accounting with daily budgets.
+
+Every chat model built by ``get_chat_model`` carries a ``UsageRecorder``
+callback that reads the call's ``usage_metadata``. Calls are attributed to
+the Telegram user and graph node of the surrounding ``usage_scope`` (set by
+the graph's tracing wrapper), aggregated in memory per (day, user, node,
+model) and flushed in batches to ``llm_usage`` and the ``llm_usage_daily``
+rollup every ``LLM_USAGE_FLUSH_SECONDS``.
+
+The ledger also enforces ``LLM_DAILY_BUDGET_USD``: once a user's spend for
+the UTC day reaches it, extraction uses low-detail vision and replies are
+rendered from templates. A user's spend is the stored rollup (re-read at
+most once a minute, so other processes count too) plus what this process
+recorded since.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Iterator
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.db.llm_usage import UsageRow, user_spend, write_usage
+from src.tools.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# USD per million (input, output) tokens; dated model names match by prefix
+PRICES_PER_MILLION = {
+    "gpt-4o-mini": (Decimal("0.15"), Decimal("0.60")),
+    "gpt-4o": (Decimal("2.50"), Decimal("10.00")),
+    "gpt-4.1-nano": (Decimal("0.10"), Decimal("0.40")),
+    "gpt-4.1-mini": (Decimal("0.40"), Decimal("1.60")),
+    "gpt-4.1": (Decimal("2.00"), Decimal("8.00")),
+}
+
+SPEND_REFRESH_SECONDS = 60.0
+
+_SCOPE: ContextVar[tuple[str | None, str | None]] = ContextVar(
+    "llm_usage_scope", default=(None, None)
+)
+
+_LEDGER_LOCK = threading.Lock()
+_LEDGER: UsageLedger | None = None
+
+TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM tokens by node and direction.",
+    ["node", "direction"],
+)
+COST = Counter(
+    "llm_cost_usd_total",
+    "Estimated LLM spend in USD by node.",
+    ["node"],
+)
+DOWNGRADES = Counter(
+    "llm_budget_downgrades_total",
+    "Calls switched to a cheaper path because the user is over budget.",
+    ["node"],
+)
+
+
+@contextmanager
+def usage_scope(telegram_user_id: str | None, node: str) -> Iterator[None]:
+    """Attribute LLM calls made inside the block to a user and node."""
+    token = _SCOPE.set((telegram_user_id, node))
+    try:
+        yield
+    finally:
+        _SCOPE.reset(token)
+
+
+def cost_usd(model: str, input_tokens: int, output_tokens: int) -> Decimal:
+    """Price a call; unknown models cost 0."""
+    for name in sorted(PRICES_PER_MILLION, key=len, reverse=True):
+        if model.startswith(name):
+            input_price, output_price = PRICES_PER_MILLION[name]
+            return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    return Decimal(0)
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+class UsageLedger:
+    """In-memory usage aggregate, batch flusher and budget check."""
+
+    def __init__(
+        self,
+        database_url: str = "",
+        daily_budget: Decimal = Decimal(0),
+        flush_interval: float = 10.0,
+        flush_rows: int = 500,
+    ) -> None:
+        """Create a ledger.
+
+        Args:
+            database_url: Postgres for flushing and stored spend (optional).
+            daily_budget: Per-user USD per UTC day; 0 disables budgets.
+            flush_interval: Seconds between background flushes.
+            flush_rows: Pending aggregates that trigger an early flush.
+        """
+        self._database_url = database_url
+        self.daily_budget = daily_budget
+        self._flush_interval = flush_interval
+        self._flush_rows = flush_rows
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: dict[tuple[date, int, str, str], list[Any]] = {}
+        # (day, user) -> cost recorded here; cost already flushed; stored spend at load
+        self._local: dict[tuple[date, int], Decimal] = {}
+        self._flushed: dict[tuple[date, int], Decimal] = {}
+        self._baseline: dict[tuple[date, int], tuple[float, Decimal]] = {}
+        self._day = _today()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._flusher: threading.Thread | None = None
+
+    @classmethod
+    def from_env(cls) -> UsageLedger:
+        """Configure from DATABASE_URL, LLM_DAILY_BUDGET_USD and LLM_USAGE_FLUSH_SECONDS."""
+        return cls(
+            database_url=os.getenv("DATABASE_URL", ""),
+            daily_budget=Decimal(os.getenv("LLM_DAILY_BUDGET_USD", "0")),
+            flush_interval=float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "10")),
+        )
+
+    def record(
+        self,
+        telegram_user_id: str | int | None,
+        node: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+    ) -> Decimal:
+        """Add one call to the aggregate and return its cost."""
+        cost = cost_usd(model, input_tokens, output_tokens)
+        day = _today()
+        user = int(telegram_user_id or 0)
+        with self._lock:
+            if day != self._day:
+                self._day = day
+                self._forget_old_days()
+            if self._database_url:
+                entry = self._pending.setdefault((day, user, node, model), [0, 0, 0, Decimal(0)])
+                entry[0] += 1
+                entry[1] += input_tokens
+                entry[2] += output_tokens
+                entry[3] += cost
+            self._local[(day, user)] = self._local.get((day, user), Decimal(0)) + cost
+            pending = len(self._pending)
+
+        TOKENS.labels(node, "input").inc(input_tokens)
+        TOKENS.labels(node, "output").inc(output_tokens)
+        COST.labels(node).inc(float(cost))
+        if self._database_url:
+            self._ensure_flusher()
+            if pending >= self._flush_rows:
+                self._wake.set()
+        return cost
+
+    def spent_today(self, telegram_user_id: str | int | None) -> Decimal:
+        """Return the user's spend for the current UTC day."""
+        day = _today()
+        key = (day, int(telegram_user_id or 0))
+        baseline = self._stored_spend(key)
+        with self._lock:
+            return baseline + self._local.get(key, Decimal(0))
+
+    def over_budget(self, telegram_user_id: str | int | None) -> bool:
+        """Return whether the user reached the daily budget."""
+        if self.daily_budget <= 0 or not telegram_user_id:
+            return False
+        try:
+            return self.spent_today(telegram_user_id) >= self.daily_budget
+        except Exception:
+            logger.warning("Could not check LLM budget for %s", telegram_user_id, exc_info=True)
+            return False
+
+    def flush(self) -> int:
+        """Write the pending aggregate to the database.
+
+        Returns:
+            Rows written (0 without a database or on failure; failed rows
+            stay pending for the next flush).
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch or not self._database_url:
+                return 0
+            rows = [UsageRow(*key, *values) for key, values in batch.items()]
+            try:
+                written = write_usage(self._database_url, rows)
+            except Exception:
+                logger.warning("Failed to flush %s LLM usage rows", len(rows), exc_info=True)
+                with self._lock:
+                    for key, values in batch.items():
+                        entry = self._pending.setdefault(key, [0, 0, 0, Decimal(0)])
+                        for index, value in enumerate(values):
+                            entry[index] += value
+                return 0
+            with self._lock:
+                for row in rows:
+                    key = (row.day, row.telegram_user_id)
+                    self._flushed[key] = self._flushed.get(key, Decimal(0)) + row.cost_usd
+            return written
+
+    def close(self) -> None:
+        """Stop the background flusher and flush what is left."""
+        self._stopping = True
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=30)
+            self._flusher = None
+        self.flush()
+
+    def _stored_spend(self, key: tuple[date, int]) -> Decimal:
+        """Stored spend from other flushes and processes, refreshed once a minute."""
+        if not self._database_url:
+            return Decimal(0)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._baseline.get(key)
+        if cached is not None and now - cached[0] < SPEND_REFRESH_SECONDS:
+            return cached[1]
+
+        # Taken before the read, so a flush racing with it is never counted twice
+        with self._flush_lock:
+            stored = user_spend(self._database_url, key[1], key[0])
+            with self._lock:
+                baseline = stored - self._flushed.get(key, Decimal(0))
+                self._baseline[key] = (now, baseline)
+        return baseline
+
+    def _forget_old_days(self) -> None:
+        """Drop per-user totals of past days (caller holds the lock)."""
+        cutoff = _today() - timedelta(days=1)
+        for totals in (self._local, self._flushed, self._baseline):
+            for key in [key for key in totals if key[0] < cutoff]:
+                del totals[key]
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None or self._stopping:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_forever, name="llm-usage-flusher", daemon=True
+                )
+                self._flusher.start()
+
+    def _flush_forever(self) -> None:
+        while not self._stopping:
+            self._wake.wait(self._flush_interval)
+            self._wake.clear()
+            if self._stopping:
+                return
+            self.flush()
+
+
+class UsageRecorder(BaseCallbackHandler):
+    """LangChain callback that records ``usage_metadata`` of every chat call."""
+
+    run_inline = True
+
+    def __init__(self, route: str, ledger: UsageLedger | None = None) -> None:
+        self.route = route
+        self._ledger = ledger
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        """Record the token usage of a finished call."""
+        telegram_user_id, node = _SCOPE.get()
+        ledger = self._ledger or get_usage_ledger()
+        default_model = (response.llm_output or {}).get("model_name", "unknown")
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if not usage:
+                    continue
+                model = message.response_metadata.get("model_name") or default_model
+                ledger.record(
+                    telegram_user_id,
+                    node or self.route,
+                    model,
+                    usage.get("input_tokens", 0),
+                    usage.get("output_tokens", 0),
+                )
+
+
+def get_usage_ledger() -> UsageLedger:
+    """Return the process-wide ledger, creating it on first use."""
+    global _LEDGER
+    with _LEDGER_LOCK:
+        if _LEDGER is None:
+            _LEDGER = UsageLedger.from_env()
+        return _LEDGER
+
+
+def over_budget(telegram_user_id: str | None, node: str) -> bool:
+    """Return whether ``node`` should take its cheaper path for this user."""
+    if not get_usage_ledger().over_budget(telegram_user_id):
+        return False
+    DOWNGRADES.labels(node).inc()
+    logger.info("User %s is over the LLM budget; %s takes the cheaper path", telegram_user_id, node)
+    return True
+
+
+def format_usage_report(report: dict[str, Any], days: int) -> str:
+    """Render a ``usage_report`` for the /usage command."""
+    totals = report["totals"]
+    lines = [
+        f"📈 LLM usage, last {days} day(s)",
+        f"Spend: ${Decimal(totals['cost_usd']):.4f} over {totals['calls']} calls "
+        f"({totals['input_tokens']} in / {totals['output_tokens']} out tokens), "
+        f"{totals['users']} users",
+        "",
+        "By node (cost per call):",
+    ]
+    for row in report["by_node"]:
+        lines.append(
+            f"• {row['node']}: ${Decimal(row['cost_usd']):.4f}, {row['calls']} calls, "
+            f"${Decimal(row['cost_per_call'] or 0):.5f}/call"
+        )
+    lines += ["", "Top users:"]
+    for row in report["top_users"]:
+        lines.append(f"• {row['telegram_user_id']}: ${Decimal(row['cost_usd']):.4f} ({row['calls']} calls)")
+    return "\n".join(lines)
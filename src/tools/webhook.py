@@ -0,0 +1,162 @@
+"""Embedded ASGI server for running the bot in webhook mode."""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def build_webhook_app(
+    application: Application,
+    secret_token: str,
+    url_path: str = "telegram",
+) -> Starlette:
+    """Create the ASGI app that feeds webhook updates into the application.
+
+    Routes:
+        POST /{url_path}: Telegram webhook (secret token required).
+        GET /healthz: Liveness, always 200 while the process serves HTTP.
+        GET /readyz: Readiness, 503 until started and while draining.
+
+    Args:
+        application: Initialized python-telegram-bot application.
+        secret_token: Expected value of the secret token header.
+        url_path: Path Telegram posts updates to.
+
+    Returns:
+        Starlette application.
+    """
+    state = {"ready": False}
+
+    async def telegram_webhook(request: Request) -> Response:
+        received = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(received, secret_token):
+            logger.warning("Rejected webhook call with invalid secret token")
+            return Response(status_code=403)
+        if not state["ready"]:
+            return Response(status_code=503)
+
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except Exception:
+            logger.warning("Rejected malformed webhook payload")
+            return Response(status_code=400)
+
+        await application.update_queue.put(update)
+        return Response(status_code=200)
+
+    async def healthz(_request: Request) -> Response:
+        return PlainTextResponse("ok")
+
+    async def readyz(_request: Request) -> Response:
+        if state["ready"] and application.running:
+            return PlainTextResponse("ready")
+        return PlainTextResponse("not ready", status_code=503)
+
+    @asynccontextmanager
+    async def lifespan(_app: Starlette) -> AsyncIterator[None]:
+        state["ready"] = True
+        try:
+            yield
+        finally:
+            state["ready"] = False
+
+    return Starlette(
+        routes=[
+            Route(f"/{url_path.strip('/')}", telegram_webhook, methods=["POST"]),
+            Route("/healthz", healthz, methods=["GET"]),
+            Route("/readyz", readyz, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+async def drain_updates(application: Application, timeout: float) -> None:
+    """Wait for queued and in-flight updates to finish, up to timeout seconds."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        in_flight = application.update_processor.current_concurrent_updates
+        if application.update_queue.empty() and in_flight == 0:
+            logger.info("Update queue drained")
+            return
+        await asyncio.sleep(0.1)
+    logger.warning(
+        "Drain timed out with %s queued and %s in-flight updates",
+        application.update_queue.qsize(),
+        application.update_processor.current_concurrent_updates,
+    )
+
+
+async def run_webhook(
+    application: Application,
+    *,
+    webhook_url: str,
+    secret_token: str,
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    url_path: str = "telegram",
+    drain_timeout: float = 30.0,
+    register_webhook: bool = True,
+) -> None:
+    """Serve webhook updates until SIGINT/SIGTERM, then drain gracefully.
+
+    On shutdown the HTTP server stops accepting requests, in-flight requests
+    finish, queued updates are processed (up to ``drain_timeout``) and only
+    then is the application stopped. The application's ``post_init`` and
+    ``post_shutdown`` hooks run as they would under ``run_polling``.
+
+    Args:
+        application: Application built with ``updater(None)``.
+        webhook_url: Public base URL Telegram should post to.
+        secret_token: Secret token Telegram sends with each request.
+        host: Interface to bind.
+        port: Port to bind.
+        url_path: Path of the webhook route.
+        drain_timeout: Seconds to wait for pending updates on shutdown.
+        register_webhook: Call setWebhook on startup (disable for replicas
+            that share an already registered URL).
+    """
+    server = uvicorn.Server(
+        uvicorn.Config(
+            build_webhook_app(application, secret_token, url_path),
+            host=host,
+            port=port,
+            log_level="info",
+            timeout_graceful_shutdown=int(drain_timeout),
+        )
+    )
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        if register_webhook:
+            await application.bot.set_webhook(
+                url=f"{webhook_url.rstrip('/')}/{url_path.strip('/')}",
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        await application.start()
+        logger.info("Webhook server listening on %s:%s/%s", host, port, url_path.strip("/"))
+        try:
+            await server.serve()
+        finally:
+            await drain_updates(application, drain_timeout)
+            await application.stop()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
@@ -37,10 +37,10 @@ class AgentPlanTests(unittest.TestCase):
             return_value=_FakePrompt(response),
         ):
             with patch.object(AgentPlan, "_get_llm", return_value=_FakeLLM()):
-                updated_state = AgentPlan()(state)
+                update = AgentPlan()(state)
 
         self.assertIsNone(state.next_action)
-        self.assertEqual(updated_state.next_action, "query_status")
+        self.assertEqual(update, {"next_action": "query_status"})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+import asyncio
+import unittest
+from contextlib import nullcontext
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+from uuid import UUID
+
+from telegram.error import Forbidden, NetworkError, RetryAfter
+
+from src.db.expense_approval import ApprovalFilter, apply_transition, preview_transition
+from src.tools.bulk_approval import format_preview, notification_messages, parse_approval_args
+from src.tools.notifier import send_batched
+
+
+def _changed(index: int, user: int, total: str = "100.00", currency: str = "MXN") -> tuple:
+    return (UUID(int=index), "pending", user, Decimal(total), currency)
+
+
+class ParseApprovalArgsTests(unittest.TestCase):
+    def test_filter_words(self) -> None:
+        selection = parse_approval_args(
+            "all pending transporte under 500 mxn team Ventas 2025-11".split(), date(2025, 12, 1)
+        )
+
+        self.assertEqual(
+            selection,
+            ApprovalFilter(
+                concept="transporte",
+                currency="MXN",
+                max_total=Decimal("500"),
+                team="Ventas",
+                start=date(2025, 11, 1),
+                end=date(2025, 12, 1),
+            ),
+        )
+        self.assertEqual(
+            parse_approval_args(["Gasto", "de", "Oficina", "<1,200.50", "user", "42"], date.today()),
+            ApprovalFilter(concept="gasto de oficina", max_total=Decimal("1200.50"), telegram_user_id=42),
+        )
+        self.assertEqual(parse_approval_args([], date.today()), ApprovalFilter())
+
+    def test_rejects_bad_input(self) -> None:
+        for args in (["under"], ["under", "lots"], ["team"], ["user", "me"], ["soon"]):
+            with self.subTest(args=args), self.assertRaises(ValueError):
+                parse_approval_args(args, date(2025, 12, 1))
+
+    def test_preview_text(self) -> None:
+        selection = ApprovalFilter(concept="transporte", currency="MXN", max_total=Decimal("500"))
+        text = format_preview(
+            selection, [("MXN", 120, Decimal("24500.00")), ("USD", 3, Decimal("75.5"))], "approved"
+        )
+
+        self.assertEqual(
+            text,
+            "Approve 123 pending transporte expenses under 500 MXN?\n"
+            "Total: MXN 24,500.00, USD 75.50",
+        )
+        self.assertEqual(format_preview(ApprovalFilter(), [], "not_approved"), "No pending expenses.")
+
+
+class ApplyTransitionTests(unittest.TestCase):
+    def test_batches_until_a_short_batch_and_notifies_per_user(self) -> None:
+        batches = [
+            [_changed(1, 7), _changed(2, 8, "50.25", "USD")],
+            [_changed(3, 7, "10.00")],
+        ]
+        conn = MagicMock()
+        conn.__enter__.return_value = conn
+        conn.transaction.side_effect = lambda: nullcontext()
+        conn.execute.return_value.fetchall.side_effect = batches
+
+        with patch("src.db.expense_approval.psycopg.connect", return_value=conn):
+            batch_id, changed = apply_transition(
+                "postgres://", ApprovalFilter(team="ventas"), "approved", 99, batch_rows=2
+            )
+
+        self.assertEqual(conn.execute.call_count, 2)
+        params = conn.execute.call_args.args[1]
+        self.assertEqual(params["team"], "ventas")
+        self.assertEqual(params["batch_id"], batch_id)
+        self.assertEqual((params["new_status"], params["changed_by"]), ("approved", 99))
+        self.assertEqual([expense.expense_id.int for expense in changed], [1, 2, 3])
+        self.assertEqual(
+            notification_messages(changed, "approved"),
+            [
+                (7, "✅ 2 of your pending expenses were approved (MXN 110.00)."),
+                (8, "✅ 1 of your pending expenses was approved (USD 50.25)."),
+            ],
+        )
+
+    def test_approvers_own_expenses_are_excluded(self) -> None:
+        conn = MagicMock()
+        conn.__enter__.return_value = conn
+        conn.execute.return_value.fetchall.return_value = [("MXN", 2, Decimal("30.00"))]
+
+        with patch("src.db.expense_approval.psycopg.connect", return_value=conn):
+            preview = preview_transition("postgres://", ApprovalFilter(team="ventas"), 99)
+
+        self.assertEqual(preview, [("MXN", 2, Decimal("30.00"))])
+        sql, params = conn.execute.call_args.args
+        self.assertIn("u.telegram_user_id <> %(changed_by)s", sql)
+        self.assertEqual((params["team"], params["changed_by"]), ("ventas", 99))
+
+    def test_only_bulk_target_statuses(self) -> None:
+        with self.assertRaises(ValueError):
+            apply_transition("postgres://", ApprovalFilter(), "pending", 99)
+
+
+class SendBatchedTests(unittest.TestCase):
+    def test_bulk_lane_and_undeliverable_chats(self) -> None:
+        bot = MagicMock()
+        calls = []
+
+        async def send_message(chat_id, _text, rate_limit_args=None):
+            calls.append((chat_id, rate_limit_args))
+            await asyncio.sleep(0)
+            if chat_id == 2:
+                # Still throttled after the rate limiter's retries
+                raise RetryAfter(timedelta(seconds=1))
+            if chat_id == 3:
+                raise Forbidden("bot was blocked by the user")
+            if chat_id == 4:
+                raise NetworkError("connection reset")
+
+        bot.send_message.side_effect = send_message
+        messages = [(chat_id, "hi") for chat_id in (1, 2, 3, 4, 5)]
+
+        sent = asyncio.run(send_batched(bot, messages, in_flight=2))
+
+        self.assertEqual(sent, 2)
+        self.assertEqual([chat for chat, _ in calls], [1, 2, 3, 4, 5])
+        self.assertEqual({args["lane"] for _, args in calls}, {"bulk"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src.graph.checkpoint import thread_config, turn_input
+from src.graph.graph import build_graph
+from src.nodes.agent_plan import AgentPlan
+from src.nodes.extract_receipt import ExtractReceipt
+from src.nodes.render_and_post import RenderAndPost
+from src.nodes.upsert_expense import UpsertExpense
+from src.schemas.agent_plan import AgentPlanResponse, ReceiptUpdates
+from src.schemas.state import WorkflowState
+
+RECEIPT = {
+    "is_receipt": True,
+    "merchant_name": "Marriott",
+    "receipt_date": "2025-11-16",
+    "currency": "MXN",
+    "total": 1800.0,
+    "category": "otros",
+}
+
+
+class _RulePlanner:
+    """Stands in for prompt | llm and applies the planner prompt's rules."""
+
+    def __or__(self, _other: object) -> "_RulePlanner":
+        return self
+
+    def invoke(self, inputs: dict) -> AgentPlanResponse:
+        state = json.loads(inputs["state_json"])
+        if state["file_id"] and not state["receipt_json_present"]:
+            return AgentPlanResponse(next_action="extract_receipt")
+        if state["receipt_json_present"] and not state["expense_id"]:
+            return AgentPlanResponse(next_action="upsert_expense")
+        saved = state["expense_id"] or state["previous_expense_id"]
+        if saved and not state["receipt_updates_applied"] and "hotel" in (
+            state["user_input"] or ""
+        ):
+            return AgentPlanResponse(
+                next_action="upsert_expense",
+                receipt_updates=ReceiptUpdates(category="hotel"),
+            )
+        return AgentPlanResponse(next_action="render_and_post")
+
+
+class _FakeLLM:
+    def with_structured_output(self, _schema: object) -> object:
+        return object()
+
+
+class CheckpointTests(unittest.TestCase):
+    def test_turn_input_keeps_only_the_previous_receipt(self) -> None:
+        text_turn = turn_input(WorkflowState(user_input="hotel", telegram_user_id="1"))
+        upload_turn = turn_input(WorkflowState(telegram_user_id="1", file_id="f2"))
+
+        self.assertIsNone(text_turn["receipt_json"])
+        self.assertIsNone(text_turn["expense_id"])
+        self.assertNotIn("previous_receipt", text_turn)
+        self.assertIsNone(text_turn["response_text"])
+        self.assertIsNone(text_turn["user_id"])
+        self.assertEqual(upload_turn["file_id"], "f2")
+        self.assertIsNone(upload_turn["receipt_json"])
+        self.assertIsNone(upload_turn["expense_id"])
+        self.assertIsNone(upload_turn["previous_receipt"])
+
+    def test_follow_up_corrects_stored_expense_without_extraction(self) -> None:
+        extractions: list[str] = []
+        writes: list[tuple[str | None, str | None, dict]] = []
+        replies: list[dict] = []
+
+        def extract(_self, state: WorkflowState) -> WorkflowState:
+            extractions.append(state.file_id)
+            return state.model_copy(update={"receipt_json": dict(RECEIPT)})
+
+        def upsert(_self, state: WorkflowState) -> dict:
+            writes.append((state.expense_id, state.file_id, dict(state.receipt_json)))
+            return {"expense_id": state.expense_id or "expense-1"}
+
+        def render(_self, state: WorkflowState) -> WorkflowState:
+            replies.append(state.model_dump(include={"expense_id", "receipt_json", "previous_receipt"}))
+            return state.model_copy(update={"response_text": f"saved {state.expense_id}"})
+
+        compiled = build_graph().compile(checkpointer=InMemorySaver())
+        config = thread_config(42)
+
+        async def run(state: WorkflowState) -> dict:
+            return await compiled.ainvoke(turn_input(state), config=config, durability="exit")
+
+        with (
+            patch("src.nodes.agent_plan.ChatPromptTemplate.from_messages", return_value=_RulePlanner()),
+            patch.object(AgentPlan, "_get_llm", return_value=_FakeLLM()),
+            patch.object(ExtractReceipt, "__call__", extract),
+            patch.object(UpsertExpense, "_upsert", upsert),
+            patch.object(RenderAndPost, "__call__", render),
+        ):
+            asyncio.run(run(WorkflowState(telegram_user_id="42", file_id="f1")))
+            asyncio.run(run(WorkflowState(telegram_user_id="42", user_input="thanks")))
+            result = asyncio.run(
+                run(WorkflowState(telegram_user_id="42", user_input="actually it was a hotel"))
+            )
+
+        self.assertEqual(extractions, ["f1"])
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(writes[-1][:2], ("expense-1", "f1"))
+        self.assertEqual(writes[-1][2]["category"], "hotel")
+        # The turn in between neither re-saves nor re-confirms the expense
+        self.assertIsNone(replies[1]["expense_id"])
+        self.assertIsNone(replies[1]["receipt_json"])
+        self.assertEqual(replies[1]["previous_receipt"]["expense_id"], "expense-1")
+        self.assertEqual(result["receipt_updates"], {"category": "hotel"})
+        self.assertEqual(result["response_text"], "saved expense-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import io
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import patch
+from uuid import UUID
+from xml.etree import ElementTree
+
+from src.db.expense_export import EXPORT_COLUMNS
+from src.tools.expense_export import (
+    ExportRequest,
+    parse_export_args,
+    receipt_objects,
+    write_export,
+    write_receipts_zip,
+    write_xlsx,
+)
+
+_NS = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def _row(index: int, receipt: str | None = None) -> tuple:
+    return (
+        UUID(int=index),
+        date(2025, 11, 1 + index % 28),
+        "pending",
+        Decimal("120.50") + index,
+        "MXN",
+        "hotel",
+        f"Hotel <Centro> & co {index}",
+        42,
+        "alice",
+        f"file-{index}",
+        receipt,
+    )
+
+
+class ParseExportArgsTests(unittest.TestCase):
+    def test_periods_and_options(self) -> None:
+        today = date(2025, 12, 10)
+
+        self.assertEqual(
+            parse_export_args([], today), ExportRequest(date(2025, 12, 1), date(2026, 1, 1))
+        )
+        self.assertEqual(
+            parse_export_args(["2025-02", "XLSX", "receipts"], today),
+            ExportRequest(date(2025, 2, 1), date(2025, 3, 1), "xlsx", True),
+        )
+        self.assertEqual(
+            parse_export_args(["2025-10-05..2025-11-04"], today),
+            parse_export_args(["2025-10-05", "2025-11-04"], today),
+        )
+        self.assertEqual(parse_export_args(["2025-10-05"], today).end, date(2025, 10, 6))
+        self.assertEqual(parse_export_args(["2025-02"], today).stem, "expenses_2025-02")
+        self.assertEqual(
+            parse_export_args(["2025-10-05..2025-11-04"], today).stem,
+            "expenses_2025-10-05_2025-11-04",
+        )
+
+    def test_rejects_bad_input(self) -> None:
+        for args in (["november"], ["2025-11-05", "2025-11-01"], ["2025-11", "2025-12", "2026-01"]):
+            with self.subTest(args=args), self.assertRaises(ValueError):
+                parse_export_args(args, date(2025, 12, 10))
+
+
+class WriteXlsxTests(unittest.TestCase):
+    def test_streams_typed_cells(self) -> None:
+        consumed = []
+
+        def rows():
+            for index in range(3):
+                consumed.append(index)
+                yield _row(index, "sha256/ab/cd/abcd" if index else None)
+
+        out = io.BytesIO()
+        count = write_xlsx(out, EXPORT_COLUMNS, rows())
+
+        self.assertEqual(count, 3)
+        with zipfile.ZipFile(out) as archive:
+            self.assertIn("xl/styles.xml", archive.namelist())
+            sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        rows_xml = sheet.findall(".//x:row", _NS)
+        self.assertEqual(len(rows_xml), 4)
+        header = [cell.findtext(".//x:t", namespaces=_NS) for cell in rows_xml[0]]
+        self.assertEqual(header, list(EXPORT_COLUMNS))
+
+        first = list(rows_xml[1])
+        self.assertEqual(first[1].get("s"), "1")
+        self.assertEqual(first[1].findtext("x:v", namespaces=_NS), str(45962))  # 2025-11-01
+        self.assertEqual(first[3].findtext("x:v", namespaces=_NS), "120.50")
+        self.assertEqual(first[6].findtext(".//x:t", namespaces=_NS), "Hotel <Centro> & co 0")
+        self.assertIsNone(first[10].find("x:v", _NS))
+
+
+class WriteReceiptsZipTests(unittest.TestCase):
+    def test_bounded_concurrency_and_distinct_objects(self) -> None:
+        lock = threading.Lock()
+        active = peak = 0
+
+        def read(_client, _bucket, object_name):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.01)
+            with lock:
+                active -= 1
+            return object_name.encode()
+
+        names = [f"sha256/{index % 7}" for index in range(20)]
+        rows = [_row(index, name) for index, name in enumerate(names)] + [_row(99)]
+        out = io.BytesIO()
+        with patch("src.tools.expense_export.read_object", side_effect=read):
+            count = write_receipts_zip(None, "bucket", receipt_objects(rows), out, concurrency=3)
+
+        self.assertEqual(count, 7)
+        self.assertLessEqual(peak, 3)
+        with zipfile.ZipFile(out) as archive:
+            self.assertEqual(archive.namelist(), list(dict.fromkeys(names)))
+            self.assertEqual(archive.read("sha256/3"), b"sha256/3")
+
+
+class WriteExportTests(unittest.TestCase):
+    def test_csv_is_copied_and_xlsx_streams_from_cursor(self) -> None:
+        request = ExportRequest(date(2025, 11, 1), date(2025, 12, 1))
+
+        def copy(_url, out, start, end, user):
+            return out.write(b"expense_id\n")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch("src.tools.expense_export.copy_expenses_csv", side_effect=copy) as copy_csv:
+                path = write_export("postgres://", Path(tmp), request, 42)
+            self.assertEqual(path.name, "expenses_2025-11.csv")
+            self.assertEqual(path.read_bytes(), b"expense_id\n")
+            self.assertEqual(copy_csv.call_args.args[2:], (request.start, request.end, 42))
+
+            with patch(
+                "src.tools.expense_export.iter_expenses", return_value=iter([_row(1)])
+            ) as rows:
+                path = write_export("postgres://", Path(tmp), request._replace(fmt="xlsx"))
+            rows.assert_called_once_with("postgres://", request.start, request.end, None)
+            self.assertTrue(zipfile.is_zipfile(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
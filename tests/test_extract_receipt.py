@@ -17,19 +17,19 @@ class ExtractReceiptTests(unittest.TestCase):
                 "src.nodes.extract_receipt.extract_receipt_from_image",
                 return_value=expected,
             ):
-                updated_state = ExtractReceipt()(state)
+                update = ExtractReceipt()(state)
 
         self.assertIsNone(state.receipt_json)
-        self.assertEqual(updated_state.receipt_json, expected)
+        self.assertEqual(update, {"receipt_json": expected})
 
     def test_extract_receipt_skips_when_missing_file_id(self) -> None:
         state = WorkflowState()
 
         with patch.object(ExtractReceipt, "_load_image_bytes") as loader:
-            updated_state = ExtractReceipt()(state)
+            update = ExtractReceipt()(state)
 
         loader.assert_not_called()
-        self.assertIsNone(updated_state.receipt_json)
+        self.assertEqual(update, {})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import os
+import random
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.graph.graph import build_graph
+from src.schemas.state import WorkflowState
+from src.tools.fake_llm import FakeLLMServer, Latency
+
+RECEIPT_PATH = Path(__file__).resolve().parents[1] / "images" / "receipts" / "valid_receipt.jpg"
+
+
+class FakeLLMTests(unittest.TestCase):
+    def test_latency_specs(self) -> None:
+        rng = random.Random(1)
+
+        self.assertEqual(Latency.parse("fixed:0.25").sample(rng), 0.25)
+        self.assertTrue(0.1 <= Latency.parse("uniform:0.1,0.2").sample(rng) <= 0.2)
+        self.assertGreater(Latency.parse("lognormal:0.5,0.3").sample(rng), 0)
+        with self.assertRaises(ValueError):
+            Latency.parse("lognormal:0.5")
+
+    def test_graph_runs_offline_against_fake_server(self) -> None:
+        compiled = build_graph().compile()
+        with FakeLLMServer(seed=1) as fake:
+            env = {"OPENAI_BASE_URL": fake.base_url, "OPENAI_API_KEY": "test"}
+            with patch.dict(os.environ, env):
+                os.environ.pop("DATABASE_URL", None)
+                os.environ.pop("RECEIPT_CACHE_DIR", None)
+                receipt = compiled.invoke(
+                    WorkflowState(telegram_user_id="1", file_id=str(RECEIPT_PATH), user_input="receipt")
+                )
+                status = compiled.invoke(
+                    WorkflowState(telegram_user_id="1", user_input="status?"),
+                    config={"configurable": {"stream_tokens": True}},
+                )
+
+        self.assertTrue(receipt["receipt_json"]["is_receipt"])
+        self.assertEqual(receipt["action_history"][0], "extract_receipt")
+        self.assertTrue(receipt["response_text"])
+        self.assertEqual(status["action_history"], ["query_status", "render_and_post"])
+        self.assertTrue(status["response_text"])
+        self.assertEqual(fake.requests["receipt"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
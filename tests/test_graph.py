@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import patch
+
+from src.graph.graph import build_graph, route_from_start
+from src.nodes.agent_plan import AgentPlan
+from src.nodes.extract_receipt import ExtractReceipt
+from src.nodes.render_and_post import RenderAndPost
+from src.nodes.resolve_user import ResolveUser
+from src.nodes.upsert_expense import UpsertExpense
+from src.schemas.state import WorkflowState
+
+
+def _plan(_self, state: WorkflowState) -> WorkflowState:
+    if state.file_id and state.receipt_json is None:
+        action = "extract_receipt"
+    elif state.receipt_json is not None and not state.expense_id:
+        action = "upsert_expense"
+    else:
+        action = "render_and_post"
+    return state.model_copy(update={"next_action": action})
+
+
+class GraphFanOutTests(unittest.TestCase):
+    def test_start_fans_out_only_for_new_uploads(self) -> None:
+        upload = WorkflowState(telegram_user_id="1", file_id="f1")
+        text = WorkflowState(telegram_user_id="1", user_input="status")
+
+        with patch.dict("os.environ", {"DATABASE_URL": "db", "RECEIPT_CACHE_DIR": ""}):
+            self.assertEqual(route_from_start(upload), ["agent_plan", "resolve_user"])
+            self.assertEqual(route_from_start(text), ["agent_plan"])
+        with patch.dict("os.environ", {"DATABASE_URL": "db", "GRAPH_FANOUT": "false"}):
+            self.assertEqual(route_from_start(upload), ["agent_plan"])
+
+    def test_resolved_user_is_reused_by_expense_write(self) -> None:
+        seen_user_ids: list[str | None] = []
+
+        def upsert(_self, state: WorkflowState) -> dict:
+            seen_user_ids.append(state.user_id)
+            return {"expense_id": "expense-1"}
+
+        with (
+            patch.dict("os.environ", {"DATABASE_URL": "db", "RECEIPT_CACHE_DIR": ""}),
+            patch.object(AgentPlan, "__call__", _plan),
+            patch.object(
+                ResolveUser,
+                "_resolve",
+                lambda _self, state: state.model_copy(update={"user_id": "user-1"}),
+            ),
+            patch.object(
+                ExtractReceipt,
+                "__call__",
+                lambda _self, state: state.model_copy(update={"receipt_json": {"total": 1}}),
+            ),
+            patch.object(UpsertExpense, "_upsert", upsert),
+            patch.object(
+                RenderAndPost,
+                "__call__",
+                lambda _self, state: state.model_copy(update={"response_text": "ok"}),
+            ),
+        ):
+            result = build_graph().compile().invoke(
+                WorkflowState(telegram_user_id="1", file_id="f1")
+            )
+
+        self.assertEqual(seen_user_ids, ["user-1"])
+        nodes = [timing["node"] for timing in result["node_timings"]]
+        self.assertEqual(sorted(nodes[:2]), ["agent_plan", "resolve_user"])
+        self.assertEqual(
+            result["action_history"], ["extract_receipt", "upsert_expense", "render_and_post"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+import psycopg
+
+from src.db.job_queue import (
+    Job,
+    backoff_seconds,
+    claim_job,
+    enqueue_job,
+    fail_job,
+    purge_jobs,
+    save_job_result,
+)
+from src.tools.job_worker import JobWorker
+
+
+def _build_mock_connection(fetchone_results=()):
+    cur = MagicMock()
+    cur.fetchone.side_effect = list(fetchone_results)
+    cur.rowcount = 1
+
+    cursor_cm = MagicMock()
+    cursor_cm.__enter__.return_value = cur
+
+    conn = MagicMock()
+    conn.cursor.return_value = cursor_cm
+    return conn, cur
+
+
+def _job(attempts: int = 1, max_attempts: int = 3) -> Job:
+    return Job(7, 42, "graph", {"state": {}}, 10, 11, attempts, max_attempts)
+
+
+class JobQueueTests(unittest.TestCase):
+    def test_enqueue_notifies_workers(self) -> None:
+        conn, cur = _build_mock_connection([(7,)])
+        conn_cm = MagicMock()
+        conn_cm.__enter__.return_value = conn
+
+        with patch("src.db.job_queue.psycopg.connect", return_value=conn_cm):
+            job_id = enqueue_job("db", chat_id=42, kind="graph", payload={"state": {}})
+
+        self.assertEqual(job_id, 7)
+        notify_sql, notify_params = cur.execute.call_args_list[-1].args
+        self.assertIn("pg_notify", notify_sql)
+        self.assertEqual(notify_params, ("graph_jobs", "7"))
+
+    def test_claim_returns_job_or_none(self) -> None:
+        row = (7, 42, "graph", {"state": {}}, 10, 11, 1, 5, None)
+        conn, cur = _build_mock_connection([row, None])
+
+        self.assertEqual(claim_job(conn, "w1", 30), Job(*row))
+        self.assertIsNone(claim_job(conn, "w1", 30))
+        self.assertIn("SKIP LOCKED", cur.execute.call_args_list[1].args[0])
+
+    def test_fail_requeues_until_attempts_exhausted(self) -> None:
+        conn, cur = _build_mock_connection()
+
+        self.assertEqual(fail_job(conn, _job(attempts=1), "w1", "boom", 2.0), "queued")
+        self.assertEqual(cur.execute.call_args.args[1][0], "queued")
+        self.assertEqual(fail_job(conn, _job(attempts=3), "w1", "boom", 2.0), "failed")
+
+    def test_save_result_only_updates_running_jobs(self) -> None:
+        conn, cur = _build_mock_connection()
+        conn_cm = MagicMock()
+        conn_cm.__enter__.return_value = conn
+
+        with patch("src.db.job_queue.psycopg.connect", return_value=conn_cm):
+            save_job_result("db", 7, "✅ Saved")
+
+        sql, params = cur.execute.call_args.args
+        self.assertIn("status = 'running'", sql)
+        self.assertEqual(params, ("✅ Saved", 7))
+
+    def test_purge_deletes_only_finished_jobs(self) -> None:
+        conn, cur = _build_mock_connection()
+        cur.rowcount = 3
+        conn_cm = MagicMock()
+        conn_cm.__enter__.return_value = conn
+
+        with patch("src.db.job_queue.psycopg.connect", return_value=conn_cm):
+            deleted = purge_jobs("db", older_than_days=7)
+
+        self.assertEqual(deleted, 3)
+        sql, params = cur.execute.call_args.args
+        self.assertIn("status IN ('done', 'failed')", sql)
+        self.assertEqual(params, (7 * 86400,))
+
+    def test_backoff_grows_and_is_capped(self) -> None:
+        self.assertLessEqual(backoff_seconds(1, base=2.0), 2.0)
+        self.assertGreaterEqual(backoff_seconds(4, base=2.0), 8.0)
+        self.assertLessEqual(backoff_seconds(20, base=2.0, cap=60.0), 60.0)
+
+
+class JobWorkerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_worker_completes_and_retries_jobs(self) -> None:
+        ok, broken = _job(), _job()._replace(id=8)
+        claims = iter([ok, broken])
+        handled: list[int] = []
+        stop = asyncio.Event()
+
+        def claim(*_args):
+            job = next(claims, None)
+            if job is None:
+                stop.set()
+            return job
+
+        async def handler(job: Job) -> None:
+            handled.append(job.id)
+            if job.id == 8:
+                raise RuntimeError("telegram down")
+
+        worker = JobWorker("db", handler, concurrency=1, poll_interval=0.01, listen=False)
+        with (
+            patch("src.tools.job_worker.psycopg.connect"),
+            patch("src.tools.job_worker.claim_job", side_effect=claim),
+            patch("src.tools.job_worker.complete_job") as complete,
+            patch("src.tools.job_worker.fail_job", return_value="queued") as fail,
+        ):
+            await worker.run(stop)
+
+        self.assertEqual(handled, [7, 8])
+        complete.assert_called_once()
+        self.assertEqual(complete.call_args.args[1], 7)
+        self.assertEqual(fail.call_args.args[1].id, 8)
+        self.assertEqual(worker.processed, 1)
+
+    async def test_slot_reconnects_after_a_database_error(self) -> None:
+        claims = iter([psycopg.OperationalError("server closed the connection"), _job()])
+        handled: list[int] = []
+        stop = asyncio.Event()
+
+        def claim(*_args):
+            result = next(claims, None)
+            if isinstance(result, Exception):
+                raise result
+            if result is None:
+                stop.set()
+            return result
+
+        async def handler(job: Job) -> None:
+            handled.append(job.id)
+
+        worker = JobWorker(
+            "db", handler, concurrency=1, poll_interval=0.01, reconnect_base=0.01, listen=False
+        )
+        with (
+            patch("src.tools.job_worker.psycopg.connect") as connect,
+            patch("src.tools.job_worker.claim_job", side_effect=claim),
+            patch("src.tools.job_worker.complete_job"),
+        ):
+            await worker.run(stop)
+
+        self.assertEqual(handled, [7])
+        self.assertEqual(connect.call_count, 2)
+        connect.return_value.close.assert_called()
+
+    async def test_worker_reports_jobs_that_ran_out_of_attempts(self) -> None:
+        claims = iter([_job(attempts=3), _job(attempts=1)._replace(id=8)])
+        reported: list[int] = []
+        stop = asyncio.Event()
+
+        def claim(*_args):
+            job = next(claims, None)
+            if job is None:
+                stop.set()
+            return job
+
+        async def handler(job: Job) -> None:
+            raise RuntimeError("llm down")
+
+        async def on_failed(job: Job) -> None:
+            reported.append(job.id)
+
+        worker = JobWorker(
+            "db", handler, concurrency=1, poll_interval=0.01, listen=False, on_failed=on_failed
+        )
+        with (
+            patch("src.tools.job_worker.psycopg.connect"),
+            patch("src.tools.job_worker.claim_job", side_effect=claim),
+            patch("src.tools.job_worker.fail_job", side_effect=["failed", "queued"]),
+        ):
+            await worker.run(stop)
+
+        self.assertEqual(reported, [7])
+
+
+if __name__ == "__main__":
+    unittest.main()
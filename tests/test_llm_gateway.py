@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import openai
+
+from src.nodes.agent_plan import AgentPlan
+from src.schemas.agent_plan import AgentPlanResponse
+from src.schemas.state import WorkflowState
+from src.tools.llm_gateway import HEDGES, LLM_ERRORS, LLMGateway, get_chat_model
+
+
+def _completion(content: dict) -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(content)},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }
+        ],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+class _FakeLLMServer:
+    """Local OpenAI-compatible server answering from a script of responses."""
+
+    def __init__(self, steps: list[dict]) -> None:
+        self.steps = list(steps)
+        self.received: list[float] = []
+        lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers["Content-Length"]))
+                with lock:
+                    server.received.append(time.monotonic())
+                    step = server.steps.pop(0) if server.steps else {}
+                time.sleep(step.get("delay", 0))
+                status = step.get("status", 200)
+                body = step.get("body") or _completion({"next_action": "query_status"})
+                payload = json.dumps(body if status == 200 else {"error": {"message": "x"}})
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    for name, value in step.get("headers", {}).items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(payload.encode())
+                except OSError:
+                    pass
+
+            def log_message(self, *_args: object) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.block_on_close = False
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_port}/v1"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class LLMGatewayTests(unittest.TestCase):
+    def _planner(self, steps: list[dict], **gateway_kwargs: object) -> tuple[_FakeLLMServer, object]:
+        server = _FakeLLMServer(steps)
+        gateway = LLMGateway(retry_base=0.01, **gateway_kwargs)
+        self.addCleanup(server.close)
+        self.addCleanup(gateway.close)
+        model = get_chat_model(
+            "gpt-4o-mini",
+            "agent_plan",
+            gateway=gateway,
+            base_url=server.base_url,
+            api_key="test",
+            hedge=bool(gateway_kwargs.get("hedge_delay")),
+            deadline=gateway_kwargs.get("deadline"),
+        )
+        return server, model
+
+    def test_retries_rate_limited_call_and_parses_structured_output(self) -> None:
+        server, model = self._planner([{"status": 429, "headers": {"retry-after-ms": "20"}}])
+
+        result = model.with_structured_output(AgentPlanResponse).invoke("status?")
+
+        self.assertEqual(result.next_action, "query_status")
+        self.assertEqual(len(server.received), 2)
+        self.assertGreaterEqual(server.received[1] - server.received[0], 0.02)
+
+    def test_rate_limit_headers_hold_the_next_request(self) -> None:
+        headers = {
+            "x-ratelimit-limit-requests": "60",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "300ms",
+        }
+        server, model = self._planner([{"headers": headers}])
+
+        model.invoke("first")
+        model.invoke("second")
+
+        self.assertGreaterEqual(server.received[1] - server.received[0], 0.25)
+
+    def test_deadline_bounds_a_stalled_call(self) -> None:
+        _server, model = self._planner([{"delay": 2.0}], max_retries=0, deadline=0.3)
+
+        started = time.monotonic()
+        with self.assertRaises(openai.APITimeoutError):
+            model.invoke("slow")
+
+        self.assertLess(time.monotonic() - started, 1.5)
+
+    def test_retried_timeout_status_is_an_llm_error(self) -> None:
+        server, model = self._planner([{"status": 408}, {"status": 408}], max_retries=1)
+
+        with self.assertRaises(openai.APITimeoutError):
+            model.invoke("timeout")
+
+        self.assertEqual(len(server.received), 2)
+
+    def test_request_errors_are_not_llm_errors(self) -> None:
+        _server, model = self._planner([{"status": 401}])
+
+        with self.assertRaises(openai.AuthenticationError) as raised:
+            model.invoke("bad key")
+
+        self.assertNotIsInstance(raised.exception, LLM_ERRORS)
+
+    def test_open_circuit_fails_fast_and_planner_falls_back(self) -> None:
+        server, model = self._planner(
+            [{"status": 500}, {"status": 500}], max_retries=0, breaker_failures=2
+        )
+        for _ in range(2):
+            with self.assertRaises(openai.InternalServerError):
+                model.invoke("boom")
+
+        state = WorkflowState(user_input="receipt", file_id="file-1")
+        with patch.object(AgentPlan, "_get_llm", return_value=model):
+            update = AgentPlan()(state)
+
+        self.assertEqual(len(server.received), 2)
+        self.assertEqual(update["next_action"], "extract_receipt")
+
+    def test_hedged_request_answers_from_backup(self) -> None:
+        backup_wins = HEDGES.labels("agent_plan", "backup")
+        before = backup_wins.value
+        server, model = self._planner([{"delay": 2.0}, {}], hedge_delay=0.1)
+
+        started = time.monotonic()
+        result = model.with_structured_output(AgentPlanResponse).invoke("status?")
+
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(result.next_action, "query_status")
+        self.assertEqual(len(server.received), 2)
+        self.assertEqual(backup_wins.value, before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.schemas.state import WorkflowState
+from src.tools.media_group import AlbumItem, MediaGroupBatcher
+
+
+class MediaGroupBatcherTests(unittest.TestCase):
+    def test_items_sharing_group_flush_once(self) -> None:
+        flushed: list[tuple[str, int]] = []
+
+        async def flush(media_group_id: str, items: list[AlbumItem]) -> None:
+            flushed.append((media_group_id, len(items)))
+
+        async def scenario() -> None:
+            batcher = MediaGroupBatcher(flush, window=0.05)
+            for index in range(3):
+                batcher.add("album-1", AlbumItem(MagicMock(), WorkflowState(file_id=str(index))))
+                await asyncio.sleep(0.01)
+            batcher.add("album-2", AlbumItem(MagicMock(), WorkflowState(file_id="x")))
+            await asyncio.sleep(0.2)
+
+        asyncio.run(scenario())
+
+        self.assertEqual(sorted(flushed), [("album-1", 3), ("album-2", 1)])
+
+    def test_max_wait_caps_debounce(self) -> None:
+        flushed: list[int] = []
+
+        async def flush(_media_group_id: str, items: list[AlbumItem]) -> None:
+            flushed.append(len(items))
+
+        async def scenario() -> None:
+            batcher = MediaGroupBatcher(flush, window=0.05, max_wait=0.08)
+            for index in range(6):
+                batcher.add("album", AlbumItem(MagicMock(), WorkflowState(file_id=str(index))))
+                await asyncio.sleep(0.03)
+            await asyncio.sleep(0.2)
+
+        asyncio.run(scenario())
+
+        self.assertGreater(len(flushed), 1)
+        self.assertEqual(sum(flushed), 6)
+
+    def test_group_waits_for_expected_uploads(self) -> None:
+        flushed: list[int] = []
+
+        async def flush(_media_group_id: str, items: list[AlbumItem]) -> None:
+            flushed.append(len(items))
+
+        async def upload(batcher: MediaGroupBatcher, index: int, seconds: float) -> None:
+            batcher.expect("album")
+            await asyncio.sleep(seconds)
+            if index == 2:
+                batcher.discard("album")
+                return
+            batcher.add("album", AlbumItem(MagicMock(), WorkflowState(file_id=str(index))))
+
+        async def scenario() -> None:
+            batcher = MediaGroupBatcher(flush, window=0.05, max_wait=0.1)
+            # Handlers run one at a time, so each upload outlasts the window
+            for index, seconds in enumerate((0.08, 0.15, 0.02)):
+                await upload(batcher, index, seconds)
+            await asyncio.sleep(0.2)
+            self.assertEqual(batcher.pending, 0)
+
+        asyncio.run(scenario())
+
+        self.assertEqual(flushed, [2])
+
+    def test_failed_flush_replies_to_the_album(self) -> None:
+        async def flush(_media_group_id: str, _items: list[AlbumItem]) -> None:
+            raise RuntimeError("graph failed")
+
+        message = MagicMock()
+        message.reply_text = AsyncMock()
+
+        async def scenario() -> None:
+            batcher = MediaGroupBatcher(flush, window=0.01)
+            batcher.add("album", AlbumItem(message, WorkflowState(file_id="a")))
+            await asyncio.sleep(0.1)
+
+        with self.assertLogs("src.tools.media_group", "ERROR"):
+            asyncio.run(scenario())
+
+        message.reply_text.assert_awaited_once()
+        self.assertIn("error", message.reply_text.await_args.args[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
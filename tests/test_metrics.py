@@ -0,0 +1,53 @@
+import unittest
+import urllib.request
+
+from src.tools import metrics
+
+
+class MetricsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registered = list(metrics.REGISTRY)
+
+    def tearDown(self) -> None:
+        metrics.REGISTRY[:] = self.registered
+
+    def test_text_exposition(self) -> None:
+        counter = metrics.Counter("test_events_total", "Events.", ["kind"])
+        gauge = metrics.Gauge("test_queue_depth", "Queue depth.")
+        histogram = metrics.Histogram("test_seconds", "Latency.", ["op"], buckets=(0.1, 1.0))
+        counter.labels('say "hi"').inc(2)
+        gauge.set_function(lambda: 7)
+        child = histogram.labels("get")
+        child.observe(0.05)
+        child.observe(0.5)
+        child.observe(3)
+
+        text = metrics.generate_latest()
+
+        self.assertIn("# TYPE test_events_total counter", text)
+        self.assertIn('test_events_total{kind="say \\"hi\\""} 2', text)
+        self.assertIn("test_queue_depth 7", text)
+        self.assertIn('test_seconds_bucket{op="get",le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{op="get",le="1"} 2', text)
+        self.assertIn('test_seconds_bucket{op="get",le="+Inf"} 3', text)
+        self.assertIn('test_seconds_sum{op="get"} 3.55', text)
+        self.assertIn('test_seconds_count{op="get"} 3', text)
+
+    def test_server_serves_metrics(self) -> None:
+        metrics.Counter("test_served_total", "Served.").inc()
+        server = metrics.start_metrics_server(0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode()
+                content_type = response.headers["Content-Type"]
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertTrue(content_type.startswith("text/plain; version=0.0.4"))
+        self.assertIn("test_served_total 1", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
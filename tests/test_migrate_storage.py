@@ -0,0 +1,60 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from src.tools.migrate_storage import migrate
+
+
+def _stat(file_id: str | None) -> MagicMock:
+    stat = MagicMock(size=3, content_type="image/jpeg")
+    stat.metadata = {"X-Amz-Meta-File_id": file_id} if file_id else {}
+    stat.last_modified = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return stat
+
+
+class MigrateStorageTests(unittest.TestCase):
+    def test_delete_source_keeps_unreferenced_objects(self) -> None:
+        client = MagicMock()
+        client.list_objects.return_value = [
+            MagicMock(object_name="telegram/42/1_file-a.jpg"),
+            MagicMock(object_name="telegram/42/2_nometa.jpg"),
+        ]
+        client.stat_object.side_effect = lambda _bucket, name: _stat(
+            "file-a" if "file-a" in name else None
+        )
+        client.get_object.return_value.stream.return_value = [b"abc"]
+
+        with (
+            patch("src.tools.migrate_storage.ensure_bucket"),
+            patch("src.tools.migrate_storage.object_exists", return_value=False),
+            patch("src.tools.migrate_storage.record_receipt_file") as record,
+        ):
+            summary = migrate(client, "receipts", "postgresql://db", delete_source=True)
+
+        record.assert_called_once()
+        self.assertEqual(record.call_args.kwargs["file_id"], "file-a")
+        client.remove_object.assert_called_once_with("receipts", "telegram/42/1_file-a.jpg")
+        self.assertEqual(summary["unreferenced"], 1)
+        self.assertEqual(summary["scanned"], 2)
+
+    def test_failed_record_keeps_the_source(self) -> None:
+        client = MagicMock()
+        client.list_objects.return_value = [MagicMock(object_name="telegram/42/1_file-a.jpg")]
+        client.stat_object.return_value = _stat("file-a")
+        client.get_object.return_value.stream.return_value = [b"abc"]
+
+        with (
+            patch("src.tools.migrate_storage.ensure_bucket"),
+            patch("src.tools.migrate_storage.object_exists", return_value=True),
+            patch(
+                "src.tools.migrate_storage.record_receipt_file", side_effect=RuntimeError("db")
+            ),
+        ):
+            with self.assertRaises(RuntimeError):
+                migrate(client, "receipts", "postgresql://db", delete_source=True)
+
+        client.remove_object.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from minio.error import S3Error
+
+from src.tools import minio_storage
+
+_ENV = {
+    "MINIO_ENDPOINT": "http://localhost:9000",
+    "MINIO_ACCESS_KEY": "access",
+    "MINIO_SECRET_KEY": "secret",
+    "MINIO_BUCKET": "receipts",
+}
+
+
+class MinioStorageTests(unittest.TestCase):
+    def setUp(self) -> None:
+        minio_storage.reset_minio_client()
+
+    def tearDown(self) -> None:
+        minio_storage.reset_minio_client()
+
+    def test_get_minio_client_is_reused(self) -> None:
+        with patch.dict("os.environ", _ENV):
+            with patch("src.tools.minio_storage.Minio") as minio_cls:
+                first = minio_storage.get_minio_client()
+                second = minio_storage.get_minio_client()
+
+        minio_cls.assert_called_once()
+        self.assertIs(first[0], second[0])
+        self.assertEqual(first[1], "receipts")
+
+    def test_ensure_bucket_checks_once(self) -> None:
+        client = MagicMock()
+        client.bucket_exists.return_value = True
+
+        minio_storage.upload_bytes(client, "receipts", "a.jpg", b"a", "image/jpeg")
+        minio_storage.upload_bytes(client, "receipts", "b.jpg", b"b", "image/jpeg")
+
+        client.bucket_exists.assert_called_once_with("receipts")
+        self.assertEqual(client.put_object.call_count, 2)
+
+    def test_upload_content_addressed_skips_existing_object(self) -> None:
+        client = MagicMock()
+        client.bucket_exists.return_value = True
+
+        stored = minio_storage.upload_content_addressed(
+            client, "receipts", b"receipt", "image/jpeg"
+        )
+
+        self.assertTrue(stored.object_name.startswith("sha256/"))
+        self.assertIn(stored.sha256, stored.object_name)
+        self.assertFalse(stored.uploaded)
+        client.stat_object.assert_called_once_with("receipts", stored.object_name)
+        client.put_object.assert_not_called()
+
+    def test_file_reference_round_trips_without_a_database(self) -> None:
+        client = MagicMock()
+        client.bucket_exists.return_value = True
+        stored = minio_storage.StoredObject("sha256/ab/cd/abcd", "abcd", 7, True)
+
+        minio_storage.record_file_reference(client, "receipts", "file-1", stored, ".jpg")
+
+        _bucket, name, body = client.put_object.call_args.args[:3]
+        self.assertEqual(name, "file_id/file-1")
+        client.get_object.return_value.read.return_value = body.getvalue()
+        self.assertEqual(
+            minio_storage.find_file_reference(client, "receipts", "file-1"),
+            {"sha256": "abcd", "object_name": "sha256/ab/cd/abcd", "suffix": ".jpg"},
+        )
+
+        client.get_object.side_effect = S3Error(None, "NoSuchKey", "missing", None, None, None)
+        self.assertIsNone(minio_storage.find_file_reference(client, "receipts", "file-2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
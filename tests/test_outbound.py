@@ -0,0 +1,181 @@
+import asyncio
+import time
+import unittest
+import warnings
+
+from telegram.error import RetryAfter
+from telegram.ext import ExtBot
+from telegram.request import HTTPXRequest
+
+from src.tools.fake_bot_api import FakeBotAPIServer
+from src.tools.notifier import send_batched
+from src.tools.outbound import OutboundLimiter
+
+
+def _bot(fake: FakeBotAPIServer, limiter: OutboundLimiter | None) -> ExtBot:
+    return ExtBot(
+        "1:test",
+        base_url=fake.base_url,
+        request=HTTPXRequest(connection_pool_size=128),
+        rate_limiter=limiter,
+    )
+
+
+class OutboundLimiterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        # RetryAfter.retry_after warns about its upcoming type change
+        warnings.simplefilter("ignore", DeprecationWarning)
+        self.addCleanup(warnings.resetwarnings)
+
+    def test_throughput_stays_under_server_limits(self) -> None:
+        messages = [(chat, f"message {index}") for index in range(10) for chat in range(1, 11)]
+
+        async def run(limiter: OutboundLimiter | None, repeat: int = 1) -> list[object]:
+            async with _bot(fake, limiter) as bot:
+                return await asyncio.gather(
+                    *(bot.send_message(chat, text) for chat, text in messages * repeat),
+                    return_exceptions=True,
+                )
+
+        with FakeBotAPIServer(global_per_second=100, chat_per_second=10) as fake:
+            naive = asyncio.run(run(None, repeat=2))
+        self.assertTrue(any(isinstance(result, RetryAfter) for result in naive))
+
+        limiter = OutboundLimiter(
+            global_per_second=90, global_burst=5, chat_per_second=8, chat_burst=1
+        )
+        with FakeBotAPIServer(global_per_second=100, chat_per_second=10) as fake:
+            started = time.monotonic()
+            results = asyncio.run(run(limiter))
+            elapsed = time.monotonic() - started
+
+        self.assertFalse([result for result in results if isinstance(result, Exception)])
+        self.assertEqual(fake.rejected, 0)
+        self.assertEqual(len(fake.sent_to(1)), 10)
+        # Each chat's messages arrive in the order they were sent
+        self.assertEqual(
+            [item.text for item in fake.sent_to(3)], [f"message {index}" for index in range(10)]
+        )
+        # About 1.1s at 8 messages/second per chat
+        self.assertLess(elapsed, 3.0)
+
+    def test_interactive_replies_overtake_bulk_notices(self) -> None:
+        limiter = OutboundLimiter(global_per_second=100, bulk_per_second=10)
+
+        async def run() -> None:
+            async with _bot(fake, limiter) as bot:
+                bulk = asyncio.create_task(
+                    send_batched(bot, [(chat, "notice") for chat in range(100, 120)])
+                )
+                await asyncio.sleep(0.3)
+                await bot.send_message(1, "reply")
+                self.assertEqual(await bulk, 20)
+
+        with FakeBotAPIServer(global_per_second=100, chat_per_second=1) as fake:
+            asyncio.run(run())
+
+        texts = [item.text for item in fake.delivered if item.method == "sendMessage"]
+        self.assertLess(texts.index("reply"), 6)
+        self.assertEqual(fake.rejected, 0)
+
+    def test_pending_edits_of_a_message_are_coalesced(self) -> None:
+        limiter = OutboundLimiter(chat_per_second=5, chat_burst=1)
+
+        async def run() -> list[object]:
+            async with _bot(fake, limiter) as bot:
+                message = await bot.send_message(1, "working")
+                edits = [
+                    bot.edit_message_text(f"step {step}", chat_id=1, message_id=message.message_id)
+                    for step in range(5)
+                ]
+                return await asyncio.gather(*edits)
+
+        with FakeBotAPIServer(chat_per_second=10) as fake:
+            results = asyncio.run(run())
+
+        edits = fake.sent_to(1, "editMessageText")
+        self.assertLessEqual(len(edits), 2)
+        self.assertEqual(edits[-1].text, "step 4")
+        self.assertEqual({result.text for result in results}, {"step 4"})
+
+    def test_retries_after_flood_control(self) -> None:
+        limiter = OutboundLimiter(chat_per_second=10)
+
+        async def run() -> tuple[object, object]:
+            async with _bot(fake, limiter) as bot:
+                return await asyncio.gather(
+                    bot.send_message(1, "first"), bot.send_message(1, "second")
+                )
+
+        with FakeBotAPIServer(chat_per_second=10, retry_after=1) as fake:
+            fake.throttle(1)
+            started = time.monotonic()
+            first, second = asyncio.run(run())
+            elapsed = time.monotonic() - started
+
+        self.assertEqual((first.text, second.text), ("first", "second"))
+        self.assertEqual(fake.rejected, 1)
+        self.assertEqual([item.text for item in fake.sent_to(1)], ["first", "second"])
+        self.assertGreaterEqual(elapsed, 1.0)
+
+    def test_cancelled_after_its_turn_frees_the_chat(self) -> None:
+        limiter = OutboundLimiter(chat_per_second=100, chat_burst=10)
+
+        async def send() -> str:
+            return "sent"
+
+        def request() -> object:
+            return limiter.process_request(send, (), {}, "sendMessage", {"chat_id": 1}, None)
+
+        async def run() -> str:
+            first = asyncio.create_task(request())
+            # Granted but not yet resumed: the chat is busy until it is released
+            while 1 not in limiter._busy:
+                await asyncio.sleep(0)
+            first.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+            return await asyncio.wait_for(request(), timeout=1.0)
+
+        self.assertEqual(asyncio.run(run()), "sent")
+
+    def test_cancelled_edit_still_answers_the_edits_it_replaced(self) -> None:
+        limiter = OutboundLimiter(chat_per_second=5, chat_burst=1)
+        sent: list[str] = []
+
+        async def send(text: str) -> str:
+            sent.append(text)
+            return text
+
+        def request(text: str, endpoint: str) -> object:
+            data = {"chat_id": 1, "message_id": 5}
+            return limiter.process_request(send, (text,), {}, endpoint, data, None)
+
+        async def run() -> str:
+            await request("working", "sendMessage")
+            older = asyncio.create_task(request("step 1", "editMessageText"))
+            await asyncio.sleep(0)
+            newer = asyncio.create_task(request("step 2", "editMessageText"))
+            await asyncio.sleep(0)
+            newer.cancel()
+            return await asyncio.wait_for(older, timeout=1.0)
+
+        self.assertEqual(asyncio.run(run()), "step 2")
+        self.assertEqual(sent, ["working", "step 2"])
+
+    def test_gives_up_after_max_retries(self) -> None:
+        limiter = OutboundLimiter(max_retries=0)
+
+        async def run() -> None:
+            async with _bot(fake, limiter) as bot:
+                await bot.send_message(1, "hi")
+
+        with FakeBotAPIServer() as fake:
+            fake.throttle(1)
+            with self.assertRaises(RetryAfter):
+                asyncio.run(run())
+        self.assertEqual(fake.sent_to(1), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import patch
+
+from src.schemas.receipt import Receipt, ReceiptItem
+from src.tools import pdf_extractor
+
+
+class PdfExtractorTests(unittest.TestCase):
+    def test_merge_receipts_combines_pages(self) -> None:
+        first = Receipt(
+            is_receipt=True,
+            merchant_name="Marriott",
+            receipt_date="2025-11-16",
+            currency="MXN",
+            items=[ReceiptItem(description="Night 1", line_total=1500.0)],
+        )
+        second = Receipt(
+            is_receipt=False,
+            merchant_name="Marriott Reforma",
+            total=3000.0,
+            items=[ReceiptItem(description="Night 2", line_total=1500.0)],
+        )
+
+        merged = pdf_extractor.merge_receipts([first, second])
+
+        self.assertTrue(merged.is_receipt)
+        self.assertEqual(merged.merchant_name, "Marriott")
+        self.assertEqual(merged.currency, "MXN")
+        self.assertEqual(merged.total, 3000.0)
+        self.assertEqual([item.description for item in merged.items], ["Night 1", "Night 2"])
+
+    def test_text_pages_skip_vision(self) -> None:
+        page_text = "HOTEL FOLIO " * 10
+
+        with patch.object(
+            pdf_extractor.pdf_raster, "extract_page_texts", return_value=[page_text, page_text]
+        ):
+            with patch.object(
+                pdf_extractor,
+                "extract_receipt_from_text",
+                return_value=Receipt(is_receipt=True, total=10.0),
+            ) as from_text:
+                with patch.object(pdf_extractor, "image_extraction_chain") as vision:
+                    merged = pdf_extractor.extract_receipt_from_pdf("folio.pdf")
+
+        self.assertEqual(from_text.call_count, 2)
+        vision.invoke.assert_not_called()
+        self.assertEqual(merged.total, 10.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.nodes.agent_plan import AgentPlan
+from src.schemas.agent_plan import AgentPlanResponse
+from src.schemas.state import WorkflowState
+from src.tools.planner_cache import PlannerCache
+
+
+class PlannerCacheTests(unittest.TestCase):
+    def test_lru_and_ttl_eviction(self) -> None:
+        cache = PlannerCache(max_entries=2, ttl=60)
+        cache.put("a", "query_status")
+        cache.put("b", "render_and_post")
+        cache.get("a")
+        cache.put("c", "extract_receipt")
+
+        self.assertEqual(cache.get("a"), "query_status")
+        self.assertIsNone(cache.get("b"))
+
+        with patch("src.tools.planner_cache.time.time", return_value=10**12):
+            self.assertIsNone(cache.get("a"))
+
+    def test_decisions_survive_a_restart(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "planner.sqlite3"
+            cache = PlannerCache(path=path)
+            cache.put("a", "query_status")
+            cache.compare("a", "query_status", "render_and_post")
+            cache.close()
+
+            reopened = PlannerCache(path=path)
+            self.assertEqual(reopened.get("a"), "render_and_post")
+            reopened.close()
+
+    def test_key_ignores_ids_and_skips_free_text(self) -> None:
+        plan = AgentPlan()
+        first = plan._cache_key(WorkflowState(telegram_user_id="1", user_input="Status?"))
+        second = plan._cache_key(WorkflowState(telegram_user_id="2", user_input="¿Cuál es el estado?"))
+
+        self.assertIsNotNone(first)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, plan._cache_key(WorkflowState(file_id="f", user_input="status")))
+        self.assertIsNone(plan._cache_key(WorkflowState(user_input="the total was 120")))
+
+    def test_hit_skips_llm_and_shadow_mode_measures_agreement(self) -> None:
+        state = WorkflowState(telegram_user_id="1", user_input="thanks!")
+        answer = AgentPlanResponse(next_action="render_and_post")
+
+        cache = PlannerCache(shadow_rate=0)
+        with (
+            patch("src.nodes.agent_plan.get_planner_cache", return_value=cache),
+            patch.object(AgentPlan, "_ask_llm", return_value=answer) as ask,
+        ):
+            AgentPlan()(state)
+            result = AgentPlan()(state)
+        self.assertEqual(ask.call_count, 1)
+        self.assertEqual(result["next_action"], "render_and_post")
+
+        shadow = PlannerCache(mode="shadow")
+        with (
+            patch("src.nodes.agent_plan.get_planner_cache", return_value=shadow),
+            patch.object(AgentPlan, "_ask_llm", return_value=answer) as ask,
+        ):
+            AgentPlan()(state)
+            AgentPlan()(state)
+        self.assertEqual(ask.call_count, 2)
+        self.assertEqual(shadow.stats()["agreement"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.tools.profiler import ProfilerBusy, profile_for, profile_update
+
+
+def _block_the_loop() -> None:
+    time.sleep(0.3)
+
+
+class ProfilerTests(unittest.TestCase):
+    def test_samples_tasks_and_detects_a_blocked_loop(self) -> None:
+        async def slow_handler() -> None:
+            await asyncio.sleep(0.05)
+            _block_the_loop()
+
+        async def scenario():
+            asyncio.get_running_loop().call_later(0.05, asyncio.ensure_future, slow_handler())
+            profile = asyncio.ensure_future(profile_for(0.6))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(ProfilerBusy):
+                await profile_for(0.1)
+            return await profile
+
+        with patch.dict(os.environ, {"PROFILE_INTERVAL_MS": "2", "PROFILE_BLOCK_MS": "50"}):
+            result = asyncio.run(scenario())
+
+        self.assertGreater(result.samples, 20)
+        self.assertGreater(result.loop_blocked_samples, 0)
+        self.assertGreaterEqual(result.max_loop_lag, 0.2)
+        blocked = [stack for stack in result.stacks if stack.startswith("loop-blocked;task ")]
+        self.assertTrue(any("_block_the_loop" in stack for stack in blocked))
+        self.assertIn("event loop blocked", result.summary())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = result.write(Path(tmp))
+            self.assertTrue(path.read_text().strip().endswith(tuple("0123456789")))
+
+    def test_update_capture_writes_pstats(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch.dict(os.environ, {"PROFILE_UPDATE_RATE": "1", "PROFILE_DIR": tmp}):
+                with profile_update("text"):
+                    sum(range(10_000))
+            captures = list(Path(tmp).glob("update-text-*.prof"))
+
+            self.assertEqual(len(captures), 1)
+            self.assertGreater(pstats.Stats(str(captures[0])).total_calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
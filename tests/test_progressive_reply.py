@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.tools.progressive_reply import ProgressiveReply
+
+
+def _source_message() -> tuple[MagicMock, MagicMock]:
+    placeholder = MagicMock()
+    placeholder.edit_text = AsyncMock()
+    source = MagicMock()
+    source.reply_text = AsyncMock(return_value=placeholder)
+    return source, placeholder
+
+
+class ProgressiveReplyTests(unittest.TestCase):
+    def test_updates_are_throttled_and_coalesced(self) -> None:
+        source, placeholder = _source_message()
+
+        async def scenario() -> None:
+            reply = ProgressiveReply(source, min_interval=0.05)
+            await reply.start("⏳")
+            for text in ("a", "ab", "abc"):
+                await reply.update(text)
+            await asyncio.sleep(0.1)
+            await reply.finish("abc done")
+
+        asyncio.run(scenario())
+
+        edits = [call.args[0] for call in placeholder.edit_text.call_args_list]
+        self.assertEqual(edits, ["abc", "abc done"])
+
+    def test_finish_skips_unchanged_text(self) -> None:
+        source, placeholder = _source_message()
+
+        async def scenario() -> None:
+            reply = ProgressiveReply(source, min_interval=0)
+            await reply.start("⏳")
+            await reply.update("done")
+            await reply.finish("done")
+
+        asyncio.run(scenario())
+
+        placeholder.edit_text.assert_awaited_once_with("done")
+
+
+if __name__ == "__main__":
+    unittest.main()
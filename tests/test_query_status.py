@@ -1,9 +1,14 @@
+import os
 import unittest
-from unittest.mock import patch
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+from uuid import UUID
 
 from src.nodes.query_status import QueryStatus
 from src.schemas.query_status import QueryStatusResponse
 from src.schemas.state import WorkflowState
+from src.schemas.status_table import StatusTable
 
 
 class _FakeChain:
@@ -31,7 +36,7 @@ class QueryStatusTests(unittest.TestCase):
     def test_query_status_updates_rows(self) -> None:
         response = QueryStatusResponse(queries=["SELECT 1"])
         state = WorkflowState(user_input="Show my status")
-        rows = [{"status": "approved"}]
+        rows = StatusTable.from_dicts([{"status": "approved"}])
 
         with patch(
             "src.nodes.query_status.ChatPromptTemplate.from_messages",
@@ -41,11 +46,11 @@ class QueryStatusTests(unittest.TestCase):
                 with patch.object(
                     QueryStatus, "_fetch_status_rows", return_value=rows
                 ) as fetch_rows:
-                    updated_state = QueryStatus()(state)
+                    update = QueryStatus()(state)
 
         fetch_rows.assert_called_once_with(response.queries)
         self.assertIsNone(state.status_rows)
-        self.assertEqual(updated_state.status_rows, rows)
+        self.assertIs(update["status_rows"], rows)
 
     def test_query_status_no_queries(self) -> None:
         response = QueryStatusResponse(queries=None)
@@ -57,10 +62,46 @@ class QueryStatusTests(unittest.TestCase):
         ):
             with patch.object(QueryStatus, "_get_llm", return_value=_FakeLLM()):
                 with patch.object(QueryStatus, "_fetch_status_rows") as fetch_rows:
-                    updated_state = QueryStatus()(state)
+                    update = QueryStatus()(state)
 
         fetch_rows.assert_not_called()
-        self.assertIsNone(updated_state.status_rows)
+        self.assertEqual(update, {})
+
+    def test_query_status_search_runs_the_search_template(self) -> None:
+        response = QueryStatusResponse(search="mariot", search_page=1)
+        state = WorkflowState(telegram_user_id="42", user_input="find the mariot receipt")
+        conn = MagicMock()
+        conn.__enter__.return_value = conn
+        conn.execute.return_value.fetchall.return_value = [
+            (
+                UUID(int=1),
+                "approved",
+                Decimal("1850.00"),
+                "MXN",
+                "hotel",
+                "Marriott (Visa)",
+                date(2025, 11, 3),
+            ),
+        ]
+
+        with patch(
+            "src.nodes.query_status.ChatPromptTemplate.from_messages",
+            return_value=_FakePrompt(response),
+        ):
+            with patch.object(QueryStatus, "_get_llm", return_value=_FakeLLM()):
+                with patch.object(QueryStatus, "_fetch_status_rows") as fetch_rows:
+                    with patch.dict(os.environ, {"DATABASE_URL": "postgres://"}):
+                        with patch("src.db.expense_search.psycopg.connect", return_value=conn):
+                            update = QueryStatus()(state)
+
+        fetch_rows.assert_not_called()
+        params = conn.execute.call_args.args[1]
+        self.assertEqual(
+            params, {"text": "mariot", "telegram_user_id": 42, "limit": 10, "offset": 10}
+        )
+        table = update["status_rows"]
+        self.assertEqual(next(iter(table))["description"], "Marriott (Visa)")
+        self.assertEqual(table.sum_by("total", "currency"), {("MXN",): Decimal("1850.00")})
 
 
 if __name__ == "__main__":
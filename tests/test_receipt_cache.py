@@ -0,0 +1,107 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from src.tools.receipt_cache import LOCK_STRIPES, ReceiptCache, read_mapped
+
+
+class ReceiptCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+
+    def test_pinned_coalesces_concurrent_misses(self) -> None:
+        cache = ReceiptCache(self._tmpdir.name, max_bytes=1024)
+        calls = []
+
+        def fetch() -> tuple[bytes, str]:
+            calls.append(1)
+            time.sleep(0.05)
+            return b"receipt", ".jpg"
+
+        def read() -> None:
+            with cache.pinned("abc", fetch):
+                pass
+
+        threads = [threading.Thread(target=read) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        stats = cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 4)
+        self.assertEqual(stats["bytes_saved"], 4 * len(b"receipt"))
+
+        with read_mapped(cache.get("abc")) as view:
+            self.assertEqual(bytes(view), b"receipt")
+
+    def test_hit_uses_one_index_connection(self) -> None:
+        cache = ReceiptCache(self._tmpdir.name, max_bytes=1024)
+        cache.put("abc", b"receipt", ".jpg")
+
+        with patch.object(cache, "_index", wraps=cache._index) as index:
+            with cache.pinned("abc", lambda: self.fail("fetched a cached entry")):
+                pass
+
+        self.assertEqual(index.call_count, 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["bytes_saved"], len(b"receipt"))
+
+    def test_put_evicts_least_recently_used(self) -> None:
+        cache = ReceiptCache(self._tmpdir.name, max_bytes=10)
+        cache.put("old", b"12345")
+        time.sleep(0.01)
+        cache.put("new", b"12345")
+        time.sleep(0.01)
+        cache.get("old")
+        cache.put("newest", b"12345")
+
+        self.assertIsNotNone(cache.get("old"))
+        self.assertIsNone(cache.get("new"))
+        self.assertIsNotNone(cache.get("newest"))
+
+    def test_pinned_entries_survive_eviction(self) -> None:
+        cache = ReceiptCache(self._tmpdir.name, max_bytes=10)
+
+        with cache.pinned("held", lambda: (b"12345", ".jpg")) as path:
+            cache.put("second", b"12345")
+            cache.put("third", b"12345")
+            with read_mapped(path) as view:
+                self.assertEqual(bytes(view), b"12345")
+
+        self.assertIsNotNone(cache.get("held"))
+        self.assertIsNone(cache.get("second"))
+        self.assertIsNotNone(cache.get("third"))
+
+    def test_lock_files_are_a_fixed_pool(self) -> None:
+        cache = ReceiptCache(self._tmpdir.name, max_bytes=10)
+        for index in range(LOCK_STRIPES + 64):
+            with cache.pinned(f"key-{index}", lambda: (b"12345", ".jpg")):
+                pass
+
+        locks = os.listdir(os.path.join(self._tmpdir.name, "locks"))
+        self.assertLessEqual(len(locks), LOCK_STRIPES * 2)
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_objects_larger_than_the_cache_are_not_stored(self) -> None:
+        cache = ReceiptCache(self._tmpdir.name, max_bytes=4)
+        cache.put("small", b"1234")
+
+        with cache.pinned("big", lambda: (b"123456789", ".pdf")) as path:
+            with read_mapped(path) as view:
+                self.assertEqual(bytes(view), b"123456789")
+
+        self.assertFalse(path.exists())
+        self.assertIsNone(cache.get("big"))
+        self.assertIsNotNone(cache.get("small"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
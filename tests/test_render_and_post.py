@@ -0,0 +1,46 @@
+import unittest
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, StateGraph
+
+from src.nodes.render_and_post import RenderAndPost
+from src.schemas.state import WorkflowState
+from src.schemas.status_table import StatusTable
+
+
+class RenderAndPostTests(unittest.TestCase):
+    def test_streams_tokens_when_requested(self) -> None:
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="Expense saved ok")]))
+        graph = StateGraph(WorkflowState)
+        graph.add_node("render_and_post", RenderAndPost())
+        graph.set_entry_point("render_and_post")
+        graph.add_edge("render_and_post", END)
+
+        with patch.object(RenderAndPost, "_get_llm", return_value=llm):
+            events = list(
+                graph.compile().stream(
+                    WorkflowState(expense_id="e-1").model_dump(),
+                    config={"configurable": {"stream_tokens": True}},
+                    stream_mode=["custom", "values"],
+                )
+            )
+
+        deltas = [chunk["response_text_delta"] for mode, chunk in events if mode == "custom"]
+        final = [chunk for mode, chunk in events if mode == "values"][-1]
+        self.assertGreater(len(deltas), 1)
+        self.assertEqual("".join(deltas), "Expense saved ok")
+        self.assertEqual(final["response_text"], "Expense saved ok")
+
+    def test_template_reply_lists_status_rows_before_expense(self) -> None:
+        rows = StatusTable.from_dicts([{"status": "pending", "total": "10.00", "currency": "MXN"}])
+        state = WorkflowState(expense_id="e-1", receipt_json={"total": 1}, status_rows=rows)
+
+        reply = RenderAndPost()._template_reply(state)
+
+        self.assertTrue(reply.startswith("Your recent expenses:"))
+
+
+if __name__ == "__main__":
+    unittest.main()
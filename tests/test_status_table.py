@@ -0,0 +1,91 @@
+import json
+import random
+import unittest
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+from uuid import UUID
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.nodes.render_and_post import STATUS_ROWS_LISTED, RenderAndPost
+from src.schemas.state import WorkflowState
+from src.schemas.status_table import StatusTable
+
+COLUMNS = ["id", "status", "total", "currency", "concept", "expense_date", "description"]
+
+
+def _rows(count: int, seed: int = 1) -> list[tuple]:
+    rng = random.Random(seed)
+    return [
+        (
+            UUID(int=rng.getrandbits(128)),
+            rng.choice(("pending", "approved", "not_approved")),
+            Decimal(rng.randint(1, 500_000)).scaleb(-2),
+            rng.choice(("MXN", "USD")),
+            rng.choice(("hotel", "avion", None)),
+            date(2025, rng.randint(1, 12), rng.randint(1, 28)),
+            f"expense {row}",
+        )
+        for row in range(count)
+    ]
+
+
+class StatusTableTests(unittest.TestCase):
+    def test_encodes_columns_and_round_trips(self) -> None:
+        rows = _rows(50)
+        table = StatusTable.from_rows(COLUMNS, rows)
+
+        self.assertEqual(table.kinds, ("uuid", "codes", "cents", "codes", "codes", "date", "object"))
+        self.assertEqual([tuple(row.values()) for row in table], rows)
+        self.assertEqual([tuple(row.values()) for row in table.rows(3)], rows[:3])
+        self.assertEqual(table.date_range(), (min(row[5] for row in rows), max(row[5] for row in rows)))
+
+        serde = JsonPlusSerializer()
+        self.assertEqual(serde.loads_typed(serde.dumps_typed(table)), table)
+
+    def test_grouped_aggregates_match_row_by_row(self) -> None:
+        table = StatusTable.from_rows(COLUMNS, _rows(2_000))
+        counts: dict = defaultdict(int)
+        totals: dict = defaultdict(Decimal)
+        for row in table:
+            key = (row["status"], row["currency"])
+            counts[key] += 1
+            totals[key] += row["total"]
+
+        self.assertEqual(table.count_by("status", "currency"), counts)
+        self.assertEqual(table.sum_by("total", "status", "currency"), totals)
+        self.assertEqual(table.sum_by("total"), {(): sum(totals.values())})
+        # Dates are not dictionary-encoded, so this is the row-by-row path
+        by_date = table.sum_by("total", "expense_date")
+        self.assertGreater(len(by_date), 256)
+        self.assertEqual(sum(by_date.values()), sum(totals.values()))
+
+    def test_inexact_or_missing_values_stay_objects(self) -> None:
+        table = StatusTable.from_dicts(
+            [{"avg": Decimal("1.005"), "total": None}, {"avg": Decimal("2"), "total": Decimal("3.10")}]
+        )
+
+        self.assertEqual(table.kinds, ("object", "object"))
+        self.assertEqual(table.summarize(), [{"count": 2}])
+        with self.assertRaises(TypeError):
+            table.sum_by("total")
+
+    def test_render_uses_totals_for_large_results(self) -> None:
+        state = WorkflowState(status_rows=StatusTable.from_rows(COLUMNS, _rows(STATUS_ROWS_LISTED + 5)))
+        render = RenderAndPost()
+
+        payload = json.loads(render._format_state_for_prompt(state))
+        with patch("src.nodes.render_and_post.over_budget", return_value=True):
+            reply = render(state)["response_text"]
+
+        self.assertEqual(payload["status_rows"]["count"], STATUS_ROWS_LISTED + 5)
+        self.assertEqual(len(payload["status_rows"]["rows"]), STATUS_ROWS_LISTED)
+        self.assertEqual(payload["status_rows"]["rows_omitted"], 5)
+        self.assertEqual(sum(group["count"] for group in payload["status_rows"]["totals"]), STATUS_ROWS_LISTED + 5)
+        self.assertIn("…and 5 more. Totals:", reply)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+import hashlib
+import unittest
+from unittest.mock import MagicMock
+
+from minio.error import S3Error
+
+from src.tools import minio_storage
+from src.tools.streaming_upload import PART_SIZE, stream_to_minio
+
+
+def _fake_client() -> tuple[MagicMock, list[bytes]]:
+    uploaded: list[bytes] = []
+
+    def put_object(_bucket, _name, data, length, part_size, **_kwargs):
+        parts = []
+        while chunk := data.read(part_size):
+            parts.append(chunk)
+        uploaded.append(b"".join(parts))
+
+    client = MagicMock()
+    client.bucket_exists.return_value = True
+    client.put_object.side_effect = put_object
+    client.stat_object.side_effect = S3Error(None, "NoSuchKey", "missing", None, None, None)
+    return client, uploaded
+
+
+async def _chunks(payload: bytes, size: int):
+    for start in range(0, len(payload), size):
+        yield payload[start : start + size]
+
+
+class StreamingUploadTests(unittest.TestCase):
+    def setUp(self) -> None:
+        minio_storage.reset_minio_client()
+
+    def test_stream_to_minio_hashes_in_one_pass(self) -> None:
+        payload = bytes(range(256)) * 5000
+        client, uploaded = _fake_client()
+
+        stored = asyncio.run(
+            stream_to_minio(_chunks(payload, 4096), client, "receipts", "image/jpeg")
+        )
+
+        digest = hashlib.sha256(payload).hexdigest()
+        self.assertEqual(uploaded, [payload])
+        self.assertEqual(stored.sha256, digest)
+        self.assertEqual(stored.size, len(payload))
+        self.assertEqual(stored.object_name, minio_storage.content_object_name(digest))
+        self.assertTrue(stored.uploaded)
+        self.assertEqual(client.put_object.call_args.kwargs["part_size"], PART_SIZE)
+        client.copy_object.assert_called_once()
+        client.remove_object.assert_called_once()
+
+    def test_stream_to_minio_propagates_upload_failure(self) -> None:
+        client, _uploaded = _fake_client()
+        client.put_object.side_effect = RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(
+                stream_to_minio(_chunks(b"x" * 100000, 10), client, "receipts", "image/jpeg")
+            )
+        client.copy_object.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+import unittest
+from unittest.mock import patch
+
+from src.schemas.state import WorkflowState
+from src.tools.structured_logging import JsonFormatter, _sampled, log_state, summarize_state
+
+
+def _state(**overrides) -> WorkflowState:
+    values = {
+        "user_input": "lunch with Alice at Sushi Tei",
+        "telegram_user_id": "42",
+        "first_name": "Alice",
+        "receipt_json": {"merchant": "Sushi Tei", "items": [{"name": "ramen"}, {"name": "tea"}]},
+        "status_rows": [{"id": 1}],
+        "next_action": "upsert_expense",
+    }
+    values.update(overrides)
+    return WorkflowState(**values)
+
+
+class StructuredLoggingTests(unittest.TestCase):
+    def test_summary_has_counts_but_no_content(self) -> None:
+        summary = summarize_state(_state())
+        rendered = json.dumps(summary)
+
+        self.assertEqual(summary["input_chars"], 29)
+        self.assertEqual(summary["receipt_items"], 2)
+        self.assertEqual(summary["status_rows"], 1)
+        for secret in ("Alice", "Sushi", "ramen", "lunch"):
+            self.assertNotIn(secret, rendered)
+
+    def test_full_state_only_at_debug(self) -> None:
+        name = "src.tools.structured_logging"
+        with self.assertLogs(name, level=logging.INFO) as info:
+            log_state("Node input", _state())
+        self.assertEqual(len(info.records), 1)
+        self.assertNotIn("Sushi", info.output[0])
+        self.assertEqual(info.records[0].state["next_action"], "upsert_expense")
+
+        with self.assertLogs(name, level=logging.DEBUG) as debug:
+            log_state("Node input", _state())
+        self.assertEqual(len(debug.records), 2)
+        self.assertIn("Sushi", debug.output[0])
+
+    def test_sampling_is_per_user_and_listed_users_always_log(self) -> None:
+        users = [str(user) for user in range(1_000)]
+        with patch.dict(os.environ, {"LOG_STATE_SAMPLE_RATE": "0.1", "LOG_STATE_USERS": "7"}):
+            first = [user for user in users if _sampled(user)]
+            second = [user for user in users if _sampled(user)]
+
+        self.assertEqual(first, second)
+        self.assertIn("7", first)
+        self.assertTrue(30 < len(first) < 200)
+
+    def test_json_formatter_includes_state(self) -> None:
+        record = logging.LogRecord("node", logging.INFO, __file__, 1, "event %s", ("x",), None)
+        record.state = {"hops": 2}
+
+        payload = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(payload["message"], "event x")
+        self.assertEqual(payload["state"], {"hops": 2})
+        self.assertEqual(payload["level"], "INFO")
+
+
+if __name__ == "__main__":
+    unittest.main()
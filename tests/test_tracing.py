@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import patch
+
+from src.graph.graph import build_graph
+from src.graph.tracing import WASTED_HOPS, guard_action
+from src.nodes.agent_plan import AgentPlan
+from src.nodes.query_status import QueryStatus
+from src.nodes.render_and_post import RenderAndPost
+from src.schemas.state import WorkflowState
+from src.schemas.status_table import StatusTable
+
+
+class GuardTests(unittest.TestCase):
+    def test_planner_choice_stands_within_budget(self) -> None:
+        state = WorkflowState(next_action="upsert_expense", hops=1, action_history=["extract_receipt"])
+        self.assertEqual(guard_action(state), ("upsert_expense", "planner"))
+
+    def test_repeated_action_forces_reply(self) -> None:
+        state = WorkflowState(next_action="query_status", hops=1, action_history=["query_status"])
+        self.assertEqual(guard_action(state), ("render_and_post", "repeated_action"))
+
+    def test_hop_budget_forces_reply(self) -> None:
+        state = WorkflowState(next_action="extract_receipt", hops=4)
+        with patch.dict("os.environ", {"GRAPH_MAX_HOPS": "4"}):
+            self.assertEqual(guard_action(state), ("render_and_post", "hop_budget"))
+
+    def test_missing_choice_defaults_to_reply(self) -> None:
+        self.assertEqual(guard_action(WorkflowState()), ("render_and_post", "default"))
+
+
+class LoopingPlannerTests(unittest.TestCase):
+    def test_looping_planner_is_cut_after_one_repeat(self) -> None:
+        planner_calls: list[int] = []
+
+        def plan(_self, state: WorkflowState) -> WorkflowState:
+            planner_calls.append(state.hops)
+            return state.model_copy(update={"next_action": "query_status"})
+
+        def render(_self, state: WorkflowState) -> WorkflowState:
+            return state.model_copy(update={"response_text": "done"})
+
+        wasted = WASTED_HOPS.labels("query_status", "repeated_action")
+        wasted_before = wasted.value
+        with (
+            patch.object(AgentPlan, "__call__", plan),
+            patch.object(QueryStatus, "__call__", lambda _self, state: state),
+            patch.object(RenderAndPost, "__call__", render),
+        ):
+            result = build_graph().compile().invoke(WorkflowState(user_input="status"))
+
+        self.assertEqual(result["action_history"], ["query_status", "render_and_post"])
+        self.assertEqual(result["hops"], 2)
+        self.assertEqual(len(planner_calls), 2)
+        self.assertEqual(
+            [timing["node"] for timing in result["node_timings"]],
+            ["agent_plan", "query_status", "agent_plan", "render_and_post"],
+        )
+        self.assertEqual(wasted.value, wasted_before + 1)
+
+
+class PartialUpdateTests(unittest.TestCase):
+    def test_status_rows_are_passed_by_reference(self) -> None:
+        rows = StatusTable.from_dicts({"id": index, "status": "pending"} for index in range(100))
+        seen: list[object] = []
+
+        def plan(_self, state: WorkflowState) -> dict:
+            seen.append(state.status_rows)
+            return {"next_action": "query_status" if state.status_rows is None else "render_and_post"}
+
+        with (
+            patch.object(AgentPlan, "__call__", plan),
+            patch.object(QueryStatus, "__call__", lambda _self, state: {"status_rows": rows}),
+            patch.object(RenderAndPost, "__call__", lambda _self, state: {"response_text": "done"}),
+        ):
+            result = build_graph().compile().invoke({"user_input": "status"})
+
+        self.assertIs(seen[-1], rows)
+        self.assertIs(result["status_rows"], rows)
+        self.assertEqual(result["action_history"], ["query_status", "render_and_post"])
+
+    def test_list_rows_are_converted_once(self) -> None:
+        state = WorkflowState(status_rows=[{"id": 1}], batch_results=[{"file_id": "f"}])
+
+        self.assertEqual(list(state.status_rows), [{"id": 1}])
+        self.assertEqual(state.batch_results, ({"file_id": "f"},))
+        rebuilt = WorkflowState(status_rows=state.status_rows, batch_results=state.batch_results)
+        self.assertIs(rebuilt.status_rows, state.status_rows)
+        self.assertIs(rebuilt.batch_results, state.batch_results)
+        self.assertEqual(state.model_dump(mode="json")["status_rows"], [{"id": 1}])
+
+
+if __name__ == "__main__":
+    unittest.main()
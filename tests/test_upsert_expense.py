@@ -25,10 +25,10 @@ class UpsertExpenseTests(unittest.TestCase):
         state = WorkflowState(telegram_user_id="123")
 
         with patch("src.nodes.upsert_expense.psycopg.connect") as connect:
-            updated_state = UpsertExpense()(state)
+            update = UpsertExpense()(state)
 
         connect.assert_not_called()
-        self.assertIsNone(updated_state.expense_id)
+        self.assertEqual(update, {})
 
     def test_upsert_inserts_expense(self) -> None:
         receipt = {
@@ -53,9 +53,13 @@ class UpsertExpenseTests(unittest.TestCase):
         )
         with patch("src.nodes.upsert_expense.psycopg.connect", return_value=conn_cm):
             with patch.dict("os.environ", {"DATABASE_URL": "db"}):
-                updated_state = UpsertExpense()(state)
+                update = UpsertExpense()(state)
 
-        self.assertEqual(updated_state.expense_id, "expense-uuid")
+        self.assertEqual(update["expense_id"], "expense-uuid")
+        self.assertEqual(
+            update["previous_receipt"],
+            {"receipt_json": receipt, "expense_id": "expense-uuid", "file_id": None},
+        )
         self.assertGreaterEqual(cur.execute.call_count, 2)
 
     def test_upsert_updates_existing_expense(self) -> None:
@@ -77,9 +81,38 @@ class UpsertExpenseTests(unittest.TestCase):
         )
         with patch("src.nodes.upsert_expense.psycopg.connect", return_value=conn_cm):
             with patch.dict("os.environ", {"DATABASE_URL": "db"}):
-                updated_state = UpsertExpense()(state)
+                update = UpsertExpense()(state)
+
+        self.assertEqual(update["expense_id"], "expense-old")
+
+    def test_upsert_many_batches_inserts(self) -> None:
+        receipt = {
+            "is_receipt": True,
+            "merchant_name": "Uber",
+            "receipt_date": "2025-11-16",
+            "currency": "mxn",
+            "total": 100,
+        }
+        states = [
+            WorkflowState(telegram_user_id="123", receipt_json=receipt, file_id="a"),
+            WorkflowState(telegram_user_id="123", receipt_json={"is_receipt": False}),
+            WorkflowState(telegram_user_id="123", receipt_json=receipt, file_id="b"),
+        ]
+
+        conn_cm, cur = _build_mock_connection(
+            [("user-uuid",), ("expense-a",), ("expense-b",)]
+        )
+        cur.results.return_value = iter([cur, cur])
+        with patch("src.nodes.upsert_expense.psycopg.connect", return_value=conn_cm) as connect:
+            with patch.dict("os.environ", {"DATABASE_URL": "db"}):
+                updated = UpsertExpense().upsert_many(states)
 
-        self.assertEqual(updated_state.expense_id, "expense-old")
+        connect.assert_called_once()
+        cur.executemany.assert_called_once()
+        self.assertEqual(len(cur.executemany.call_args.args[1]), 2)
+        self.assertEqual(
+            [state.expense_id for state in updated], ["expense-a", None, "expense-b"]
+        )
 
 
 if __name__ == "__main__":
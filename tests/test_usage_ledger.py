@@ -0,0 +1,103 @@
+import unittest
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from src.db.llm_usage import INSERT_USAGE_SQL, UPSERT_DAILY_SQL
+from src.nodes.render_and_post import RenderAndPost
+from src.schemas.state import WorkflowState
+from src.tools.usage_ledger import (
+    UsageLedger,
+    UsageRecorder,
+    format_usage_report,
+    usage_scope,
+)
+
+
+def _llm_result(input_tokens: int, output_tokens: int, model: str = "gpt-4o-mini") -> LLMResult:
+    message = AIMessage(
+        content="ok",
+        usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        },
+        response_metadata={"model_name": model},
+    )
+    return LLMResult(generations=[[ChatGeneration(message=message)]])
+
+
+class UsageLedgerTests(unittest.TestCase):
+    def test_recorder_attributes_calls_to_scope(self) -> None:
+        ledger = UsageLedger(daily_budget=Decimal("0.0002"))
+        recorder = UsageRecorder("render_and_post", ledger=ledger)
+
+        with usage_scope("42", "extract_receipt"):
+            recorder.on_llm_end(_llm_result(1000, 100))
+
+        # 1000 * 0.15/M + 100 * 0.60/M
+        self.assertEqual(ledger.spent_today("42"), Decimal("0.00021"))
+        self.assertEqual(ledger.spent_today("7"), Decimal(0))
+        self.assertTrue(ledger.over_budget("42"))
+        self.assertFalse(ledger.over_budget("7"))
+
+    def test_flush_writes_raw_rows_and_rollup_in_batches(self) -> None:
+        ledger = UsageLedger(database_url="postgresql://test", flush_interval=3600)
+        ledger._stopping = True  # no background flusher
+        for _ in range(3):
+            ledger.record("42", "agent_plan", "gpt-4o-mini", 200, 20)
+        ledger.record("7", "render_and_post", "gpt-4o-mini", 100, 50)
+
+        connect = MagicMock()
+        cursor = connect.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value
+        with patch("src.db.llm_usage.psycopg.connect", connect):
+            written = ledger.flush()
+            self.assertEqual(ledger.flush(), 0)
+
+        self.assertEqual(written, 2)
+        self.assertEqual(connect.call_count, 1)
+        sqls = [call.args[0] for call in cursor.executemany.call_args_list]
+        self.assertEqual(sqls, [INSERT_USAGE_SQL, UPSERT_DAILY_SQL])
+        rows = cursor.executemany.call_args_list[0].args[1]
+        plan_row = next(row for row in rows if row[2] == "agent_plan")
+        self.assertEqual(plan_row[1:7], (42, "agent_plan", "gpt-4o-mini", 3, 600, 60))
+
+    def test_over_budget_user_gets_template_reply(self) -> None:
+        state = WorkflowState(telegram_user_id="42", expense_id="e-1")
+        with (
+            patch("src.nodes.render_and_post.over_budget", return_value=True),
+            patch.object(RenderAndPost, "_get_llm") as get_llm,
+        ):
+            result = RenderAndPost()(state)
+
+        get_llm.assert_not_called()
+        self.assertIn("e-1", result["response_text"])
+
+    def test_format_usage_report(self) -> None:
+        report = {
+            "totals": {
+                "calls": 5,
+                "input_tokens": 1000,
+                "output_tokens": 200,
+                "cost_usd": Decimal("0.0123"),
+                "users": 2,
+            },
+            "by_node": [
+                {"node": "extract_receipt", "calls": 2, "tokens": 900,
+                 "cost_usd": Decimal("0.01"), "cost_per_call": Decimal("0.005")},
+            ],
+            "top_users": [{"telegram_user_id": 42, "calls": 4, "cost_usd": Decimal("0.011")}],
+        }
+
+        text = format_usage_report(report, days=7)
+
+        self.assertIn("last 7 day(s)", text)
+        self.assertIn("extract_receipt: $0.0100, 2 calls, $0.00500/call", text)
+        self.assertIn("42: $0.0110 (4 calls)", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
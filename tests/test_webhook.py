@@ -0,0 +1,59 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+from starlette.testclient import TestClient
+
+from src.tools.webhook import SECRET_HEADER, build_webhook_app
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 10,
+        "date": 1700000000,
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Ana"},
+        "text": "status",
+    },
+}
+
+
+def _application() -> MagicMock:
+    application = MagicMock()
+    application.running = True
+    application.update_queue = asyncio.Queue()
+    application.bot.defaults = None
+    return application
+
+
+class WebhookTests(unittest.TestCase):
+    def test_valid_update_is_queued(self) -> None:
+        application = _application()
+        with TestClient(build_webhook_app(application, "s3cret")) as client:
+            response = client.post("/telegram", json=UPDATE, headers={SECRET_HEADER: "s3cret"})
+
+        self.assertEqual(response.status_code, 200)
+        update = application.update_queue.get_nowait()
+        self.assertEqual(update.message.text, "status")
+
+    def test_invalid_secret_is_rejected(self) -> None:
+        application = _application()
+        with TestClient(build_webhook_app(application, "s3cret")) as client:
+            response = client.post("/telegram", json=UPDATE, headers={SECRET_HEADER: "nope"})
+
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(application.update_queue.empty())
+
+    def test_health_and_readiness(self) -> None:
+        application = _application()
+        app = build_webhook_app(application, "s3cret")
+
+        with TestClient(app) as client:
+            self.assertEqual(client.get("/healthz").status_code, 200)
+            self.assertEqual(client.get("/readyz").status_code, 200)
+            application.running = False
+            self.assertEqual(client.get("/readyz").status_code, 503)
+
+
+if __name__ == "__main__":
+    unittest.main()
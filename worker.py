@@ -0,0 +1,153 @@
+"""
+Graph worker: claims queued jobs, runs the workflow and posts the reply.
+
+Run any number of these (on one or many hosts) next to a bot started with
+JOB_QUEUE=true. Each process runs WORKER_CONCURRENCY jobs at once.
+
+Usage:
+    uv run python worker.py
+"""
+
+import asyncio
+import logging
+import os
+import signal
+
+from dotenv import load_dotenv
+from langgraph.graph.state import CompiledStateGraph
+from telegram.error import BadRequest
+from telegram.ext import ExtBot
+
+from src.db import Job, init_db_from_env, purge_jobs, save_job_result
+from src.graph.album import run_album
+from src.graph.checkpoint import ConversationMemory, thread_config, turn_input
+from src.graph.graph import graph
+from src.schemas.state import WorkflowState
+from src.tools.job_worker import JobWorker
+from src.tools.metrics import start_metrics_server
+from src.tools.outbound import OutboundLimiter
+from src.tools.profiler import install_profile_signal, profile_update
+from src.tools.structured_logging import configure_logging
+from src.tools.usage_ledger import get_usage_ledger
+
+load_dotenv()
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Same reply the bot's error handler sends when an inline run fails
+FAILED_TEXT = "❌ An error occurred. Please try again later."
+PURGE_INTERVAL_SECONDS = 3600
+
+
+async def run_job(job: Job, compiled_graph: CompiledStateGraph) -> str:
+    """Run the workflow for a job and return the reply text."""
+    if job.kind == "album":
+        states = [WorkflowState(**state) for state in job.payload["states"]]
+        result = await asyncio.to_thread(run_album, states)
+        return result.response_text or f"✅ {len(states)} receipts received. Thanks!"
+
+    if job.kind == "graph":
+        state = WorkflowState(**job.payload["state"])
+        result = await compiled_graph.ainvoke(
+            turn_input(state), config=thread_config(job.chat_id), durability="exit"
+        )
+        return result.get("response_text") or job.payload.get("fallback_text") or "✅ Got it. Thanks!"
+
+    raise ValueError(f"Unknown job kind: {job.kind}")
+
+
+async def deliver(bot: ExtBot, job: Job, text: str) -> None:
+    """Replace the placeholder with the reply, or send a new message."""
+    if job.progress_message_id:
+        try:
+            await bot.edit_message_text(text, chat_id=job.chat_id, message_id=job.progress_message_id)
+            return
+        except BadRequest as exc:
+            # A retried job may find the placeholder already showing the reply
+            if "not modified" in str(exc).lower():
+                return
+            logger.warning("Could not edit placeholder for job %s: %s", job.id, exc)
+
+    await bot.send_message(
+        job.chat_id,
+        text,
+        reply_to_message_id=job.reply_to_message_id,
+        allow_sending_without_reply=True,
+    )
+
+
+async def purge_finished_jobs(
+    database_url: str, retention_days: float, stop: asyncio.Event
+) -> None:
+    """Delete old done and failed jobs every PURGE_INTERVAL_SECONDS until stopped."""
+    while not stop.is_set():
+        try:
+            deleted = await asyncio.to_thread(purge_jobs, database_url, retention_days)
+            if deleted:
+                logger.info("Purged %s finished jobs older than %s days", deleted, retention_days)
+        except Exception:
+            logger.exception("Could not purge finished jobs")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=PURGE_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main() -> None:
+    """Start the worker and run until SIGINT/SIGTERM."""
+    database_url = os.environ["DATABASE_URL"]
+    init_db_from_env()
+
+    metrics_port = int(os.getenv("METRICS_PORT", "0"))
+    if metrics_port:
+        start_metrics_server(metrics_port, os.getenv("METRICS_HOST", "127.0.0.1"))
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    install_profile_signal(loop)
+
+    memory = ConversationMemory.from_env()
+    compiled_graph = graph.compile(checkpointer=await memory.open())
+
+    bot = ExtBot(os.environ["TELEGRAM_BOT_TOKEN"], rate_limiter=OutboundLimiter.from_env())
+    async with bot:
+
+        async def handle(job: Job) -> None:
+            text = job.result_text
+            if text is None:
+                # The queue runs one job per chat at a time, so threads never overlap
+                with profile_update(job.kind):
+                    text = await run_job(job, compiled_graph)
+                if job.kind == "graph":
+                    await memory.after_turn(job.chat_id)
+                # A failed delivery is retried without running the graph again
+                await asyncio.to_thread(save_job_result, database_url, job.id, text)
+            await deliver(bot, job, text)
+
+        async def report_failure(job: Job) -> None:
+            await deliver(bot, job, FAILED_TEXT)
+
+        worker = JobWorker(
+            database_url,
+            handle,
+            concurrency=int(os.getenv("WORKER_CONCURRENCY", "4")),
+            visibility_timeout=float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300")),
+            poll_interval=float(os.getenv("JOB_POLL_INTERVAL", "5")),
+            on_failed=report_failure,
+        )
+        retention_days = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+        purge = asyncio.create_task(purge_finished_jobs(database_url, retention_days, stop))
+        try:
+            await worker.run(stop)
+        finally:
+            purge.cancel()
+            await asyncio.gather(purge, return_exceptions=True)
+            await memory.close()
+            await asyncio.to_thread(get_usage_ledger().close)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())